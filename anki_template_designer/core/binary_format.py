@@ -0,0 +1,345 @@
+"""Compact binary encoding for template data.
+
+Encodes the dictionaries produced by ``Template.to_dict`` (or any
+JSON-compatible value) into a versioned binary form that is several
+times smaller than indented JSON and faster to load:
+
+- Well-known keys (``"fieldName"``, ``"customCss"``...) are written as a
+  single varint from a fixed key dictionary.
+- Every distinct string is stored once in a string table and referenced
+  by index, so repeated class names, field names and ids cost one varint.
+- Lengths and integers use LEB128 varints (integers zigzag-encoded).
+- ISO timestamps under known date keys are stored as microseconds.
+- The body may optionally be zlib-compressed.
+
+Layout::
+
+    magic "ATDB" | version u8 | flags u8 | body
+    body = varint string_count | strings... | value
+
+The key dictionary is part of the format version: keys may only ever be
+appended, and a new format version is required to change existing ones.
+"""
+
+import struct
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from .exceptions import InvalidFormatError
+
+MAGIC = b"ATDB"
+FORMAT_VERSION = 1
+
+FLAG_ZLIB = 0x01
+
+# Well-known keys. Append only: indices are part of the on-disk format.
+KEY_DICTIONARY: Tuple[str, ...] = (
+    # Template
+    "id", "name", "front", "back", "css", "noteType",
+    "createdAt", "modifiedAt", "version",
+    # TemplateSide
+    "html", "components",
+    # Component
+    "type", "content", "fieldName", "style", "children", "attributes",
+    # ComponentStyle
+    "background", "color", "fontSize", "fontFamily", "padding",
+    "margin", "border", "borderRadius", "customCss",
+    # Common component attributes
+    "class", "src", "alt", "title", "href", "target",
+)
+_KEY_INDEX: Dict[str, int] = {k: i for i, k in enumerate(KEY_DICTIONARY)}
+
+# Keys whose ISO-8601 string values are stored as timestamps
+_DATETIME_KEYS = frozenset({"createdAt", "modifiedAt"})
+_EPOCH = datetime(1970, 1, 1)
+
+# Value tags
+_T_NULL = 0
+_T_FALSE = 1
+_T_TRUE = 2
+_T_INT = 3
+_T_FLOAT = 4
+_T_STR = 5
+_T_LIST = 6
+_T_DICT = 7
+_T_DATETIME = 8
+
+_DOUBLE = struct.Struct("<d")
+
+
+def is_binary(data: bytes) -> bool:
+    """Check whether a byte string is in the binary template format.
+
+    Args:
+        data: Raw file contents.
+
+    Returns:
+        True if the data starts with the format's magic bytes.
+    """
+    return data[:len(MAGIC)] == MAGIC
+
+
+def encode(value: Any, compress: bool = False) -> bytes:
+    """Encode a JSON-compatible value.
+
+    Args:
+        value: Value to encode (typically ``Template.to_dict()``).
+        compress: If True, zlib-compress the body.
+
+    Returns:
+        Encoded bytes.
+
+    Raises:
+        InvalidFormatError: If the value contains unsupported types.
+    """
+    encoder = _Encoder()
+    encoder.write_value(value, None)
+
+    header = bytearray()
+    _write_varint(header, len(encoder.strings))
+    for s in encoder.strings:
+        raw = s.encode("utf-8")
+        _write_varint(header, len(raw))
+        header += raw
+
+    body = bytes(header) + bytes(encoder.out)
+    flags = 0
+    if compress:
+        body = zlib.compress(body)
+        flags |= FLAG_ZLIB
+
+    return MAGIC + bytes((FORMAT_VERSION, flags)) + body
+
+
+def decode(data: bytes) -> Any:
+    """Decode bytes produced by :func:`encode`.
+
+    Args:
+        data: Encoded bytes.
+
+    Returns:
+        The decoded value.
+
+    Raises:
+        InvalidFormatError: If the data is not valid binary template data.
+    """
+    if not is_binary(data) or len(data) < len(MAGIC) + 2:
+        raise InvalidFormatError("Not a binary template file")
+
+    version = data[len(MAGIC)]
+    flags = data[len(MAGIC) + 1]
+    if version != FORMAT_VERSION:
+        raise InvalidFormatError(
+            f"Unsupported binary template version: {version}",
+            details={"version": version},
+        )
+
+    body = data[len(MAGIC) + 2:]
+    try:
+        if flags & FLAG_ZLIB:
+            body = zlib.decompress(body)
+        return _Decoder(body).read_document()
+    except (zlib.error, IndexError, UnicodeDecodeError, struct.error, ValueError) as e:
+        raise InvalidFormatError(f"Corrupt binary template data: {e}") from e
+
+
+def _write_varint(out: bytearray, n: int) -> None:
+    """Write an unsigned LEB128 varint."""
+    while n > 0x7F:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+class _Encoder:
+    """Internal: single-pass encoder with string interning."""
+
+    def __init__(self) -> None:
+        self.out = bytearray()
+        self.strings: List[str] = []
+        self._string_index: Dict[str, int] = {}
+
+    def intern(self, s: str) -> int:
+        index = self._string_index.get(s)
+        if index is None:
+            index = len(self.strings)
+            self._string_index[s] = index
+            self.strings.append(s)
+        return index
+
+    def write_value(self, value: Any, key: Any) -> None:
+        out = self.out
+        if value is None:
+            out.append(_T_NULL)
+        elif value is True:
+            out.append(_T_TRUE)
+        elif value is False:
+            out.append(_T_FALSE)
+        elif isinstance(value, int):
+            out.append(_T_INT)
+            _write_varint(out, (value << 1) if value >= 0 else ((-value << 1) - 1))
+        elif isinstance(value, float):
+            out.append(_T_FLOAT)
+            out += _DOUBLE.pack(value)
+        elif isinstance(value, str):
+            micros = _timestamp_micros(value) if key in _DATETIME_KEYS else None
+            if micros is not None:
+                out.append(_T_DATETIME)
+                _write_varint(out, (micros << 1) if micros >= 0 else ((-micros << 1) - 1))
+            else:
+                out.append(_T_STR)
+                _write_varint(out, self.intern(value))
+        elif isinstance(value, (list, tuple)):
+            out.append(_T_LIST)
+            _write_varint(out, len(value))
+            for item in value:
+                self.write_value(item, None)
+        elif isinstance(value, dict):
+            out.append(_T_DICT)
+            _write_varint(out, len(value))
+            for k, v in value.items():
+                if not isinstance(k, str):
+                    raise InvalidFormatError(
+                        "Binary template keys must be strings",
+                        details={"key": repr(k)},
+                    )
+                index = _KEY_INDEX.get(k)
+                if index is None:
+                    index = len(KEY_DICTIONARY) + self.intern(k)
+                _write_varint(out, index)
+                self.write_value(v, k)
+        else:
+            raise InvalidFormatError(
+                f"Cannot encode value of type {type(value).__name__}",
+                details={"type": type(value).__name__},
+            )
+
+
+def _timestamp_micros(value: str) -> Any:
+    """Convert a naive ISO timestamp to epoch microseconds if it round-trips."""
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if dt.tzinfo is not None or dt.isoformat() != value:
+        return None
+    delta = dt - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """Read an unsigned LEB128 varint, returning (value, new position)."""
+    result = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+class _Decoder:
+    """Internal: decoder over an in-memory body.
+
+    Single-byte varints (the vast majority: small counts, low string
+    indices, dictionary keys) are read inline without a function call.
+    """
+
+    def __init__(self, data: bytes) -> None:
+        self._data = data
+        self._pos = 0
+        self._strings: List[str] = []
+
+    def read_document(self) -> Any:
+        data = self._data
+        count, pos = _read_varint(data, 0)
+        strings = self._strings
+        for _ in range(count):
+            length, pos = _read_varint(data, pos)
+            end = pos + length
+            if end > len(data):
+                raise ValueError("string table truncated")
+            strings.append(data[pos:end].decode("utf-8"))
+            pos = end
+        self._pos = pos
+        value = self.read_value()
+        if self._pos != len(data):
+            raise ValueError("trailing data after document")
+        return value
+
+    def read_value(self) -> Any:
+        data = self._data
+        pos = self._pos
+        tag = data[pos]
+        pos += 1
+
+        if tag <= _T_TRUE:
+            self._pos = pos
+            return None if tag == _T_NULL else tag == _T_TRUE
+        if tag == _T_FLOAT:
+            (value,) = _DOUBLE.unpack_from(data, pos)
+            self._pos = pos + _DOUBLE.size
+            return value
+
+        n = data[pos]
+        if n < 0x80:
+            pos += 1
+        else:
+            n, pos = _read_varint(data, pos)
+
+        if tag == _T_STR:
+            self._pos = pos
+            return self._strings[n]
+        if tag == _T_DICT:
+            # Scalars are decoded inline; only containers recurse
+            result = {}
+            strings = self._strings
+            keys = KEY_DICTIONARY
+            base = len(keys)
+            for _ in range(n):
+                index = data[pos]
+                if index < 0x80:
+                    pos += 1
+                else:
+                    index, pos = _read_varint(data, pos)
+                key = keys[index] if index < base else strings[index - base]
+
+                vtag = data[pos]
+                if vtag == _T_STR:
+                    v = data[pos + 1]
+                    if v < 0x80:
+                        pos += 2
+                    else:
+                        v, pos = _read_varint(data, pos + 1)
+                    result[key] = strings[v]
+                elif vtag == _T_NULL:
+                    pos += 1
+                    result[key] = None
+                else:
+                    self._pos = pos
+                    result[key] = self.read_value()
+                    pos = self._pos
+            self._pos = pos
+            return result
+        if tag == _T_LIST:
+            self._pos = pos
+            read = self.read_value
+            return [read() for _ in range(n)]
+
+        self._pos = pos
+        if tag == _T_INT:
+            return (n >> 1) if not n & 1 else -((n + 1) >> 1)
+        if tag == _T_DATETIME:
+            micros = (n >> 1) if not n & 1 else -((n + 1) >> 1)
+            seconds, micro = divmod(micros, 1_000_000)
+            return _format_timestamp(seconds, micro)
+
+        raise ValueError(f"unknown value tag {tag}")
+
+
+def _format_timestamp(seconds: int, micro: int) -> str:
+    """Format epoch seconds/microseconds back to a naive ISO string."""
+    return (_EPOCH + timedelta(seconds=seconds, microseconds=micro)).isoformat()
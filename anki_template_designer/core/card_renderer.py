@@ -0,0 +1,555 @@
+"""Render Anki card templates (qfmt/afmt) for previews.
+
+A template is tokenised once into a flat list of operations:
+
+    TEXT     literal HTML
+    FIELD    {{Field}} or {{filter:...:Field}}
+    SECTION  {{#Field}} / {{^Field}}, with the index just past the
+             matching {{/Field}} so a skipped section is a single jump
+
+Rendering is then one linear pass over the operations, so its cost is
+proportional to the template and the output, not to the number of
+fields times the template size. Filters follow Anki: in
+``{{text:cloze:Field}}`` the field is passed through ``cloze`` and then
+``text``. Supported filters are ``cloze``, ``cloze-only``, ``hint``,
+``type``, ``text``, ``furigana``, ``kana``, ``kanji``, ``nc`` and
+``tts``; unknown filters (add-on filters, ``edit``) leave the text as it
+is. Special fields ``FrontSide``, ``Tags``, ``Type``, ``Deck``,
+``Subdeck``, ``Card`` and ``CardFlag`` are taken from ``specials``.
+
+A reference to a field the note does not have is left in the output
+verbatim, so it stays visible in the preview.
+
+Compiled templates are immutable and safe to render from several
+threads. ``CardRenderer`` caches them by a caller-chosen key such as
+``(note type id, ordinal, mod)``. ``render_cards`` renders a batch,
+on the calling thread or, if asked for, in a thread pool.
+"""
+
+import html
+import re
+import threading
+import unicodedata
+import logging
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Hashable, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .exceptions import TemplateSyntaxError
+
+logger = logging.getLogger("anki_template_designer.core.card_renderer")
+
+_TOKEN = re.compile(r"\{\{(.*?)\}\}", re.S)
+_CLOZE = re.compile(r"\{\{c(\d+)::(.*?)(?:::(.*?))?\}\}", re.S)
+_RUBY = re.compile(r" ?([^ >]+?)\[(.+?)\]")
+_HTML_STRIP = re.compile(r"<!--.*?-->|<(script|style)\b.*?</\1\s*>|<[^>]*>", re.S | re.I)
+# Anki treats fields holding only whitespace, <br> and <div> as empty
+_EMPTY = re.compile(r"^(?:\s|\u00a0|</?(?:br|div)\s*/?>)*$", re.S | re.I)
+
+_TEXT, _FIELD, _SECTION = 0, 1, 2
+
+# Kinds of field reference
+REF_FIELD = "field"          # {{Field}}, {{filter:Field}}
+REF_SECTION = "section"      # {{#Field}}
+REF_INVERTED = "inverted"    # {{^Field}}
+
+Op = Tuple[Any, ...]
+# (template index, field values, card ordinal)
+CardJob = Tuple[int, Dict[str, str], int]
+
+
+class CompiledTemplate:
+    """A card template tokenised into operations.
+
+    Attributes:
+        source: The template text.
+        field_names: Field and special names the template refers to.
+    """
+
+    __slots__ = ("source", "field_names", "_ops")
+
+    def __init__(self, source: str, ops: Tuple[Op, ...], field_names: Tuple[str, ...]) -> None:
+        self.source = source
+        self.field_names = field_names
+        self._ops = ops
+
+    def __len__(self) -> int:
+        return len(self._ops)
+
+    def render(
+        self,
+        fields: Dict[str, str],
+        card_ordinal: int = 0,
+        question: bool = True,
+        specials: Optional[Dict[str, str]] = None,
+        front_side: str = ""
+    ) -> str:
+        """Render the template.
+
+        Args:
+            fields: Field values by field name.
+            card_ordinal: 0-based card ordinal; cloze number minus one.
+            question: Render the question side (affects cloze and type).
+            specials: Values of special fields such as "Tags" and "Deck".
+            front_side: Rendered question, for ``{{FrontSide}}``.
+
+        Returns:
+            Rendered HTML.
+        """
+        specials = specials or {}
+        out: List[str] = []
+        append = out.append
+        ops = self._ops
+        count = len(ops)
+        i = 0
+        while i < count:
+            op = ops[i]
+            kind = op[0]
+            if kind == _TEXT:
+                append(op[1])
+            elif kind == _FIELD:
+                name = op[1]
+                value = fields.get(name)
+                if value is None:
+                    if name == "FrontSide":
+                        value = "" if question else front_side
+                    else:
+                        value = specials.get(name)
+                        if value is None:
+                            append(op[3])
+                            i += 1
+                            continue
+                if op[2]:
+                    value = _apply_filters(op[2], value, name, card_ordinal + 1, question)
+                append(value)
+            else:
+                value = fields.get(op[1])
+                if value is None:
+                    value = specials.get(op[1], "")
+                if (_EMPTY.match(value) is None) == op[2]:
+                    i = op[3]
+                    continue
+            i += 1
+        return "".join(out)
+
+
+def compile_card_template(source: str) -> CompiledTemplate:
+    """Tokenise a card template.
+
+    Args:
+        source: Template text (an Anki qfmt or afmt).
+
+    Returns:
+        The compiled template.
+
+    Raises:
+        TemplateSyntaxError: If sections are not properly nested.
+    """
+    ops: List[Op] = []
+    open_sections: List[Tuple[str, int]] = []
+    names: Dict[str, None] = {}
+    position = 0
+
+    for match in _TOKEN.finditer(source):
+        if match.start() > position:
+            _add_text(ops, source[position:match.start()])
+        position = match.end()
+        token = match.group(1).strip()
+
+        if token[:1] in ("#", "^"):
+            key = token[1:].strip()
+            names[key] = None
+            open_sections.append((key, len(ops)))
+            ops.append((_SECTION, key, token[0] == "^", -1))
+        elif token[:1] == "/":
+            key = token[1:].strip()
+            if not open_sections:
+                raise TemplateSyntaxError(
+                    f"Found {{{{/{key}}}}} without a matching {{{{#{key}}}}}",
+                    details={"token": match.group(0)},
+                )
+            expected, start = open_sections.pop()
+            if key != expected:
+                raise TemplateSyntaxError(
+                    f"Found {{{{/{key}}}}}, but expected {{{{/{expected}}}}}",
+                    details={"token": match.group(0)},
+                )
+            section = ops[start]
+            ops[start] = (_SECTION, section[1], section[2], len(ops))
+        elif token:
+            *filters, name = token.split(":")
+            name = name.strip()
+            names[name] = None
+            ops.append((_FIELD, name, _compile_filters(filters), match.group(0)))
+        else:
+            _add_text(ops, match.group(0))
+
+    if open_sections:
+        key = open_sections[-1][0]
+        raise TemplateSyntaxError(f"Missing {{{{/{key}}}}}", details={"section": key})
+    if position < len(source):
+        _add_text(ops, source[position:])
+    return CompiledTemplate(source, tuple(ops), tuple(names))
+
+
+def render_card(
+    front: CompiledTemplate,
+    back: CompiledTemplate,
+    fields: Dict[str, str],
+    card_ordinal: int = 0,
+    specials: Optional[Dict[str, str]] = None
+) -> Tuple[str, str]:
+    """Render the question and answer of one card.
+
+    Args:
+        front: Compiled question template.
+        back: Compiled answer template.
+        fields: Field values by field name.
+        card_ordinal: 0-based card ordinal; cloze number minus one.
+        specials: Values of special fields such as "Tags" and "Deck".
+
+    Returns:
+        Tuple of question and answer HTML.
+    """
+    question = front.render(fields, card_ordinal, True, specials)
+    answer = back.render(fields, card_ordinal, False, specials, front_side=question)
+    return question, answer
+
+
+def render_cards(
+    templates: Sequence[Tuple[CompiledTemplate, CompiledTemplate, Optional[Dict[str, str]]]],
+    jobs: Sequence[CardJob],
+    workers: Optional[int] = 0,
+    chunk_size: int = 250,
+    min_parallel: int = 2000
+) -> List[Tuple[str, str]]:
+    """Render a batch of cards.
+
+    Args:
+        templates: Compiled question and answer templates, with their
+            special field values, indexed by the jobs.
+        jobs: Cards to render as (template index, fields, card ordinal).
+        workers: Worker threads. 0 renders on the calling thread;
+            None uses the executor's default. Threads are used rather
+            than processes because inside Anki the interpreter is the
+            Anki binary, which must not be started again.
+        chunk_size: Cards per worker task.
+        min_parallel: Below this many cards, render inline since
+            starting a pool costs more than it saves.
+
+    Returns:
+        Question and answer HTML per job, in job order.
+    """
+    if workers == 0 or len(jobs) < min_parallel:
+        return _render_jobs(templates, jobs)
+
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    results: List[Tuple[str, str]] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for rendered in pool.map(lambda chunk: _render_jobs(templates, chunk), chunks):
+            results.extend(rendered)
+    return results
+
+
+def cloze_ordinals(fields: Iterable[str]) -> List[int]:
+    """Get the cards a cloze note generates.
+
+    Args:
+        fields: Field values of the note.
+
+    Returns:
+        Sorted 0-based card ordinals (cloze number minus one).
+    """
+    numbers = set()
+    for value in fields:
+        if "{{c" in value:
+            numbers.update(int(m.group(1)) for m in _CLOZE.finditer(value))
+    return sorted(n - 1 for n in numbers if n > 0)
+
+
+class FieldReference(NamedTuple):
+    """A reference to a field in a card template.
+
+    Attributes:
+        field: Field or special name.
+        kind: REF_FIELD, REF_SECTION or REF_INVERTED.
+        filters: Filters as written, outermost first; empty for sections.
+    """
+    field: str
+    kind: str
+    filters: Tuple[str, ...] = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary."""
+        return {"field": self.field, "kind": self.kind, "filters": list(self.filters)}
+
+
+def template_references(source: str) -> List[FieldReference]:
+    """List the field references of a card template, in order.
+
+    Unlike compile_card_template this does not check that sections
+    nest, so malformed templates can still be inspected.
+
+    Args:
+        source: Template text (an Anki qfmt or afmt).
+
+    Returns:
+        References, including repeats.
+    """
+    refs = []
+    for match in _TOKEN.finditer(source):
+        token = match.group(1).strip()
+        if token[:1] in ("#", "^"):
+            kind = REF_SECTION if token[0] == "#" else REF_INVERTED
+            refs.append(FieldReference(token[1:].strip(), kind))
+        elif token and token[0] != "/":
+            *filters, name = token.split(":")
+            refs.append(FieldReference(name.strip(), REF_FIELD, tuple(f.strip() for f in filters)))
+    return refs
+
+
+class CardRenderer:
+    """Renders card templates, caching their compiled form.
+
+    Keys identify a template version; use something that changes when
+    the template does, e.g. ``(note_type_id, ordinal, mod)``. Entries
+    also remember their source text, so a key reused for different
+    text is recompiled rather than rendering stale output.
+
+    Example:
+        renderer = CardRenderer()
+        front, back = renderer.render((nt.id, 0, nt.mod), qfmt, afmt, fields)
+    """
+
+    def __init__(self, max_entries: int = 512) -> None:
+        """Initialize the renderer.
+
+        Args:
+            max_entries: Maximum number of cached templates (front and
+                back pairs).
+        """
+        self._max_entries = max_entries
+        self._cache: "OrderedDict[Hashable, Tuple[CompiledTemplate, CompiledTemplate]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def compile(self, key: Hashable, front: str, back: str) -> Tuple[CompiledTemplate, CompiledTemplate]:
+        """Get the compiled question and answer templates for a key.
+
+        Args:
+            key: Cache key of this template version.
+            front: Question template text.
+            back: Answer template text.
+
+        Returns:
+            Tuple of compiled question and answer templates.
+
+        Raises:
+            TemplateSyntaxError: If either template is malformed.
+        """
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0].source == front and entry[1].source == back:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return entry
+            self._misses += 1
+
+        entry = (compile_card_template(front), compile_card_template(back))
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._max_entries:
+                self._cache.popitem(last=False)
+        return entry
+
+    def render(
+        self,
+        key: Hashable,
+        front: str,
+        back: str,
+        fields: Dict[str, str],
+        card_ordinal: int = 0,
+        specials: Optional[Dict[str, str]] = None
+    ) -> Tuple[str, str]:
+        """Render one card, compiling its templates on first use.
+
+        Args:
+            key: Cache key of this template version.
+            front: Question template text.
+            back: Answer template text.
+            fields: Field values by field name.
+            card_ordinal: 0-based card ordinal; cloze number minus one.
+            specials: Values of special fields such as "Tags" and "Deck".
+
+        Returns:
+            Tuple of question and answer HTML.
+
+        Raises:
+            TemplateSyntaxError: If either template is malformed.
+        """
+        compiled_front, compiled_back = self.compile(key, front, back)
+        return render_card(compiled_front, compiled_back, fields, card_ordinal, specials)
+
+    def invalidate(self, owner: Hashable) -> int:
+        """Drop cached templates whose key is a tuple starting with ``owner``.
+
+        Args:
+            owner: First element of the keys to drop, e.g. a note type id.
+
+        Returns:
+            Number of entries dropped.
+        """
+        with self._lock:
+            stale = [k for k in self._cache if isinstance(k, tuple) and k and k[0] == owner]
+            for key in stale:
+                del self._cache[key]
+            return len(stale)
+
+    def clear_cache(self) -> int:
+        """Clear the cache.
+
+        Returns:
+            Number of entries cleared.
+        """
+        with self._lock:
+            count = len(self._cache)
+            self._cache.clear()
+            return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics.
+
+        Returns:
+            Dictionary with entry count, hits and misses.
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._cache),
+                "maxEntries": self._max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hitRate": round(self._hits / total, 4) if total else 0.0,
+            }
+
+
+def _render_jobs(
+    templates: Sequence[Tuple[CompiledTemplate, CompiledTemplate, Optional[Dict[str, str]]]],
+    jobs: Iterable[CardJob]
+) -> List[Tuple[str, str]]:
+    return [
+        render_card(templates[index][0], templates[index][1], fields, ordinal, templates[index][2])
+        for index, fields, ordinal in jobs
+    ]
+
+
+def strip_html(text: str) -> str:
+    """Remove tags, comments, scripts and styles, and decode entities."""
+    return html.unescape(_HTML_STRIP.sub("", text))
+
+
+def _add_text(ops: List[Op], text: str) -> None:
+    """Append literal text, merging with a preceding text operation."""
+    if ops and ops[-1][0] == _TEXT:
+        ops[-1] = (_TEXT, ops[-1][1] + text)
+    else:
+        ops.append((_TEXT, text))
+
+
+def _compile_filters(filters: List[str]) -> Tuple[str, ...]:
+    """Order filters by application: the one next to the field runs first.
+
+    ``type`` consumes the whole chain after it, so it is kept as one
+    entry (``"type"`` or ``"type:cloze"``).
+    """
+    filters = [f.strip() for f in filters if f.strip()]
+    if filters and filters[0] == "type":
+        return ("type:cloze",) if "cloze" in filters[1:] else ("type",)
+    return tuple(reversed(filters))
+
+
+def _apply_filters(filters: Tuple[str, ...], text: str, field_name: str, cloze: int, question: bool) -> str:
+    for name in filters:
+        if name == "cloze":
+            text = _reveal_cloze(text, cloze, question)
+        elif name == "cloze-only":
+            text = ", ".join(m.group(2) for m in _CLOZE.finditer(text) if int(m.group(1)) == cloze)
+        elif name == "text":
+            text = strip_html(text)
+        elif name == "hint":
+            text = _hint(text, field_name)
+        elif name == "type" or name == "type:cloze":
+            if name == "type:cloze":
+                text = ", ".join(m.group(2) for m in _CLOZE.finditer(text) if int(m.group(1)) == cloze)
+            text = _type_answer(text, question)
+        elif name == "furigana":
+            text = _RUBY.sub(lambda m: _ruby(m, "<ruby><rb>{0}</rb><rt>{1}</rt></ruby>"), text)
+        elif name == "kana":
+            text = _RUBY.sub(lambda m: _ruby(m, "{1}"), text)
+        elif name == "kanji":
+            text = _RUBY.sub(lambda m: _ruby(m, "{0}"), text)
+        elif name == "nc":
+            text = unicodedata.normalize(
+                "NFC",
+                "".join(c for c in unicodedata.normalize("NFD", text) if not unicodedata.combining(c))
+            )
+        elif name.startswith("tts "):
+            lang, _, options = name[4:].strip().partition(" ")
+            options = f" {options}" if options else ""
+            text = f"[anki:tts lang={lang}{options}]{text}[/anki:tts]"
+    return text
+
+
+def _reveal_cloze(text: str, cloze: int, question: bool) -> str:
+    """Render cloze deletions as Anki does for card ``cloze``.
+
+    Returns an empty string if the text has no deletion with that
+    number, since Anki would not generate the card.
+    """
+    found = False
+
+    def replace(match: "re.Match[str]") -> str:
+        nonlocal found
+        ordinal = int(match.group(1))
+        answer = match.group(2)
+        if ordinal != cloze:
+            return f'<span class="cloze-inactive" data-ordinal="{ordinal}">{answer}</span>'
+        found = True
+        if not question:
+            return f'<span class="cloze" data-ordinal="{ordinal}">{answer}</span>'
+        hint = match.group(3)
+        shown = f"[{hint}]" if hint else "[...]"
+        return (f'<span class="cloze" data-cloze="{html.escape(answer)}" '
+                f'data-ordinal="{ordinal}">{shown}</span>')
+
+    rendered = _CLOZE.sub(replace, text)
+    return rendered if found else ""
+
+
+def _hint(text: str, field_name: str) -> str:
+    if not text.strip():
+        return ""
+    hint_id = f"hint{zlib.crc32(text.encode('utf-8')):08x}"
+    return (
+        f'<a class=hint href="#" onclick="this.style.display=\'none\';'
+        f'document.getElementById(\'{hint_id}\').style.display=\'block\';return false;" '
+        f'draggable=false>{html.escape(field_name)}</a>'
+        f'<div id="{hint_id}" class=hint style="display: none">{text}</div>'
+    )
+
+
+def _type_answer(text: str, question: bool) -> str:
+    if question:
+        return '<center><input type="text" id="typeans" class="typeans"></center>'
+    return f'<div id="typeans" class="typeans"><code>{html.escape(strip_html(text))}</code></div>'
+
+
+def _ruby(match: "re.Match[str]", template: str) -> str:
+    base, reading = match.group(1), match.group(2)
+    if reading.startswith("sound:"):
+        # [sound:...] tags are media, not readings
+        return match.group(0)
+    return template.format(base, reading)
@@ -0,0 +1,367 @@
+"""Compile component trees to Anki template HTML.
+
+Mirrors the save path of ``web/js/anki-converter.js`` so that template
+HTML can be regenerated from ``TemplateSide.components`` without a
+webview (bulk operations, backups, tests). Anki components emit their
+Mustache tokens as documented in ``docs/COMPONENT-REFERENCE.md``:
+
+    FIELD        {{Field}}
+    CLOZE        {{cloze:Field}} or {{c1::answer}}
+    HINT         {{hint:Field}}
+    TYPE_ANSWER  {{type:Field}}
+    CONDITIONAL  {{#Field}}...{{/Field}} or {{^Field}}...{{/Field}}
+    TAGS         {{Tags}}
+    FRONTSIDE    {{FrontSide}}
+
+Output is memoized per subtree. Each component gets a content hash
+built from its own properties and its children's hashes (a Merkle
+hash), and compiled HTML is cached by that hash. Hash and HTML are
+also cached on the component itself and dropped when it is marked
+dirty (see ``models``), so after a small edit only the edited component
+and its ancestors are rehashed and re-emitted; clean subtrees are not
+even visited. Component ids are not part of the hash since they never
+reach the HTML.
+"""
+
+import hashlib
+from collections import OrderedDict
+from html import escape
+from typing import Any, Dict, List, Optional
+
+from .exceptions import ComponentError
+from .models import (
+    Component, ComponentStyle, ComponentType, Template, TemplateSide, record_recompute
+)
+
+# Element tags for non-Anki components
+_ELEMENT_TAGS = {
+    ComponentType.CONTAINER: "div",
+    ComponentType.ROW: "div",
+    ComponentType.COLUMN: "div",
+    ComponentType.TEXT: "div",
+    ComponentType.HEADING: "h2",
+}
+
+# Classes the editor uses for layout components
+_LAYOUT_CLASSES = {
+    ComponentType.ROW: "atd-row",
+    ComponentType.COLUMN: "atd-column",
+}
+
+# Anki tokens that wrap a single field name
+_FIELD_TOKENS = {
+    ComponentType.FIELD: "{{%s}}",
+    ComponentType.HINT: "{{hint:%s}}",
+    ComponentType.TYPE_ANSWER: "{{type:%s}}",
+}
+
+# Attributes that configure a component rather than being emitted
+_CONTROL_ATTRIBUTES = {
+    ComponentType.CLOZE: frozenset({"ordinal"}),
+    ComponentType.CONDITIONAL: frozenset({"negate", "condition"}),
+}
+
+_STYLE_PROPERTIES = (
+    ("background", "background"),
+    ("color", "color"),
+    ("font_size", "font-size"),
+    ("font_family", "font-family"),
+    ("padding", "padding"),
+    ("margin", "margin"),
+    ("border", "border"),
+    ("border_radius", "border-radius"),
+)
+
+
+def style_to_css(style: ComponentStyle) -> str:
+    """Convert a component style to an inline CSS declaration list.
+
+    Args:
+        style: The component style.
+
+    Returns:
+        Declarations such as ``"color: red; padding: 4px"``, or an
+        empty string if no properties are set.
+    """
+    declarations = [
+        f"{css_name}: {getattr(style, attr)}"
+        for attr, css_name in _STYLE_PROPERTIES
+        if getattr(style, attr) is not None
+    ]
+    if style.custom_css:
+        declarations.append(style.custom_css.strip().rstrip(";"))
+    return "; ".join(declarations)
+
+
+class TemplateCompiler:
+    """Compiler from component trees to Anki template HTML.
+
+    A single compiler instance should be reused across compilations so
+    that its subtree cache pays off; the cache is bounded and evicts the
+    least recently used entries.
+
+    Example:
+        compiler = TemplateCompiler()
+        front_html = compiler.compile_side(template.front)
+        compiler.compile_template(template, update_html=True)
+    """
+
+    def __init__(self, max_entries: int = 10000) -> None:
+        """Initialize the compiler.
+
+        Args:
+            max_entries: Maximum number of cached subtrees.
+        """
+        self._max_entries = max_entries
+        self._cache: "OrderedDict[bytes, str]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def compile_template(self, template: Template, update_html: bool = False) -> Dict[str, str]:
+        """Compile both sides of a template.
+
+        Sides without components keep their existing HTML, since they
+        were authored as raw HTML rather than in the visual editor.
+
+        Args:
+            template: The template to compile.
+            update_html: If True, store the result in ``side.html``.
+
+        Returns:
+            Dictionary with "front" and "back" HTML.
+        """
+        result = {}
+        for name, side in (("front", template.front), ("back", template.back)):
+            html = self.compile_side(side) if side.components else side.html
+            if update_html and side.html != html:
+                side.html = html
+            result[name] = html
+        return result
+
+    def compile_side(self, side: TemplateSide) -> str:
+        """Compile the component tree of one template side.
+
+        Args:
+            side: The template side.
+
+        Returns:
+            Anki template HTML.
+        """
+        return self.compile_components(side.components)
+
+    def compile_components(self, components: List[Component]) -> str:
+        """Compile a list of sibling components.
+
+        Args:
+            components: Components to compile, in order.
+
+        Returns:
+            Concatenated HTML for all components.
+        """
+        return "".join(self._emit(c) for c in components)
+
+    def compile_component(self, component: Component) -> str:
+        """Compile a single component subtree.
+
+        Args:
+            component: Root of the subtree.
+
+        Returns:
+            HTML for the subtree.
+        """
+        return self.compile_components([component])
+
+    def content_hash(self, component: Component) -> str:
+        """Get the content hash of a component subtree.
+
+        Args:
+            component: Root of the subtree.
+
+        Returns:
+            Hex digest identifying the subtree's compiled output.
+        """
+        return self._hash(component).hex()
+
+    def clear_cache(self) -> int:
+        """Clear the subtree cache.
+
+        Returns:
+            Number of entries cleared.
+        """
+        count = len(self._cache)
+        self._cache.clear()
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics.
+
+        Returns:
+            Dictionary with entry count, hits and misses.
+        """
+        total = self._hits + self._misses
+        return {
+            "entries": len(self._cache),
+            "maxEntries": self._max_entries,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hitRate": round(self._hits / total, 4) if total else 0.0,
+        }
+
+    def _hash(self, component: Component) -> bytes:
+        """Get the Merkle hash of a subtree, rehashing only dirty nodes."""
+        value = component.get_cached("hash")
+        if value is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(_own_fingerprint(component))
+            for child in component.children:
+                digest.update(self._hash(child))
+            value = digest.digest()
+            component.set_cached("hash", value)
+            record_recompute("hash")
+        return value
+
+    def _emit(self, component: Component) -> str:
+        """Emit HTML for a subtree, reusing cached subtrees."""
+        html = component.get_cached("html")
+        if html is not None:
+            self._hits += 1
+            return html
+
+        key = self._hash(component)
+        cache = self._cache
+        html = cache.get(key)
+        if html is not None:
+            cache.move_to_end(key)
+            self._hits += 1
+        else:
+            self._misses += 1
+            inner = "".join(self._emit(c) for c in component.children)
+            html = _render(component, inner)
+            record_recompute("html")
+
+            cache[key] = html
+            if len(cache) > self._max_entries:
+                cache.popitem(last=False)
+
+        component.set_cached("html", html)
+        return html
+
+
+def compile_template(template: Template, update_html: bool = False) -> Dict[str, str]:
+    """Compile a template with a throwaway compiler.
+
+    Args:
+        template: The template to compile.
+        update_html: If True, store the result in ``side.html``.
+
+    Returns:
+        Dictionary with "front" and "back" HTML.
+    """
+    return TemplateCompiler().compile_template(template, update_html=update_html)
+
+
+def _own_fingerprint(component: Component) -> bytes:
+    """Serialize the properties of one component that affect its HTML.
+
+    Uses ``repr`` rather than sorted JSON: attribute order is part of
+    the emitted HTML, so it must be part of the fingerprint as well.
+    """
+    style = component.style
+    return repr((
+        component.type.value,
+        component.content,
+        component.field_name,
+        style.background, style.color, style.font_size, style.font_family,
+        style.padding, style.margin, style.border, style.border_radius,
+        style.custom_css,
+        component.attributes,
+        len(component.children),
+    )).encode("utf-8")
+
+
+def _require_field(component: Component) -> str:
+    """Get the field name of an Anki component, which must be set."""
+    if not component.field_name:
+        raise ComponentError(
+            f"{component.type.value} component has no field name",
+            details={"component_id": component.id},
+        )
+    return component.field_name
+
+
+def _render(component: Component, inner: str) -> str:
+    """Render one component given its already-compiled children."""
+    ctype = component.type
+    body = component.content + inner
+
+    if ctype in _FIELD_TOKENS:
+        return _wrap_inline(component, _FIELD_TOKENS[ctype] % _require_field(component))
+
+    if ctype == ComponentType.CLOZE:
+        if component.field_name:
+            token = f"{{{{cloze:{component.field_name}}}}}"
+        else:
+            ordinal = component.attributes.get("ordinal", 1)
+            token = f"{{{{c{ordinal}::{component.content}}}}}"
+        return _wrap_inline(component, token)
+
+    if ctype == ComponentType.CONDITIONAL:
+        name = _require_field(component)
+        negate = bool(component.attributes.get("negate")) or component.attributes.get("condition") == "hide"
+        marker = "^" if negate else "#"
+        return f"{{{{{marker}{name}}}}}{body}{{{{/{name}}}}}"
+
+    if ctype == ComponentType.TAGS:
+        return _wrap_inline(component, "{{Tags}}")
+
+    if ctype == ComponentType.FRONTSIDE:
+        return _wrap_inline(component, "{{FrontSide}}")
+
+    if ctype == ComponentType.IMAGE:
+        return f"<img{_attributes(component)}>"
+
+    if ctype == ComponentType.AUDIO:
+        if component.field_name:
+            return f"{{{{{component.field_name}}}}}"
+        src = component.attributes.get("src", "")
+        return f"[sound:{src}]" if src else ""
+
+    tag = _ELEMENT_TAGS.get(ctype, "div")
+    return f"<{tag}{_attributes(component)}>{body}</{tag}>"
+
+
+def _wrap_inline(component: Component, token: str) -> str:
+    """Emit an Anki token, wrapped in a span only if it carries styling."""
+    attributes = _attributes(component)
+    if not attributes:
+        return token
+    return f"<span{attributes}>{token}</span>"
+
+
+def _attributes(component: Component) -> str:
+    """Format a component's HTML attributes, including inline style."""
+    skip = _CONTROL_ATTRIBUTES.get(component.type, frozenset())
+    attrs: Dict[str, Optional[str]] = {}
+
+    layout_class = _LAYOUT_CLASSES.get(component.type)
+    for name, value in component.attributes.items():
+        if name in skip or value is None or value is False:
+            continue
+        attrs[name] = None if value is True else str(value)
+
+    if layout_class:
+        existing = attrs.get("class")
+        attrs["class"] = f"{layout_class} {existing}" if existing else layout_class
+
+    css = style_to_css(component.style)
+    if css:
+        existing = attrs.get("style")
+        attrs["style"] = f"{existing.rstrip(';')}; {css}" if existing else css
+
+    parts = []
+    for name, value in attrs.items():
+        if value is None:
+            parts.append(f" {escape(name)}")
+        else:
+            parts.append(f' {escape(name)}="{escape(value)}"')
+    return "".join(parts)
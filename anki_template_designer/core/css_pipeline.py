@@ -0,0 +1,900 @@
+"""Parse, merge and minify note type CSS.
+
+The editor saves its whole stylesheet into the note type, so rules that
+were already in the note type CSS come back on every save and pile up.
+Every card in the collection then ships the duplicated CSS at review
+time. ``merge_css`` parses one or more stylesheets into rules and
+at-rules and merges them back together:
+
+- A declaration is dropped if a later one of the same property with
+  the same selector list in the same context (top level or the same
+  ``@media``/``@supports``/... block) overrides it: both match the same
+  elements with the same specificity. ``!important`` beats later normal
+  declarations, and differing values with vendor prefixes or functions
+  are kept as fallbacks (``display: -webkit-box; display: flex``).
+  Rules left empty are dropped.
+- Rules with the same selector list in the same context are then merged
+  into the earlier rule, unless a rule in between sets a property that
+  overlaps (the same property, or a shorthand and its longhands), in
+  which case moving declarations up could change the cascade.
+- Blocks containing comments are written back as they are and never
+  merged, so their comments are not lost.
+- A later ``@keyframes`` of the same name replaces the earlier one;
+  identical ``@font-face``, ``@import`` and similar at-rules are kept
+  once.
+
+Output is either pretty-printed or minified. ``CssPipeline`` caches
+results by content hash, so saving a note type whose CSS did not change
+costs one hash. ``CssPipeline.tidy`` keeps CSS as written when there is
+nothing to merge, so hand-formatted stylesheets are only rewritten when
+that makes them smaller.
+
+The parser is deliberately strict: CSS nesting, unbalanced braces or
+unterminated strings raise ``CssSyntaxError`` rather than being guessed
+at, and ``CssPipeline.process`` then returns the input unchanged.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from .exceptions import CssSyntaxError
+
+logger = logging.getLogger("anki_template_designer.core.css_pipeline")
+
+# Block at-rules whose rules are merged with those of a later block with the same prelude
+_MERGEABLE_AT_RULES = frozenset((
+    "media", "supports", "container", "layer", "document", "-moz-document", "scope",
+))
+# At-rules whose block holds declarations rather than rules
+_DECLARATION_AT_RULES = frozenset((
+    "font-face", "page", "property", "counter-style", "viewport", "-ms-viewport",
+    "font-palette-values",
+))
+_KEYFRAMES = frozenset(("keyframes", "-webkit-keyframes", "-moz-keyframes", "-o-keyframes"))
+
+_SPECIAL_RE = re.compile(r"""["'\\()\[\]{};]|/\*""")
+_STRING_RE = re.compile(r""""(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'""", re.DOTALL)
+_AT_NAME_RE = re.compile(r"@(-?[A-Za-z_][\w-]*)")
+_PROPERTY_RE = re.compile(r"[*_]?-{0,2}[A-Za-z_][\w-]*$")
+_IMPORTANT_RE = re.compile(r"\s*!\s*important\s*$", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+_COMMA_RE = re.compile(r"\s*,\s*")
+_COLON_RE = re.compile(r"\s*:\s*")
+_PAREN_SPACE_RE = re.compile(r"\(\s+|\s+\)")
+_VENDOR_RE = re.compile(r"(?:^|[\s,(])-(?:webkit|moz|ms|o)-")
+
+
+class Declaration(NamedTuple):
+    """A ``property: value`` pair.
+
+    Attributes:
+        name: Property name, lower case except for custom properties.
+        value: Value with whitespace collapsed, without ``!important``.
+        important: Whether the declaration is ``!important``.
+    """
+    name: str
+    value: str
+    important: bool = False
+
+
+class Rule:
+    """A style rule: a selector list and its declarations.
+
+    ``raw`` is the block as written when it contains comments; such rules
+    are written back verbatim and never merged.
+    """
+
+    __slots__ = ("selector", "declarations", "raw")
+
+    def __init__(self, selector: str, declarations: List[Declaration], raw: Optional[str] = None) -> None:
+        self.selector = selector
+        self.declarations = declarations
+        self.raw = raw
+
+
+class AtRule:
+    """An at-rule with a block of rules, a block of declarations, or no block.
+
+    ``raw`` is a declaration block as written when it contains comments.
+    """
+
+    __slots__ = ("name", "prelude", "children", "declarations", "raw")
+
+    def __init__(
+        self,
+        name: str,
+        prelude: str,
+        children: Optional[List["Node"]] = None,
+        declarations: Optional[List[Declaration]] = None,
+        raw: Optional[str] = None
+    ) -> None:
+        self.name = name
+        self.prelude = prelude
+        self.children = children
+        self.declarations = declarations
+        self.raw = raw
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        """Get the (name, prelude) identifying the at-rule."""
+        return (self.name, self.prelude)
+
+
+class Comment:
+    """A comment between rules."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+Node = Union[Rule, AtRule, Comment]
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+def _string_end(text: str, start: int) -> int:
+    """Get the index after the string literal starting at ``start``."""
+    match = _STRING_RE.match(text, start)
+    if match is None:
+        raise CssSyntaxError("Unterminated string", details={"offset": start})
+    return match.end()
+
+
+def _map_outside_strings(text: str, func) -> str:
+    """Apply ``func`` to the parts of ``text`` outside string literals."""
+    if '"' not in text and "'" not in text:
+        return func(text)
+    parts = []
+    position = 0
+    for match in _STRING_RE.finditer(text):
+        parts.append(func(text[position:match.start()]))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(func(text[position:]))
+    return "".join(parts)
+
+
+def _collapse_whitespace(text: str) -> str:
+    return _map_outside_strings(text, lambda part: _WHITESPACE_RE.sub(" ", part)).strip()
+
+
+def _normalize_selector(selector: str, minify: bool = False) -> str:
+    """Canonicalise whitespace in a selector list.
+
+    Combinators and commas at the top level get one space around them
+    (none when minifying); other whitespace runs become one space.
+    """
+    out: List[str] = []
+    space = False
+    depth = 0
+    i = 0
+    n = len(selector)
+    while i < n:
+        c = selector[i]
+        if c in "\"'":
+            end = _string_end(selector, i)
+            if space and out:
+                out.append(" ")
+            space = False
+            out.append(selector[i:end])
+            i = end
+            continue
+        if c.isspace():
+            space = True
+            i += 1
+            continue
+        if depth == 0 and (c == "," or (c in ">+~" and selector[i + 1:i + 2] != "=")):
+            if minify:
+                out.append(c)
+            else:
+                out.append(", " if c == "," else f" {c} ")
+            space = False
+            i += 1
+            continue
+        if space and out and out[-1][-1:] != " " and not (minify and out[-1] in (",", ">", "+", "~")):
+            out.append(" ")
+        space = False
+        if c == "\\":
+            out.append(selector[i:i + 2])
+            i += 2
+            continue
+        if c in "([":
+            depth += 1
+        elif c in ")]":
+            depth = max(depth - 1, 0)
+        out.append(c)
+        i += 1
+    return "".join(out).strip()
+
+
+def _normalize_media_query(prelude: str) -> str:
+    """Canonicalise spacing in media features, ``( max-width:600px )`` -> ``(max-width: 600px)``."""
+    def normalize(part: str) -> str:
+        part = _PAREN_SPACE_RE.sub(lambda m: m.group().strip(), part)
+        return _COLON_RE.sub(": ", part)
+    return _map_outside_strings(prelude, normalize)
+
+
+def _parse_declaration(text: str) -> Declaration:
+    name, colon, value = text.partition(":")
+    name = name.strip()
+    if not colon or not _PROPERTY_RE.match(name):
+        raise CssSyntaxError(f"Invalid declaration: {text[:60]!r}")
+    important = False
+    match = _IMPORTANT_RE.search(value)
+    if match is not None:
+        important = True
+        value = value[:match.start()]
+    if name.startswith("--"):
+        # Custom property values are kept as written
+        return Declaration(name, value.strip(), important)
+    return Declaration(name.lower(), _collapse_whitespace(value), important)
+
+
+class _Parser:
+    """Recursive descent parser over a stylesheet string."""
+
+    def __init__(self, css: str) -> None:
+        self.css = css
+        self.pos = 0
+        # Comments skipped by _read so far
+        self.comments = 0
+
+    def parse(self) -> List[Node]:
+        return self._rules(nested=False)
+
+    def _read(self) -> Tuple[str, Optional[str]]:
+        """Read up to the next ``{``, ``}`` or ``;`` outside brackets.
+
+        Returns:
+            The text read with comments removed, and the character that
+            stopped it (not consumed), or None at the end of input.
+        """
+        css = self.css
+        parts = []
+        depth = 0
+        i = self.pos
+        while True:
+            match = _SPECIAL_RE.search(css, i)
+            if match is None:
+                parts.append(css[i:])
+                self.pos = len(css)
+                return "".join(parts), None
+            j = match.start()
+            token = match.group()
+            parts.append(css[i:j])
+            if token == "/*":
+                end = css.find("*/", j + 2)
+                if end < 0:
+                    raise CssSyntaxError("Unterminated comment", details={"offset": j})
+                parts.append(" ")
+                self.comments += 1
+                i = end + 2
+            elif token in "\"'":
+                i = _string_end(css, j)
+                parts.append(css[j:i])
+            elif token == "\\":
+                parts.append(css[j:j + 2])
+                i = j + 2
+            elif token in "([":
+                depth += 1
+                parts.append(token)
+                i = j + 1
+            elif token in ")]":
+                depth = max(depth - 1, 0)
+                parts.append(token)
+                i = j + 1
+            elif depth:
+                parts.append(token)
+                i = j + 1
+            else:
+                self.pos = j
+                return "".join(parts), token
+
+    def _skip_space(self, nodes: Optional[List[Node]]) -> None:
+        """Skip whitespace, collecting comments into ``nodes``."""
+        css = self.css
+        n = len(css)
+        while True:
+            while self.pos < n and css[self.pos].isspace():
+                self.pos += 1
+            if not css.startswith("/*", self.pos):
+                return
+            end = css.find("*/", self.pos + 2)
+            if end < 0:
+                raise CssSyntaxError("Unterminated comment", details={"offset": self.pos})
+            if nodes is not None:
+                nodes.append(Comment(css[self.pos + 2:end]))
+            self.pos = end + 2
+
+    def _rules(self, nested: bool) -> List[Node]:
+        css = self.css
+        nodes: List[Node] = []
+        while True:
+            self._skip_space(nodes)
+            if self.pos >= len(css):
+                if nested:
+                    raise CssSyntaxError("Missing '}' at end of stylesheet")
+                return nodes
+            c = css[self.pos]
+            if c == "}":
+                if not nested:
+                    raise CssSyntaxError("Unexpected '}'", details={"offset": self.pos})
+                self.pos += 1
+                return nodes
+            if c == ";":
+                self.pos += 1
+                continue
+            if c == "@":
+                nodes.append(self._at_rule())
+                continue
+            start = self.pos
+            prelude, stop = self._read()
+            if stop != "{":
+                raise CssSyntaxError(
+                    f"Expected '{{' after {prelude.strip()[:60]!r}", details={"offset": start}
+                )
+            self.pos += 1
+            nodes.append(Rule(_normalize_selector(prelude), *self._declarations()))
+
+    def _at_rule(self) -> AtRule:
+        match = _AT_NAME_RE.match(self.css, self.pos)
+        if match is None:
+            raise CssSyntaxError("Invalid at-rule", details={"offset": self.pos})
+        name = match.group(1).lower()
+        self.pos = match.end()
+        prelude, stop = self._read()
+        prelude = _collapse_whitespace(prelude)
+        if name == "media":
+            prelude = _normalize_media_query(prelude)
+        if stop != "{":
+            if stop == ";":
+                self.pos += 1
+            return AtRule(name, prelude)
+        self.pos += 1
+        if name in _DECLARATION_AT_RULES:
+            declarations, raw = self._declarations()
+            return AtRule(name, prelude, declarations=declarations, raw=raw)
+        return AtRule(name, prelude, children=self._rules(nested=True))
+
+    def _declarations(self) -> Tuple[List[Declaration], Optional[str]]:
+        """Parse a declaration block after its ``{``.
+
+        Returns:
+            The declarations, and the block text as written if it
+            contains comments, else None.
+        """
+        start = self.pos
+        comments = self.comments
+        declarations = []
+        while True:
+            text, stop = self._read()
+            if stop == "{":
+                raise CssSyntaxError("Nested rules are not supported", details={"offset": self.pos})
+            text = text.strip()
+            if text:
+                declarations.append(_parse_declaration(text))
+            if stop is None:
+                raise CssSyntaxError("Missing '}' at end of stylesheet")
+            self.pos += 1
+            if stop == "}":
+                raw = self.css[start:self.pos - 1] if self.comments > comments else None
+                return declarations, raw
+
+
+def parse_stylesheet(css: str) -> List[Node]:
+    """Parse a stylesheet.
+
+    Args:
+        css: Stylesheet text.
+
+    Returns:
+        Top-level rules, at-rules and comments in source order.
+
+    Raises:
+        CssSyntaxError: If the stylesheet is malformed or uses nesting.
+    """
+    return _Parser(css).parse()
+
+
+# ---------------------------------------------------------------------------
+# Merging
+# ---------------------------------------------------------------------------
+
+# Shorthands and aliases that set properties not named after their first word
+_SHORTHAND_FAMILIES = {
+    "gap": ("row", "column"),
+    "grid-gap": ("gap", "row", "column"),
+    "grid-row-gap": ("gap", "row"),
+    "grid-column-gap": ("gap", "column"),
+    "columns": ("column",),
+    "inset": ("top", "right", "bottom", "left"),
+    "place-content": ("align", "justify"),
+    "place-items": ("align", "justify"),
+    "place-self": ("align", "justify"),
+    "font": ("line",),
+    "white-space": ("text",),
+    "word-wrap": ("overflow",),
+    "page-break-before": ("break",),
+    "page-break-after": ("break",),
+    "page-break-inside": ("break",),
+    "vertical-align": ("alignment", "baseline"),
+}
+
+
+def _property_families(name: str) -> Tuple[str, ...]:
+    """Get the groups of properties a property can interact with.
+
+    Two properties can override each other only if their families
+    overlap: ``margin-top`` -> ``("margin",)`` overlaps ``margin``, and
+    ``gap`` -> ``("gap", "row", "column")`` overlaps ``row-gap``.
+    """
+    if name.startswith("--"):
+        return (name,)
+    name = name.lstrip("*_")
+    if name.startswith("-"):
+        name = name.split("-", 2)[-1]
+    return (name.split("-", 1)[0],) + _SHORTHAND_FAMILIES.get(name, ())
+
+
+def _is_fallback(earlier: Declaration, later: Declaration) -> bool:
+    """Whether ``earlier`` may still apply if the browser rejects ``later``."""
+    if earlier.value == later.value or earlier.important != later.important:
+        return False
+    return any(
+        _VENDOR_RE.search(value) or "(" in value
+        for value in (earlier.value, later.value)
+    )
+
+
+def _surviving(declarations: List[Declaration]) -> List[bool]:
+    """Flag the declarations that no later one of the same property overrides."""
+    keep = [True] * len(declarations)
+    positions: Dict[str, List[int]] = {}
+    for index, decl in enumerate(declarations):
+        earlier = positions.get(decl.name)
+        if earlier is None:
+            positions[decl.name] = [index]
+            continue
+        remaining = []
+        for prev_index in earlier:
+            prev = declarations[prev_index]
+            if prev.important and not decl.important:
+                keep[index] = False
+                remaining.append(prev_index)
+            elif _is_fallback(prev, decl):
+                remaining.append(prev_index)
+            else:
+                keep[prev_index] = False
+        if keep[index]:
+            remaining.append(index)
+        positions[decl.name] = remaining
+    return keep
+
+
+def dedupe_declarations(declarations: Iterable[Declaration]) -> List[Declaration]:
+    """Drop declarations that a later one in the same block overrides.
+
+    Args:
+        declarations: Declarations in source order.
+
+    Returns:
+        Surviving declarations in source order.
+    """
+    declarations = list(declarations)
+    return [decl for decl, keep in zip(declarations, _surviving(declarations)) if keep]
+
+
+def _group_rules(nodes: List[Node], context: Tuple[Any, ...], groups: Dict[Tuple[Any, ...], List[Rule]]) -> None:
+    """Collect rules by context and selector, in source order.
+
+    Rules in ``@media`` and similar blocks with the same prelude share a
+    context: they apply under the same conditions.
+    """
+    for node in nodes:
+        if isinstance(node, Rule):
+            if node.raw is None:
+                groups.setdefault((context, node.selector), []).append(node)
+        elif isinstance(node, AtRule) and node.children and node.name in _MERGEABLE_AT_RULES:
+            _group_rules(node.children, context + (node.key,), groups)
+
+
+def _drop_overridden(rules: List[Rule], emptied: Set[int]) -> None:
+    """Drop declarations overridden by a later rule with the same selector.
+
+    Such rules match the same elements with the same specificity, so the
+    later declaration wins whatever lies between them. Rules left without
+    declarations are added to ``emptied``.
+    """
+    declarations = [decl for rule in rules for decl in rule.declarations]
+    keep = _surviving(declarations)
+    if all(keep):
+        return
+    position = 0
+    for rule in rules:
+        count = len(rule.declarations)
+        rule.declarations = [
+            decl for decl, kept in zip(rule.declarations, keep[position:position + count]) if kept
+        ]
+        position += count
+        if count and not rule.declarations:
+            emptied.add(id(rule))
+
+
+def _prune(nodes: List[Node], emptied: Set[int]) -> List[Node]:
+    """Remove emptied rules, and blocks left with nothing but comments."""
+    if not emptied:
+        return nodes
+    out: List[Node] = []
+    for node in nodes:
+        if id(node) in emptied:
+            continue
+        if isinstance(node, AtRule) and node.children and node.name in _MERGEABLE_AT_RULES:
+            children = _prune(node.children, emptied)
+            if len(children) < len(node.children) and all(isinstance(c, Comment) for c in children):
+                continue
+            node.children = children
+        out.append(node)
+    return out
+
+
+def _families(nodes: Iterable[Optional[Node]]) -> Set[str]:
+    """Get the property families set by rules in ``nodes``."""
+    families: Set[str] = set()
+    for node in nodes:
+        if isinstance(node, Rule):
+            for decl in node.declarations:
+                families.update(_property_families(decl.name))
+        elif isinstance(node, AtRule) and node.children and node.name not in _KEYFRAMES:
+            families.update(_families(node.children))
+    return families
+
+
+class _Cascade:
+    """Last position at which each property family is set within a context."""
+
+    __slots__ = ("_last", "_last_any")
+
+    def __init__(self) -> None:
+        self._last: Dict[str, int] = {}
+        self._last_any = -1
+
+    def mark(self, families: Set[str], position: int) -> None:
+        last = self._last
+        for family in families:
+            if last.get(family, -1) < position:
+                last[family] = position
+        if families and self._last_any < position:
+            self._last_any = position
+
+    def set_after(self, families: Set[str], position: int) -> bool:
+        """Whether a node after ``position`` sets one of ``families``.
+
+        If so, declarations of those families cannot move up to
+        ``position`` without changing which one wins.
+        """
+        last = self._last
+        if last.get("all", -1) > position or ("all" in families and self._last_any > position):
+            return True
+        return any(last.get(family, -1) > position for family in families)
+
+
+def merge_nodes(nodes: List[Node]) -> List[Node]:
+    """Drop overridden declarations, then merge rules and at-rules.
+
+    Args:
+        nodes: Parsed nodes in source order; they may be modified.
+
+    Returns:
+        Merged nodes.
+    """
+    groups: Dict[Tuple[Any, ...], List[Rule]] = {}
+    _group_rules(nodes, (), groups)
+    emptied: Set[int] = set()
+    for rules in groups.values():
+        _drop_overridden(rules, emptied)
+    return _merge_context(_prune(nodes, emptied))
+
+
+def _merge_context(nodes: List[Node]) -> List[Node]:
+    """Merge rules and at-rules of one context, keeping the cascade."""
+    out: List[Optional[Node]] = []
+    targets: Dict[Tuple[str, ...], int] = {}
+    seen: Set[Tuple[Any, ...]] = set()
+    cascade = _Cascade()
+
+    for node in nodes:
+        if isinstance(node, Comment):
+            out.append(node)
+        elif isinstance(node, Rule):
+            families = _families([node])
+            if node.raw is not None:
+                # Comments are kept by leaving the block as written
+                cascade.mark(families, len(out))
+                out.append(node)
+                continue
+            node.declarations = dedupe_declarations(node.declarations)
+            key = ("", node.selector)
+            index = targets.get(key)
+            if index is not None and not cascade.set_after(families, index):
+                target = out[index]
+                target.declarations = dedupe_declarations(target.declarations + node.declarations)
+                cascade.mark(families, index)
+                continue
+            targets[key] = len(out)
+            cascade.mark(families, len(out))
+            out.append(node)
+        elif node.children is not None:
+            node.children = _merge_context(node.children)
+            key = ("@",) + node.key
+            index = targets.get(key)
+            if node.name in _KEYFRAMES:
+                # Only the last @keyframes of a name is used
+                if index is not None:
+                    out[index] = None
+                targets[key] = len(out)
+                out.append(node)
+                continue
+            families = _families(node.children)
+            if node.name in _MERGEABLE_AT_RULES and index is not None and not cascade.set_after(families, index):
+                target = out[index]
+                target.children = _merge_context(target.children + node.children)
+                cascade.mark(families, index)
+                continue
+            targets[key] = len(out)
+            cascade.mark(families, len(out))
+            out.append(node)
+        else:
+            if node.raw is not None:
+                signature = node.key + (node.raw,)
+            elif node.declarations is not None:
+                node.declarations = dedupe_declarations(node.declarations)
+                signature = node.key + tuple(node.declarations)
+            else:
+                signature = node.key
+            if signature in seen:
+                continue
+            seen.add(signature)
+            out.append(node)
+    return [node for node in out if node is not None]
+
+
+def count_nodes(nodes: Iterable[Node]) -> int:
+    """Count rules, at-rules and declarations, recursively.
+
+    Args:
+        nodes: Parsed or merged nodes.
+
+    Returns:
+        Number of nodes and declarations, comments excluded.
+    """
+    total = 0
+    for node in nodes:
+        if isinstance(node, Comment):
+            continue
+        total += 1 + len(node.declarations or ())
+        if isinstance(node, AtRule) and node.children:
+            total += count_nodes(node.children)
+    return total
+
+
+# ---------------------------------------------------------------------------
+# Serialising
+# ---------------------------------------------------------------------------
+
+def _minify_value(value: str) -> str:
+    return _map_outside_strings(value, lambda part: _COMMA_RE.sub(",", part))
+
+
+def _minify_prelude(prelude: str) -> str:
+    return _map_outside_strings(prelude, lambda part: _COLON_RE.sub(":", _COMMA_RE.sub(",", part)))
+
+
+def _format_declaration(decl: Declaration, minify: bool) -> str:
+    if minify:
+        value = decl.value if decl.name.startswith("--") else _minify_value(decl.value)
+        return f"{decl.name}:{value}{'!important' if decl.important else ''}"
+    return f"{decl.name}: {decl.value}{' !important' if decl.important else ''}"
+
+
+def _write(node: Node, minify: bool, indent: str, out: List[str]) -> None:
+    if isinstance(node, Comment):
+        if not minify:
+            out.append(f"{indent}/*{node.text}*/\n")
+        return
+    if isinstance(node, Rule):
+        head = _normalize_selector(node.selector, minify=True) if minify else node.selector
+        declarations = node.declarations
+    else:
+        prelude = _minify_prelude(node.prelude) if minify else node.prelude
+        head = f"@{node.name} {prelude}" if prelude else f"@{node.name}"
+        if node.children is None and node.declarations is None:
+            out.append(f"{head};" if minify else f"{indent}{head};\n")
+            return
+        declarations = node.declarations
+
+    if minify:
+        out.append(head + "{")
+        if declarations is not None:
+            out.append(";".join(_format_declaration(d, True) for d in declarations))
+        else:
+            for child in node.children:
+                _write(child, True, "", out)
+        out.append("}")
+        return
+
+    if node.raw is not None:
+        out.append(f"{indent}{head} {{{node.raw}}}\n")
+        return
+
+    out.append(f"{indent}{head} {{\n")
+    if declarations is not None:
+        for decl in declarations:
+            out.append(f"{indent}    {_format_declaration(decl, False)};\n")
+    else:
+        for child in node.children:
+            _write(child, False, indent + "    ", out)
+    out.append(f"{indent}}}\n")
+
+
+def serialize_stylesheet(nodes: List[Node], minify: bool = False) -> str:
+    """Turn parsed nodes back into CSS.
+
+    Args:
+        nodes: Parsed or merged nodes.
+        minify: Drop comments and all optional whitespace.
+
+    Returns:
+        Stylesheet text; pretty output separates top-level blocks with
+        blank lines.
+    """
+    blocks = []
+    for node in nodes:
+        out: List[str] = []
+        _write(node, minify, "", out)
+        if out:
+            blocks.append("".join(out))
+    return ("" if minify else "\n").join(blocks)
+
+
+def merge_css(*stylesheets: str, minify: bool = False) -> str:
+    """Merge stylesheets, later ones taking precedence.
+
+    Args:
+        *stylesheets: Stylesheet texts in cascade order.
+        minify: Produce minified output.
+
+    Returns:
+        The merged stylesheet.
+
+    Raises:
+        CssSyntaxError: If a stylesheet is malformed or uses nesting.
+    """
+    nodes: List[Node] = []
+    for css in stylesheets:
+        nodes.extend(parse_stylesheet(css))
+    return serialize_stylesheet(merge_nodes(nodes), minify)
+
+
+class CssPipeline:
+    """Merges stylesheets, caching results by content hash.
+
+    Example:
+        pipeline = CssPipeline()
+        css = pipeline.process(model["css"], editor_css)
+    """
+
+    def __init__(self, max_entries: int = 64) -> None:
+        """Initialize the pipeline.
+
+        Args:
+            max_entries: Maximum number of results kept.
+        """
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+
+    @staticmethod
+    def _key(mode: str, stylesheets: Tuple[str, ...]) -> str:
+        digest = hashlib.sha256(mode.encode("ascii"))
+        for css in stylesheets:
+            data = css.encode("utf-8", "surrogatepass")
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _cached(self, mode: str, stylesheets: Tuple[str, ...], compute: Callable[[], str]) -> str:
+        key = self._key(mode, stylesheets)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return result
+            self._misses += 1
+
+        try:
+            result = compute()
+        except CssSyntaxError as e:
+            logger.warning(f"Leaving CSS unchanged: {e.message}")
+            with self._lock:
+                self._errors += 1
+            result = "\n".join(stylesheets)
+
+        with self._lock:
+            self._entries[key] = result
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def process(self, *stylesheets: str, minify: bool = False) -> str:
+        """Merge stylesheets, later ones taking precedence.
+
+        Malformed CSS is not touched: the stylesheets are returned
+        joined as they are.
+
+        Args:
+            *stylesheets: Stylesheet texts in cascade order.
+            minify: Produce minified output.
+
+        Returns:
+            The merged stylesheet.
+        """
+        return self._cached(
+            "minify" if minify else "pretty", stylesheets,
+            lambda: merge_css(*stylesheets, minify=minify)
+        )
+
+    def tidy(self, css: str) -> str:
+        """Merge a stylesheet only if that removes something.
+
+        Args:
+            css: Stylesheet text.
+
+        Returns:
+            The merged, pretty-printed stylesheet if rules or
+            declarations were merged or dropped, else ``css`` as written.
+        """
+        def compute() -> str:
+            nodes = parse_stylesheet(css)
+            before = count_nodes(nodes)
+            merged = merge_nodes(nodes)
+            if count_nodes(merged) == before:
+                return css
+            return serialize_stylesheet(merged)
+
+        return self._cached("tidy", (css,), compute)
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics.
+
+        Returns:
+            Dictionary with entries, maxEntries, hits, misses, hitRate and
+            errors (inputs left unchanged because they did not parse).
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self._max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hitRate": self._hits / total if total else 0.0,
+                "errors": self._errors
+            }
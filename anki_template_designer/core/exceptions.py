@@ -24,6 +24,9 @@ class ErrorCode(Enum):
     TEMPLATE_LOAD_FAILED = 1103
     TEMPLATE_DELETE_FAILED = 1104
     TEMPLATE_DUPLICATE_NAME = 1105
+    TEMPLATE_PATCH_FAILED = 1106
+    TEMPLATE_SYNTAX_INVALID = 1107
+    CSS_SYNTAX_INVALID = 1108
     
     # Component errors (1200-1299)
     COMPONENT_NOT_FOUND = 1200
@@ -150,6 +153,24 @@ class TemplateValidationError(TemplateError):
     default_code = ErrorCode.TEMPLATE_INVALID
 
 
+class TemplatePatchError(TemplateError):
+    """Raised when a template patch does not apply cleanly."""
+    default_message = "Failed to apply template patch"
+    default_code = ErrorCode.TEMPLATE_PATCH_FAILED
+
+
+class TemplateSyntaxError(TemplateError):
+    """Raised when an Anki card template cannot be parsed."""
+    default_message = "Invalid card template syntax"
+    default_code = ErrorCode.TEMPLATE_SYNTAX_INVALID
+
+
+class CssSyntaxError(TemplateError):
+    """Raised when a stylesheet cannot be parsed."""
+    default_message = "Invalid CSS syntax"
+    default_code = ErrorCode.CSS_SYNTAX_INVALID
+
+
 # Component-related exceptions
 
 class ComponentError(TemplateDesignerError):
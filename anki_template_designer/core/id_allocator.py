@@ -0,0 +1,232 @@
+"""Compact, collision-free component id allocation.
+
+Component ids are 13 characters: an 8-character random prefix chosen
+once per allocator, followed by a 5-character base-36 counter. Ids from
+one allocator are monotonic and never repeat. Allocators in one process
+pick distinct prefixes, and with about 2 * 10^12 possible prefixes,
+allocators in different sessions are not expected to share one either.
+A per-template allocator also skips ids already present in the
+template, so pasted or imported components cannot collide.
+
+Generating an id is a counter increment and two table lookups instead
+of a uuid4 generation and string formatting per component.
+"""
+
+import secrets
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+ID_LENGTH = 13
+PREFIX_LENGTH = 8
+
+_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+_LETTERS = _DIGITS[10:]
+_PAIRS = [a + b for a in _DIGITS for b in _DIGITS]
+_COUNTER_LIMIT = 36 ** (ID_LENGTH - PREFIX_LENGTH)
+
+# Prefixes handed out in this process
+_prefixes_in_use: Set[str] = set()
+_prefix_lock = threading.Lock()
+
+
+def _new_prefix() -> str:
+    """Pick a random prefix not used by another allocator in this process.
+
+    Prefixes start with a letter so ids are also valid HTML ids.
+    """
+    with _prefix_lock:
+        while True:
+            prefix = secrets.choice(_LETTERS) + "".join(
+                secrets.choice(_DIGITS) for _ in range(PREFIX_LENGTH - 1)
+            )
+            if prefix not in _prefixes_in_use:
+                _prefixes_in_use.add(prefix)
+                return prefix
+
+
+class IdAllocator:
+    """Allocator of unique component ids.
+
+    Example:
+        allocator = IdAllocator.for_components(template.front.components)
+        ids = allocator.allocate_many(len(pasted))
+
+    Attributes:
+        prefix: Current id prefix.
+    """
+
+    def __init__(self, used: Iterable[str] = (), track: bool = True) -> None:
+        """Initialize the allocator.
+
+        Args:
+            used: Ids already in use, which will never be allocated.
+            track: Whether to remember allocated and reserved ids. The
+                process-wide default allocator does not track, since its
+                prefix alone keeps its ids unique.
+        """
+        self._lock = threading.Lock()
+        self._track = track
+        self._used: Set[str] = set(used) if track else set()
+        self._prefix = _new_prefix()
+        self._counter = 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        state.pop("_lock", None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_components(cls, components: Iterable[Any]) -> "IdAllocator":
+        """Create an allocator that avoids every id in component trees.
+
+        Args:
+            components: Root components to scan, including descendants.
+
+        Returns:
+            A tracking allocator.
+        """
+        allocator = cls()
+        allocator.reserve_tree(components)
+        return allocator
+
+    @property
+    def prefix(self) -> str:
+        """Get the current id prefix."""
+        return self._prefix
+
+    def __contains__(self, component_id: str) -> bool:
+        """Check whether an id is known to be in use."""
+        return component_id in self._used
+
+    def __len__(self) -> int:
+        """Get the number of ids known to be in use."""
+        return len(self._used)
+
+    def allocate(self) -> str:
+        """Allocate one id.
+
+        Returns:
+            A new unique id.
+        """
+        with self._lock:
+            return self._next()
+
+    def allocate_many(self, count: int) -> List[str]:
+        """Allocate several ids at once, e.g. for imports and paste.
+
+        Args:
+            count: Number of ids to allocate.
+
+        Returns:
+            List of new unique ids, in increasing order.
+        """
+        with self._lock:
+            if not self._track:
+                return [self._next() for _ in range(count)]
+
+            used = self._used
+            ids: List[str] = []
+            while len(ids) < count:
+                start = self._counter
+                stop = min(start + count - len(ids), _COUNTER_LIMIT)
+                prefix = self._prefix
+                batch = [_format(prefix, n) for n in range(start, stop)]
+                self._counter = stop
+                if used.isdisjoint(batch):
+                    ids.extend(batch)
+                else:
+                    ids.extend(i for i in batch if i not in used)
+                used.update(batch)
+                if self._counter >= _COUNTER_LIMIT:
+                    self._rollover()
+            return ids
+
+    def reserve(self, component_id: str) -> bool:
+        """Mark an existing id as in use.
+
+        Args:
+            component_id: Id to reserve.
+
+        Returns:
+            False if the id was already in use (a duplicate), else True.
+        """
+        with self._lock:
+            if component_id in self._used:
+                return False
+            self._used.add(component_id)
+            return True
+
+    def reserve_tree(self, components: Iterable[Any]) -> None:
+        """Mark every id in component trees as in use.
+
+        Args:
+            components: Root components to scan, including descendants.
+        """
+        stack = list(components)
+        ids = []
+        while stack:
+            node = stack.pop()
+            ids.append(node.id)
+            stack.extend(node.children)
+        with self._lock:
+            self._used.update(ids)
+
+    def release(self, component_id: str) -> None:
+        """Forget an id, e.g. after its component was deleted.
+
+        Released ids are never handed out again by this allocator, since
+        allocation is monotonic; releasing only keeps the index small.
+
+        Args:
+            component_id: Id to release.
+        """
+        with self._lock:
+            self._used.discard(component_id)
+
+    def _next(self) -> str:
+        """Allocate one id. Caller holds the lock."""
+        while True:
+            if self._counter >= _COUNTER_LIMIT:
+                self._rollover()
+            component_id = _format(self._prefix, self._counter)
+            self._counter += 1
+            if not self._track:
+                return component_id
+            if component_id not in self._used:
+                self._used.add(component_id)
+                return component_id
+
+    def _rollover(self) -> None:
+        """Switch to a fresh prefix once the counter space is exhausted."""
+        self._prefix = _new_prefix()
+        self._counter = 0
+
+
+def _format(prefix: str, n: int) -> str:
+    """Format a prefix and counter as a fixed-width id."""
+    return prefix + _DIGITS[n // 1679616] + _PAIRS[(n // 1296) % 1296] + _PAIRS[n % 1296]
+
+
+_default_allocator: Optional[IdAllocator] = None
+
+
+def new_component_id() -> str:
+    """Allocate an id from the process-wide default allocator.
+
+    Used for components created outside any template. Ids are unique
+    within the process and never collide with ids from per-template
+    allocators, which always use a different prefix. They are not checked
+    against ids loaded from disk; use ``Template.id_allocator`` when adding
+    components to an existing template.
+
+    Returns:
+        A new unique id.
+    """
+    global _default_allocator
+    if _default_allocator is None:
+        _default_allocator = IdAllocator(track=False)
+    return _default_allocator.allocate()
@@ -3,14 +3,268 @@
 This module defines the core data structures used throughout
 the template designer for representing templates, components,
 and related data.
+
+Components and template sides track changes: assigning a field,
+mutating ``children``/``components``/``attributes`` in place or setting
+a style property marks the node dirty and propagates to its ancestors.
+Derived artefacts (compiled HTML, content hash, serialized bytes) are
+cached per node and dropped when it becomes dirty, so after an edit only
+the dirty path is rebuilt. In-place changes to nested attribute values
+(e.g. a list inside ``attributes``) are not seen; call ``mark_dirty()``
+after making them.
 """
 
-from dataclasses import dataclass, field
+from copy import deepcopy
+from dataclasses import dataclass, field, fields
 from typing import Any, Dict, List, Optional
 from datetime import datetime
 from enum import Enum
+import json
 import uuid
 
+from .id_allocator import IdAllocator, new_component_id
+
+# Number of derived artefacts rebuilt, by kind ("hash", "html", "bytes")
+_recompute_counts: Dict[str, int] = {}
+
+
+def record_recompute(kind: str, count: int = 1) -> None:
+    """Record that derived artefacts were rebuilt.
+    
+    Args:
+        kind: Artefact kind, e.g. "html".
+        count: Number of nodes rebuilt.
+    """
+    _recompute_counts[kind] = _recompute_counts.get(kind, 0) + count
+
+
+def get_recompute_counts() -> Dict[str, int]:
+    """Get how many nodes had each derived artefact rebuilt.
+    
+    Reset before an edit and read afterwards to see the cost of that edit.
+    
+    Returns:
+        Dictionary of artefact kind to rebuild count.
+    """
+    return dict(_recompute_counts)
+
+
+def reset_recompute_counts() -> None:
+    """Reset the rebuild counters."""
+    _recompute_counts.clear()
+
+
+def _compact_json(value: Any) -> str:
+    """Serialize a value as compact JSON."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class _TrackedList(list):
+    """Internal: child list that reparents items and dirties its owner."""
+    
+    _owner = None
+    
+    def __init__(self, owner: Any, items: Any = ()) -> None:
+        super().__init__(items)
+        self._owner = owner
+        for item in self:
+            item._parent = owner
+    
+    def __deepcopy__(self, memo: Dict[int, Any]) -> List[Any]:
+        return [deepcopy(item, memo) for item in self]
+    
+    def __reduce_ex__(self, protocol: int) -> Any:
+        return (list, (list(self),))
+    
+    def _adopt(self, items: Any) -> None:
+        owner = self._owner
+        for item in items:
+            item._parent = owner
+    
+    def _release(self, items: Any) -> None:
+        owner = self._owner
+        for item in items:
+            if item._parent is owner:
+                item._parent = None
+    
+    def _changed(self) -> None:
+        if self._owner is not None:
+            self._owner.mark_dirty()
+    
+    def append(self, item: Any) -> None:
+        super().append(item)
+        self._adopt((item,))
+        self._changed()
+    
+    def extend(self, items: Any) -> None:
+        items = list(items)
+        super().extend(items)
+        self._adopt(items)
+        self._changed()
+    
+    def __iadd__(self, items: Any) -> "_TrackedList":
+        self.extend(items)
+        return self
+    
+    def insert(self, index: int, item: Any) -> None:
+        super().insert(index, item)
+        self._adopt((item,))
+        self._changed()
+    
+    def pop(self, index: int = -1) -> Any:
+        item = super().pop(index)
+        self._release((item,))
+        self._changed()
+        return item
+    
+    def remove(self, item: Any) -> None:
+        super().remove(item)
+        self._release((item,))
+        self._changed()
+    
+    def clear(self) -> None:
+        self._release(self)
+        super().clear()
+        self._changed()
+    
+    def __setitem__(self, index: Any, value: Any) -> None:
+        if isinstance(index, slice):
+            value = list(value)
+            self._release(self[index])
+            self._adopt(value)
+        else:
+            self._release((self[index],))
+            self._adopt((value,))
+        super().__setitem__(index, value)
+        self._changed()
+    
+    def __delitem__(self, index: Any) -> None:
+        removed = self[index] if isinstance(index, slice) else (self[index],)
+        super().__delitem__(index)
+        self._release(removed)
+        self._changed()
+    
+    def sort(self, *args: Any, **kwargs: Any) -> None:
+        super().sort(*args, **kwargs)
+        self._changed()
+    
+    def reverse(self) -> None:
+        super().reverse()
+        self._changed()
+
+
+class _TrackedDict(dict):
+    """Internal: attribute dict that dirties its owner on mutation."""
+    
+    _owner = None
+    
+    def __init__(self, owner: Any, items: Any = ()) -> None:
+        super().__init__(items)
+        self._owner = owner
+    
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Dict[Any, Any]:
+        return {key: deepcopy(value, memo) for key, value in self.items()}
+    
+    def __reduce_ex__(self, protocol: int) -> Any:
+        return (dict, (dict(self),))
+    
+    def _changed(self) -> None:
+        if self._owner is not None:
+            self._owner.mark_dirty()
+    
+    def __setitem__(self, key: Any, value: Any) -> None:
+        super().__setitem__(key, value)
+        self._changed()
+    
+    def __delitem__(self, key: Any) -> None:
+        super().__delitem__(key)
+        self._changed()
+    
+    def pop(self, *args: Any) -> Any:
+        result = super().pop(*args)
+        self._changed()
+        return result
+    
+    def popitem(self) -> Any:
+        result = super().popitem()
+        self._changed()
+        return result
+    
+    def setdefault(self, key: Any, default: Any = None) -> Any:
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+    
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super().update(*args, **kwargs)
+        self._changed()
+    
+    def __ior__(self, other: Any) -> "_TrackedDict":
+        self.update(other)
+        return self
+    
+    def clear(self) -> None:
+        super().clear()
+        self._changed()
+
+
+class _Tracked:
+    """Internal: dirty flag and derived-artefact cache shared by tree nodes.
+    
+    Invariant: a node with cached artefacts has clean descendants, so
+    dirtiness only needs to propagate until it reaches a node that is
+    already dirty.
+    """
+    
+    _dirty = True
+    _parent = None
+    _derived: Optional[Dict[str, Any]] = None
+    
+    @property
+    def is_dirty(self) -> bool:
+        """Whether derived artefacts must be rebuilt."""
+        return self._dirty
+    
+    def mark_dirty(self) -> None:
+        """Drop cached artefacts on this node and its ancestors."""
+        node = self
+        while node is not None and not node._dirty:
+            node._dirty = True
+            node._derived = None
+            node = node._parent
+    
+    def get_cached(self, key: str) -> Any:
+        """Get a cached derived artefact.
+        
+        Args:
+            key: Artefact kind, e.g. "html".
+            
+        Returns:
+            The cached value, or None if dirty or never computed.
+        """
+        derived = self._derived
+        return derived.get(key) if derived else None
+    
+    def set_cached(self, key: str, value: Any) -> None:
+        """Cache a derived artefact computed from the current state.
+        
+        Args:
+            key: Artefact kind, e.g. "html".
+            value: The artefact.
+        """
+        if self._derived is None:
+            self._derived = {}
+        self._derived[key] = value
+        self._dirty = False
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Parent links are rebuilt by the parent; copying them would
+        # drag the whole tree into copies of a single node.
+        state = dict(self.__dict__)
+        state.pop("_parent", None)
+        return state
+
 
 class ComponentType(Enum):
     """Enumeration of available component types."""
@@ -23,6 +277,11 @@ class ComponentType(Enum):
     CLOZE = "cloze"
     IMAGE = "image"
     AUDIO = "audio"
+    HINT = "hint"
+    TYPE_ANSWER = "type-answer"
+    CONDITIONAL = "conditional"
+    TAGS = "tags"
+    FRONTSIDE = "frontside"
 
 
 @dataclass
@@ -50,6 +309,19 @@ class ComponentStyle:
     border_radius: Optional[str] = None
     custom_css: Optional[str] = None
     
+    _owner = None
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        self.__dict__[name] = value
+        owner = self._owner
+        if owner is not None and name != "_owner" and not owner._dirty:
+            owner.mark_dirty()
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        state.pop("_owner", None)
+        return state
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary, excluding None values."""
         return {k: v for k, v in {
@@ -81,9 +353,12 @@ class ComponentStyle:
 
 
 @dataclass
-class Component:
+class Component(_Tracked):
     """A template component (block).
     
+    Assigning any field, or mutating ``children``, ``attributes`` or
+    ``style`` in place, marks the component and its ancestors dirty.
+    
     Attributes:
         id: Unique identifier for the component.
         type: Component type from ComponentType enum.
@@ -93,7 +368,7 @@ class Component:
         children: Child components (for containers).
         attributes: Additional attributes.
     """
-    id: str = field(default_factory=lambda: str(uuid.uuid4())[:8])
+    id: str = field(default_factory=new_component_id)
     type: ComponentType = ComponentType.CONTAINER
     content: str = ""
     field_name: Optional[str] = None
@@ -101,6 +376,27 @@ class Component:
     children: List["Component"] = field(default_factory=list)
     attributes: Dict[str, Any] = field(default_factory=dict)
     
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in _COMPONENT_FIELDS:
+            if name == "children":
+                value = _TrackedList(self, value)
+            elif name == "attributes":
+                value = _TrackedDict(self, value)
+            elif name == "style":
+                value.__dict__["_owner"] = self
+            self.__dict__[name] = value
+            if not self._dirty:
+                self.mark_dirty()
+        else:
+            self.__dict__[name] = value
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.__dict__["children"] = _TrackedList(self, state.get("children", ()))
+        self.__dict__["attributes"] = _TrackedDict(self, state.get("attributes", {}))
+        if "style" in state:
+            state["style"].__dict__["_owner"] = self
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for serialization."""
         return {
@@ -113,24 +409,66 @@ class Component:
             "attributes": self.attributes,
         }
     
+    def to_bytes(self) -> bytes:
+        """Serialize the subtree as compact UTF-8 JSON.
+        
+        Equivalent to compact ``json.dumps(self.to_dict())``, but built
+        from cached per-node bytes so only dirty paths are re-serialized.
+        
+        Returns:
+            Serialized subtree.
+        """
+        cached = self.get_cached("bytes")
+        if cached is None:
+            head = _compact_json({
+                "id": self.id,
+                "type": self.type.value,
+                "content": self.content,
+                "fieldName": self.field_name,
+                "style": self.style.to_dict(),
+            })
+            cached = b"".join((
+                head[:-1].encode("utf-8"),
+                b',"children":[',
+                b",".join(c.to_bytes() for c in self.children),
+                b'],"attributes":',
+                _compact_json(self.attributes).encode("utf-8"),
+                b"}",
+            ))
+            self.set_cached("bytes", cached)
+            record_recompute("bytes")
+        return cached
+    
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> "Component":
-        """Create instance from dictionary."""
+    def from_dict(cls, data: Dict[str, Any], allocator: Optional[IdAllocator] = None) -> "Component":
+        """Create instance from dictionary.
+        
+        Args:
+            data: Serialized component.
+            allocator: Allocator for components without an id. Defaults
+                to the process-wide allocator.
+        """
+        component_id = data.get("id")
+        if component_id is None:
+            component_id = allocator.allocate() if allocator else new_component_id()
         return cls(
-            id=data.get("id", str(uuid.uuid4())[:8]),
+            id=component_id,
             type=ComponentType(data.get("type", "container")),
             content=data.get("content", ""),
             field_name=data.get("fieldName"),
             style=ComponentStyle.from_dict(data.get("style", {})),
-            children=[cls.from_dict(c) for c in data.get("children", [])],
+            children=[cls.from_dict(c, allocator) for c in data.get("children", [])],
             attributes=data.get("attributes", {}),
         )
 
 
 @dataclass
-class TemplateSide:
+class TemplateSide(_Tracked):
     """One side (front or back) of a template.
     
+    Root components report changes to their side, so the side is dirty
+    whenever anything in its component tree is.
+    
     Attributes:
         html: Raw HTML content.
         components: Component tree representation.
@@ -138,6 +476,20 @@ class TemplateSide:
     html: str = ""
     components: List[Component] = field(default_factory=list)
     
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in _SIDE_FIELDS:
+            if name == "components":
+                value = _TrackedList(self, value)
+            self.__dict__[name] = value
+            if not self._dirty:
+                self.mark_dirty()
+        else:
+            self.__dict__[name] = value
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self.__dict__["components"] = _TrackedList(self, state.get("components", ()))
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary."""
         return {
@@ -145,12 +497,36 @@ class TemplateSide:
             "components": [c.to_dict() for c in self.components],
         }
     
+    def to_bytes(self) -> bytes:
+        """Serialize the side as compact UTF-8 JSON.
+        
+        Returns:
+            Serialized side, rebuilt only along dirty paths.
+        """
+        cached = self.get_cached("bytes")
+        if cached is None:
+            cached = b"".join((
+                b'{"html":',
+                _compact_json(self.html).encode("utf-8"),
+                b',"components":[',
+                b",".join(c.to_bytes() for c in self.components),
+                b"]}",
+            ))
+            self.set_cached("bytes", cached)
+            record_recompute("bytes")
+        return cached
+    
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> "TemplateSide":
-        """Create instance from dictionary."""
+    def from_dict(cls, data: Dict[str, Any], allocator: Optional[IdAllocator] = None) -> "TemplateSide":
+        """Create instance from dictionary.
+        
+        Args:
+            data: Serialized side.
+            allocator: Allocator for components without an id.
+        """
         return cls(
             html=data.get("html", ""),
-            components=[Component.from_dict(c) for c in data.get("components", [])],
+            components=[Component.from_dict(c, allocator) for c in data.get("components", [])],
         )
 
 
@@ -193,22 +569,85 @@ class Template:
             "version": self.version,
         }
     
+    @property
+    def id_allocator(self) -> IdAllocator:
+        """Get the allocator for new component ids in this template.
+        
+        Built on first use from the ids currently in the template, and
+        kept in sync when components are allocated through it.
+        """
+        allocator = self.__dict__.get("_id_allocator")
+        if allocator is None:
+            allocator = IdAllocator.for_components(self.front.components + self.back.components)
+            self._id_allocator = allocator
+        return allocator
+    
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "Template":
-        """Create instance from dictionary."""
-        return cls(
+        """Create instance from dictionary.
+        
+        Components without an id get one from the template's allocator,
+        which avoids every id already present in the data.
+        """
+        front_data = data.get("front", {})
+        back_data = data.get("back", {})
+        allocator = IdAllocator(_component_ids(front_data) + _component_ids(back_data))
+        template = cls(
             id=data.get("id", str(uuid.uuid4())),
             name=data.get("name", "Untitled Template"),
-            front=TemplateSide.from_dict(data.get("front", {})),
-            back=TemplateSide.from_dict(data.get("back", {})),
+            front=TemplateSide.from_dict(front_data, allocator),
+            back=TemplateSide.from_dict(back_data, allocator),
             css=data.get("css", ""),
             note_type=data.get("noteType"),
             created_at=datetime.fromisoformat(data.get("createdAt", datetime.now().isoformat())),
             modified_at=datetime.fromisoformat(data.get("modifiedAt", datetime.now().isoformat())),
             version=data.get("version", 1),
         )
+        template._id_allocator = allocator
+        return template
+    
+    def to_bytes(self) -> bytes:
+        """Serialize the template as compact UTF-8 JSON.
+        
+        Equivalent to compact ``json.dumps(self.to_dict())``; the sides
+        reuse their cached bytes.
+        
+        Returns:
+            Serialized template.
+        """
+        head = _compact_json({"id": self.id, "name": self.name})
+        tail = _compact_json({
+            "css": self.css,
+            "noteType": self.note_type,
+            "createdAt": self.created_at.isoformat(),
+            "modifiedAt": self.modified_at.isoformat(),
+            "version": self.version,
+        })
+        return b"".join((
+            head[:-1].encode("utf-8"),
+            b',"front":', self.front.to_bytes(),
+            b',"back":', self.back.to_bytes(),
+            b",", tail[1:].encode("utf-8"),
+        ))
     
     def update_modified(self) -> None:
         """Update the modification timestamp."""
         self.modified_at = datetime.now()
         self.version += 1
+
+
+def _component_ids(side_data: Dict[str, Any]) -> List[str]:
+    """Collect the ids present in a serialized template side."""
+    ids = []
+    stack = list(side_data.get("components", ()))
+    while stack:
+        node = stack.pop()
+        component_id = node.get("id")
+        if component_id is not None:
+            ids.append(component_id)
+        stack.extend(node.get("children", ()))
+    return ids
+
+
+_COMPONENT_FIELDS = frozenset(f.name for f in fields(Component))
+_SIDE_FIELDS = frozenset(f.name for f in fields(TemplateSide))
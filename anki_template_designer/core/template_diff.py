@@ -0,0 +1,767 @@
+"""Tree diff/patch engine for template versions.
+
+Computes a compact, reversible edit script between two versions of a
+Template. Components are matched by id, so the common case (ids stable,
+a handful of properties edited) is linear in the size of the tree and
+produces a patch proportional to the size of the change rather than the
+size of the template.
+
+Patches are plain lists of JSON-serialisable operations:
+
+    set     Template-level scalar (name, noteType, version, timestamps)
+    text    Edits to ``css``, ``front.html`` or ``back.html``
+    node    Component property (type, content, fieldName)
+    style   Single ComponentStyle key
+    attr    Single component attribute
+    insert  Component subtree inserted under a parent at an index
+    delete  Component subtree removed from a parent at an index
+    move    Existing component moved to a new parent/index
+
+Every operation carries both the old and the new value, so a patch can
+be applied forwards or backwards and conflicts are detected instead of
+silently corrupting the tree.
+"""
+
+import bisect
+import difflib
+from copy import deepcopy
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .exceptions import TemplatePatchError
+from .models import Component, ComponentStyle, ComponentType, Template, TemplateSide
+
+PATCH_FORMAT_VERSION = 1
+
+SIDES = ("front", "back")
+
+# Template-level scalar fields, keyed by their serialized name
+_TEMPLATE_FIELDS = {
+    "name": "name",
+    "noteType": "note_type",
+    "version": "version",
+    "createdAt": "created_at",
+    "modifiedAt": "modified_at",
+}
+_DATETIME_FIELDS = {"createdAt", "modifiedAt"}
+
+# Component scalar properties, keyed by their serialized name
+_NODE_FIELDS = {
+    "type": "type",
+    "content": "content",
+    "fieldName": "field_name",
+}
+
+# Middle sections longer than this are diffed line by line
+_LINE_DIFF_THRESHOLD = 1024
+
+
+@dataclass
+class TemplatePatch:
+    """A reversible edit script between two template versions.
+
+    Attributes:
+        ops: Ordered list of JSON-serialisable operations.
+        base_version: Template version the patch applies to.
+        target_version: Template version the patch produces.
+    """
+    ops: List[Dict[str, Any]] = field(default_factory=list)
+    base_version: Optional[int] = None
+    target_version: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    @property
+    def is_empty(self) -> bool:
+        """Check if the patch contains no operations."""
+        return not self.ops
+
+    def inverted(self) -> "TemplatePatch":
+        """Return the patch that undoes this one."""
+        return TemplatePatch(
+            ops=[_invert_op(op) for op in reversed(self.ops)],
+            base_version=self.target_version,
+            target_version=self.base_version,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for serialization."""
+        return {
+            "format": PATCH_FORMAT_VERSION,
+            "baseVersion": self.base_version,
+            "targetVersion": self.target_version,
+            "ops": self.ops,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TemplatePatch":
+        """Create instance from dictionary."""
+        fmt = data.get("format", PATCH_FORMAT_VERSION)
+        if fmt != PATCH_FORMAT_VERSION:
+            raise TemplatePatchError(
+                f"Unsupported patch format: {fmt}",
+                details={"format": fmt},
+            )
+        return cls(
+            ops=list(data.get("ops", [])),
+            base_version=data.get("baseVersion"),
+            target_version=data.get("targetVersion"),
+        )
+
+
+# ---------------------------------------------------------------------- #
+#  Diff                                                                   #
+# ---------------------------------------------------------------------- #
+
+def diff_templates(old: Template, new: Template) -> TemplatePatch:
+    """Compute the edit script that turns ``old`` into ``new``.
+
+    Args:
+        old: Base template version.
+        new: Target template version.
+
+    Returns:
+        TemplatePatch that, applied to ``old``, yields ``new``.
+    """
+    ops: List[Dict[str, Any]] = []
+
+    for key, attr in _TEMPLATE_FIELDS.items():
+        old_value = _template_value(old, key, attr)
+        new_value = _template_value(new, key, attr)
+        if old_value != new_value:
+            ops.append({"op": "set", "path": key, "old": old_value, "new": new_value})
+
+    edits = diff_text(old.css, new.css)
+    if edits:
+        ops.append({"op": "text", "path": "css", "edits": edits})
+
+    for side_name in SIDES:
+        old_side: TemplateSide = getattr(old, side_name)
+        new_side: TemplateSide = getattr(new, side_name)
+
+        edits = diff_text(old_side.html, new_side.html)
+        if edits:
+            ops.append({"op": "text", "path": f"{side_name}.html", "edits": edits})
+
+        _diff_components(side_name, old_side.components, new_side.components, ops)
+
+    return TemplatePatch(ops=ops, base_version=old.version, target_version=new.version)
+
+
+def diff_text(old: str, new: str) -> List[List[Any]]:
+    """Compute a list of ``[position, old, new]`` text edits.
+
+    Positions refer to the string as it stands after the preceding
+    edits in the list have been applied.
+
+    Args:
+        old: Original text.
+        new: Target text.
+
+    Returns:
+        List of edits (empty if the strings are equal).
+    """
+    if old == new:
+        return []
+
+    # Trim common prefix and suffix; most edits touch one small region
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    while (suffix < limit - prefix
+           and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]):
+        suffix += 1
+
+    old_mid = old[prefix:len(old) - suffix]
+    new_mid = new[prefix:len(new) - suffix]
+
+    if (len(old_mid) < _LINE_DIFF_THRESHOLD or len(new_mid) < _LINE_DIFF_THRESHOLD
+            or "\n" not in old_mid or "\n" not in new_mid):
+        return [[prefix, old_mid, new_mid]]
+
+    old_lines = old_mid.splitlines(keepends=True)
+    new_lines = new_mid.splitlines(keepends=True)
+    old_offsets = _line_offsets(old_lines)
+
+    edits: List[List[Any]] = []
+    delta = 0
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        removed = "".join(old_lines[i1:i2])
+        added = "".join(new_lines[j1:j2])
+        edits.append([prefix + old_offsets[i1] + delta, removed, added])
+        delta += len(added) - len(removed)
+    return edits
+
+
+def _line_offsets(lines: List[str]) -> List[int]:
+    """Return the start offset of each line plus the total length."""
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    return offsets
+
+
+def _template_value(template: Template, key: str, attr: str) -> Any:
+    """Get a template scalar in its serialized form."""
+    value = getattr(template, attr)
+    if key in _DATETIME_FIELDS:
+        return value.isoformat()
+    return value
+
+
+def _index_tree(roots: List[Component]) -> Optional[Tuple[Dict[str, Component], Dict[str, Optional[str]]]]:
+    """Map component id -> component and component id -> parent id.
+
+    Returns None if the tree contains duplicate ids, in which case
+    components cannot be matched reliably.
+    """
+    nodes: Dict[str, Component] = {}
+    parents: Dict[str, Optional[str]] = {}
+    stack: List[Tuple[Component, Optional[str]]] = [(c, None) for c in roots]
+    while stack:
+        node, parent_id = stack.pop()
+        node_id = node.id
+        if node_id in nodes:
+            return None
+        nodes[node_id] = node
+        parents[node_id] = parent_id
+        for child in node.children:
+            stack.append((child, node_id))
+    return nodes, parents
+
+
+class _DuplicateIds(Exception):
+    """Internal: the target tree contains duplicate ids."""
+
+
+class _ShadowTree:
+    """The old structure, materialised lazily and kept in sync with emitted ops.
+
+    Child lists are only copied for parents the diff actually touches,
+    so unchanged regions of the tree cost a single comparison.
+    """
+
+    def __init__(self, roots: List[Component], nodes: Dict[str, Component],
+                 parents: Dict[str, Optional[str]]) -> None:
+        self.roots = roots
+        self.nodes = nodes
+        self._parents = parents
+        self._children: Dict[Optional[str], List[str]] = {}
+        self._moved: Dict[str, Optional[str]] = {}
+
+    def children(self, parent_id: Optional[str]) -> List[str]:
+        ids = self._children.get(parent_id)
+        if ids is None:
+            source = self.roots if parent_id is None else self.nodes[parent_id].children
+            ids = [c.id for c in source]
+            self._children[parent_id] = ids
+        return ids
+
+    def add_empty(self, parent_id: str) -> None:
+        self._children[parent_id] = []
+
+    def parent(self, node_id: str) -> Optional[str]:
+        if node_id in self._moved:
+            return self._moved[node_id]
+        return self._parents[node_id]
+
+    def set_parent(self, node_id: str, parent_id: Optional[str]) -> None:
+        self._moved[node_id] = parent_id
+
+    def matches(self, parent_id: Optional[str], target_nodes: List[Component]) -> bool:
+        """Check if a parent's current children equal the target, without copying."""
+        ids = self._children.get(parent_id)
+        if ids is not None:
+            return len(ids) == len(target_nodes) and all(
+                a == b.id for a, b in zip(ids, target_nodes))
+        source = self.roots if parent_id is None else self.nodes[parent_id].children
+        return len(source) == len(target_nodes) and all(
+            a.id == b.id for a, b in zip(source, target_nodes))
+
+
+def _diff_components(
+    side: str,
+    old_roots: List[Component],
+    new_roots: List[Component],
+    ops: List[Dict[str, Any]],
+) -> None:
+    """Append the operations turning one component forest into another."""
+    start = len(ops)
+    indexed = _index_tree(old_roots)
+    try:
+        if indexed is None:
+            raise _DuplicateIds()
+        _diff_forest(side, old_roots, new_roots, indexed[0], indexed[1], ops)
+    except _DuplicateIds:
+        # Ids are ambiguous: replace the whole forest
+        del ops[start:]
+        for i in reversed(range(len(old_roots))):
+            ops.append(_structure_op("delete", side, None, i, _subtree_dict(old_roots[i])))
+        for i, root in enumerate(new_roots):
+            ops.append(_structure_op("insert", side, None, i, _subtree_dict(root)))
+
+
+def _diff_forest(
+    side: str,
+    old_roots: List[Component],
+    new_roots: List[Component],
+    old_nodes: Dict[str, Component],
+    old_parents: Dict[str, Optional[str]],
+    ops: List[Dict[str, Any]],
+) -> None:
+    """Diff two forests whose old ids are known to be unique."""
+    shadow = _ShadowTree(old_roots, old_nodes, old_parents)
+    seen: set = set()
+
+    # 1. Attach: walk the target tree parents-first. Matched components get
+    # their property changes; each child list is then fixed up in place.
+    pending: List[Tuple[Optional[str], List[Component]]] = [(None, new_roots)]
+    while pending:
+        parent_id, target_nodes = pending.pop()
+
+        for child in target_nodes:
+            child_id = child.id
+            if child_id in seen:
+                raise _DuplicateIds()
+            seen.add(child_id)
+            old = old_nodes.get(child_id)
+            if old is not None:
+                _diff_properties(side, old, child, ops)
+
+        inserted: set = set()
+        if not shadow.matches(parent_id, target_nodes):
+            inserted = _reorder_children(side, parent_id, target_nodes, shadow, seen, ops)
+
+        for child in reversed(target_nodes):
+            if child.id not in inserted:
+                pending.append((child.id, child.children))
+
+    # 2. Detach: every matched component is now in place, so each removed
+    # component's remaining subtree consists only of removed components
+    removals: Dict[Optional[str], List[str]] = {}
+    for node_id in old_nodes.keys() - seen:
+        parent_id = old_parents[node_id]
+        if parent_id is None or parent_id in seen:
+            removals.setdefault(parent_id, []).append(node_id)
+
+    for parent_id, node_ids in removals.items():
+        siblings = shadow.children(parent_id)
+        positions = sorted((siblings.index(nid) for nid in node_ids), reverse=True)
+        for position in positions:
+            node_id = siblings.pop(position)
+            payload = _shadow_dict(node_id, shadow)
+            ops.append(_structure_op("delete", side, parent_id, position, payload))
+
+
+def _collect_new_subtree(node: Component, old_nodes: Dict[str, Component], seen: set) -> bool:
+    """Check whether a whole subtree is new, registering its ids if so."""
+    ids = []
+    stack = list(node.children)
+    while stack:
+        current = stack.pop()
+        if current.id in old_nodes:
+            return False
+        ids.append(current.id)
+        stack.extend(current.children)
+    for node_id in ids:
+        if node_id in seen:
+            raise _DuplicateIds()
+        seen.add(node_id)
+    return True
+
+
+def _reorder_children(
+    side: str,
+    parent_id: Optional[str],
+    target_nodes: List[Component],
+    shadow: _ShadowTree,
+    seen: set,
+    ops: List[Dict[str, Any]],
+) -> set:
+    """Emit the minimal moves/inserts making the target a subsequence of the children.
+
+    Children already under this parent that form the longest run in
+    target order stay put; every other child is placed right after its
+    target predecessor. Children leaving this parent are left in place
+    and moved out when their new parent is processed.
+
+    Returns:
+        Ids of children inserted together with their whole subtree.
+    """
+    target = [c.id for c in target_nodes]
+    current = shadow.children(parent_id)
+    target_pos = {cid: i for i, cid in enumerate(target)}
+    local = [cid for cid in current if cid in target_pos]
+    stay = _longest_increasing_run(local, target_pos)
+    inserted = set()
+
+    for i, cid in enumerate(target):
+        if cid in stay:
+            continue
+
+        if cid in shadow.nodes:
+            source_parent = shadow.parent(cid)
+            source = shadow.children(source_parent)
+            from_index = source.index(cid)
+            source.pop(from_index)
+            to_index = 0 if i == 0 else current.index(target[i - 1]) + 1
+            current.insert(to_index, cid)
+            shadow.set_parent(cid, parent_id)
+            ops.append({
+                "op": "move",
+                "side": side,
+                "id": cid,
+                "from": [source_parent, from_index],
+                "to": [parent_id, to_index],
+            })
+        else:
+            node = target_nodes[i]
+            to_index = 0 if i == 0 else current.index(target[i - 1]) + 1
+            current.insert(to_index, cid)
+            if _collect_new_subtree(node, shadow.nodes, seen):
+                payload = _subtree_dict(node)
+                inserted.add(cid)
+            else:
+                payload = _node_dict(node)
+                shadow.add_empty(cid)
+            ops.append(_structure_op("insert", side, parent_id, to_index, payload))
+
+    return inserted
+
+
+def _longest_increasing_run(ids: List[str], rank: Dict[str, int]) -> set:
+    """Return the ids forming a longest subsequence increasing in ``rank``."""
+    if not ids:
+        return set()
+
+    # Patience sorting with predecessor links, O(n log n)
+    tails: List[int] = []
+    tail_idx: List[int] = []
+    prev = [-1] * len(ids)
+    for i, cid in enumerate(ids):
+        r = rank[cid]
+        k = bisect.bisect_left(tails, r)
+        if k == len(tails):
+            tails.append(r)
+            tail_idx.append(i)
+        else:
+            tails[k] = r
+            tail_idx[k] = i
+        prev[i] = tail_idx[k - 1] if k > 0 else -1
+
+    result = set()
+    i = tail_idx[-1]
+    while i != -1:
+        result.add(ids[i])
+        i = prev[i]
+    return result
+
+
+def _diff_properties(side: str, old: Component, new: Component, ops: List[Dict[str, Any]]) -> None:
+    """Append property operations for a matched component."""
+    node_id = new.id
+
+    if old.type != new.type:
+        ops.append({"op": "node", "side": side, "id": node_id, "key": "type",
+                    "old": old.type.value, "new": new.type.value})
+    if old.content != new.content:
+        ops.append({"op": "node", "side": side, "id": node_id, "key": "content",
+                    "old": old.content, "new": new.content})
+    if old.field_name != new.field_name:
+        ops.append({"op": "node", "side": side, "id": node_id, "key": "fieldName",
+                    "old": old.field_name, "new": new.field_name})
+
+    if old.style != new.style:
+        old_style = old.style.to_dict()
+        new_style = new.style.to_dict()
+        for key in sorted(old_style.keys() | new_style.keys()):
+            if old_style.get(key) != new_style.get(key):
+                ops.append({"op": "style", "side": side, "id": node_id, "key": key,
+                            "old": old_style.get(key), "new": new_style.get(key)})
+
+    if old.attributes != new.attributes:
+        for key in sorted(old.attributes.keys() | new.attributes.keys(), key=str):
+            in_old = key in old.attributes
+            in_new = key in new.attributes
+            if in_old and in_new and old.attributes[key] == new.attributes[key]:
+                continue
+            op: Dict[str, Any] = {"op": "attr", "side": side, "id": node_id, "key": key}
+            if in_old:
+                op["old"] = deepcopy(old.attributes[key])
+            if in_new:
+                op["new"] = deepcopy(new.attributes[key])
+            ops.append(op)
+
+
+def _structure_op(kind: str, side: str, parent_id: Optional[str], index: int,
+                  node: Dict[str, Any]) -> Dict[str, Any]:
+    """Build an insert or delete operation."""
+    return {"op": kind, "side": side, "parent": parent_id, "index": index, "node": node}
+
+
+def _node_dict(node: Component) -> Dict[str, Any]:
+    """Serialize a single component without its children."""
+    return {
+        "id": node.id,
+        "type": node.type.value,
+        "content": node.content,
+        "fieldName": node.field_name,
+        "style": node.style.to_dict(),
+        "children": [],
+        "attributes": deepcopy(node.attributes),
+    }
+
+
+def _subtree_dict(node: Component) -> Dict[str, Any]:
+    """Serialize a component subtree without aliasing mutable state."""
+    data = _node_dict(node)
+    data["children"] = [_subtree_dict(c) for c in node.children]
+    return data
+
+
+def _shadow_dict(node_id: str, shadow: _ShadowTree) -> Dict[str, Any]:
+    """Serialize a removed subtree as it stands in the shadow structure."""
+    data = _node_dict(shadow.nodes[node_id])
+    data["children"] = [_shadow_dict(cid, shadow) for cid in shadow.children(node_id)]
+    return data
+
+
+# ---------------------------------------------------------------------- #
+#  Apply                                                                  #
+# ---------------------------------------------------------------------- #
+
+def apply_patch(template: Template, patch: TemplatePatch, reverse: bool = False) -> Template:
+    """Apply a patch to a template in place.
+
+    Args:
+        template: Template to modify.
+        patch: Patch to apply.
+        reverse: If True, undo the patch instead of applying it.
+
+    Returns:
+        The modified template (same object).
+
+    Raises:
+        TemplatePatchError: If the template does not match the patch's
+            base state. The template may be partially modified.
+    """
+    ops = patch.inverted().ops if reverse else patch.ops
+    indexes: Dict[str, Dict[str, Component]] = {}
+
+    for op in ops:
+        kind = op.get("op")
+        if kind == "set":
+            _apply_set(template, op)
+        elif kind == "text":
+            _apply_text(template, op)
+        elif kind in ("node", "style", "attr"):
+            node = _lookup(template, indexes, op["side"], op["id"])
+            _apply_property(node, op)
+        elif kind == "insert":
+            _apply_insert(template, indexes, op)
+        elif kind == "delete":
+            _apply_delete(template, indexes, op)
+        elif kind == "move":
+            _apply_move(template, indexes, op)
+        else:
+            raise TemplatePatchError(f"Unknown patch operation: {kind}", details={"op": kind})
+
+    return template
+
+
+def _conflict(message: str, op: Dict[str, Any]) -> TemplatePatchError:
+    """Build a conflict error for an operation."""
+    details = {k: op[k] for k in ("op", "side", "id", "path", "key") if k in op}
+    return TemplatePatchError(f"Patch conflict: {message}", details=details)
+
+
+def _apply_set(template: Template, op: Dict[str, Any]) -> None:
+    key = op["path"]
+    attr = _TEMPLATE_FIELDS.get(key)
+    if attr is None:
+        raise _conflict(f"unknown template field '{key}'", op)
+    if _template_value(template, key, attr) != op["old"]:
+        raise _conflict(f"'{key}' does not match base value", op)
+    value = op["new"]
+    if key in _DATETIME_FIELDS:
+        value = datetime.fromisoformat(value)
+    setattr(template, attr, value)
+
+
+def _apply_text(template: Template, op: Dict[str, Any]) -> None:
+    path = op["path"]
+    if path == "css":
+        owner, attr = template, "css"
+    else:
+        side_name, _, attr = path.partition(".")
+        if side_name not in SIDES or attr != "html":
+            raise _conflict(f"unknown text path '{path}'", op)
+        owner = getattr(template, side_name)
+
+    text = getattr(owner, attr)
+    for position, old, new in op["edits"]:
+        if text[position:position + len(old)] != old:
+            raise _conflict(f"'{path}' does not match base text at {position}", op)
+        text = text[:position] + new + text[position + len(old):]
+    setattr(owner, attr, text)
+
+
+def _side_index(template: Template, indexes: Dict[str, Dict[str, Component]],
+                side: str) -> Dict[str, Component]:
+    """Get (building on first use) the id index for one side."""
+    index = indexes.get(side)
+    if index is None:
+        if side not in SIDES:
+            raise TemplatePatchError(f"Unknown template side: {side}", details={"side": side})
+        index = {}
+        stack = list(getattr(template, side).components)
+        while stack:
+            node = stack.pop()
+            index[node.id] = node
+            stack.extend(node.children)
+        indexes[side] = index
+    return index
+
+
+def _lookup(template: Template, indexes: Dict[str, Dict[str, Component]],
+            side: str, node_id: str) -> Component:
+    node = _side_index(template, indexes, side).get(node_id)
+    if node is None:
+        raise TemplatePatchError(
+            f"Patch conflict: component not found: {node_id}",
+            details={"side": side, "id": node_id},
+        )
+    return node
+
+
+def _children_of(template: Template, indexes: Dict[str, Dict[str, Component]],
+                 side: str, parent_id: Optional[str]) -> List[Component]:
+    if parent_id is None:
+        _side_index(template, indexes, side)
+        return getattr(template, side).components
+    return _lookup(template, indexes, side, parent_id).children
+
+
+def _apply_property(node: Component, op: Dict[str, Any]) -> None:
+    kind = op["op"]
+    key = op["key"]
+
+    if kind == "node":
+        attr = _NODE_FIELDS.get(key)
+        if attr is None:
+            raise _conflict(f"unknown component property '{key}'", op)
+        current = node.type.value if key == "type" else getattr(node, attr)
+        if current != op["old"]:
+            raise _conflict(f"'{key}' does not match base value", op)
+        value = ComponentType(op["new"]) if key == "type" else op["new"]
+        setattr(node, attr, value)
+
+    elif kind == "style":
+        style = node.style.to_dict()
+        if style.get(key) != op["old"]:
+            raise _conflict(f"style '{key}' does not match base value", op)
+        if op["new"] is None:
+            style.pop(key, None)
+        else:
+            style[key] = op["new"]
+        node.style = ComponentStyle.from_dict(style)
+
+    else:
+        if ("old" in op) != (key in node.attributes) or (
+                "old" in op and node.attributes[key] != op["old"]):
+            raise _conflict(f"attribute '{key}' does not match base value", op)
+        if "new" in op:
+            node.attributes[key] = deepcopy(op["new"])
+        else:
+            del node.attributes[key]
+
+
+def _apply_insert(template: Template, indexes: Dict[str, Dict[str, Component]],
+                  op: Dict[str, Any]) -> None:
+    side = op["side"]
+    siblings = _children_of(template, indexes, side, op["parent"])
+    index = op["index"]
+    if not 0 <= index <= len(siblings):
+        raise _conflict(f"insert index {index} out of range", op)
+
+    node = Component.from_dict(deepcopy(op["node"]))
+    side_index = indexes[side]
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if current.id in side_index:
+            raise _conflict(f"component already exists: {current.id}", op)
+        side_index[current.id] = current
+        stack.extend(current.children)
+    siblings.insert(index, node)
+
+
+def _apply_delete(template: Template, indexes: Dict[str, Dict[str, Component]],
+                  op: Dict[str, Any]) -> None:
+    side = op["side"]
+    siblings = _children_of(template, indexes, side, op["parent"])
+    index = op["index"]
+    node_id = op["node"].get("id")
+    if not 0 <= index < len(siblings) or siblings[index].id != node_id:
+        raise _conflict(f"component {node_id} not found at index {index}", op)
+
+    node = siblings.pop(index)
+    side_index = indexes[side]
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        side_index.pop(current.id, None)
+        stack.extend(current.children)
+
+
+def _apply_move(template: Template, indexes: Dict[str, Dict[str, Component]],
+                op: Dict[str, Any]) -> None:
+    side = op["side"]
+    source_parent, from_index = op["from"]
+    target_parent, to_index = op["to"]
+
+    source = _children_of(template, indexes, side, source_parent)
+    if not 0 <= from_index < len(source) or source[from_index].id != op["id"]:
+        raise _conflict(f"component {op['id']} not found at index {from_index}", op)
+    node = source.pop(from_index)
+
+    target = _children_of(template, indexes, side, target_parent)
+    if not 0 <= to_index <= len(target):
+        source.insert(from_index, node)
+        raise _conflict(f"move index {to_index} out of range", op)
+    target.insert(to_index, node)
+
+
+def _invert_op(op: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the operation that undoes ``op``."""
+    kind = op["op"]
+    inverse = dict(op)
+
+    if kind in ("set", "node", "style"):
+        inverse["old"], inverse["new"] = op["new"], op["old"]
+    elif kind == "attr":
+        inverse.pop("old", None)
+        inverse.pop("new", None)
+        if "new" in op:
+            inverse["old"] = op["new"]
+        if "old" in op:
+            inverse["new"] = op["old"]
+    elif kind == "text":
+        inverse["edits"] = [[pos, new, old] for pos, old, new in reversed(op["edits"])]
+    elif kind == "insert":
+        inverse["op"] = "delete"
+    elif kind == "delete":
+        inverse["op"] = "insert"
+    elif kind == "move":
+        inverse["from"], inverse["to"] = op["to"], op["from"]
+    else:
+        raise TemplatePatchError(f"Unknown patch operation: {kind}", details={"op": kind})
+
+    return inverse
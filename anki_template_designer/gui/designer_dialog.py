@@ -315,6 +315,7 @@ class DesignerDialog(QDialog):
             event: Close event object.
         """
         logger.debug("DesignerDialog closing")
+        
         # Clean up WebView
         if self._webview is not None:
             self._webview.setUrl(QUrl("about:blank"))
@@ -412,7 +413,9 @@ class DesignerDialog(QDialog):
     # ------------------------------------------------------------------ #
 
     def _on_save_template(self, payload: dict) -> dict:
-        """Save the front/back HTML + CSS back to Anki, creating a backup first.
+        """Save the front/back HTML + CSS back to Anki, backing up the old version first.
+
+        Nothing is saved or backed up if the content is unchanged.
 
         Expected payload keys from JS:
             noteTypeId  – int (the Anki model id)
@@ -433,28 +436,21 @@ class DesignerDialog(QDialog):
             back_html = payload.get("backHtml", "")
             css = payload.get("css", "")
 
-            # Fetch current state for backup
-            nt = svc.get_note_type(note_type_id)
-            if nt is None:
-                return {"success": False, "error": f"Note type {note_type_id} not found"}
-
-            if ordinal >= len(nt.templates):
-                return {"success": False, "error": f"Template ordinal {ordinal} out of range"}
-
-            old_tmpl = nt.templates[ordinal]
-            self._backup_template(
-                nt.name, old_tmpl.name, ordinal,
-                old_tmpl.front, old_tmpl.back, nt.css,
+            def backup(model: dict) -> None:
+                # Only reached when something changed, so no-op saves leave no backup
+                tmpl = model["tmpls"][ordinal]
+                self._backup_template(
+                    model.get("name", ""), tmpl.get("name", ""), ordinal,
+                    tmpl.get("qfmt", ""), tmpl.get("afmt", ""), model.get("css", ""),
+                )
+
+            # Write only what changed to Anki, in a single model save
+            result = svc.apply_changes(
+                note_type_id, {ordinal: (front_html, back_html)}, css, before_save=backup
             )
-
-            # Write new values to Anki
-            ok_tmpl = svc.update_template(note_type_id, ordinal, front=front_html, back=back_html)
-            ok_css = svc.update_css(note_type_id, css)
-
-            if ok_tmpl and ok_css:
-                return {"success": True}
-            else:
-                return {"success": False, "error": "Anki save returned False"}
+            if result.success:
+                return {"success": True, "saved": result.saved, "timings": result.to_dict()["timings"]}
+            return {"success": False, "error": result.error, "details": result.details}
 
         except Exception as e:
             logger.error(f"Save template failed: {e}", exc_info=True)
@@ -510,15 +506,14 @@ class DesignerDialog(QDialog):
             return {"templates": []}
 
         try:
-            note_types = svc.get_all_note_types()
             templates = []
-            for nt in note_types:
-                for tmpl in nt.templates:
+            for summary in svc.get_note_type_summaries():
+                for ordinal, tmpl_name in enumerate(summary.template_names or []):
                     templates.append({
-                        "id": f"{nt.id}:{tmpl.ordinal}",
-                        "name": f"{nt.name} > {tmpl.name}",
-                        "noteTypeId": nt.id,
-                        "ordinal": tmpl.ordinal,
+                        "id": f"{summary.id}:{ordinal}",
+                        "name": f"{summary.name} > {tmpl_name}",
+                        "noteTypeId": summary.id,
+                        "ordinal": ordinal,
                     })
             return {"templates": templates}
         except Exception as e:
@@ -532,12 +527,13 @@ class DesignerDialog(QDialog):
             return {"templateId": None}
 
         try:
-            note_types = svc.get_all_note_types()
-            if not note_types:
+            summaries = svc.get_note_type_summaries(include_templates=False)
+            if not summaries:
                 return {"templateId": None}
 
-            nt = note_types[0]
-            if not nt.templates:
+            # Only the note type being opened is loaded in full
+            nt = svc.get_note_type(summaries[0].id)
+            if nt is None or not nt.templates:
                 return {"templateId": None}
 
             tmpl = nt.templates[0]
@@ -808,6 +808,38 @@ class WebViewBridge(QObject):
                 "error": str(e)
             })
     
+    @pyqtSlot(bool, result=str)
+    def getNoteTypeSummaries(self, include_templates: bool) -> str:
+        """Get the names and IDs of all note types without loading them.
+        
+        Args:
+            include_templates: Whether to include card template names.
+            
+        Returns:
+            JSON-encoded list of note type summaries.
+        """
+        from ..services.note_type_service import get_note_type_service
+        
+        service = get_note_type_service()
+        if service is None:
+            return json.dumps({
+                "success": False,
+                "error": "Note type service not initialized"
+            })
+        
+        try:
+            summaries = service.get_note_type_summaries(include_templates)
+            return json.dumps({
+                "success": True,
+                "noteTypes": [s.to_dict() for s in summaries]
+            })
+        except Exception as e:
+            logger.error(f"Error listing note types: {e}")
+            return json.dumps({
+                "success": False,
+                "error": str(e)
+            })
+    
     @pyqtSlot(str, result=str)
     def getNoteType(self, note_type_id_str: str) -> str:
         """Get a specific note type by ID.
@@ -960,6 +992,79 @@ class WebViewBridge(QObject):
                 "error": str(e)
             })
     
+    @pyqtSlot(str, bool, result=str)
+    def optimizeCss(self, stylesheets_json: str, minify: bool) -> str:
+        """Merge stylesheets into one without duplicate rules.
+        
+        Args:
+            stylesheets_json: JSON-encoded list of stylesheets in cascade
+                order, e.g. the note type CSS followed by the editor CSS.
+            minify: Whether to minify the result.
+            
+        Returns:
+            JSON-encoded merged CSS.
+        """
+        from ..services.note_type_service import get_note_type_service
+        
+        service = get_note_type_service()
+        if service is None:
+            return json.dumps({
+                "success": False,
+                "error": "Note type service not initialized"
+            })
+        
+        try:
+            stylesheets = json.loads(stylesheets_json) if stylesheets_json else []
+            return json.dumps({
+                "success": True,
+                "css": service.optimize_css(*stylesheets, minify=minify)
+            })
+        except Exception as e:
+            logger.error(f"Error optimizing CSS: {e}")
+            return json.dumps({
+                "success": False,
+                "error": str(e)
+            })
+    
+    @pyqtSlot(str, result=str)
+    def getFieldReferences(self, note_type_id_str: str) -> str:
+        """Get which fields each card template of a note type references.
+        
+        Args:
+            note_type_id_str: The note type ID as string (to support 64-bit IDs).
+            
+        Returns:
+            JSON-encoded reference map with per-side references, field
+            usages and unused fields.
+        """
+        from ..services.note_type_service import get_note_type_service
+        
+        service = get_note_type_service()
+        if service is None:
+            return json.dumps({
+                "success": False,
+                "error": "Note type service not initialized"
+            })
+        
+        try:
+            note_type_id = int(note_type_id_str)
+            references = service.get_field_reference_map(note_type_id)
+            if references is None:
+                return json.dumps({
+                    "success": False,
+                    "error": f"Note type {note_type_id} not found"
+                })
+            return json.dumps({
+                "success": True,
+                "references": references
+            })
+        except Exception as e:
+            logger.error(f"Error getting field references for {note_type_id_str}: {e}")
+            return json.dumps({
+                "success": False,
+                "error": str(e)
+            })
+    
     @pyqtSlot(str, int, str, str, result=str)
     def updateTemplate(self, note_type_id_str: str, template_ordinal: int, 
                        front: str, back: str) -> str:
@@ -1055,8 +1160,10 @@ class WebViewBridge(QObject):
             field_data_json: JSON-encoded field data dict.
             
         Returns:
-            JSON-encoded preview with front, back, and CSS.
+            JSON-encoded preview with front, back, CSS and media used.
+            Very large images are replaced by placeholders.
         """
+        from ..services.media_cache import PREVIEW_PLACEHOLDER_BYTES
         from ..services.note_type_service import get_note_type_service
         
         service = get_note_type_service()
@@ -1069,7 +1176,10 @@ class WebViewBridge(QObject):
         try:
             note_type_id = int(note_type_id_str)
             field_data = json.loads(field_data_json) if field_data_json else None
-            preview = service.render_preview(note_type_id, template_ordinal, field_data)
+            preview = service.render_preview(
+                note_type_id, template_ordinal, field_data,
+                placeholder_over=PREVIEW_PLACEHOLDER_BYTES
+            )
             
             if preview is None:
                 return json.dumps({
@@ -1088,6 +1198,51 @@ class WebViewBridge(QObject):
                 "error": str(e)
             })
     
+    @pyqtSlot(str, str, str, result=str)
+    def renderPreviews(self, note_type_id_str: str, ordinals_json: str,
+                       notes_json: str) -> str:
+        """Render many cards of a note type in one call.
+        
+        Args:
+            note_type_id_str: The note type ID as string (to support 64-bit IDs).
+            ordinals_json: JSON list of card ordinals, or empty for all cards.
+            notes_json: JSON list of field data dicts, or empty for sample data.
+            
+        Returns:
+            JSON-encoded envelope with the shared CSS and rendered cards.
+        """
+        from ..services.note_type_service import get_note_type_service
+        
+        service = get_note_type_service()
+        if service is None:
+            return json.dumps({
+                "success": False,
+                "error": "Note type service not initialized"
+            })
+        
+        try:
+            note_type_id = int(note_type_id_str)
+            ordinals = json.loads(ordinals_json) if ordinals_json else None
+            notes = json.loads(notes_json) if notes_json else None
+            previews = service.render_previews(note_type_id, ordinals, notes)
+            
+            if previews is None:
+                return json.dumps({
+                    "success": False,
+                    "error": f"Note type {note_type_id} not found"
+                })
+            
+            return json.dumps({
+                "success": True,
+                "previews": previews
+            })
+        except Exception as e:
+            logger.error(f"Error rendering previews: {e}")
+            return json.dumps({
+                "success": False,
+                "error": str(e)
+            })
+    
     @pyqtSlot(str, result=str)
     def getSampleData(self, note_type_id_str: str) -> str:
         """Get sample field data for a note type.
@@ -1128,6 +1283,40 @@ class WebViewBridge(QObject):
                 "error": str(e)
             })
     
+    @pyqtSlot(str, int, result=str)
+    def search(self, query: str, limit: int) -> str:
+        """Search templates and note types.
+        
+        Args:
+            query: Search query, e.g. "{{Front}} .card" or "name:basic*".
+            limit: Maximum number of hits (0 for no limit).
+        
+        Returns:
+            JSON-encoded hits, best first.
+        """
+        from ..services.note_type_service import get_note_type_service
+        
+        try:
+            max_hits = limit if limit > 0 else None
+            hits = []
+            if self._template_service is not None:
+                hits.extend(self._template_service.search_templates(query, limit=max_hits))
+            note_type_service = get_note_type_service()
+            if note_type_service is not None:
+                hits.extend(note_type_service.search_note_types(query, limit=max_hits))
+            
+            hits.sort(key=lambda hit: (-hit["score"], hit["title"]))
+            return json.dumps({
+                "success": True,
+                "results": hits[:max_hits]
+            })
+        except Exception as e:
+            logger.error(f"Error searching: {e}")
+            return json.dumps({
+                "success": False,
+                "error": str(e)
+            })
+    
     # ===== Selection Methods (Plan 12) =====
     
     @pyqtSlot(result=str)
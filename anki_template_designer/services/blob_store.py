@@ -0,0 +1,320 @@
+"""Content-addressed blob store.
+
+Blobs are immutable byte strings stored once under their SHA-256
+digest, in a two-level directory (``ab/abcdef...``). Reference counts
+track how many stored templates use each blob; they are kept in a
+snapshot file plus an append-only journal, so recording a reference
+costs one small append rather than rewriting every count.
+
+Counts are used for statistics. Garbage collection never trusts them:
+the owner rebuilds them from the stored templates (mark and sweep)
+before deleting anything, so counts lost in a crash cannot cause live
+blobs to be removed.
+"""
+
+import hashlib
+import json
+import os
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from ..core.exceptions import StorageReadError
+
+logger = logging.getLogger("anki_template_designer.services.blob_store")
+
+_HEX = frozenset("0123456789abcdef")
+
+
+@dataclass
+class BlobStats:
+    """Blob store statistics.
+
+    Attributes:
+        blobs: Number of distinct blobs stored.
+        stored_bytes: Bytes of blob data on disk.
+        referenced_bytes: Bytes the references would take if every
+            reference had its own copy.
+        references: Total number of references.
+    """
+    blobs: int = 0
+    stored_bytes: int = 0
+    referenced_bytes: int = 0
+    references: int = 0
+
+    @property
+    def saved_bytes(self) -> int:
+        """Get the bytes saved by sharing blobs."""
+        return max(0, self.referenced_bytes - self.stored_bytes)
+
+    @property
+    def dedup_ratio(self) -> float:
+        """Get referenced bytes per stored byte (1.0 means no sharing)."""
+        return self.referenced_bytes / self.stored_bytes if self.stored_bytes else 1.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary."""
+        return {
+            "blobs": self.blobs,
+            "storedBytes": self.stored_bytes,
+            "referencedBytes": self.referenced_bytes,
+            "references": self.references,
+            "savedBytes": self.saved_bytes,
+            "dedupRatio": round(self.dedup_ratio, 3),
+        }
+
+
+def digest_of(payload: bytes) -> str:
+    """Get the content address of a payload."""
+    return hashlib.sha256(payload).hexdigest()
+
+
+class BlobStore:
+    """Immutable blobs addressed by their SHA-256 digest.
+
+    Example:
+        store = BlobStore(os.path.join(addon_dir, "blobs"))
+        digest = store.put(b".card { color: red; }")
+        store.incref([digest])
+        assert store.get(digest) == b".card { color: red; }"
+    """
+
+    REFS_FILE = "refs.json"
+    JOURNAL_FILE = "refs.log"
+
+    def __init__(self, root: str, compact_after: int = 10000) -> None:
+        """Initialize the store.
+
+        Args:
+            root: Blob directory. Created if missing.
+            compact_after: Journal entries after which counts are
+                rewritten as a snapshot.
+        """
+        self._root = root
+        self._compact_after = compact_after
+        self._lock = threading.RLock()
+        # digest -> [reference count, blob size]
+        self._refs: Dict[str, List[int]] = {}
+        self._journal_entries = 0
+        self._counts_loaded = True
+        os.makedirs(root, exist_ok=True)
+        self._load_refs()
+
+    @property
+    def location(self) -> str:
+        """Get the blob directory."""
+        return self._root
+
+    @property
+    def counts_loaded(self) -> bool:
+        """Whether reference counts were loaded intact.
+
+        False if the count files were missing or unreadable while blobs
+        exist; the owner should rebuild them.
+        """
+        return self._counts_loaded
+
+    def path_for(self, digest: str) -> str:
+        """Get the file path of a blob."""
+        if len(digest) != 64 or not all(c in _HEX for c in digest):
+            raise StorageReadError(f"Invalid blob digest: {digest!r}")
+        return os.path.join(self._root, digest[:2], digest[2:])
+
+    def put(self, payload: bytes) -> str:
+        """Store a blob if it is not already stored.
+
+        Args:
+            payload: Blob content.
+
+        Returns:
+            The blob's digest.
+        """
+        digest = digest_of(payload)
+        path = self.path_for(digest)
+        with self._lock:
+            if os.path.exists(path):
+                return digest
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.tmp"
+            try:
+                with open(temp_path, "wb") as f:
+                    f.write(payload)
+                os.replace(temp_path, path)
+            except (IOError, OSError):
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        """Read a blob.
+
+        Args:
+            digest: The blob's digest.
+
+        Returns:
+            Blob content.
+
+        Raises:
+            StorageReadError: If the blob is missing or corrupt.
+        """
+        path = self.path_for(digest)
+        try:
+            with open(path, "rb") as f:
+                payload = f.read()
+        except FileNotFoundError:
+            raise StorageReadError(f"Missing blob {digest}", path=path)
+        if digest_of(payload) != digest:
+            raise StorageReadError(f"Corrupt blob {digest}", path=path)
+        return payload
+
+    def has(self, digest: str) -> bool:
+        """Check whether a blob is stored."""
+        return os.path.exists(self.path_for(digest))
+
+    def refcount(self, digest: str) -> int:
+        """Get the number of recorded references to a blob."""
+        with self._lock:
+            entry = self._refs.get(digest)
+            return entry[0] if entry else 0
+
+    def incref(self, digests: Iterable[str]) -> None:
+        """Record one reference per digest (repeat a digest for several)."""
+        self._adjust(digests, 1)
+
+    def decref(self, digests: Iterable[str]) -> None:
+        """Drop one reference per digest."""
+        self._adjust(digests, -1)
+
+    def set_refcounts(self, counts: Dict[str, int]) -> None:
+        """Replace all reference counts, e.g. after a mark phase.
+
+        Args:
+            counts: Reference count per live digest.
+        """
+        with self._lock:
+            refs = {}
+            for digest, count in counts.items():
+                size = self._refs.get(digest, [0, -1])[1]
+                if size < 0:
+                    size = self._size_on_disk(digest)
+                refs[digest] = [count, size]
+            self._refs = refs
+            self._counts_loaded = True
+            self.save()
+
+    def sweep(self, live: Set[str]) -> int:
+        """Delete every blob not in the live set.
+
+        Args:
+            live: Digests still referenced.
+
+        Returns:
+            Number of blobs deleted.
+        """
+        removed = 0
+        with self._lock:
+            for digest in self._stored_digests():
+                if digest in live:
+                    continue
+                try:
+                    os.remove(self.path_for(digest))
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"Could not remove blob {digest}: {e}")
+                self._refs.pop(digest, None)
+        if removed:
+            logger.info(f"Removed {removed} unreferenced blobs")
+        return removed
+
+    def get_stats(self) -> BlobStats:
+        """Get statistics from the recorded reference counts."""
+        with self._lock:
+            stats = BlobStats()
+            for count, size in self._refs.values():
+                if count <= 0:
+                    continue
+                stats.blobs += 1
+                stats.stored_bytes += size
+                stats.referenced_bytes += size * count
+                stats.references += count
+            return stats
+
+    def save(self) -> None:
+        """Write the counts as a snapshot and empty the journal."""
+        with self._lock:
+            snapshot = os.path.join(self._root, self.REFS_FILE)
+            temp_path = f"{snapshot}.tmp"
+            live = {d: entry for d, entry in self._refs.items() if entry[0] > 0}
+            try:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump({"version": 1, "refs": live}, f, separators=(",", ":"))
+                os.replace(temp_path, snapshot)
+                with open(os.path.join(self._root, self.JOURNAL_FILE), "w", encoding="utf-8"):
+                    pass
+                self._journal_entries = 0
+            except (IOError, OSError) as e:
+                logger.error(f"Failed to save blob reference counts: {e}")
+
+    def _adjust(self, digests: Iterable[str], delta: int) -> None:
+        lines = []
+        with self._lock:
+            for digest in digests:
+                entry = self._refs.get(digest)
+                if entry is None:
+                    entry = self._refs[digest] = [0, self._size_on_disk(digest)]
+                entry[0] += delta
+                lines.append(f"{'+' if delta > 0 else '-'}{digest} {entry[1]}\n")
+            if not lines:
+                return
+            try:
+                with open(os.path.join(self._root, self.JOURNAL_FILE), "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+            except (IOError, OSError) as e:
+                logger.warning(f"Failed to journal blob references: {e}")
+            self._journal_entries += len(lines)
+            if self._journal_entries >= self._compact_after:
+                self.save()
+
+    def _load_refs(self) -> None:
+        snapshot = os.path.join(self._root, self.REFS_FILE)
+        journal = os.path.join(self._root, self.JOURNAL_FILE)
+        try:
+            if os.path.exists(snapshot):
+                with open(snapshot, "r", encoding="utf-8") as f:
+                    self._refs = {d: list(entry) for d, entry in json.load(f)["refs"].items()}
+            elif self._stored_digests():
+                self._counts_loaded = False
+
+            if os.path.exists(journal):
+                with open(journal, "r", encoding="utf-8") as f:
+                    for line in f:
+                        digest, _, size = line[1:].strip().partition(" ")
+                        if not size:
+                            continue  # torn final line
+                        entry = self._refs.setdefault(digest, [0, int(size)])
+                        entry[0] += 1 if line[0] == "+" else -1
+                        self._journal_entries += 1
+        except (IOError, OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Blob reference counts unreadable, rebuild needed: {e}")
+            self._refs = {}
+            self._counts_loaded = False
+
+    def _size_on_disk(self, digest: str) -> int:
+        try:
+            return os.path.getsize(self.path_for(digest))
+        except OSError:
+            return 0
+
+    def _stored_digests(self) -> List[str]:
+        digests = []
+        for prefix in os.listdir(self._root):
+            directory = os.path.join(self._root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                digest = prefix + name
+                if len(digest) == 64 and all(c in _HEX for c in digest):
+                    digests.append(digest)
+        return digests
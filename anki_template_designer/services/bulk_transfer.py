@@ -0,0 +1,310 @@
+"""Helpers for bulk template import and export.
+
+Template packs are directories, zip archives or single files containing
+``.json`` or ``.atdb`` templates. Sources are read on the calling
+thread as they are consumed; decoding and validation (building a
+``Template`` from each payload) run in chunks, inline by default or in
+a thread pool with a bounded number of chunks in flight, so a large
+pack is never held in memory at once. Each item yields either
+validated data or an error message, so one bad file or archive member
+never aborts the batch.
+
+A process pool is available as an explicit option for use outside
+Anki, such as scripts and tests. Inside Anki ``sys.executable`` is the
+Anki binary, so starting worker processes could launch Anki itself.
+Worker functions are module-level so they can be pickled; where a
+process pool cannot be started, parsing falls back to the calling
+thread.
+"""
+
+import json
+import os
+import logging
+import zipfile
+import zlib
+from concurrent.futures import (
+    FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from itertools import chain, islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from ..core import binary_format
+from ..core.models import Template
+
+logger = logging.getLogger("anki_template_designer.services.bulk_transfer")
+
+TEMPLATE_EXTENSIONS = (".json", ".atdb")
+
+# (source name, raw bytes)
+RawItem = Tuple[str, bytes]
+# (source name, validated template data or None, error message or None)
+ParsedItem = Tuple[str, Optional[Dict[str, Any]], Optional[str]]
+
+# Errors raised by corrupt or unsupported zip archives and members
+ARCHIVE_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, IOError, OSError,
+                  RuntimeError, NotImplementedError)
+
+
+@dataclass
+class BulkItemError:
+    """A template that could not be imported or exported.
+
+    Attributes:
+        source: File, archive member or template id.
+        error: Human-readable reason.
+    """
+    source: str
+    error: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary."""
+        return {"source": self.source, "error": self.error}
+
+
+@dataclass
+class BulkResult:
+    """Outcome of a bulk import or export.
+
+    Attributes:
+        succeeded: Ids of templates imported or exported.
+        errors: Items that failed.
+        duration_ms: Wall-clock time of the operation.
+    """
+    succeeded: List[str] = field(default_factory=list)
+    errors: List[BulkItemError] = field(default_factory=list)
+    duration_ms: float = 0.0
+
+    @property
+    def total(self) -> int:
+        """Get the number of items processed."""
+        return len(self.succeeded) + len(self.errors)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary."""
+        return {
+            "succeeded": list(self.succeeded),
+            "errors": [e.to_dict() for e in self.errors],
+            "total": self.total,
+            "durationMs": round(self.duration_ms, 2),
+        }
+
+
+def iter_sources(sources: Union[str, Sequence[str]]) -> Iterator[RawItem]:
+    """Read template payloads from files, directories and zip archives.
+
+    Payloads are read one at a time as the iterator is consumed.
+    Unreadable sources, including corrupt archives and archive members
+    that fail to decompress, are yielded with empty content so they are
+    reported as per-item errors.
+
+    Args:
+        sources: One path or a list of paths.
+
+    Yields:
+        (source name, raw bytes) for each template found.
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+
+    for source in sources:
+        if os.path.isdir(source):
+            for name in sorted(os.listdir(source)):
+                if name.endswith(TEMPLATE_EXTENSIONS):
+                    yield _read_file(os.path.join(source, name))
+        elif zipfile.is_zipfile(source):
+            yield from _read_archive(source)
+        else:
+            yield _read_file(source)
+
+
+def count_sources(sources: Union[str, Sequence[str]]) -> int:
+    """Count the payloads ``iter_sources`` yields, without reading them.
+
+    Args:
+        sources: One path or a list of paths.
+
+    Returns:
+        Number of items.
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+
+    total = 0
+    for source in sources:
+        if os.path.isdir(source):
+            total += sum(1 for name in os.listdir(source) if name.endswith(TEMPLATE_EXTENSIONS))
+        elif zipfile.is_zipfile(source):
+            try:
+                with zipfile.ZipFile(source) as archive:
+                    total += sum(1 for info in archive.infolist() if _is_template_member(info))
+            except ARCHIVE_ERRORS:
+                total += 1
+        else:
+            total += 1
+    return total
+
+
+def _is_template_member(info: zipfile.ZipInfo) -> bool:
+    return not info.is_dir() and info.filename.endswith(TEMPLATE_EXTENSIONS)
+
+
+def _read_archive(path: str) -> Iterator[RawItem]:
+    try:
+        archive = zipfile.ZipFile(path)
+    except ARCHIVE_ERRORS as e:
+        logger.warning(f"Cannot open template archive {path}: {e}")
+        yield path, b""
+        return
+
+    with archive:
+        for info in archive.infolist():
+            if not _is_template_member(info):
+                continue
+            name = f"{path}:{info.filename}"
+            try:
+                raw = archive.read(info)
+            except ARCHIVE_ERRORS as e:
+                logger.warning(f"Cannot read template source {name}: {e}")
+                raw = b""
+            yield name, raw
+
+
+def _read_file(path: str) -> RawItem:
+    try:
+        with open(path, "rb") as f:
+            return path, f.read()
+    except (IOError, OSError) as e:
+        logger.warning(f"Cannot read template source {path}: {e}")
+        return path, b""
+
+
+def parse_template(raw: bytes) -> Dict[str, Any]:
+    """Decode and validate one template payload.
+
+    Args:
+        raw: JSON or binary-format template.
+
+    Returns:
+        Normalized template data (``Template.to_dict()``).
+
+    Raises:
+        ValueError, KeyError, TypeError or a ``TemplateDesignerError``
+        if the payload is not a valid template.
+    """
+    if not raw:
+        raise ValueError("empty or unreadable file")
+    if binary_format.is_binary(raw):
+        data = binary_format.decode(raw)
+    else:
+        data = json.loads(raw.decode("utf-8"))
+    if not isinstance(data, dict):
+        raise ValueError("template must be a JSON object")
+    template_id = data.get("id")
+    if not isinstance(template_id, str) or not template_id:
+        raise ValueError("template has no id")
+    if not all(c.isalnum() or c in "-_" for c in template_id):
+        raise ValueError(f"invalid template id: {template_id!r}")
+    return Template.from_dict(data).to_dict()
+
+
+def _parse_chunk(chunk: List[RawItem]) -> List[ParsedItem]:
+    """Parse a chunk of payloads. May run in a worker process."""
+    results: List[ParsedItem] = []
+    for name, raw in chunk:
+        try:
+            results.append((name, parse_template(raw), None))
+        except Exception as e:  # any malformed input must become a per-item error
+            results.append((name, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+def _chunks(items: Iterable[RawItem], size: int) -> Iterator[List[RawItem]]:
+    chunk: List[RawItem] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_parallel(
+    items: Iterable[RawItem],
+    workers: Optional[int] = 0,
+    chunk_size: int = 100,
+    min_parallel: int = 200,
+    processes: bool = False
+) -> Iterator[List[ParsedItem]]:
+    """Parse payloads, yielding chunks as they finish.
+
+    Items are consumed lazily. In a pool, at most two chunks per worker
+    are in flight, so memory stays bounded for any number of items.
+    Chunks are yielded in completion order, not input order.
+
+    Args:
+        items: Payloads to parse.
+        workers: Pool workers. 0 parses on the calling thread; None
+            uses the executor's default.
+        chunk_size: Payloads per task.
+        min_parallel: Below this many payloads, parse inline since
+            starting a pool costs more than it saves.
+        processes: Use a process pool instead of threads. Only for use
+            outside Anki (scripts, tests).
+
+    Yields:
+        Lists of parsed items.
+    """
+    items = iter(items)
+    head = list(islice(items, min_parallel))
+    chunks = _chunks(chain(head, items), chunk_size)
+    if workers == 0 or len(head) < min_parallel:
+        for chunk in chunks:
+            yield _parse_chunk(chunk)
+        return
+
+    in_flight: Dict[Future, List[RawItem]] = {}
+    max_in_flight = 2 * (workers or os.cpu_count() or 1)
+    try:
+        executor: Executor = (ProcessPoolExecutor if processes else ThreadPoolExecutor)(max_workers=workers)
+        with executor as pool:
+            for chunk in chunks:
+                in_flight[pool.submit(_parse_chunk, chunk)] = chunk
+                if len(in_flight) >= max_in_flight:
+                    yield from _collect(in_flight)
+            while in_flight:
+                yield from _collect(in_flight)
+    except (BrokenProcessPool, OSError, RuntimeError) as e:
+        logger.warning(f"Process pool unavailable, parsing inline: {e}")
+        for chunk in chain(list(in_flight.values()), chunks):
+            yield _parse_chunk(chunk)
+
+
+def _collect(in_flight: Dict[Future, List[RawItem]]) -> Iterator[List[ParsedItem]]:
+    """Wait for chunks to finish and yield their results, removing them from ``in_flight``."""
+    done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+    for future in done:
+        result = future.result()
+        del in_flight[future]
+        yield result
+
+
+def write_archive(archive_path: str, entries: Iterable[Tuple[str, bytes]]) -> None:
+    """Write (member name, payload) entries to a zip archive atomically.
+
+    Args:
+        archive_path: Destination ``.zip`` path.
+        entries: Member names and contents.
+    """
+    temp_path = f"{archive_path}.tmp"
+    try:
+        with zipfile.ZipFile(temp_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for name, payload in entries:
+                archive.writestr(name, payload)
+        os.replace(temp_path, archive_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,198 @@
+"""Index of the fields each Anki card template references.
+
+Every side of every card template, keyed ``(note type id, ordinal,
+side)``, maps to the field references it contains: plain and filtered
+fields (``{{Front}}``, ``{{cloze:Text}}``) and conditionals
+(``{{#Extra}}``, ``{{^Extra}}``). A reverse map answers "which template
+sides use this field" without scanning any template text.
+
+Updates are per note type and incremental: a side is only tokenised
+again if its text changed, and sides of removed card templates are
+dropped.
+"""
+
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from ..core.card_renderer import FieldReference, template_references
+
+logger = logging.getLogger("anki_template_designer.services.field_index")
+
+SIDE_FRONT = "front"
+SIDE_BACK = "back"
+
+# (ordinal, side) within a note type
+Side = Tuple[int, str]
+
+
+class FieldIndex:
+    """Field references of card templates, per note type.
+
+    Example:
+        index = FieldIndex()
+        index.update(nt.id, [(t.ordinal, t.front, t.back) for t in nt.templates])
+        index.usages(nt.id, "Back")  # [(0, "back")]
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # note type id -> side -> (source, references)
+        self._sides: Dict[int, Dict[Side, Tuple[str, Tuple[FieldReference, ...]]]] = {}
+        # (note type id, field) -> sides referencing it
+        self._fields: Dict[Tuple[int, str], Set[Side]] = {}
+        self._tokenised = 0
+
+    def update(self, note_type_id: int, templates: Iterable[Tuple[int, str, str]]) -> int:
+        """Index the card templates of a note type.
+
+        Args:
+            note_type_id: The note type ID.
+            templates: (ordinal, front, back) of every card template.
+
+        Returns:
+            Number of template sides tokenised; 0 if nothing changed.
+        """
+        with self._lock:
+            sides = self._sides.setdefault(note_type_id, {})
+            current: Set[Side] = set()
+            changed = 0
+            for ordinal, front, back in templates:
+                for side, source in ((SIDE_FRONT, front), (SIDE_BACK, back)):
+                    key = (ordinal, side)
+                    current.add(key)
+                    entry = sides.get(key)
+                    if entry is not None and entry[0] == source:
+                        continue
+                    if entry is not None:
+                        self._unlink(note_type_id, key, entry[1])
+                    refs = tuple(template_references(source))
+                    sides[key] = (source, refs)
+                    for ref in refs:
+                        self._fields.setdefault((note_type_id, ref.field), set()).add(key)
+                    changed += 1
+
+            for key in set(sides) - current:
+                self._unlink(note_type_id, key, sides.pop(key)[1])
+            self._tokenised += changed
+            return changed
+
+    def remove(self, note_type_id: int) -> None:
+        """Drop a note type from the index.
+
+        Args:
+            note_type_id: The note type ID.
+        """
+        with self._lock:
+            for key, (_, refs) in self._sides.pop(note_type_id, {}).items():
+                self._unlink(note_type_id, key, refs)
+
+    def clear(self) -> None:
+        """Drop everything from the index."""
+        with self._lock:
+            self._sides.clear()
+            self._fields.clear()
+
+    def note_type_ids(self) -> List[int]:
+        """Get the IDs of the indexed note types."""
+        with self._lock:
+            return list(self._sides)
+
+    def references(self, note_type_id: int, ordinal: int, side: str) -> Optional[List[FieldReference]]:
+        """Get the field references of one template side.
+
+        Args:
+            note_type_id: The note type ID.
+            ordinal: Card template ordinal.
+            side: SIDE_FRONT or SIDE_BACK.
+
+        Returns:
+            References in template order, or None if not indexed.
+        """
+        with self._lock:
+            entry = self._sides.get(note_type_id, {}).get((ordinal, side))
+            return list(entry[1]) if entry is not None else None
+
+    def sides(self, note_type_id: int) -> List[Side]:
+        """Get the indexed template sides of a note type, in order.
+
+        Args:
+            note_type_id: The note type ID.
+
+        Returns:
+            Sorted (ordinal, side) pairs.
+        """
+        with self._lock:
+            return sorted(self._sides.get(note_type_id, {}), key=_side_order)
+
+    def usages(self, note_type_id: int, field_name: str) -> List[Side]:
+        """Get the template sides that reference a field.
+
+        Args:
+            note_type_id: The note type ID.
+            field_name: Field name.
+
+        Returns:
+            Sorted (ordinal, side) pairs.
+        """
+        with self._lock:
+            return sorted(self._fields.get((note_type_id, field_name), ()), key=_side_order)
+
+    def referenced_fields(self, note_type_id: int) -> Set[str]:
+        """Get every field name a note type's templates reference.
+
+        Args:
+            note_type_id: The note type ID.
+
+        Returns:
+            Field and special names.
+        """
+        with self._lock:
+            return {
+                ref.field
+                for _, refs in self._sides.get(note_type_id, {}).values()
+                for ref in refs
+            }
+
+    def unused_fields(self, note_type_id: int, field_names: Iterable[str]) -> List[str]:
+        """Get the fields no template of a note type references.
+
+        Args:
+            note_type_id: The note type ID.
+            field_names: The note type's field names.
+
+        Returns:
+            Unreferenced field names, in the given order.
+        """
+        used = self.referenced_fields(note_type_id)
+        return [name for name in field_names if name not in used]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics.
+
+        Returns:
+            Dictionary with note types, template sides and distinct
+            field references indexed, and sides tokenised so far.
+        """
+        with self._lock:
+            return {
+                "noteTypes": len(self._sides),
+                "sides": sum(len(sides) for sides in self._sides.values()),
+                "fields": len(self._fields),
+                "tokenised": self._tokenised
+            }
+
+    def _unlink(self, note_type_id: int, key: Side, refs: Iterable[FieldReference]) -> None:
+        """Remove a side from the reverse map. Caller holds the lock."""
+        for ref in refs:
+            field_key = (note_type_id, ref.field)
+            users = self._fields.get(field_key)
+            if users is None:
+                continue
+            users.discard(key)
+            if not users:
+                del self._fields[field_key]
+
+
+def _side_order(side: Side) -> Tuple[int, int]:
+    return (side[0], 0 if side[1] == SIDE_FRONT else 1)
@@ -0,0 +1,376 @@
+"""Media referenced by card previews.
+
+``extract_media_references`` finds the collection media a rendered card
+uses: ``src`` of ``<img>``, ``<audio>``, ``<video>`` and ``<source>``
+tags, and ``[sound:...]`` tags. Remote and inline (``data:``) URLs are
+not collection media and are skipped.
+
+``MediaCache`` keeps metadata of media files in a bounded LRU: size,
+modification time and, for images, pixel dimensions read from the file
+header. An entry is revalidated with one ``stat`` and the file is only
+read again when its size or mtime changed.
+
+For previews, ``MediaCache.replace_large_images`` swaps images above a
+size limit for a tiny SVG placeholder with the same dimensions, keeping
+the file name in ``data-src``, so notes with large images do not make
+the webview load and decode them on every re-render.
+"""
+
+import html
+import logging
+import os
+import re
+import struct
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote, unquote
+
+logger = logging.getLogger("anki_template_designer.services.media_cache")
+
+KIND_IMAGE = "image"
+KIND_AUDIO = "audio"
+KIND_VIDEO = "video"
+KIND_OTHER = "other"
+
+# Images above this size are replaced by placeholders in previews
+PREVIEW_PLACEHOLDER_BYTES = 2 * 1024 * 1024
+
+_EXTENSION_KINDS = {
+    **dict.fromkeys(("png", "jpg", "jpeg", "gif", "webp", "svg", "bmp", "ico", "avif", "tif", "tiff"), KIND_IMAGE),
+    **dict.fromkeys(("mp3", "ogg", "oga", "opus", "wav", "m4a", "aac", "flac", "spx"), KIND_AUDIO),
+    **dict.fromkeys(("mp4", "webm", "mov", "mkv", "ogv", "avi", "mpg", "mpeg", "3gp"), KIND_VIDEO),
+}
+
+_SRC_RE = re.compile(
+    r"""<(img|audio|video|source)\b[^>]*?\bsrc\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""",
+    re.IGNORECASE,
+)
+_SOUND_RE = re.compile(r"\[sound:(.+?)\]")
+_SVG_SIZE_RE = re.compile(r"""\b(width|height)\s*=\s*["']\s*([\d.]+)(?:px)?\s*["']""")
+_JPEG_SOF = frozenset((0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF))
+
+
+class MediaReference(NamedTuple):
+    """A media file referenced by card HTML.
+
+    Attributes:
+        filename: Name of the file in the collection's media folder.
+        tag: Where it was found: "img", "audio", "video", "source" or
+            "sound" for ``[sound:...]``.
+    """
+    filename: str
+    tag: str
+
+    @property
+    def kind(self) -> str:
+        """Get the media kind from the file extension."""
+        return media_kind(self.filename)
+
+
+@dataclass
+class MediaInfo:
+    """Metadata of a media file."""
+    filename: str
+    kind: str
+    size: int
+    mtime: float
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary."""
+        return {
+            "filename": self.filename,
+            "kind": self.kind,
+            "size": self.size,
+            "mtime": self.mtime,
+            "width": self.width,
+            "height": self.height
+        }
+
+
+def media_kind(filename: str) -> str:
+    """Classify a media file by extension.
+
+    Args:
+        filename: File name.
+
+    Returns:
+        KIND_IMAGE, KIND_AUDIO, KIND_VIDEO or KIND_OTHER.
+    """
+    return _EXTENSION_KINDS.get(filename.rpartition(".")[2].lower(), KIND_OTHER)
+
+
+def _local_name(src: str) -> Optional[str]:
+    """Turn a ``src`` value into a media file name, or None if it is not one."""
+    src = unquote(html.unescape(src.strip()))
+    if not src or "://" in src or src.startswith(("data:", "//", "#")):
+        return None
+    # Collection media is a flat folder; never resolve paths out of it
+    if os.path.basename(src) != src or src in (".", ".."):
+        return None
+    return src
+
+
+def extract_media_references(card_html: str) -> List[MediaReference]:
+    """Find the collection media referenced by card HTML.
+
+    Args:
+        card_html: Rendered card or field HTML.
+
+    Returns:
+        References in document order, each file once.
+    """
+    found: Dict[str, MediaReference] = {}
+    if "src" in card_html:
+        for match in _SRC_RE.finditer(card_html):
+            name = _local_name(match.group(2) or match.group(3) or match.group(4) or "")
+            if name is not None and name not in found:
+                found[name] = MediaReference(name, match.group(1).lower())
+    if "[sound:" in card_html:
+        for match in _SOUND_RE.finditer(card_html):
+            name = _local_name(match.group(1))
+            if name is not None and name not in found:
+                found[name] = MediaReference(name, "sound")
+    return list(found.values())
+
+
+def image_size(path: str) -> Optional[Tuple[int, int]]:
+    """Read the pixel dimensions of an image from its header.
+
+    Supports PNG, GIF, JPEG, WebP and SVG with explicit width and height.
+
+    Args:
+        path: Image file path.
+
+    Returns:
+        (width, height), or None if unknown.
+    """
+    try:
+        with open(path, "rb") as f:
+            head = f.read(32)
+            if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+                return struct.unpack(">II", head[16:24])
+            if head[:6] in (b"GIF87a", b"GIF89a"):
+                return struct.unpack("<HH", head[6:10])
+            if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+                return _webp_size(head)
+            if head[:2] == b"\xff\xd8":
+                f.seek(2)
+                return _jpeg_size(f)
+            if path.lower().endswith(".svg"):
+                f.seek(0)
+                return _svg_size(f.read(4096).decode("utf-8", "replace"))
+    except (OSError, ValueError, struct.error) as e:
+        logger.debug(f"Cannot read image size of {path}: {e}")
+    return None
+
+
+def _webp_size(head: bytes) -> Optional[Tuple[int, int]]:
+    chunk = head[12:16]
+    if chunk == b"VP8 " and len(head) >= 30:
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(head) >= 25:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(head) >= 30:
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+
+def _jpeg_size(f: BinaryIO) -> Optional[Tuple[int, int]]:
+    while True:
+        byte = f.read(1)
+        while byte and byte != b"\xff":
+            byte = f.read(1)
+        while byte == b"\xff":
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            continue
+        length = struct.unpack(">H", f.read(2))[0]
+        if marker in _JPEG_SOF:
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _svg_size(text: str) -> Optional[Tuple[int, int]]:
+    start = text.find("<svg")
+    if start < 0:
+        return None
+    tag = text[start:text.find(">", start)]
+    sizes = {name: value for name, value in _SVG_SIZE_RE.findall(tag)}
+    if "width" in sizes and "height" in sizes:
+        return round(float(sizes["width"])), round(float(sizes["height"]))
+    return None
+
+
+def placeholder_uri(info: MediaInfo) -> str:
+    """Make a small SVG data URI with the dimensions of an image.
+
+    Args:
+        info: Image metadata.
+
+    Returns:
+        ``data:image/svg+xml`` URI.
+    """
+    width, height = info.width or 320, info.height or 240
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}"><rect width="100%" height="100%" fill="#d0d0d0"/></svg>'
+    )
+    return "data:image/svg+xml," + quote(svg)
+
+
+class MediaCache:
+    """Bounded cache of media file metadata for one media folder.
+
+    Example:
+        cache = MediaCache(col.media.dir())
+        infos = cache.infos_for(preview_html)
+    """
+
+    def __init__(self, media_dir: str, max_entries: int = 2048) -> None:
+        """Initialize the cache.
+
+        Args:
+            media_dir: The collection's media folder.
+            max_entries: Maximum number of files kept.
+        """
+        self._media_dir = media_dir
+        self._max_entries = max_entries
+        self._entries: "OrderedDict[str, MediaInfo]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def media_dir(self) -> str:
+        """Get the media folder."""
+        return self._media_dir
+
+    def get_info(self, filename: str) -> Optional[MediaInfo]:
+        """Get the metadata of a media file.
+
+        Args:
+            filename: File name in the media folder.
+
+        Returns:
+            MediaInfo, or None if the file does not exist.
+        """
+        path = os.path.join(self._media_dir, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._entries.pop(filename, None)
+            return None
+
+        with self._lock:
+            info = self._entries.get(filename)
+            if info is not None and info.size == stat.st_size and info.mtime == stat.st_mtime:
+                self._entries.move_to_end(filename)
+                self._hits += 1
+                return info
+            self._misses += 1
+
+        kind = media_kind(filename)
+        info = MediaInfo(filename, kind, stat.st_size, stat.st_mtime)
+        if kind == KIND_IMAGE:
+            size = image_size(path)
+            if size is not None:
+                info.width, info.height = size
+
+        with self._lock:
+            self._entries[filename] = info
+            self._entries.move_to_end(filename)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return info
+
+    def infos_for(self, card_html: str) -> List[MediaInfo]:
+        """Get the metadata of every existing media file card HTML references.
+
+        Args:
+            card_html: Rendered card HTML.
+
+        Returns:
+            MediaInfo per referenced file that exists, in document order.
+        """
+        infos = []
+        for ref in extract_media_references(card_html):
+            info = self.get_info(ref.filename)
+            if info is not None:
+                infos.append(info)
+        return infos
+
+    def replace_large_images(self, card_html: str, max_bytes: int = PREVIEW_PLACEHOLDER_BYTES) -> str:
+        """Swap images larger than a limit for same-sized placeholders.
+
+        The original file name is kept in a ``data-src`` attribute.
+
+        Args:
+            card_html: Rendered card HTML.
+            max_bytes: Largest image size served as is.
+
+        Returns:
+            HTML with large images replaced.
+        """
+        if "<img" not in card_html and "<IMG" not in card_html:
+            return card_html
+
+        parts = []
+        position = 0
+        for match in _SRC_RE.finditer(card_html):
+            if match.group(1).lower() != "img":
+                continue
+            group = next(g for g in (2, 3, 4) if match.group(g) is not None)
+            name = _local_name(match.group(group))
+            info = self.get_info(name) if name is not None else None
+            if info is None or info.size <= max_bytes:
+                continue
+            start, end = match.span(group)
+            if group != 4:
+                start, end = start - 1, end + 1
+            original = match.group(group).replace('"', "&quot;")
+            parts.append(card_html[position:start])
+            parts.append(f'"{placeholder_uri(info)}" data-src="{original}"')
+            position = end
+        if not parts:
+            return card_html
+        parts.append(card_html[position:])
+        return "".join(parts)
+
+    def invalidate(self, filename: Optional[str] = None) -> None:
+        """Forget one file, or all.
+
+        Args:
+            filename: File name, or None for all.
+        """
+        with self._lock:
+            if filename is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(filename, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics.
+
+        Returns:
+            Dictionary with entries, maxEntries, hits, misses and hitRate.
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self._max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hitRate": self._hits / total if total else 0.0
+            }
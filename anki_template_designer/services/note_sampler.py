@@ -0,0 +1,346 @@
+"""Representative sample notes for template previews.
+
+Instead of previewing a note type with whichever note happens to come
+first, the sampler picks the notes that exercise a template the most:
+
+    longest  the most field content
+    cloze    the most cloze deletions
+    media    the most images and sounds
+    empty    the most empty fields
+
+Notes are read straight from the ``notes`` table, newest edits first, up
+to a fixed number per note type. The picks are cached per note type and
+refreshed incrementally: later calls only read notes whose ``mod`` moved
+since the last scan, and rescan only when a picked note was edited or
+deleted.
+
+``LocalCollection`` is an in-memory stand-in for the parts of Anki's
+collection the sampler uses, for tests and benchmarks without Anki.
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..core.card_renderer import cloze_ordinals
+
+logger = logging.getLogger("anki_template_designer.services.note_sampler")
+
+# Anki joins the fields of a note with this separator in ``notes.flds``
+FIELD_SEPARATOR = "\x1f"
+
+REASON_LONGEST = "longest"
+REASON_CLOZE = "cloze"
+REASON_MEDIA = "media"
+REASON_EMPTY = "empty"
+# In order of preference for the default sample
+REASONS = (REASON_LONGEST, REASON_CLOZE, REASON_MEDIA, REASON_EMPTY)
+
+_MEDIA_RE = re.compile(r"<img\b[^>]*\bsrc\s*=|\[sound:", re.IGNORECASE)
+
+_SCAN_SQL = "select id, mod, flds from notes where mid = ? order by mod desc limit ?"
+_CHANGED_SQL = "select id, mod, flds from notes where mid = ? and mod >= ? order by mod desc limit ?"
+
+
+def score_fields(fields: Sequence[str]) -> Dict[str, int]:
+    """Score a note's fields for each sampling reason.
+
+    Args:
+        fields: Field values of the note.
+
+    Returns:
+        Dictionary mapping reason to score; higher is more representative.
+    """
+    return {
+        REASON_LONGEST: sum(len(value) for value in fields),
+        REASON_CLOZE: len(cloze_ordinals(fields)),
+        REASON_MEDIA: sum(len(_MEDIA_RE.findall(value)) for value in fields),
+        REASON_EMPTY: sum(1 for value in fields if not value.strip()),
+    }
+
+
+@dataclass
+class SampleNote:
+    """A note picked as a preview sample."""
+    note_id: int
+    fields: List[str]
+    reasons: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary."""
+        return {
+            "noteId": self.note_id,
+            "fields": list(self.fields),
+            "reasons": list(self.reasons)
+        }
+
+
+class _ModelSamples:
+    """Best note seen so far per reason, for one note type."""
+
+    __slots__ = ("best", "last_mod")
+
+    def __init__(self) -> None:
+        # reason -> (score, note id, fields)
+        self.best: Dict[str, Tuple[int, int, List[str]]] = {}
+        self.last_mod = 0
+
+    def merge(self, note_id: int, mod: int, fields: List[str]) -> None:
+        """Consider a note for every reason."""
+        for reason, score in score_fields(fields).items():
+            if score <= 0:
+                continue
+            current = self.best.get(reason)
+            if current is None or score > current[0]:
+                self.best[reason] = (score, note_id, fields)
+        if mod > self.last_mod:
+            self.last_mod = mod
+
+    def picked(self) -> Dict[int, List[str]]:
+        """Get the fields of each picked note by ID."""
+        return {note_id: fields for _, note_id, fields in self.best.values()}
+
+    def samples(self) -> List[SampleNote]:
+        """Get the picked notes, each once, in order of REASONS."""
+        samples: Dict[int, SampleNote] = {}
+        for reason in REASONS:
+            if reason not in self.best:
+                continue
+            _, note_id, fields = self.best[reason]
+            sample = samples.get(note_id)
+            if sample is None:
+                sample = samples[note_id] = SampleNote(note_id, list(fields))
+            sample.reasons.append(reason)
+        return list(samples.values())
+
+
+class NoteSampler:
+    """Picks and caches representative notes per note type.
+
+    Args:
+        scan_limit: Maximum notes read per note type and scan.
+    """
+
+    def __init__(self, scan_limit: int = 2000) -> None:
+        self._scan_limit = scan_limit
+        self._models: Dict[int, _ModelSamples] = {}
+        self._lock = threading.Lock()
+        self._scans = 0
+        self._refreshes = 0
+
+    def sample(self, col: Any, note_type_id: int) -> List[SampleNote]:
+        """Get representative notes of a note type.
+
+        Args:
+            col: Anki collection, or a LocalCollection.
+            note_type_id: The note type ID.
+
+        Returns:
+            Picked notes, most content first; empty if the note type
+            has no notes.
+        """
+        with self._lock:
+            entry = self._models.get(note_type_id)
+            if entry is None or not self._refresh(col, note_type_id, entry):
+                entry = self._scan(col, note_type_id)
+                self._models[note_type_id] = entry
+            return entry.samples()
+
+    def invalidate(self, note_type_id: Optional[int] = None) -> None:
+        """Forget the picks of one note type, or of all.
+
+        Args:
+            note_type_id: The note type ID, or None for all.
+        """
+        with self._lock:
+            if note_type_id is None:
+                self._models.clear()
+            else:
+                self._models.pop(note_type_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get sampler statistics.
+
+        Returns:
+            Dictionary with cached note types, full scans and incremental
+            refreshes.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._models),
+                "scanLimit": self._scan_limit,
+                "scans": self._scans,
+                "refreshes": self._refreshes
+            }
+
+    def _scan(self, col: Any, note_type_id: int) -> _ModelSamples:
+        """Pick notes from the most recently edited notes of a note type."""
+        entry = _ModelSamples()
+        for note_id, mod, flds in col.db.all(_SCAN_SQL, note_type_id, self._scan_limit):
+            entry.merge(note_id, mod, flds.split(FIELD_SEPARATOR))
+        self._scans += 1
+        return entry
+
+    def _refresh(self, col: Any, note_type_id: int, entry: _ModelSamples) -> bool:
+        """Merge notes edited since the last scan into the picks.
+
+        Returns:
+            False if the picks may no longer be the best and a full scan
+            is needed.
+        """
+        picked = entry.picked()
+        if picked:
+            marks = ",".join("?" * len(picked))
+            live = col.db.list(f"select id from notes where id in ({marks})", *picked)
+            if len(live) != len(picked):
+                return False
+
+        # ">=": Anki's mod has one-second resolution; merging a note twice is harmless
+        rows = col.db.all(_CHANGED_SQL, note_type_id, entry.last_mod, self._scan_limit)
+        for note_id, mod, flds in rows:
+            fields = flds.split(FIELD_SEPARATOR)
+            if note_id in picked and picked[note_id] != fields:
+                # An edited pick may have lost the score it was picked for
+                return False
+            entry.merge(note_id, mod, fields)
+        self._refreshes += 1
+        return True
+
+
+@dataclass
+class LocalNote:
+    """A note of a LocalCollection, shaped like Anki's ``Note``."""
+    id: int
+    mid: int
+    mod: int
+    fields: List[str]
+
+
+class _LocalDB:
+    """The query methods of Anki's ``col.db`` over an SQLite connection."""
+
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self._conn = conn
+
+    def all(self, sql: str, *args: Any) -> List[List[Any]]:
+        """Run a query and return all rows."""
+        return [list(row) for row in self._conn.execute(sql, args)]
+
+    def list(self, sql: str, *args: Any) -> List[Any]:
+        """Run a query and return the first column of each row."""
+        return [row[0] for row in self._conn.execute(sql, args)]
+
+    def scalar(self, sql: str, *args: Any) -> Any:
+        """Run a query and return the first column of the first row."""
+        row = self._conn.execute(sql, args).fetchone()
+        return row[0] if row else None
+
+
+class LocalCollection:
+    """In-memory stand-in for Anki's collection.
+
+    Keeps notes in an SQLite ``notes`` table with Anki's ``id``, ``mid``,
+    ``mod`` and ``flds`` columns, and offers ``db``, ``find_notes`` (for
+    ``mid:<id>`` searches) and ``get_note``. Each write gets the next
+    ``mod`` unless one is given.
+    """
+
+    def __init__(self) -> None:
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._conn.execute(
+            "create table notes (id integer primary key, mid integer not null, "
+            "mod integer not null, flds text not null)"
+        )
+        self.db = _LocalDB(self._conn)
+        self._clock = 0
+
+    def _next_mod(self, mod: Optional[int]) -> int:
+        self._clock = max(self._clock + 1, mod or 0)
+        return mod if mod is not None else self._clock
+
+    def add_note(self, mid: int, fields: Sequence[str], mod: Optional[int] = None) -> int:
+        """Add a note.
+
+        Args:
+            mid: Note type ID.
+            fields: Field values.
+            mod: Modification time, or None for the next one.
+
+        Returns:
+            The new note ID.
+        """
+        cursor = self._conn.execute(
+            "insert into notes (mid, mod, flds) values (?, ?, ?)",
+            (mid, self._next_mod(mod), FIELD_SEPARATOR.join(fields))
+        )
+        return cursor.lastrowid
+
+    def add_notes(self, mid: int, notes: Iterable[Sequence[str]]) -> None:
+        """Add many notes of one note type.
+
+        Args:
+            mid: Note type ID.
+            notes: Field values of each note.
+        """
+        rows = [(mid, self._next_mod(None), FIELD_SEPARATOR.join(fields)) for fields in notes]
+        self._conn.executemany("insert into notes (mid, mod, flds) values (?, ?, ?)", rows)
+
+    def update_note(self, note_id: int, fields: Sequence[str], mod: Optional[int] = None) -> None:
+        """Replace the fields of a note.
+
+        Args:
+            note_id: The note ID.
+            fields: New field values.
+            mod: Modification time, or None for the next one.
+        """
+        self._conn.execute(
+            "update notes set flds = ?, mod = ? where id = ?",
+            (FIELD_SEPARATOR.join(fields), self._next_mod(mod), note_id)
+        )
+
+    def remove_notes(self, note_ids: Iterable[int]) -> None:
+        """Delete notes.
+
+        Args:
+            note_ids: IDs of the notes to delete.
+        """
+        self._conn.executemany("delete from notes where id = ?", [(i,) for i in note_ids])
+
+    def find_notes(self, query: str) -> List[int]:
+        """Find notes; only ``mid:<id>`` searches are supported.
+
+        Args:
+            query: Search string.
+
+        Returns:
+            Matching note IDs.
+        """
+        match = re.fullmatch(r"\s*mid:(\d+)\s*", query)
+        if match is None:
+            raise ValueError(f"Unsupported search: {query}")
+        return self.db.list("select id from notes where mid = ? order by id", int(match.group(1)))
+
+    def get_note(self, note_id: int) -> LocalNote:
+        """Get a note.
+
+        Args:
+            note_id: The note ID.
+
+        Returns:
+            The note.
+
+        Raises:
+            KeyError: If there is no such note.
+        """
+        rows = self.db.all("select id, mid, mod, flds from notes where id = ?", note_id)
+        if not rows:
+            raise KeyError(note_id)
+        nid, mid, mod, flds = rows[0]
+        return LocalNote(nid, mid, mod, flds.split(FIELD_SEPARATOR))
+
+    def close(self) -> None:
+        """Close the underlying database."""
+        self._conn.close()
@@ -4,9 +4,24 @@ Note Type Service for Anki Template Designer.
 Plan 11: Provides interface to Anki's note types, fields, and templates.
 """
 
+import copy
+import hashlib
 import logging
+import re
+import time
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional, TYPE_CHECKING
+from typing import Any, Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from ..core.card_renderer import (
+    CardJob, CardRenderer, cloze_ordinals, compile_card_template, render_cards,
+)
+from ..core.css_pipeline import CssPipeline
+from ..core.exceptions import TemplateSyntaxError
+from .field_index import FieldIndex
+from .media_cache import MediaCache
+from .note_sampler import NoteSampler, SampleNote
+from .performance.metrics import MetricsTracker
+from .search_index import DOC_NOTE_TYPE, SearchIndex, get_search_index, note_type_terms
 
 if TYPE_CHECKING:
     from anki.models import NotetypeDict
@@ -14,6 +29,24 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger("anki_template_designer.services.note_type_service")
 
+_TRAILING_SPACE_RE = re.compile(r"[ \t]+$", re.MULTILINE)
+
+
+def content_hash(text: str) -> str:
+    """Hash template HTML or CSS, ignoring differences that do not render.
+    
+    Line endings are normalised and trailing whitespace is dropped from
+    each line and from both ends of the text.
+    
+    Args:
+        text: Template HTML or CSS.
+        
+    Returns:
+        Hex digest of the normalised text.
+    """
+    normalised = _TRAILING_SPACE_RE.sub("", text.replace("\r\n", "\n").replace("\r", "\n")).strip()
+    return hashlib.sha256(normalised.encode("utf-8")).hexdigest()
+
 
 @dataclass
 class AnkiField:
@@ -95,6 +128,8 @@ class NoteType:
     templates: List[CardTemplate] = field(default_factory=list)
     css: str = ""
     sort_field: int = 0
+    mod: int = 0
+    is_cloze: bool = False
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary."""
@@ -104,7 +139,9 @@ class NoteType:
             "fields": [f.to_dict() for f in self.fields],
             "templates": [t.to_dict() for t in self.templates],
             "css": self.css,
-            "sortField": self.sort_field
+            "sortField": self.sort_field,
+            "mod": self.mod,
+            "isCloze": self.is_cloze
         }
     
     def get_field_names(self) -> List[str]:
@@ -134,10 +171,77 @@ class NoteType:
             fields=fields,
             templates=templates,
             css=model.get("css", ""),
-            sort_field=model.get("sortf", 0)
+            sort_field=model.get("sortf", 0),
+            mod=model.get("mod", 0),
+            is_cloze=model.get("type", 0) == 1
+        )
+
+
+@dataclass
+class NoteTypeSummary:
+    """Name, ID and card template names of a note type, for pickers."""
+    id: int
+    name: str
+    template_names: Optional[List[str]] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary."""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "templateNames": self.template_names
+        }
+    
+    @classmethod
+    def from_anki_model(cls, model: Dict[str, Any], include_templates: bool = True) -> "NoteTypeSummary":
+        """Create from Anki model dictionary without building fields or templates."""
+        return cls(
+            id=model.get("id", 0),
+            name=model.get("name", "Unknown"),
+            template_names=(
+                [t.get("name", "") for t in model.get("tmpls", [])]
+                if include_templates else None
+            )
         )
 
 
+@dataclass
+class ApplyResult:
+    """Outcome of a combined note type update.
+    
+    Attributes:
+        success: Whether the changes were saved, or there were none.
+        error: Why nothing was saved, if it failed.
+        details: Context of the error, e.g. the ``ordinal`` and ``side``
+            ("front" or "back") of a template that does not parse.
+        templates_changed: Ordinals of the card templates that changed.
+        css_changed: Whether the CSS changed.
+        timings: Milliseconds spent validating, saving and in total.
+    """
+    success: bool = False
+    error: Optional[str] = None
+    details: Dict[str, Any] = field(default_factory=dict)
+    templates_changed: List[int] = field(default_factory=list)
+    css_changed: bool = False
+    timings: Dict[str, float] = field(default_factory=dict)
+    
+    @property
+    def saved(self) -> bool:
+        """Whether the model was written to the collection."""
+        return self.success and (bool(self.templates_changed) or self.css_changed)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary."""
+        return {
+            "success": self.success,
+            "error": self.error,
+            "details": dict(self.details),
+            "templatesChanged": list(self.templates_changed),
+            "cssChanged": self.css_changed,
+            "timings": {k: round(v, 2) for k, v in self.timings.items()}
+        }
+
+
 class NoteTypeService:
     """Service for interacting with Anki note types.
     
@@ -149,15 +253,34 @@ class NoteTypeService:
     - Create sample data for preview
     """
     
-    def __init__(self, mw: Optional["AnkiQt"] = None) -> None:
+    def __init__(
+        self,
+        mw: Optional["AnkiQt"] = None,
+        search_index: Optional[SearchIndex] = None,
+        metrics: Optional[MetricsTracker] = None
+    ) -> None:
         """Initialize the service.
         
         Args:
             mw: Anki main window instance.
+            search_index: Index to keep note types in. A private one is
+                created if None.
+            metrics: Tracker for model save metrics. A private one is
+                created if None.
         """
         self._mw = mw
         self._cache: Dict[int, NoteType] = {}
+        # (mod, usn) of the model each cached note type was built from
+        self._versions: Dict[int, Tuple[int, int]] = {}
         self._cache_valid = False
+        self._search_index = search_index if search_index is not None else SearchIndex()
+        self._search_built = False
+        self._field_index = FieldIndex()
+        self._renderer = CardRenderer()
+        self._sampler = NoteSampler()
+        self._media_cache: Optional[MediaCache] = None
+        self._css_pipeline = CssPipeline()
+        self._metrics = metrics or MetricsTracker()
     
     def set_main_window(self, mw: "AnkiQt") -> None:
         """Set the Anki main window reference.
@@ -167,12 +290,65 @@ class NoteTypeService:
         """
         self._mw = mw
         self._invalidate_cache()
+        self._renderer.clear_cache()
+        self._sampler.invalidate()
+        self._media_cache = None
+        # Another profile's collection: index it afresh on the next search
+        self._search_index.clear(DOC_NOTE_TYPE)
+        self._search_built = False
+        self._field_index.clear()
     
     def _invalidate_cache(self) -> None:
         """Invalidate the note type cache."""
         self._cache.clear()
+        self._versions.clear()
         self._cache_valid = False
     
+    def _invalidate_note_type(self, note_type_id: int) -> None:
+        """Drop one note type from the cache.
+        
+        Args:
+            note_type_id: The note type ID.
+        """
+        self._cache.pop(note_type_id, None)
+        self._versions.pop(note_type_id, None)
+        self._renderer.invalidate(note_type_id)
+    
+    @staticmethod
+    def _model_version(model: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+        """Get the version a cached note type is validated against.
+        
+        Args:
+            model: Anki model dictionary.
+            
+        Returns:
+            (mod, usn) tuple, or None if the model carries no
+            modification time and so can never be trusted from cache.
+        """
+        mod = model.get("mod") or 0
+        if not mod:
+            return None
+        return (mod, model.get("usn", 0))
+    
+    def _store(self, model: Dict[str, Any]) -> NoteType:
+        """Build a note type from a model and cache it.
+        
+        Args:
+            model: Anki model dictionary.
+            
+        Returns:
+            The new NoteType.
+        """
+        nt = NoteType.from_anki_model(model)
+        self._cache[nt.id] = nt
+        version = self._model_version(model)
+        if version is None:
+            self._versions.pop(nt.id, None)
+        else:
+            self._versions[nt.id] = version
+        self._index_note_type(nt)
+        return nt
+    
     def _get_collection(self) -> Optional[Any]:
         """Get the Anki collection.
         
@@ -186,6 +362,11 @@ class NoteTypeService:
     def get_all_note_types(self) -> List[NoteType]:
         """Get all note types from Anki.
         
+        The mod/usn of every model is read with one query on the
+        notetypes table. Note types whose mod/usn is unchanged since they
+        were cached are reused as-is; only models modified since are
+        loaded, rebuilt and re-indexed.
+        
         Returns:
             List of NoteType objects.
         """
@@ -195,47 +376,165 @@ class NoteTypeService:
             return []
         
         try:
-            models = col.models.all()
+            versions = self._read_model_versions(col)
+            models: Dict[int, Dict[str, Any]] = {}
+            if versions is None:
+                # Older Anki: no notetypes table, check each model's own mod/usn
+                models = {model.get("id", 0): model for model in col.models.all()}
+                versions = [
+                    (note_type_id, self._model_version(model)) for note_type_id, model in models.items()
+                ]
             note_types = []
             
-            for model in models:
-                nt = NoteType.from_anki_model(model)
-                self._cache[nt.id] = nt
-                note_types.append(nt)
+            rebuilt = 0
+            
+            for note_type_id, version in versions:
+                cached = self._cache.get(note_type_id)
+                if cached is None or version is None or self._versions.get(note_type_id) != version:
+                    model = models.get(note_type_id) or col.models.get(note_type_id)
+                    if model is None:
+                        continue
+                    if cached is not None:
+                        self._renderer.invalidate(note_type_id)
+                    cached = self._store(model)
+                    rebuilt += 1
+                note_types.append(cached)
+            
+            # Drop note types deleted since the last listing
+            listed_ids = {nt.id for nt in note_types}
+            for note_type_id in set(self._cache) - listed_ids:
+                self._invalidate_note_type(note_type_id)
+            for note_type_id in set(self._field_index.note_type_ids()) - listed_ids:
+                self._field_index.remove(note_type_id)
+            listed = {str(nt.id) for nt in note_types}
+            for doc_id in self._search_index.ids(DOC_NOTE_TYPE):
+                if doc_id not in listed:
+                    self._search_index.remove(DOC_NOTE_TYPE, doc_id)
             
             self._cache_valid = True
-            logger.debug(f"Loaded {len(note_types)} note types")
+            self._search_built = True
+            logger.debug(f"Loaded {len(note_types)} note types ({rebuilt} refreshed)")
             return note_types
             
         except Exception as e:
             logger.error(f"Failed to get note types: {e}")
             return []
     
+    @staticmethod
+    def _read_model_versions(col: Any) -> Optional[List[Tuple[int, Optional[Tuple[int, int]]]]]:
+        """Read the mod/usn of all models in one query.
+        
+        Args:
+            col: Anki collection.
+            
+        Returns:
+            (note type ID, version) pairs in Anki's order, with versions
+            as returned by ``_model_version``, or None if the collection
+            has no notetypes table.
+        """
+        try:
+            rows = col.db.all("select id, mtime_secs, usn from notetypes order by name")
+            return [(note_type_id, (mod, usn) if mod else None) for note_type_id, mod, usn in rows]
+        except Exception as e:
+            logger.debug(f"Cannot query note type versions: {e}")
+            return None
+    
+    def get_note_type_summaries(self, include_templates: bool = True) -> List[NoteTypeSummary]:
+        """List note types by name and ID without loading them in full.
+        
+        Uses Anki's name/ID listing where the collection provides it,
+        and reads card template names for every note type with one query
+        on the templates table, so no model is loaded. Full note types
+        are loaded on demand through get_note_type.
+        
+        Args:
+            include_templates: Whether to fill in card template names.
+            
+        Returns:
+            List of NoteTypeSummary objects, in Anki's order.
+        """
+        col = self._get_collection()
+        if col is None:
+            logger.warning("No collection available")
+            return []
+        
+        try:
+            names_and_ids = getattr(col.models, "all_names_and_ids", None)
+            template_names: Dict[int, List[str]] = {}
+            if names_and_ids is not None and include_templates:
+                template_names = self._read_template_names(col)
+            if names_and_ids is None or template_names is None:
+                # Older Anki: no light listing, read what we need off each model
+                return [
+                    NoteTypeSummary.from_anki_model(model, include_templates)
+                    for model in col.models.all()
+                ]
+            
+            return [
+                NoteTypeSummary(
+                    id=entry.id,
+                    name=entry.name,
+                    template_names=template_names.get(entry.id, []) if include_templates else None
+                )
+                for entry in names_and_ids()
+            ]
+            
+        except Exception as e:
+            logger.error(f"Failed to list note types: {e}")
+            return []
+    
+    @staticmethod
+    def _read_template_names(col: Any) -> Optional[Dict[int, List[str]]]:
+        """Read the card template names of all note types in one query.
+        
+        Args:
+            col: Anki collection.
+            
+        Returns:
+            Template names in ordinal order per note type ID, or None if
+            the collection has no templates table.
+        """
+        try:
+            rows = col.db.all("select ntid, ord, name from templates order by ntid, ord")
+        except Exception as e:
+            logger.debug(f"Cannot query card template names: {e}")
+            return None
+        names: Dict[int, List[str]] = {}
+        for note_type_id, _, name in rows:
+            names.setdefault(note_type_id, []).append(name)
+        return names
+    
     def get_note_type(self, note_type_id: int) -> Optional[NoteType]:
         """Get a specific note type by ID.
         
+        A cached note type is returned only while the model's mod/usn
+        still match the ones it was built from; a model edited in Anki's
+        own editor or changed by a sync is reloaded.
+        
         Args:
             note_type_id: The note type ID.
             
         Returns:
             NoteType or None if not found.
         """
-        # Check cache first
-        if note_type_id in self._cache:
-            return self._cache[note_type_id]
-        
+        cached = self._cache.get(note_type_id)
         col = self._get_collection()
         if col is None:
-            return None
+            return cached
         
         try:
             model = col.models.get(note_type_id)
             if model is None:
+                if cached is not None:
+                    self._invalidate_note_type(note_type_id)
                 return None
             
-            nt = NoteType.from_anki_model(model)
-            self._cache[note_type_id] = nt
-            return nt
+            version = self._model_version(model)
+            if cached is not None:
+                if version is not None and self._versions.get(note_type_id) == version:
+                    return cached
+                self._invalidate_note_type(note_type_id)
+            return self._store(model)
             
         except Exception as e:
             logger.error(f"Failed to get note type {note_type_id}: {e}")
@@ -259,9 +558,7 @@ class NoteTypeService:
             if model is None:
                 return None
             
-            nt = NoteType.from_anki_model(model)
-            self._cache[nt.id] = nt
-            return nt
+            return self._store(model)
             
         except Exception as e:
             logger.error(f"Failed to get note type '{name}': {e}")
@@ -350,7 +647,8 @@ class NoteTypeService:
                 tmpl["afmt"] = back
             
             col.models.save(model)
-            self._invalidate_cache()
+            self._invalidate_note_type(note_type_id)
+            self._index_note_type(NoteType.from_anki_model(model))
             
             logger.info(f"Updated template {template_ordinal} for note type {note_type_id}")
             return True
@@ -381,7 +679,8 @@ class NoteTypeService:
             
             model["css"] = css
             col.models.save(model)
-            self._invalidate_cache()
+            self._invalidate_note_type(note_type_id)
+            self._index_note_type(NoteType.from_anki_model(model))
             
             logger.info(f"Updated CSS for note type {note_type_id}")
             return True
@@ -390,6 +689,242 @@ class NoteTypeService:
             logger.error(f"Failed to update CSS: {e}")
             return False
     
+    def apply_changes(
+        self,
+        note_type_id: int,
+        templates: Optional[Dict[int, Tuple[Optional[str], Optional[str]]]] = None,
+        css: Optional[str] = None,
+        before_save: Optional[Callable[[Dict[str, Any]], None]] = None,
+        optimize_css: bool = False
+    ) -> ApplyResult:
+        """Update card templates and CSS of a note type with a single save.
+        
+        Every change is validated before anything is written: ordinals
+        must exist and templates must parse. Incoming HTML and CSS are
+        compared with the stored model by content_hash, and only the
+        parts that differ are written. The model is saved once, and not
+        at all if nothing differs; a failed save leaves the collection's
+        model untouched.
+        
+        Metrics (in ``get_save_stats``):
+            ``note_types.saved`` and ``note_types.save_skipped`` counters.
+            ``note_types.save`` timing: duration of each model save.
+        
+        Args:
+            note_type_id: The note type ID.
+            templates: New (front, back) HTML per template ordinal;
+                None leaves that side unchanged.
+            css: New CSS, or None to leave it unchanged.
+            before_save: Called with the stored model just before it is
+                overwritten, e.g. to back it up. Not called if nothing
+                changed; if it raises, nothing is saved.
+            optimize_css: Merge duplicate rules and drop overridden
+                declarations in ``css`` before comparing and saving
+                (see ``core.css_pipeline``). Off by default so the
+                user's CSS is saved as written; CSS with nothing to
+                merge is saved as written either way.
+            
+        Returns:
+            ApplyResult with what changed and the time spent.
+        """
+        start = time.perf_counter()
+        result = ApplyResult()
+        
+        col = self._get_collection()
+        if col is None:
+            result.error = "No collection available"
+            return result
+        
+        try:
+            model = col.models.get(note_type_id)
+            if model is None:
+                result.error = f"Note type {note_type_id} not found"
+                return result
+            
+            tmpls = model.get("tmpls", [])
+            changes: List[Tuple[int, str, str]] = []
+            for ordinal, (front, back) in sorted((templates or {}).items()):
+                if not 0 <= ordinal < len(tmpls):
+                    result.error = f"Template ordinal {ordinal} out of range"
+                    return result
+                for key, text in (("qfmt", front), ("afmt", back)):
+                    if text is None or content_hash(text) == content_hash(tmpls[ordinal].get(key, "")):
+                        continue
+                    compile_card_template(text)
+                    changes.append((ordinal, key, text))
+            if css is not None and optimize_css:
+                css = self._css_pipeline.tidy(css)
+            css_changed = css is not None and content_hash(css) != content_hash(model.get("css", ""))
+            result.timings["validateMs"] = (time.perf_counter() - start) * 1000
+            
+            if changes or css_changed:
+                if before_save is not None:
+                    before_save(model)
+                save_start = time.perf_counter()
+                updated = copy.deepcopy(model)
+                for ordinal, key, text in changes:
+                    updated["tmpls"][ordinal][key] = text
+                if css_changed:
+                    updated["css"] = css
+                col.models.save(updated)
+                result.timings["saveMs"] = (time.perf_counter() - save_start) * 1000
+                self._metrics.record_timing("note_types.save", result.timings["saveMs"])
+                self._metrics.increment("note_types.saved")
+                
+                self._invalidate_note_type(note_type_id)
+                self._index_note_type(NoteType.from_anki_model(updated))
+                result.templates_changed = sorted({ordinal for ordinal, _, _ in changes})
+                result.css_changed = css_changed
+            else:
+                self._metrics.increment("note_types.save_skipped")
+            
+            result.success = True
+            
+        except TemplateSyntaxError as e:
+            side = "front" if key == "qfmt" else "back"
+            result.error = f"Template {ordinal} {side} is invalid: {e.message}"
+            result.details = dict(e.details, ordinal=ordinal, side=side)
+        except Exception as e:
+            logger.error(f"Failed to apply changes to note type {note_type_id}: {e}")
+            result.error = str(e)
+        
+        result.timings["totalMs"] = (time.perf_counter() - start) * 1000
+        if result.saved:
+            logger.info(
+                f"Saved note type {note_type_id}: templates {result.templates_changed}, "
+                f"css {'changed' if result.css_changed else 'unchanged'} "
+                f"in {result.timings['totalMs']:.1f}ms"
+            )
+        elif result.success:
+            logger.debug(f"Note type {note_type_id} unchanged, save skipped")
+        return result
+    
+    def optimize_css(self, *stylesheets: str, minify: bool = False) -> str:
+        """Merge stylesheets into one without duplicate rules.
+        
+        Args:
+            *stylesheets: Stylesheet texts in cascade order.
+            minify: Produce minified output.
+            
+        Returns:
+            The merged stylesheet, or the stylesheets joined unchanged
+            if one does not parse.
+        """
+        return self._css_pipeline.process(*stylesheets, minify=minify)
+    
+    def get_save_stats(self) -> Dict[str, Any]:
+        """Get model save statistics.
+        
+        Returns:
+            Dictionary with saves written and skipped as unchanged, save
+            timings and CSS pipeline cache statistics.
+        """
+        save = self._metrics.get_timing_stats("note_types.save")
+        return {
+            "saved": self._metrics.get_counter("note_types.saved"),
+            "skipped": self._metrics.get_counter("note_types.save_skipped"),
+            "save": save.to_dict() if save else None,
+            "css": self._css_pipeline.get_stats()
+        }
+    
+    def search_note_types(self, query: str, limit: Optional[int] = 50) -> List[Dict[str, Any]]:
+        """Search note types by name, card template HTML, CSS and field references.
+        
+        All note types are indexed on the first search; afterwards only
+        note types that are loaded or updated are re-indexed.
+        
+        Args:
+            query: Query such as ``"{{cloze:Text}}"`` or ``"class:night_mode"``.
+            limit: Maximum number of hits, or None for all.
+            
+        Returns:
+            Hits as {"type", "id", "title", "score", "matches"}, best first.
+        """
+        if not self._search_built:
+            self.get_all_note_types()
+        return self._search_index.search(query, doc_type=DOC_NOTE_TYPE, limit=limit)
+    
+    def _index_note_type(self, nt: NoteType) -> None:
+        """Add or re-index a note type in the search and field indexes."""
+        self._search_index.update(DOC_NOTE_TYPE, nt.id, nt.name, note_type_terms(nt))
+        self._field_index.update(nt.id, [(t.ordinal, t.front, t.back) for t in nt.templates])
+    
+    def _indexed_note_type(self, note_type_id: int) -> Optional[NoteType]:
+        """Get a note type, making sure the field index is current for it."""
+        nt = self.get_note_type(note_type_id)
+        if nt is not None:
+            # A no-op unless its templates changed since they were indexed
+            self._field_index.update(nt.id, [(t.ordinal, t.front, t.back) for t in nt.templates])
+        return nt
+    
+    def find_field_usages(self, note_type_id: int, field_name: str) -> List[Dict[str, Any]]:
+        """Find the card template sides that reference a field.
+        
+        Args:
+            note_type_id: The note type ID.
+            field_name: Field name, e.g. before renaming it.
+            
+        Returns:
+            List of {"ordinal", "side", "references"}, with the
+            references to the field on that side.
+        """
+        if self._indexed_note_type(note_type_id) is None:
+            return []
+        usages = []
+        for ordinal, side in self._field_index.usages(note_type_id, field_name):
+            refs = self._field_index.references(note_type_id, ordinal, side) or []
+            usages.append({
+                "ordinal": ordinal,
+                "side": side,
+                "references": [r.to_dict() for r in refs if r.field == field_name]
+            })
+        return usages
+    
+    def get_unused_fields(self, note_type_id: int) -> List[str]:
+        """Get the fields of a note type that no card template references.
+        
+        Args:
+            note_type_id: The note type ID.
+            
+        Returns:
+            Field names, in field order.
+        """
+        nt = self._indexed_note_type(note_type_id)
+        if nt is None:
+            return []
+        return self._field_index.unused_fields(nt.id, nt.get_field_names())
+    
+    def get_field_reference_map(self, note_type_id: int) -> Optional[Dict[str, Any]]:
+        """Get which fields every card template side of a note type references.
+        
+        Args:
+            note_type_id: The note type ID.
+            
+        Returns:
+            Dictionary with "noteTypeId", "sides" (a list of {"ordinal",
+            "side", "references"}), "usages" (field name to the
+            [ordinal, side] pairs using it) and "unusedFields", or None
+            if the note type was not found.
+        """
+        nt = self._indexed_note_type(note_type_id)
+        if nt is None:
+            return None
+        
+        sides = []
+        usages: Dict[str, List[List[Any]]] = {}
+        for ordinal, side in self._field_index.sides(nt.id):
+            refs = self._field_index.references(nt.id, ordinal, side) or []
+            sides.append({"ordinal": ordinal, "side": side, "references": [r.to_dict() for r in refs]})
+        for name in sorted(self._field_index.referenced_fields(nt.id)):
+            usages[name] = [list(use) for use in self._field_index.usages(nt.id, name)]
+        
+        return {
+            "noteTypeId": nt.id,
+            "sides": sides,
+            "usages": usages,
+            "unusedFields": self._field_index.unused_fields(nt.id, nt.get_field_names())
+        }
+    
     def get_sample_data(self, note_type_id: int) -> Dict[str, str]:
         """Get sample data for template preview.
         
@@ -412,10 +947,33 @@ class NoteTypeService:
         
         return sample
     
+    def get_sample_notes(self, note_type_id: int) -> List[SampleNote]:
+        """Get representative notes of a note type.
+        
+        Picks the notes with the most content, cloze deletions, media
+        and empty fields from a bounded scan. Picks are cached per note
+        type and refreshed from notes edited since.
+        
+        Args:
+            note_type_id: The note type ID.
+            
+        Returns:
+            Picked notes, most content first.
+        """
+        col = self._get_collection()
+        if col is None:
+            return []
+        
+        try:
+            return self._sampler.sample(col, note_type_id)
+        except Exception as e:
+            logger.error(f"Failed to sample notes of note type {note_type_id}: {e}")
+            return []
+    
     def get_sample_note_data(self, note_type_id: int) -> Optional[Dict[str, str]]:
         """Get sample data from an actual note.
         
-        Finds a note of the given type and extracts field values.
+        Uses the representative note with the most content.
         
         Args:
             note_type_id: The note type ID.
@@ -423,49 +981,62 @@ class NoteTypeService:
         Returns:
             Dictionary mapping field names to actual values, or None.
         """
-        col = self._get_collection()
-        if col is None:
+        samples = self.get_sample_notes(note_type_id)
+        if not samples:
+            return None
+        
+        nt = self.get_note_type(note_type_id)
+        if nt is None:
             return None
         
+        values = samples[0].fields
+        return {
+            f.name: values[i] if i < len(values) else ""
+            for i, f in enumerate(nt.fields)
+        }
+    
+    def _get_media_cache(self) -> Optional[MediaCache]:
+        """Get the media metadata cache for the collection's media folder.
+        
+        Returns:
+            MediaCache, or None if there is no collection media folder.
+        """
+        col = self._get_collection()
+        if col is None or getattr(col, "media", None) is None:
+            return None
         try:
-            # Find a note with this model
-            note_ids = col.find_notes(f"mid:{note_type_id}")
-            if not note_ids:
-                return None
-            
-            note = col.get_note(note_ids[0])
-            nt = self.get_note_type(note_type_id)
-            if nt is None:
-                return None
-            
-            data = {}
-            for i, f in enumerate(nt.fields):
-                if i < len(note.fields):
-                    data[f.name] = note.fields[i]
-                else:
-                    data[f.name] = ""
-            
-            return data
-            
+            media_dir = col.media.dir()
         except Exception as e:
-            logger.error(f"Failed to get sample note data: {e}")
+            logger.debug(f"No media folder: {e}")
+            return None
+        if not isinstance(media_dir, str):
             return None
+        if self._media_cache is None or self._media_cache.media_dir != media_dir:
+            self._media_cache = MediaCache(media_dir)
+        return self._media_cache
     
     def render_preview(
         self,
         note_type_id: int,
         template_ordinal: int = 0,
-        field_values: Optional[Dict[str, str]] = None
-    ) -> Dict[str, str]:
+        field_values: Optional[Dict[str, str]] = None,
+        placeholder_over: Optional[int] = None
+    ) -> Dict[str, Any]:
         """Render a card preview.
         
+        With a collection media folder, the result also lists the media
+        the card uses, with size and image dimensions.
+        
         Args:
             note_type_id: The note type ID.
             template_ordinal: Which template to render.
             field_values: Field values to use (uses sample if not provided).
+            placeholder_over: Replace images larger than this many bytes
+                with placeholders; None keeps every image.
             
         Returns:
-            Dictionary with 'front' and 'back' HTML.
+            Dictionary with 'front', 'back' and 'css', 'media' if there is
+            a media folder, and 'error' if the template is malformed.
         """
         nt = self.get_note_type(note_type_id)
         if nt is None:
@@ -480,27 +1051,113 @@ class NoteTypeService:
         if field_values is None:
             field_values = self.get_sample_data(note_type_id)
         
-        # Simple template rendering (replace {{field}} with values)
-        front = tmpl.front
-        back = tmpl.back
+        specials = {"Type": nt.name, "Card": tmpl.name}
+        try:
+            # Compiled once per template version, then one pass per render
+            front, back = self._renderer.render(
+                (nt.id, template_ordinal, nt.mod), tmpl.front, tmpl.back,
+                field_values, template_ordinal, specials
+            )
+        except TemplateSyntaxError as e:
+            logger.warning(f"Cannot render template {template_ordinal} of note type {note_type_id}: {e.message}")
+            return {"front": "", "back": "", "css": nt.css, "error": e.message}
         
-        for field_name, value in field_values.items():
-            # Replace {{field}} patterns
-            front = front.replace(f"{{{{{field_name}}}}}", value)
-            back = back.replace(f"{{{{{field_name}}}}}", value)
+        preview: Dict[str, Any] = {
+            "front": front,
+            "back": back,
+            "css": nt.css
+        }
+        media = self._get_media_cache()
+        if media is not None:
+            # The answer usually embeds the question, so list media once
+            preview["media"] = [info.to_dict() for info in media.infos_for(front + back)]
+            if placeholder_over is not None:
+                preview["front"] = media.replace_large_images(front, placeholder_over)
+                preview["back"] = media.replace_large_images(back, placeholder_over)
+        return preview
+    
+    def render_previews(
+        self,
+        note_type_id: int,
+        ordinals: Optional[List[int]] = None,
+        notes: Optional[List[Dict[str, str]]] = None,
+        workers: Optional[int] = 0
+    ) -> Optional[Dict[str, Any]]:
+        """Render many cards of one note type in a single call.
+        
+        Each card template is compiled once for the whole batch and the
+        note type's CSS is returned once rather than per card.
+        
+        Args:
+            note_type_id: The note type ID.
+            ordinals: Card ordinals to render for every note. Defaults to
+                every card template, or for cloze note types to the
+                deletions each note contains.
+            notes: Field values per note (uses sample data if None).
+            workers: Worker threads for large batches; 0 renders on the
+                calling thread, None uses the executor's default.
             
-            # Also handle special patterns
-            front = front.replace(f"{{{{edit:{field_name}}}}}", value)
-            back = back.replace(f"{{{{edit:{field_name}}}}}", value)
+        Returns:
+            Envelope {"noteTypeId", "css", "cards", "errors"}; each card
+            is {"note", "ordinal", "front", "back"}, each error
+            {"ordinal", "error"}. None if the note type is not found.
+        """
+        nt = self.get_note_type(note_type_id)
+        if nt is None:
+            return None
+        
+        if notes is None:
+            notes = [self.get_sample_data(note_type_id)]
+        if ordinals is None and not nt.is_cloze:
+            ordinals = list(range(len(nt.templates)))
+        
+        # Cloze note types have one template shared by every card
+        template_ordinals = [0] if nt.is_cloze else sorted(set(ordinals))
+        templates = []
+        template_index: Dict[int, int] = {}
+        errors: List[Dict[str, Any]] = []
+        for ordinal in template_ordinals:
+            if not 0 <= ordinal < len(nt.templates):
+                errors.append({"ordinal": ordinal, "error": f"No card template {ordinal}"})
+                continue
+            tmpl = nt.templates[ordinal]
+            try:
+                front, back = self._renderer.compile((nt.id, ordinal, nt.mod), tmpl.front, tmpl.back)
+            except TemplateSyntaxError as e:
+                errors.append({"ordinal": ordinal, "error": e.message})
+                continue
+            template_index[ordinal] = len(templates)
+            templates.append((front, back, {"Type": nt.name, "Card": tmpl.name}))
+        
+        jobs: List[CardJob] = []
+        cards: List[Dict[str, Any]] = []
+        for note_index, fields in enumerate(notes):
+            card_ordinals = ordinals if ordinals is not None else cloze_ordinals(fields.values())
+            for ordinal in card_ordinals:
+                index = template_index.get(0 if nt.is_cloze else ordinal)
+                if index is None:
+                    continue
+                jobs.append((index, fields, ordinal))
+                cards.append({"note": note_index, "ordinal": ordinal})
         
-        # Replace {{FrontSide}} in back with rendered front
-        back = back.replace("{{FrontSide}}", front)
+        for card, (front_html, back_html) in zip(cards, render_cards(templates, jobs, workers=workers)):
+            card["front"] = front_html
+            card["back"] = back_html
         
         return {
-            "front": front,
-            "back": back,
-            "css": nt.css
+            "noteTypeId": nt.id,
+            "css": nt.css,
+            "cards": cards,
+            "errors": errors
         }
+    
+    def get_render_stats(self) -> Dict[str, Any]:
+        """Get statistics of the compiled card template cache.
+        
+        Returns:
+            Dictionary with entry count, hits and misses.
+        """
+        return self._renderer.get_stats()
 
 
 # Global service instance
@@ -526,5 +1183,5 @@ def init_note_type_service(mw: Optional["AnkiQt"] = None) -> NoteTypeService:
         Initialized NoteTypeService.
     """
     global _global_service
-    _global_service = NoteTypeService(mw)
+    _global_service = NoteTypeService(mw, search_index=get_search_index())
     return _global_service
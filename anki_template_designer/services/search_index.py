@@ -0,0 +1,469 @@
+"""Full-text search over designer templates and Anki note types.
+
+An inverted index maps terms to the documents containing them, kept
+separately per kind of term:
+
+    name     words of the template or note type name
+    text     words of the visible HTML text
+    class    class names, from HTML ``class`` attributes and CSS selectors
+    id       element ids, from HTML ``id`` attributes and CSS selectors
+    element  element names used in CSS selectors
+    field    field references such as ``{{Front}}``, ``{{cloze:Text}}``
+
+Documents are updated incrementally: re-indexing a document only
+touches the postings of terms that were added or removed, and is a
+no-op if its terms did not change.
+
+Query syntax: whitespace-separated terms, all of which must match.
+``kind:term`` restricts a term to one kind, ``term*`` matches a prefix,
+``"two words"`` quotes a term with spaces (field names), and
+``{{Field}}``, ``.class`` and ``#id`` are shorthands for the field,
+class and id kinds.
+"""
+
+import html
+import re
+import logging
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger("anki_template_designer.services.search_index")
+
+KINDS = ("name", "text", "class", "id", "element", "field")
+
+# Relevance weight of a match per kind
+_WEIGHTS = {"name": 4, "field": 3, "class": 2, "id": 2, "element": 1, "text": 1}
+
+DOC_TEMPLATE = "template"
+DOC_NOTE_TYPE = "noteType"
+
+Terms = Dict[str, Set[str]]
+
+_WORD_RE = re.compile(r"[^\W_]+")
+_MUSTACHE_RE = re.compile(r"\{\{\s*([^{}]+?)\s*\}\}")
+_ATTR_RE = re.compile(r"""\b(class|id)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]*>")
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+_CSS_BLOCK_RE = re.compile(r"([^{}]*)\{")
+_CSS_CLASS_RE = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+_CSS_ID_RE = re.compile(r"#(-?[_a-zA-Z][\w-]*)")
+_CSS_ELEMENT_RE = re.compile(r"(?:^|[\s>+~,(])([a-zA-Z][\w-]*)")
+_QUERY_RE = re.compile(r'(?:(\w+):)?("[^"]*"|\S+)')
+
+
+def empty_terms() -> Terms:
+    """Create an empty term set per kind."""
+    return {kind: set() for kind in KINDS}
+
+
+def add_words(terms: Terms, kind: str, text: str) -> None:
+    """Add the casefolded words of a string."""
+    terms[kind].update(w.casefold() for w in _WORD_RE.findall(text))
+
+
+def add_field_reference(terms: Terms, reference: str) -> None:
+    """Add the field name of a Mustache reference like ``#Front`` or ``cloze:Text``."""
+    name = reference.lstrip("#^/").strip()
+    name = name.rsplit(":", 1)[-1].strip()
+    if name:
+        terms["field"].add(name.casefold())
+
+
+def add_html(terms: Terms, markup: str) -> None:
+    """Add field references, classes, ids and text words of HTML."""
+    if not markup:
+        return
+    for reference in _MUSTACHE_RE.findall(markup):
+        add_field_reference(terms, reference)
+    for match in _ATTR_RE.finditer(markup):
+        kind = match.group(1).lower()
+        value = match.group(2) or match.group(3) or match.group(4) or ""
+        terms[kind].update(v.casefold() for v in value.split())
+    text = _TAG_RE.sub(" ", _MUSTACHE_RE.sub(" ", markup))
+    add_words(terms, "text", html.unescape(text))
+
+
+def add_css(terms: Terms, css: str) -> None:
+    """Add the classes, ids and element names used in CSS selectors."""
+    if not css:
+        return
+    css = _CSS_COMMENT_RE.sub(" ", css)
+    for prelude in _CSS_BLOCK_RE.findall(css):
+        prelude = prelude.strip()
+        if not prelude or prelude.startswith("@"):
+            continue
+        terms["class"].update(c.casefold() for c in _CSS_CLASS_RE.findall(prelude))
+        terms["id"].update(i.casefold() for i in _CSS_ID_RE.findall(prelude))
+        # Drop class/id/attribute parts so only bare element names remain
+        bare = re.sub(r"[.#][\w-]+|\[[^\]]*\]|::?[\w-]+(\([^)]*\))?", " ", prelude)
+        terms["element"].update(e.casefold() for e in _CSS_ELEMENT_RE.findall(bare))
+
+
+def _add_components(terms: Terms, components: Iterable[Dict[str, Any]]) -> None:
+    stack = list(components)
+    while stack:
+        component = stack.pop()
+        add_html(terms, component.get("content") or "")
+        if component.get("fieldName"):
+            terms["field"].add(component["fieldName"].casefold())
+        attributes = component.get("attributes") or {}
+        for kind in ("class", "id"):
+            value = attributes.get(kind)
+            if isinstance(value, str):
+                terms[kind].update(v.casefold() for v in value.split())
+        stack.extend(component.get("children") or [])
+
+
+def template_terms(data: Dict[str, Any]) -> Terms:
+    """Extract search terms from a serialized template (``Template.to_dict()``).
+
+    Args:
+        data: Serialized template.
+
+    Returns:
+        Terms per kind.
+    """
+    terms = empty_terms()
+    add_words(terms, "name", data.get("name") or "")
+    for side in ("front", "back"):
+        side_data = data.get(side) or {}
+        add_html(terms, side_data.get("html") or "")
+        _add_components(terms, side_data.get("components") or [])
+    add_css(terms, data.get("css") or "")
+    return terms
+
+
+def note_type_terms(note_type: Any) -> Terms:
+    """Extract search terms from a ``NoteType``.
+
+    Args:
+        note_type: Note type with name, templates and css.
+
+    Returns:
+        Terms per kind.
+    """
+    terms = empty_terms()
+    add_words(terms, "name", note_type.name or "")
+    for card in note_type.templates:
+        add_words(terms, "name", card.name or "")
+        add_html(terms, card.front)
+        add_html(terms, card.back)
+    add_css(terms, note_type.css)
+    return terms
+
+
+def parse_query(query: str) -> List[Tuple[Optional[str], str, bool]]:
+    """Split a query into (kind or None, term, is_prefix) tuples.
+
+    Words in an unqualified term are split into separate terms, since
+    names and text are indexed word by word.
+    """
+    parsed: List[Tuple[Optional[str], str, bool]] = []
+    for kind, raw in _QUERY_RE.findall(query):
+        kind = kind.lower() if kind else None
+        if kind is not None and kind not in KINDS:
+            # Not a kind prefix, e.g. "cloze:Text" - treat as a field reference
+            raw = f"{kind}:{raw}"
+            kind = None
+
+        quoted = raw.startswith('"') and raw.endswith('"') and len(raw) >= 2
+        if quoted:
+            raw = raw[1:-1]
+        prefix = raw.endswith("*") and not quoted
+        if prefix:
+            raw = raw[:-1]
+
+        mustache = _MUSTACHE_RE.fullmatch(raw)
+        if kind is None and mustache:
+            reference = empty_terms()
+            add_field_reference(reference, mustache.group(1))
+            parsed.extend(("field", term, prefix) for term in reference["field"])
+        elif kind is None and raw[:1] in ".#" and len(raw) > 1:
+            parsed.append(("class" if raw[0] == "." else "id", raw[1:].casefold(), prefix))
+        elif kind in ("field", "class", "id") or (quoted and kind is None):
+            if raw:
+                parsed.append((kind, raw.casefold(), prefix))
+        else:
+            words = [w.casefold() for w in _WORD_RE.findall(raw)]
+            for i, word in enumerate(words):
+                parsed.append((kind, word, prefix and i == len(words) - 1))
+    return parsed
+
+
+class SearchIndex:
+    """Incrementally maintained inverted index.
+
+    Document ids are ``"<type>:<id>"`` so templates and note types can
+    share one index.
+
+    Example:
+        index = SearchIndex()
+        index.update(DOC_TEMPLATE, template.id, template.name, template_terms(data))
+        hits = index.search("{{Front}} .card")
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        self._postings: Dict[str, Dict[str, Set[str]]] = {kind: {} for kind in KINDS}
+        self._sorted_terms: Dict[str, Optional[List[str]]] = {kind: None for kind in KINDS}
+        self._documents: Dict[str, Terms] = {}
+        self._titles: Dict[str, str] = {}
+        self._by_type: Dict[str, Set[str]] = {}
+        self._title_order: Optional[List[str]] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        """Get the number of indexed documents."""
+        return len(self._documents)
+
+    def __contains__(self, doc_key: str) -> bool:
+        """Check whether a document key (``"<type>:<id>"``) is indexed."""
+        return doc_key in self._documents
+
+    def count(self, doc_type: Optional[str] = None) -> int:
+        """Get the number of indexed documents, optionally of one type."""
+        with self._lock:
+            if doc_type is None:
+                return len(self._documents)
+            return len(self._by_type.get(doc_type, ()))
+
+    def ids(self, doc_type: str) -> List[str]:
+        """Get the ids of indexed documents of one type."""
+        start = len(doc_type) + 1
+        with self._lock:
+            return [key[start:] for key in self._by_type.get(doc_type, ())]
+
+    def update(self, doc_type: str, doc_id: Any, title: str, terms: Terms) -> bool:
+        """Add or re-index a document.
+
+        Args:
+            doc_type: Document type, e.g. ``DOC_TEMPLATE``.
+            doc_id: Document id within its type.
+            title: Display title returned with search hits.
+            terms: Terms per kind.
+
+        Returns:
+            True if any posting changed.
+        """
+        key = f"{doc_type}:{doc_id}"
+        with self._lock:
+            if self._titles.get(key) != title:
+                self._titles[key] = title
+                self._title_order = None
+            self._by_type.setdefault(doc_type, set()).add(key)
+            old = self._documents.get(key)
+            if old == terms:
+                return False
+
+            for kind in KINDS:
+                new_terms = terms.get(kind, set())
+                old_terms = old[kind] if old else set()
+                for term in old_terms - new_terms:
+                    self._remove_posting(kind, term, key)
+                for term in new_terms - old_terms:
+                    self._add_posting(kind, term, key)
+            self._documents[key] = {kind: set(terms.get(kind, ())) for kind in KINDS}
+            return True
+
+    def remove(self, doc_type: str, doc_id: Any) -> bool:
+        """Remove a document.
+
+        Args:
+            doc_type: Document type.
+            doc_id: Document id within its type.
+
+        Returns:
+            True if the document was indexed.
+        """
+        key = f"{doc_type}:{doc_id}"
+        with self._lock:
+            old = self._documents.pop(key, None)
+            if old is None:
+                return False
+            self._titles.pop(key, None)
+            self._by_type.get(doc_type, set()).discard(key)
+            self._title_order = None
+            for kind in KINDS:
+                for term in old[kind]:
+                    self._remove_posting(kind, term, key)
+            return True
+
+    def clear(self, doc_type: Optional[str] = None) -> None:
+        """Remove all documents, or all documents of one type."""
+        with self._lock:
+            if doc_type is None:
+                for kind in KINDS:
+                    self._postings[kind].clear()
+                    self._sorted_terms[kind] = None
+                self._documents.clear()
+                self._titles.clear()
+                self._by_type.clear()
+                self._title_order = None
+                return
+            for doc_id in self.ids(doc_type):
+                self.remove(doc_type, doc_id)
+
+    def search(
+        self,
+        query: str,
+        doc_type: Optional[str] = None,
+        limit: Optional[int] = 50
+    ) -> List[Dict[str, Any]]:
+        """Find documents matching every term of a query.
+
+        Args:
+            query: Query string (see module docstring).
+            doc_type: Only return documents of this type.
+            limit: Maximum number of hits, or None for all.
+
+        Returns:
+            Hits as {"type", "id", "title", "score", "matches"} dictionaries,
+            best first. ``matches`` lists the kinds that matched.
+        """
+        terms = parse_query(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            # Most selective terms first so the candidate set shrinks fast
+            lookups = [self._lookup(kind, term, prefix) for kind, term, prefix in terms]
+            lookups.sort(key=lambda hits: sum(len(docs) for docs in hits.values()))
+
+            candidates: Optional[Set[str]] = None
+            if doc_type is not None:
+                candidates = self._by_type.get(doc_type, set())
+            for hits in lookups:
+                if len(hits) == 1:
+                    docs = next(iter(hits.values()))
+                else:
+                    docs = set().union(*hits.values())
+                candidates = docs if candidates is None else candidates & docs
+                if not candidates:
+                    return []
+
+            # Group documents by score with set operations rather than
+            # scoring them one by one; broad queries match most documents
+            buckets: Dict[int, Set[str]] = {0: candidates}
+            for hits in lookups:
+                for kind, kind_docs in hits.items():
+                    weight = _WEIGHTS[kind]
+                    regrouped: Dict[int, Set[str]] = {}
+                    for score, bucket in buckets.items():
+                        inside = bucket & kind_docs
+                        outside = bucket - inside if len(inside) < len(bucket) else None
+                        for new_score, group in ((score + weight, inside), (score, outside)):
+                            if not group:
+                                continue
+                            if new_score in regrouped:
+                                regrouped[new_score] |= group
+                            else:
+                                regrouped[new_score] = group
+                    buckets = regrouped
+
+            ranked: List[Tuple[str, int]] = []
+            for score in sorted(buckets, reverse=True):
+                remaining = None if limit is None else limit - len(ranked)
+                if remaining is not None and remaining <= 0:
+                    break
+                ranked.extend((key, score) for key in self._by_title(buckets[score], remaining))
+
+            results = []
+            for key, score in ranked:
+                kind_name, _, doc_id = key.partition(":")
+                matches = {k for hits in lookups for k, docs in hits.items() if key in docs}
+                results.append({
+                    "type": kind_name,
+                    "id": doc_id,
+                    "title": self._titles.get(key, ""),
+                    "score": score,
+                    "matches": sorted(matches),
+                })
+            return results
+
+    def _by_title(self, keys: Set[str], limit: Optional[int]) -> List[str]:
+        """Order documents by title, stopping after limit. Caller holds the lock."""
+        if limit is None or len(keys) <= 4 * limit:
+            ordered = sorted(keys, key=lambda key: (self._titles.get(key, ""), key))
+            return ordered if limit is None else ordered[:limit]
+
+        # Large group: walk the cached title order until enough are found
+        if self._title_order is None:
+            self._title_order = sorted(self._titles, key=lambda key: (self._titles[key], key))
+        found = []
+        for key in self._title_order:
+            if key in keys:
+                found.append(key)
+                if len(found) >= limit:
+                    break
+        return found
+
+    def _lookup(self, kind: Optional[str], term: str, prefix: bool) -> Dict[str, Set[str]]:
+        """Find matching documents per kind. Caller holds the lock."""
+        kinds = KINDS if kind is None else (kind,)
+        hits: Dict[str, Set[str]] = {}
+        for k in kinds:
+            postings = self._postings[k]
+            if not prefix:
+                docs = postings.get(term)
+                if docs:
+                    hits[k] = docs
+                continue
+
+            sorted_terms = self._sorted_terms[k]
+            if sorted_terms is None:
+                sorted_terms = self._sorted_terms[k] = sorted(postings)
+            docs = set()
+            i = bisect_left(sorted_terms, term)
+            while i < len(sorted_terms) and sorted_terms[i].startswith(term):
+                docs |= postings[sorted_terms[i]]
+                i += 1
+            if docs:
+                hits[k] = docs
+        return hits
+
+    def _add_posting(self, kind: str, term: str, key: str) -> None:
+        postings = self._postings[kind]
+        docs = postings.get(term)
+        if docs is None:
+            postings[term] = {key}
+            self._sorted_terms[kind] = None
+        else:
+            docs.add(key)
+
+    def _remove_posting(self, kind: str, term: str, key: str) -> None:
+        postings = self._postings[kind]
+        docs = postings.get(term)
+        if docs is None:
+            return
+        docs.discard(key)
+        if not docs:
+            del postings[term]
+            self._sorted_terms[kind] = None
+
+
+# Global index shared by the template and note type services
+_global_index: Optional[SearchIndex] = None
+
+
+def get_search_index() -> SearchIndex:
+    """Get the global search index, creating it on first use.
+
+    Returns:
+        The shared SearchIndex.
+    """
+    global _global_index
+    if _global_index is None:
+        _global_index = SearchIndex()
+    return _global_index
+
+
+def init_search_index() -> SearchIndex:
+    """Initialize (or reset) the global search index.
+
+    Returns:
+        The new SearchIndex.
+    """
+    global _global_index
+    _global_index = SearchIndex()
+    return _global_index
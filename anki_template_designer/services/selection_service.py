@@ -5,6 +5,7 @@ Plan 12: Implements component selection, multi-selection, and selection events.
 """
 
 import logging
+import threading
 from dataclasses import dataclass, field
 from typing import Any, Callable, Dict, List, Optional, Set
 
@@ -75,6 +76,13 @@ class SelectionService:
     - Selection persistence
     - Selection change events
     
+    Thread safety: changes are serialised by a lock and never modify
+    the published state in place; each change builds a new
+    ``SelectionState`` and swaps it in. Readers take no lock and see
+    either the state before or after a change, never a mix. Listeners
+    are called after the lock is released, with copies of the states
+    before and after their change.
+    
     Example:
         service = SelectionService()
         
@@ -93,17 +101,14 @@ class SelectionService:
         self._state = SelectionState()
         self._listeners: List[SelectionChangeListener] = []
         self._component_order: List[str] = []  # For shift-select range
+        self._lock = threading.RLock()
         
         logger.debug("SelectionService initialized")
     
     @property
     def state(self) -> SelectionState:
         """Get current selection state (read-only copy)."""
-        return SelectionState(
-            selected_ids=self._state.selected_ids.copy(),
-            primary_id=self._state.primary_id,
-            selection_order=self._state.selection_order.copy()
-        )
+        return _copy_state(self._state)
     
     @property
     def selected_ids(self) -> List[str]:
@@ -145,8 +150,11 @@ class SelectionService:
         Args:
             listener: Function called with (old_state, new_state) on changes.
         """
-        if listener not in self._listeners:
-            self._listeners.append(listener)
+        with self._lock:
+            if listener in self._listeners:
+                return
+            # Replaced rather than mutated so notification can iterate unlocked
+            self._listeners = self._listeners + [listener]
             logger.debug(f"Added selection listener, total: {len(self._listeners)}")
     
     def remove_listener(self, listener: SelectionChangeListener) -> None:
@@ -155,20 +163,24 @@ class SelectionService:
         Args:
             listener: The listener to remove.
         """
-        if listener in self._listeners:
-            self._listeners.remove(listener)
+        with self._lock:
+            if listener not in self._listeners:
+                return
+            self._listeners = [l for l in self._listeners if l is not listener]
             logger.debug(f"Removed selection listener, total: {len(self._listeners)}")
     
     def _notify_listeners(self, old_state: SelectionState, new_state: SelectionState) -> None:
         """Notify all listeners of selection change.
         
+        Called without the lock held. Each listener gets its own copies.
+        
         Args:
             old_state: State before the change.
             new_state: State after the change.
         """
         for listener in self._listeners:
             try:
-                listener(old_state, new_state)
+                listener(_copy_state(old_state), _copy_state(new_state))
             except Exception as e:
                 logger.error(f"Error in selection listener: {e}")
     
@@ -196,18 +208,16 @@ class SelectionService:
         if not component_id:
             return False
         
-        old_state = self.state
-        
-        # Check if this is already the only selection
-        if (self._state.selected_ids == {component_id} and 
-            self._state.primary_id == component_id):
-            return False
-        
-        self._state.selected_ids = {component_id}
-        self._state.primary_id = component_id
-        self._state.selection_order = [component_id]
+        with self._lock:
+            old_state = self._state
+            
+            # Check if this is already the only selection
+            if (old_state.selected_ids == {component_id} and
+                old_state.primary_id == component_id):
+                return False
+            
+            new_state = self._state = _only(component_id)
         
-        new_state = self.state
         self._notify_listeners(old_state, new_state)
         
         logger.debug(f"Selected: {component_id}")
@@ -225,19 +235,15 @@ class SelectionService:
         if not component_id:
             return False
         
-        if component_id in self._state.selected_ids:
-            return False
-        
-        old_state = self.state
+        with self._lock:
+            old_state = self._state
+            if component_id in old_state.selected_ids:
+                return False
+            new_state = self._state = _with_added(old_state, component_id)
         
-        self._state.selected_ids.add(component_id)
-        self._state.primary_id = component_id
-        self._state.selection_order.append(component_id)
-        
-        new_state = self.state
         self._notify_listeners(old_state, new_state)
         
-        logger.debug(f"Added to selection: {component_id}, total: {self.count}")
+        logger.debug(f"Added to selection: {component_id}, total: {new_state.count()}")
         return True
     
     def remove_from_selection(self, component_id: str) -> bool:
@@ -252,27 +258,15 @@ class SelectionService:
         if not component_id:
             return False
         
-        if component_id not in self._state.selected_ids:
-            return False
-        
-        old_state = self.state
+        with self._lock:
+            old_state = self._state
+            if component_id not in old_state.selected_ids:
+                return False
+            new_state = self._state = _without(old_state, component_id)
         
-        self._state.selected_ids.discard(component_id)
-        
-        if component_id in self._state.selection_order:
-            self._state.selection_order.remove(component_id)
-        
-        # Update primary to last in order, or None
-        if self._state.primary_id == component_id:
-            if self._state.selection_order:
-                self._state.primary_id = self._state.selection_order[-1]
-            else:
-                self._state.primary_id = None
-        
-        new_state = self.state
         self._notify_listeners(old_state, new_state)
         
-        logger.debug(f"Removed from selection: {component_id}, remaining: {self.count}")
+        logger.debug(f"Removed from selection: {component_id}, remaining: {new_state.count()}")
         return True
     
     def toggle_selection(self, component_id: str) -> bool:
@@ -284,12 +278,21 @@ class SelectionService:
         Returns:
             True if component is now selected, False if deselected.
         """
-        if self.is_selected(component_id):
-            self.remove_from_selection(component_id)
-            return False
-        else:
-            self.add_to_selection(component_id)
-            return True
+        with self._lock:
+            old_state = self._state
+            selected = old_state.is_selected(component_id)
+            if not component_id:
+                return not selected
+            if selected:
+                new_state = _without(old_state, component_id)
+            else:
+                new_state = _with_added(old_state, component_id)
+            self._state = new_state
+        
+        self._notify_listeners(old_state, new_state)
+        
+        logger.debug(f"Toggled selection: {component_id}, selected: {not selected}")
+        return not selected
     
     def select_range(self, to_component_id: str) -> bool:
         """Select a range from primary to target (Shift+click behavior).
@@ -306,37 +309,33 @@ class SelectionService:
         if not to_component_id:
             return False
         
-        # If no component order or no primary, just select the component
-        if not self._component_order or not self._state.primary_id:
-            return self.select(to_component_id)
-        
-        try:
-            primary_idx = self._component_order.index(self._state.primary_id)
-            target_idx = self._component_order.index(to_component_id)
-        except ValueError:
-            # Component not in order, just add to selection
-            return self.add_to_selection(to_component_id)
-        
-        old_state = self.state
-        
-        # Get range indices
-        start_idx = min(primary_idx, target_idx)
-        end_idx = max(primary_idx, target_idx)
-        
-        # Select all components in range
-        range_ids = self._component_order[start_idx:end_idx + 1]
-        
-        for cid in range_ids:
-            self._state.selected_ids.add(cid)
-            if cid not in self._state.selection_order:
-                self._state.selection_order.append(cid)
+        order = self._component_order
+        with self._lock:
+            old_state = self._state
+            
+            # If no component order or no primary, just select the component
+            if not order or not old_state.primary_id:
+                fallback = self.select
+            else:
+                try:
+                    primary_idx = order.index(old_state.primary_id)
+                    target_idx = order.index(to_component_id)
+                    fallback = None
+                except ValueError:
+                    # Component not in order, just add to selection
+                    fallback = self.add_to_selection
+            
+            if fallback is None:
+                new_state = self._state = _with_range(
+                    old_state, order[min(primary_idx, target_idx):max(primary_idx, target_idx) + 1]
+                )
         
-        # Keep primary as is (the anchor for the range)
+        if fallback is not None:
+            return fallback(to_component_id)
         
-        new_state = self.state
         self._notify_listeners(old_state, new_state)
         
-        logger.debug(f"Selected range: {len(range_ids)} components")
+        logger.debug(f"Selected range: {new_state.count() - old_state.count()} components added")
         return True
     
     def select_all(self, component_ids: List[str]) -> bool:
@@ -351,13 +350,13 @@ class SelectionService:
         if not component_ids:
             return False
         
-        old_state = self.state
-        
-        self._state.selected_ids = set(component_ids)
-        self._state.selection_order = list(component_ids)
-        self._state.primary_id = component_ids[-1] if component_ids else None
-        
-        new_state = self.state
+        with self._lock:
+            old_state = self._state
+            new_state = self._state = SelectionState(
+                selected_ids=set(component_ids),
+                primary_id=component_ids[-1],
+                selection_order=list(component_ids)
+            )
         
         if old_state.selected_ids != new_state.selected_ids:
             self._notify_listeners(old_state, new_state)
@@ -372,12 +371,11 @@ class SelectionService:
         Returns:
             True if selection changed.
         """
-        if self._state.is_empty():
-            return False
-        
-        old_state = self.state
-        self._state.clear()
-        new_state = self.state
+        with self._lock:
+            old_state = self._state
+            if old_state.is_empty():
+                return False
+            new_state = self._state = SelectionState()
         
         self._notify_listeners(old_state, new_state)
         
@@ -394,19 +392,21 @@ class SelectionService:
         Returns:
             True if selection changed.
         """
-        old_state = self.state
-        
-        self._state.selected_ids = set(component_ids)
-        self._state.selection_order = list(component_ids)
-        
-        if primary_id and primary_id in self._state.selected_ids:
-            self._state.primary_id = primary_id
+        selected_ids = set(component_ids)
+        if primary_id and primary_id in selected_ids:
+            new_primary: Optional[str] = primary_id
         elif component_ids:
-            self._state.primary_id = component_ids[-1]
+            new_primary = component_ids[-1]
         else:
-            self._state.primary_id = None
+            new_primary = None
         
-        new_state = self.state
+        with self._lock:
+            old_state = self._state
+            new_state = self._state = SelectionState(
+                selected_ids=selected_ids,
+                primary_id=new_primary,
+                selection_order=list(component_ids)
+            )
         
         if (old_state.selected_ids != new_state.selected_ids or
             old_state.primary_id != new_state.primary_id):
@@ -425,29 +425,31 @@ class SelectionService:
         Returns:
             The newly selected component ID, or None if no change.
         """
-        if not self._component_order:
+        order = self._component_order
+        if not order:
             return None
         
+        primary_id = self._state.primary_id
         current_idx = -1
-        if self._state.primary_id:
+        if primary_id:
             try:
-                current_idx = self._component_order.index(self._state.primary_id)
+                current_idx = order.index(primary_id)
             except ValueError:
                 current_idx = -1
         
         new_idx: Optional[int] = None
         
         if direction == "next":
-            new_idx = min(current_idx + 1, len(self._component_order) - 1)
+            new_idx = min(current_idx + 1, len(order) - 1)
         elif direction == "prev":
             new_idx = max(current_idx - 1, 0) if current_idx > 0 else 0
         elif direction == "first":
             new_idx = 0
         elif direction == "last":
-            new_idx = len(self._component_order) - 1
+            new_idx = len(order) - 1
         
-        if new_idx is not None and 0 <= new_idx < len(self._component_order):
-            new_id = self._component_order[new_idx]
+        if new_idx is not None and 0 <= new_idx < len(order):
+            new_id = order[new_idx]
             self.select(new_id)
             return new_id
         
@@ -459,7 +461,7 @@ class SelectionService:
         Returns:
             Dictionary representation of selection state.
         """
-        return self._state.to_dict()
+        return _copy_state(self._state).to_dict()
     
     def restore_state(self, state_dict: Dict[str, Any]) -> None:
         """Restore selection from state dictionary.
@@ -467,15 +469,77 @@ class SelectionService:
         Args:
             state_dict: Dictionary from get_state_dict().
         """
-        old_state = self.state
-        self._state = SelectionState.from_dict(state_dict)
-        new_state = self.state
+        restored = SelectionState.from_dict(state_dict)
+        restored.selection_order = list(restored.selection_order)
+        with self._lock:
+            old_state = self._state
+            new_state = self._state = restored
         
         if old_state.selected_ids != new_state.selected_ids:
             self._notify_listeners(old_state, new_state)
             logger.debug("Selection state restored")
 
 
+def _copy_state(state: SelectionState) -> SelectionState:
+    """Copy a selection state so the caller may modify it."""
+    return SelectionState(
+        selected_ids=state.selected_ids.copy(),
+        primary_id=state.primary_id,
+        selection_order=state.selection_order.copy()
+    )
+
+
+def _only(component_id: str) -> SelectionState:
+    """Build a state with a single selected component."""
+    return SelectionState(
+        selected_ids={component_id},
+        primary_id=component_id,
+        selection_order=[component_id]
+    )
+
+
+def _with_added(state: SelectionState, component_id: str) -> SelectionState:
+    """Build a state with a component added and made primary."""
+    return SelectionState(
+        selected_ids=state.selected_ids | {component_id},
+        primary_id=component_id,
+        selection_order=state.selection_order + [component_id]
+    )
+
+
+def _with_range(state: SelectionState, range_ids: List[str]) -> SelectionState:
+    """Build a state with a range of components added.
+    
+    The primary is kept as is; it is the anchor of the range.
+    """
+    selection_order = state.selection_order.copy()
+    for cid in range_ids:
+        if cid not in state.selected_ids:
+            selection_order.append(cid)
+    return SelectionState(
+        selected_ids=state.selected_ids | set(range_ids),
+        primary_id=state.primary_id,
+        selection_order=selection_order
+    )
+
+
+def _without(state: SelectionState, component_id: str) -> SelectionState:
+    """Build a state with a component removed.
+    
+    The primary falls back to the last remaining component in selection
+    order, or None.
+    """
+    selection_order = [cid for cid in state.selection_order if cid != component_id]
+    primary_id = state.primary_id
+    if primary_id == component_id:
+        primary_id = selection_order[-1] if selection_order else None
+    return SelectionState(
+        selected_ids=state.selected_ids - {component_id},
+        primary_id=primary_id,
+        selection_order=selection_order
+    )
+
+
 # Global instance
 _selection_service: Optional[SelectionService] = None
 
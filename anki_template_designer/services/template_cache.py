@@ -0,0 +1,292 @@
+"""Bounded in-memory cache of loaded templates.
+
+Templates are cached by id up to a byte budget and evicted least
+recently used first. The size of a template is its serialized size
+(``Template.to_bytes()``), which is cheap to recompute after an edit
+since serialization is cached along clean subtrees.
+
+Each entry can carry a storage version token (see
+``TemplateStorage.version``) recorded when it was read, so callers can
+detect templates changed outside the process with one ``stat``.
+
+Pinned templates (the current template, templates not yet saved) are
+never evicted. Ids that were looked up and not found are remembered for
+a short time, so repeated lookups of missing templates do not go to
+storage.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from ..core.models import Template
+from .performance.cache import CacheStats
+
+logger = logging.getLogger("anki_template_designer.services.template_cache")
+
+
+class TemplateCache:
+    """LRU cache of templates with a byte budget.
+
+    Example:
+        cache = TemplateCache(max_bytes=16 * 1024 * 1024)
+        cache.put(template.id, template, pinned=True)
+        template = cache.get(template_id)
+        if template is None and not cache.is_missing(template_id):
+            ...  # load from storage
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        negative_ttl: float = 30.0,
+        max_negative: int = 1024
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            max_bytes: Byte budget for unpinned and pinned templates together.
+            negative_ttl: Seconds a missing id is remembered (0 disables).
+            max_negative: Maximum number of missing ids remembered.
+        """
+        self._max_bytes = max_bytes
+        self._negative_ttl = negative_ttl
+        self._max_negative = max_negative
+
+        self._entries: "OrderedDict[str, Template]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._versions: Dict[str, Any] = {}
+        self._pinned: Set[str] = set()
+        self._missing: "OrderedDict[str, float]" = OrderedDict()
+        self._size_bytes = 0
+        self._stats = CacheStats()
+        self._lock = threading.RLock()
+
+    @property
+    def max_bytes(self) -> int:
+        """Get the byte budget."""
+        return self._max_bytes
+
+    @property
+    def size_bytes(self) -> int:
+        """Get the total size of cached templates."""
+        return self._size_bytes
+
+    def __contains__(self, template_id: str) -> bool:
+        """Check whether a template is cached."""
+        return template_id in self._entries
+
+    def __len__(self) -> int:
+        """Get the number of cached templates."""
+        return len(self._entries)
+
+    def get(self, template_id: str) -> Optional[Template]:
+        """Get a cached template and mark it recently used.
+
+        Args:
+            template_id: The template's unique identifier.
+
+        Returns:
+            The cached Template, or None.
+        """
+        with self._lock:
+            template = self._entries.get(template_id)
+            if template is None:
+                self._stats.misses += 1
+                return None
+            self._entries.move_to_end(template_id)
+            self._stats.hits += 1
+            return template
+
+    def put(self, template_id: str, template: Template, pinned: Optional[bool] = None) -> None:
+        """Cache a template, or refresh its size after an edit.
+
+        Args:
+            template_id: The template's unique identifier.
+            template: The template.
+            pinned: Pin or unpin the template. Keeps the current pin state if None.
+        """
+        size = len(template.to_bytes())
+        with self._lock:
+            self._missing.pop(template_id, None)
+            self._size_bytes += size - self._sizes.get(template_id, 0)
+            self._entries[template_id] = template
+            self._entries.move_to_end(template_id)
+            self._sizes[template_id] = size
+            if pinned is True:
+                self._pinned.add(template_id)
+            elif pinned is False:
+                self._pinned.discard(template_id)
+            self._stats.entries = len(self._entries)
+            self._evict()
+
+    def ids(self) -> List[str]:
+        """Get the ids of all cached templates, least recently used first."""
+        with self._lock:
+            return list(self._entries)
+
+    def version_of(self, template_id: str) -> Any:
+        """Get the storage version recorded for a cached template.
+
+        Args:
+            template_id: The template's unique identifier.
+
+        Returns:
+            The version token, or None if none was recorded.
+        """
+        return self._versions.get(template_id)
+
+    def set_version(self, template_id: str, version: Any) -> None:
+        """Record the storage version of a cached template.
+
+        Ignored if the template is not cached.
+
+        Args:
+            template_id: The template's unique identifier.
+            version: Token from ``TemplateStorage.version``.
+        """
+        with self._lock:
+            if template_id in self._entries:
+                self._versions[template_id] = version
+
+    def remove(self, template_id: str) -> bool:
+        """Remove a template from the cache.
+
+        Args:
+            template_id: The template's unique identifier.
+
+        Returns:
+            True if the template was cached.
+        """
+        with self._lock:
+            self._pinned.discard(template_id)
+            return self._remove(template_id)
+
+    def pin(self, template_id: str) -> bool:
+        """Protect a cached template from eviction.
+
+        Args:
+            template_id: The template's unique identifier.
+
+        Returns:
+            True if the template is cached.
+        """
+        with self._lock:
+            if template_id not in self._entries:
+                return False
+            self._pinned.add(template_id)
+            return True
+
+    def unpin(self, template_id: str) -> None:
+        """Allow a template to be evicted again.
+
+        Args:
+            template_id: The template's unique identifier.
+        """
+        with self._lock:
+            self._pinned.discard(template_id)
+            self._evict()
+
+    def is_pinned(self, template_id: str) -> bool:
+        """Check whether a template is pinned."""
+        return template_id in self._pinned
+
+    def mark_missing(self, template_id: str) -> None:
+        """Remember that a template id does not exist in storage.
+
+        Args:
+            template_id: The missing template's id.
+        """
+        if self._negative_ttl <= 0:
+            return
+        with self._lock:
+            self._missing[template_id] = time.monotonic() + self._negative_ttl
+            self._missing.move_to_end(template_id)
+            while len(self._missing) > self._max_negative:
+                self._missing.popitem(last=False)
+
+    def is_missing(self, template_id: str) -> bool:
+        """Check whether a template id is known not to exist.
+
+        Args:
+            template_id: The template's unique identifier.
+
+        Returns:
+            True if the id was recently looked up and not found.
+        """
+        with self._lock:
+            expires = self._missing.get(template_id)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self._missing[template_id]
+                return False
+            return True
+
+    def forget_missing(self, template_id: Optional[str] = None) -> None:
+        """Drop negative entries, e.g. after templates were added externally.
+
+        Args:
+            template_id: Id to forget, or None to forget all.
+        """
+        with self._lock:
+            if template_id is None:
+                self._missing.clear()
+            else:
+                self._missing.pop(template_id, None)
+
+    def clear(self) -> int:
+        """Remove all templates and negative entries, including pinned ones.
+
+        Returns:
+            Number of templates removed.
+        """
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._sizes.clear()
+            self._versions.clear()
+            self._pinned.clear()
+            self._missing.clear()
+            self._size_bytes = 0
+            self._stats.entries = 0
+            return count
+
+    def get_stats(self) -> CacheStats:
+        """Get cache statistics.
+
+        Returns:
+            CacheStats with hits, misses, entries, size and evictions.
+        """
+        with self._lock:
+            return CacheStats(
+                hits=self._stats.hits,
+                misses=self._stats.misses,
+                entries=len(self._entries),
+                size_bytes=self._size_bytes,
+                evictions=self._stats.evictions,
+            )
+
+    def _remove(self, template_id: str) -> bool:
+        """Remove an entry. Caller holds the lock."""
+        if self._entries.pop(template_id, None) is None:
+            return False
+        self._size_bytes -= self._sizes.pop(template_id, 0)
+        self._versions.pop(template_id, None)
+        self._stats.entries = len(self._entries)
+        return True
+
+    def _evict(self) -> None:
+        """Evict unpinned entries, oldest first, until within budget. Caller holds the lock."""
+        if self._size_bytes <= self._max_bytes:
+            return
+        for template_id in list(self._entries):
+            if self._size_bytes <= self._max_bytes:
+                break
+            if template_id in self._pinned:
+                continue
+            self._remove(template_id)
+            self._stats.evictions += 1
+            logger.debug(f"Evicted template from cache: {template_id}")
@@ -0,0 +1,372 @@
+"""Per-template version history.
+
+Each template has an append-only log (``<id>.jsonl``), one record per
+saved version. Every ``snapshot_interval`` records the full template is
+stored; the records in between hold the ``TemplatePatch`` from the
+previous version, so history grows with the size of the edits rather
+than the size of the template.
+
+Any version is rebuilt by replaying at most ``snapshot_interval - 1``
+patches from the nearest earlier snapshot. Record offsets are indexed
+on first access, so only those lines are read.
+
+Compaction keeps the newest ``keep_recent`` versions intact and thins
+older history down to sparse snapshots.
+"""
+
+import json
+import os
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ..core.exceptions import TemplatePatchError
+from ..core.models import Template
+from ..core.template_diff import TemplatePatch, apply_patch, diff_templates
+
+logger = logging.getLogger("anki_template_designer.services.template_history")
+
+# Errors raised when a history log cannot be read or replayed
+HISTORY_ERRORS = (IOError, OSError, ValueError, KeyError, TypeError, TemplatePatchError)
+
+
+@dataclass
+class HistoryEntry:
+    """One recorded version of a template.
+
+    Attributes:
+        version: Template version number.
+        saved_at: When the version was recorded.
+        snapshot: Whether the full template is stored (else a patch).
+        offset: Byte offset of the record in the log.
+        size: Size of the record in bytes.
+    """
+    version: int
+    saved_at: str
+    snapshot: bool
+    offset: int
+    size: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary."""
+        return {
+            "version": self.version,
+            "savedAt": self.saved_at,
+            "snapshot": self.snapshot,
+            "size": self.size,
+        }
+
+
+class TemplateHistory:
+    """Append-only version logs for templates.
+
+    Example:
+        history = TemplateHistory(os.path.join(addon_dir, "template_history"))
+        history.record(template.id, template.to_bytes())
+        old = history.get_version(template_id, 3)
+    """
+
+    EXTENSION = ".jsonl"
+
+    def __init__(
+        self,
+        history_dir: str,
+        snapshot_interval: int = 20,
+        keep_recent: int = 200,
+        max_cached: int = 64
+    ) -> None:
+        """Initialize the history store.
+
+        Args:
+            history_dir: Directory of the logs. Created if missing.
+            snapshot_interval: Records per full snapshot; bounds replay.
+            keep_recent: Versions kept intact by compaction, which runs
+                automatically once a log holds twice as many records.
+            max_cached: Templates whose latest version is kept in memory
+                to diff the next save against.
+        """
+        if snapshot_interval < 1:
+            raise ValueError("snapshot_interval must be at least 1")
+        self._dir = history_dir
+        self._snapshot_interval = snapshot_interval
+        self._keep_recent = keep_recent
+        self._max_cached = max_cached
+        self._entries: Dict[str, List[HistoryEntry]] = {}
+        self._latest: "OrderedDict[str, Template]" = OrderedDict()
+        self._lock = threading.RLock()
+        os.makedirs(history_dir, exist_ok=True)
+
+    @property
+    def location(self) -> str:
+        """Get the history directory."""
+        return self._dir
+
+    def path_for(self, template_id: str) -> str:
+        """Get the log path of a template."""
+        safe_id = "".join(c for c in template_id if c.isalnum() or c in "-_")
+        return os.path.join(self._dir, f"{safe_id}{self.EXTENSION}")
+
+    def record(self, template_id: str, payload: bytes) -> bool:
+        """Append a saved version of a template to its history.
+
+        Args:
+            template_id: The template's unique identifier.
+            payload: Serialized template (``Template.to_bytes()``).
+
+        Returns:
+            True if a record was appended; False if nothing changed
+            since the last recorded version.
+        """
+        with self._lock:
+            try:
+                return self._record(template_id, Template.from_dict(json.loads(payload)))
+            except HISTORY_ERRORS as e:
+                # History must never fail the save that triggered it
+                logger.error(f"Failed to record history of {template_id}: {e}")
+                return False
+
+    def _record(self, template_id: str, current: Template) -> bool:
+        """Append a version. Caller holds the lock."""
+        try:
+            entries = self._load_entries(template_id)
+            previous = self._latest_version(template_id, entries) if entries else None
+        except HISTORY_ERRORS as e:
+            # Set the damaged log aside and start a new chain
+            logger.error(f"History of {template_id} unreadable, starting a new log: {e}")
+            path = self.path_for(template_id)
+            if os.path.exists(path):
+                os.replace(path, f"{path}.corrupt")
+            entries, previous = [], None
+            self._entries[template_id] = entries
+
+        since_snapshot = 0
+        for entry in reversed(entries):
+            if entry.snapshot:
+                break
+            since_snapshot += 1
+
+        record: Dict[str, Any] = {
+            "version": current.version,
+            "savedAt": datetime.now().isoformat(),
+        }
+        if previous is None or since_snapshot + 1 >= self._snapshot_interval:
+            if previous is not None and diff_templates(previous, current).is_empty:
+                return False
+            record["snapshot"] = current.to_dict()
+        else:
+            patch = diff_templates(previous, current)
+            if patch.is_empty:
+                return False
+            record["patch"] = patch.to_dict()
+
+        self._append(template_id, entries, record)
+        self._remember(template_id, current)
+
+        if len(entries) >= max(2 * self._keep_recent, self._snapshot_interval):
+            self.compact(template_id)
+        return True
+
+    def list_versions(self, template_id: str) -> List[HistoryEntry]:
+        """List recorded versions, newest first.
+
+        Args:
+            template_id: The template's unique identifier.
+
+        Returns:
+            History entries.
+        """
+        with self._lock:
+            try:
+                return list(reversed(self._load_entries(template_id)))
+            except HISTORY_ERRORS as e:
+                logger.error(f"Failed to read history of {template_id}: {e}")
+                return []
+
+    def get_version(self, template_id: str, version: int) -> Optional[Template]:
+        """Rebuild a recorded version.
+
+        Args:
+            template_id: The template's unique identifier.
+            version: Version number. If recorded more than once, the
+                latest record wins.
+
+        Returns:
+            The template as it was at that version, or None if unknown.
+        """
+        with self._lock:
+            try:
+                entries = self._load_entries(template_id)
+                for position in range(len(entries) - 1, -1, -1):
+                    if entries[position].version == version:
+                        return self._replay(template_id, entries, position)
+            except HISTORY_ERRORS as e:
+                logger.error(f"Failed to rebuild {template_id} v{version}: {e}")
+            return None
+
+    def compact(self, template_id: str, keep_recent: Optional[int] = None) -> int:
+        """Thin old history down to its snapshots.
+
+        The newest ``keep_recent`` versions stay replayable; of older
+        versions only snapshots at least ``keep_recent`` versions apart
+        are kept, as sparse checkpoints.
+
+        Args:
+            template_id: The template's unique identifier.
+            keep_recent: Versions to keep intact. Defaults to the
+                configured value.
+
+        Returns:
+            Number of records removed.
+        """
+        keep = self._keep_recent if keep_recent is None else keep_recent
+        with self._lock:
+            try:
+                entries = self._load_entries(template_id)
+                cutoff = max(0, len(entries) - keep)
+                if cutoff == 0:
+                    return 0
+
+                records = []
+                last_checkpoint: Optional[int] = None
+                for position, entry in enumerate(entries):
+                    if position < cutoff:
+                        if not entry.snapshot:
+                            continue
+                        if (last_checkpoint is not None
+                                and entry.version - last_checkpoint < max(keep, 1)):
+                            continue
+                        last_checkpoint = entry.version
+                    record = self._read_record(template_id, entry)
+                    if position == cutoff and not entry.snapshot:
+                        # The kept tail must start from a full snapshot
+                        record.pop("patch")
+                        record["snapshot"] = self._replay(template_id, entries, position).to_dict()
+                    records.append(record)
+            except HISTORY_ERRORS as e:
+                logger.error(f"Failed to compact history of {template_id}: {e}")
+                return 0
+
+            self._rewrite(template_id, records)
+            removed = len(entries) - len(records)
+            logger.debug(f"Compacted history of {template_id}: {removed} records removed")
+            return removed
+
+    def purge(self, template_id: str) -> bool:
+        """Delete a template's history.
+
+        Returns:
+            True if a log existed.
+        """
+        with self._lock:
+            self._entries.pop(template_id, None)
+            self._latest.pop(template_id, None)
+            path = self.path_for(template_id)
+            if not os.path.exists(path):
+                return False
+            os.remove(path)
+            return True
+
+    def _load_entries(self, template_id: str) -> List[HistoryEntry]:
+        """Index a log's records, dropping a torn final line. Caller holds the lock."""
+        entries = self._entries.get(template_id)
+        if entries is not None:
+            return entries
+
+        entries = []
+        path = self.path_for(template_id)
+        if os.path.exists(path):
+            good_end = 0
+            with open(path, "rb") as f:
+                offset = 0
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    record = json.loads(line)
+                    entries.append(HistoryEntry(
+                        version=record["version"],
+                        saved_at=record.get("savedAt", ""),
+                        snapshot="snapshot" in record,
+                        offset=offset,
+                        size=len(line),
+                    ))
+                    offset += len(line)
+                    good_end = offset
+            if good_end != os.path.getsize(path):
+                logger.warning(f"Truncating torn record in history of {template_id}")
+                with open(path, "r+b") as f:
+                    f.truncate(good_end)
+
+        self._entries[template_id] = entries
+        return entries
+
+    def _read_record(self, template_id: str, entry: HistoryEntry) -> Dict[str, Any]:
+        with open(self.path_for(template_id), "rb") as f:
+            f.seek(entry.offset)
+            return json.loads(f.read(entry.size))
+
+    def _replay(self, template_id: str, entries: List[HistoryEntry], position: int) -> Template:
+        """Rebuild the version at ``position`` from the nearest snapshot."""
+        start = position
+        while not entries[start].snapshot:
+            start -= 1
+            if start < 0:
+                raise ValueError(f"History of {template_id} has no base snapshot")
+
+        first, last = entries[start], entries[position]
+        with open(self.path_for(template_id), "rb") as f:
+            f.seek(first.offset)
+            lines = f.read(last.offset + last.size - first.offset).splitlines()
+
+        template = Template.from_dict(json.loads(lines[0])["snapshot"])
+        for line in lines[1:]:
+            apply_patch(template, TemplatePatch.from_dict(json.loads(line)["patch"]))
+        return template
+
+    def _latest_version(self, template_id: str, entries: List[HistoryEntry]) -> Template:
+        latest = self._latest.get(template_id)
+        if latest is None:
+            latest = self._replay(template_id, entries, len(entries) - 1)
+            self._remember(template_id, latest)
+        else:
+            self._latest.move_to_end(template_id)
+        return latest
+
+    def _remember(self, template_id: str, template: Template) -> None:
+        self._latest[template_id] = template
+        self._latest.move_to_end(template_id)
+        while len(self._latest) > self._max_cached:
+            self._latest.popitem(last=False)
+
+    def _append(self, template_id: str, entries: List[HistoryEntry], record: Dict[str, Any]) -> None:
+        line = (json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+        path = self.path_for(template_id)
+        with open(path, "ab") as f:
+            offset = f.tell()
+            f.write(line)
+        entries.append(HistoryEntry(
+            version=record["version"],
+            saved_at=record["savedAt"],
+            snapshot="snapshot" in record,
+            offset=offset,
+            size=len(line),
+        ))
+
+    def _rewrite(self, template_id: str, records: List[Dict[str, Any]]) -> None:
+        """Atomically replace a log with the given records."""
+        path = self.path_for(template_id)
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                for record in records:
+                    f.write((json.dumps(record, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8"))
+            os.replace(temp_path, path)
+        except (IOError, OSError):
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            # Offsets changed; re-index on next access
+            self._entries.pop(template_id, None)
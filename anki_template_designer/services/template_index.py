@@ -0,0 +1,268 @@
+"""Metadata index for stored templates.
+
+Keeps the id, name and timestamps of every stored template in a single
+JSON file so listing templates does not need to open and parse each
+template. Entries remember the file's mtime, size and inode; a refresh stats
+the storage directory and only re-reads files whose stat changed, so
+templates edited or copied in from outside are picked up as well.
+
+Updates are kept in memory and written out lazily: a stale index file
+is harmless because the next refresh re-validates every entry.
+"""
+
+import json
+import os
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from ..core.exceptions import InvalidFormatError
+
+logger = logging.getLogger("anki_template_designer.services.template_index")
+
+# Metadata fields copied from template data into the index
+_METADATA_KEYS = ("name", "modifiedAt", "createdAt", "noteType")
+
+
+class TemplateIndex:
+    """Persistent index of template metadata.
+
+    Example:
+        index = TemplateIndex(path)
+        index.refresh(storage_path, (".json",), read_data)
+        index.save()
+        page = index.query(offset=0, limit=50, sort="name")
+    """
+
+    FORMAT_VERSION = 2
+    SORT_KEYS = ("modifiedAt", "createdAt", "name")
+
+    def __init__(self, index_path: str) -> None:
+        """Initialize the index.
+
+        Args:
+            index_path: Path of the index file.
+        """
+        self._path = index_path
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._dirty = False
+
+    @property
+    def path(self) -> str:
+        """Get the index file path."""
+        return self._path
+    
+    @property
+    def is_dirty(self) -> bool:
+        """Whether the in-memory index differs from the index file."""
+        return self._dirty
+
+    def __len__(self) -> int:
+        """Get the number of indexed templates."""
+        self._ensure_loaded()
+        return len(self._entries)
+
+    def __contains__(self, template_id: str) -> bool:
+        """Check whether a template is indexed."""
+        self._ensure_loaded()
+        return template_id in self._entries
+
+    def get(self, template_id: str) -> Optional[Dict[str, Any]]:
+        """Get the index entry for a template.
+
+        Args:
+            template_id: The template's unique identifier.
+
+        Returns:
+            Entry dictionary, or None if not indexed.
+        """
+        self._ensure_loaded()
+        return self._entries.get(template_id)
+
+    def update(self, template_id: str, file_path: str, data: Dict[str, Any]) -> None:
+        """Record metadata for a template that was just written.
+
+        Args:
+            template_id: The template's unique identifier.
+            file_path: Path of the stored template file.
+            data: Serialized template (``Template.to_dict()``).
+        """
+        self._ensure_loaded()
+        stat = os.stat(file_path)
+        self._entries[template_id] = _make_entry(
+            os.path.basename(file_path), stat.st_mtime_ns, stat.st_size, stat.st_ino, data
+        )
+        self._dirty = True
+
+    def remove(self, template_id: str) -> bool:
+        """Remove a template from the index.
+
+        Args:
+            template_id: The template's unique identifier.
+
+        Returns:
+            True if the template was indexed.
+        """
+        self._ensure_loaded()
+        removed = self._entries.pop(template_id, None) is not None
+        self._dirty = self._dirty or removed
+        return removed
+
+    def refresh(
+        self,
+        storage_path: str,
+        extensions: Sequence[str],
+        read_data: Callable[[str], Dict[str, Any]]
+    ) -> bool:
+        """Bring the index up to date with the storage directory.
+
+        Files are matched by name, mtime, size and inode; only new or changed
+        files are read. If a template exists under several extensions,
+        the first extension in ``extensions`` wins.
+
+        Args:
+            storage_path: Template storage directory.
+            extensions: Template file extensions, in order of preference.
+            read_data: Reads and decodes a template file.
+
+        Returns:
+            True if the index changed.
+        """
+        self._ensure_loaded()
+
+        found: Dict[str, os.DirEntry] = {}
+        rank: Dict[str, int] = {}
+        with os.scandir(storage_path) as it:
+            for entry in it:
+                for position, extension in enumerate(extensions):
+                    if entry.name.endswith(extension):
+                        template_id = entry.name[:-len(extension)]
+                        if template_id not in rank or position < rank[template_id]:
+                            found[template_id] = entry
+                            rank[template_id] = position
+                        break
+
+        changed = False
+        for template_id in list(self._entries):
+            if template_id not in found:
+                del self._entries[template_id]
+                changed = True
+
+        for template_id, entry in found.items():
+            stat = entry.stat()
+            current = self._entries.get(template_id)
+            if (current is not None and current["file"] == entry.name
+                    and current["mtimeNs"] == stat.st_mtime_ns
+                    and current["size"] == stat.st_size
+                    and current["ino"] == entry.inode()):
+                continue
+
+            try:
+                data = read_data(entry.path)
+            except (IOError, OSError, json.JSONDecodeError, UnicodeDecodeError,
+                    InvalidFormatError, KeyError) as e:
+                logger.warning(f"Skipping unreadable template {entry.name}: {e}")
+                if self._entries.pop(template_id, None) is not None:
+                    changed = True
+                continue
+
+            self._entries[template_id] = _make_entry(
+                entry.name, stat.st_mtime_ns, stat.st_size, entry.inode(), data
+            )
+            changed = True
+
+        self._dirty = self._dirty or changed
+        return changed
+
+    def query(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        sort: str = "modifiedAt",
+        reverse: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        """Get a page of template metadata.
+
+        Args:
+            offset: Number of entries to skip.
+            limit: Maximum number of entries, or None for all.
+            sort: Sort key: "modifiedAt", "createdAt" or "name".
+            reverse: Sort descending. Defaults to newest first for
+                timestamps and A-Z for names.
+
+        Returns:
+            List of {"id", "name", "modifiedAt"} dictionaries.
+        """
+        if sort not in self.SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        if reverse is None:
+            reverse = sort != "name"
+
+        self._ensure_loaded()
+        if sort == "name":
+            key = lambda item: (item[1]["name"].casefold(), item[0])
+        else:
+            key = lambda item: (item[1][sort], item[0])
+
+        items = sorted(self._entries.items(), key=key, reverse=reverse)
+        end = None if limit is None else offset + limit
+        return [
+            {"id": template_id, "name": entry["name"], "modifiedAt": entry["modifiedAt"]}
+            for template_id, entry in items[offset:end]
+        ]
+
+    def load(self) -> None:
+        """Load the index file, starting empty if missing or invalid."""
+        self._loaded = True
+        self._entries = {}
+        if not os.path.exists(self._path):
+            return
+
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (IOError, OSError, json.JSONDecodeError, UnicodeDecodeError) as e:
+            logger.warning(f"Ignoring unreadable template index: {e}")
+            return
+
+        if not isinstance(data, dict) or data.get("format") != self.FORMAT_VERSION:
+            logger.info("Template index format changed, rebuilding")
+            return
+        self._entries = data.get("entries", {})
+
+    def save(self) -> bool:
+        """Write the index file atomically.
+
+        Returns:
+            True if the index was written.
+        """
+        self._ensure_loaded()
+        temp_path = f"{self._path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"format": self.FORMAT_VERSION, "entries": self._entries},
+                    f, ensure_ascii=False, separators=(",", ":")
+                )
+            os.replace(temp_path, self._path)
+            self._dirty = False
+            return True
+        except (IOError, OSError) as e:
+            logger.error(f"Failed to save template index: {e}")
+            return False
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+
+def _make_entry(filename: str, mtime_ns: int, size: int, inode: int,
+                data: Dict[str, Any]) -> Dict[str, Any]:
+    """Build an index entry from template data and file stat."""
+    entry: Dict[str, Any] = {"file": filename, "mtimeNs": mtime_ns, "size": size, "ino": inode}
+    for key in _METADATA_KEYS:
+        entry[key] = data.get(key)
+    entry["name"] = entry["name"] or "Untitled Template"
+    entry["modifiedAt"] = entry["modifiedAt"] or ""
+    entry["createdAt"] = entry["createdAt"] or ""
+    return entry
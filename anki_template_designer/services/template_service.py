@@ -6,12 +6,27 @@ and Anki integration.
 
 import json
 import os
+import time
 import logging
-from typing import Dict, List, Optional
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
 from datetime import datetime
 from pathlib import Path
 
 from ..core.models import Template
+from .bulk_transfer import (
+    BulkItemError, BulkResult, count_sources, iter_sources, parse_parallel, write_archive,
+)
+from .blob_store import BlobStore
+from .performance.metrics import MetricsTracker
+from .search_index import DOC_TEMPLATE, SearchIndex, template_terms
+from .template_cache import TemplateCache
+from .template_history import TemplateHistory
+from .template_storage import (
+    READ_ERRORS, WRITE_ERRORS, DedupTemplateStorage, FileTemplateStorage,
+    SQLiteTemplateStorage, TemplateStorage, import_templates,
+)
+from .write_behind import WriteBehindQueue
 
 logger = logging.getLogger("anki_template_designer.services.template_service")
 
@@ -20,38 +35,182 @@ class TemplateService:
     """Service for managing templates.
     
     Handles loading, saving, and managing templates with
-    local file storage and Anki integration.
+    local storage and Anki integration.
+    
+    Storage is delegated to a backend from ``template_storage``. The
+    default "file" backend keeps one file per template, as indented
+    JSON or in the compact binary format from ``core.binary_format``;
+    both formats are always readable and the configured format only
+    decides how templates are written. Template metadata is kept in an
+    index file next to the storage directory, so listing templates does
+    not load them. The "sqlite" backend keeps everything in one
+    database; ``import_from`` copies an existing directory into it.
+    
+    Loaded templates are kept in a ``TemplateCache`` bounded by a byte
+    budget; the current template, unsaved templates and templates whose
+    save is still queued for writing are pinned, and
+    ids that were not found are remembered for ``negative_cache_ttl``
+    seconds. Cached templates are validated against a storage version
+    token on each access (one ``stat`` for the file backend) and
+    reloaded if they were changed outside the service; ``refresh()``
+    does the same for every cached template, and ``start_watcher()``
+    runs it periodically.
+    
+    Files are written atomically (temp file plus ``os.replace``). With
+    ``write_behind`` enabled, saves return immediately and are written
+    on a background thread; repeated saves of one template within the
+    debounce window are coalesced. Call ``flush()`` to wait for pending
+    writes and ``shutdown()`` before exit. A background write that still
+    fails after its retries leaves the template unsaved and pinned, and
+    is reported to write error listeners and in ``get_write_stats()``.
+    
+    Threading: live ``Template`` objects belong to the UI thread, which
+    edits them in place; other threads must not read or modify them.
+    Operations that change which templates are cached, unsaved or
+    current (create, get, load, save, delete, restore) are serialised
+    by one lock, so bridge calls, plugin hooks and the watcher never
+    interleave with the UI thread's edits. Background readers use
+    ``get_template_snapshot()``, ``list_templates()`` or
+    ``bulk_export()``: they read the queued write or storage and
+    return detached copies of the last saved state, without taking
+    that lock. Storage access is serialised separately, and the
+    write-behind thread never takes the service lock, so waiting for
+    it while holding the lock cannot deadlock.
     
     Attributes:
-        storage_path: Path to template storage directory.
+        storage_path: Template storage directory, or database file.
+        storage_format: Format used when writing template files.
     """
     
     TEMPLATES_DIR = "templates"
-    TEMPLATE_EXTENSION = ".json"
+    INDEX_FILE = "template_index.json"
+    DATABASE_FILE = "templates.db"
+    BLOBS_DIR = "template_blobs"
+    HISTORY_DIR = "template_history"
+    TEMPLATE_EXTENSION = FileTemplateStorage.TEMPLATE_EXTENSION
+    BINARY_EXTENSION = FileTemplateStorage.BINARY_EXTENSION
+    FORMAT_JSON = FileTemplateStorage.FORMAT_JSON
+    FORMAT_BINARY = FileTemplateStorage.FORMAT_BINARY
+    STORAGE_FORMATS = FileTemplateStorage.STORAGE_FORMATS
+    BACKEND_FILE = "file"
+    BACKEND_SQLITE = "sqlite"
+    BACKENDS = (BACKEND_FILE, BACKEND_SQLITE)
     
-    def __init__(self, addon_dir: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        addon_dir: Optional[str] = None,
+        storage_format: str = FORMAT_JSON,
+        compress: bool = False,
+        write_behind: bool = False,
+        debounce_seconds: float = 0.5,
+        metrics: Optional[MetricsTracker] = None,
+        backend: str = BACKEND_FILE,
+        storage: Optional[TemplateStorage] = None,
+        cache_max_bytes: int = 32 * 1024 * 1024,
+        negative_cache_ttl: float = 30.0,
+        validate_cache: bool = True,
+        search_index: Optional[SearchIndex] = None,
+        dedup: bool = False,
+        history: bool = False
+    ) -> None:
         """Initialize the template service.
         
         Args:
             addon_dir: Base addon directory. If None, uses current module's parent.
+            storage_format: Format for written templates ("json" or "binary").
+                Only used by the file backend.
+            compress: Whether binary templates are zlib-compressed.
+            write_behind: Write saves on a background thread.
+            debounce_seconds: Coalescing window for background writes.
+            metrics: Tracker for write metrics. A private one is created if None.
+            backend: Storage backend, "file" or "sqlite".
+            storage: Custom backend instance. Overrides ``backend``.
+            cache_max_bytes: Byte budget of the in-memory template cache.
+            negative_cache_ttl: Seconds a missing template id is remembered.
+            validate_cache: Check cached templates for external changes on access.
+            search_index: Index to keep templates in. A private one is created
+                if None; pass a shared one to search note types too.
+            dedup: Store CSS and component subtrees once, by content hash,
+                so duplicated templates share them until modified.
+            history: Keep a version history of every template saved.
         """
+        if storage_format not in self.STORAGE_FORMATS:
+            raise ValueError(f"Unknown storage format: {storage_format}")
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown storage backend: {backend}")
+        
         if addon_dir is None:
             addon_dir = str(Path(__file__).parent.parent)
         
+        if storage is None:
+            if backend == self.BACKEND_SQLITE:
+                storage = SQLiteTemplateStorage(os.path.join(addon_dir, self.DATABASE_FILE))
+            else:
+                storage = FileTemplateStorage(
+                    os.path.join(addon_dir, self.TEMPLATES_DIR),
+                    os.path.join(addon_dir, self.INDEX_FILE),
+                    storage_format=storage_format,
+                    compress=compress,
+                )
+            if dedup:
+                storage = DedupTemplateStorage(
+                    storage, BlobStore(os.path.join(addon_dir, self.BLOBS_DIR))
+                )
+        
         self._addon_dir = addon_dir
-        self._storage_path = os.path.join(addon_dir, self.TEMPLATES_DIR)
-        self._templates: Dict[str, Template] = {}
+        self._storage = storage
+        self._templates = TemplateCache(cache_max_bytes, negative_ttl=negative_cache_ttl)
+        self._unsaved: Set[str] = set()
         self._current_template: Optional[Template] = None
+        self._validate_cache = validate_cache
+        # Lock order: _lock before _io_lock; the writer thread takes only _io_lock
+        # and _pin_lock, which guards unsaved/pinned state and is never held while waiting
+        self._lock = threading.RLock()
+        self._io_lock = threading.RLock()
+        self._pin_lock = threading.RLock()
+        self._write_errors: Dict[str, str] = {}
+        self._write_error_listeners: List[Callable[[str, str], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_stop = threading.Event()
+        self._search_index = search_index if search_index is not None else SearchIndex()
+        self._search_built = False
+        self._history: Optional[TemplateHistory] = None
+        if history:
+            self._history = TemplateHistory(os.path.join(addon_dir, self.HISTORY_DIR))
+        self._write_queue: Optional[WriteBehindQueue] = None
+        if write_behind:
+            self._write_queue = WriteBehindQueue(
+                self._write_serialized,
+                debounce_seconds=debounce_seconds,
+                metrics=metrics,
+                name="template_service.write",
+                on_error=self._on_write_failed,
+            )
         
-        # Ensure storage directory exists
-        os.makedirs(self._storage_path, exist_ok=True)
-        
-        logger.debug(f"TemplateService initialized. Storage: {self._storage_path}")
+        logger.debug(f"TemplateService initialized. Storage: {storage.location}")
+    
+    @property
+    def storage(self) -> TemplateStorage:
+        """Get the storage backend."""
+        return self._storage
     
     @property
     def storage_path(self) -> str:
-        """Get the template storage path."""
-        return self._storage_path
+        """Get the template storage directory or database file."""
+        return self._storage.location
+    
+    @property
+    def storage_format(self) -> Optional[str]:
+        """Get the format used when writing template files.
+        
+        None for backends that do not store individual files.
+        """
+        return getattr(self._manifest_storage(), "storage_format", None)
+    
+    @property
+    def write_queue(self) -> Optional[WriteBehindQueue]:
+        """Get the write-behind queue, or None if writes are synchronous."""
+        return self._write_queue
     
     @property
     def current_template(self) -> Optional[Template]:
@@ -67,12 +226,13 @@ class TemplateService:
         Returns:
             The newly created Template.
         """
-        template = Template(name=name)
-        self._templates[template.id] = template
-        self._current_template = template
-        
-        logger.debug(f"Created template: {template.id} - {name}")
-        return template
+        with self._lock:
+            template = Template(name=name)
+            self._mark_unsaved(template)
+            self._set_current(template)
+            
+            logger.debug(f"Created template: {template.id} - {name}")
+            return template
     
     def get_template(self, template_id: str) -> Optional[Template]:
         """Get a template by ID.
@@ -83,12 +243,20 @@ class TemplateService:
         Returns:
             The Template if found, None otherwise.
         """
-        # Check memory cache first
-        if template_id in self._templates:
-            return self._templates[template_id]
-        
-        # Try loading from disk
-        return self.load_template(template_id)
+        with self._lock:
+            # Check memory cache first
+            template = self._templates.get(template_id)
+            if template is not None:
+                if self._validate_cache and self._is_stale(template_id):
+                    logger.debug(f"Template changed in storage, reloading: {template_id}")
+                    return self.load_template(template_id)
+                return template
+            
+            if self._templates.is_missing(template_id):
+                return None
+            
+            # Try loading from disk
+            return self.load_template(template_id)
     
     def save_template(self, template: Optional[Template] = None) -> bool:
         """Save a template to disk.
@@ -99,30 +267,90 @@ class TemplateService:
         Returns:
             True if save succeeded, False otherwise.
         """
-        template = template or self._current_template
-        
-        if template is None:
-            logger.warning("No template to save")
-            return False
-        
-        try:
-            template.update_modified()
+        with self._lock:
+            template = template or self._current_template
             
-            file_path = self._get_template_path(template.id)
+            if template is None:
+                logger.warning("No template to save")
+                return False
             
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(template.to_dict(), f, indent=2, ensure_ascii=False)
+            try:
+                template.update_modified()
+                
+                if self._write_queue is not None:
+                    with self._pin_lock:
+                        # Cache first so the writer can record the new version;
+                        # pinned until written, the writer releases it
+                        self._templates.put(template.id, template, pinned=True)
+                        self._unsaved.discard(template.id)
+                        # Immutable snapshot; rebuilt only along dirty paths
+                        self._write_queue.submit(template.id, template.to_bytes())
+                else:
+                    data = template.to_dict()
+                    with self._io_lock:
+                        self._storage.write(template.id, data)
+                        version = self._storage.version(template.id)
+                    self._templates.put(template.id, template, pinned=template is self._current_template)
+                    self._templates.set_version(template.id, version)
+                    self._index_template(template.id, data)
+                    if self._history is not None:
+                        self._history.record(template.id, template.to_bytes())
+                    self._unsaved.discard(template.id)
+                
+                logger.debug(f"Saved template: {template.id}")
+                return True
+                
+            except WRITE_ERRORS as e:
+                logger.error(f"Failed to save template {template.id}: {e}")
+                # Still newer than storage: keep it until saved or discarded
+                self._mark_unsaved(template)
+                return False
+    
+    def mark_modified(self, template_id: str) -> bool:
+        """Record that a cached template was edited and not yet saved.
+        
+        Edited templates are pinned in the cache, so they are not evicted
+        and their changes lost, until ``save_template`` or
+        ``discard_changes``.
+        
+        Args:
+            template_id: The template's unique identifier.
             
-            self._templates[template.id] = template
-            logger.debug(f"Saved template: {template.id}")
+        Returns:
+            True if the template is cached, False otherwise.
+        """
+        with self._lock:
+            template = self._templates.get(template_id)
+            if template is None:
+                logger.warning(f"Cannot mark uncached template as modified: {template_id}")
+                return False
+            self._mark_unsaved(template)
             return True
+    
+    def discard_changes(self, template_id: str) -> Optional[Template]:
+        """Drop unsaved changes to a template and reload it from storage.
+        
+        Args:
+            template_id: The template's unique identifier.
             
-        except (IOError, OSError) as e:
-            logger.error(f"Failed to save template {template.id}: {e}")
-            return False
+        Returns:
+            The template as last saved, or None if it was never saved.
+        """
+        with self._lock:
+            with self._pin_lock:
+                self._unsaved.discard(template_id)
+                self._write_errors.pop(template_id, None)
+            self._templates.remove(template_id)
+            template = self.load_template(template_id)
+            if self._current_template is not None and self._current_template.id == template_id:
+                if template is None:
+                    self._current_template = None
+                else:
+                    self._set_current(template)
+            return template
     
     def load_template(self, template_id: str) -> Optional[Template]:
-        """Load a template from disk.
+        """Load a template from storage.
         
         Args:
             template_id: The template's unique identifier.
@@ -130,25 +358,58 @@ class TemplateService:
         Returns:
             The loaded Template if found, None otherwise.
         """
-        file_path = self._get_template_path(template_id)
+        with self._lock:
+            if self._write_queue is not None and template_id in self._write_queue:
+                self._write_queue.flush()
+            
+            try:
+                # Version before data: a concurrent rewrite then shows up as stale
+                version = self._storage.version(template_id)
+                data = self._storage.read(template_id)
+                if data is None:
+                    logger.warning(f"Template not found in storage: {template_id}")
+                    if template_id not in self._unsaved:
+                        self._templates.remove(template_id)
+                    self._templates.mark_missing(template_id)
+                    if self._search_built:
+                        self._search_index.remove(DOC_TEMPLATE, template_id)
+                    return None
+                
+                template = Template.from_dict(data)
+                self._templates.put(template.id, template)
+                self._templates.set_version(template.id, version)
+                self._index_template(template.id, data)
+                
+                logger.debug(f"Loaded template: {template.id}")
+                return template
+                
+            except READ_ERRORS as e:
+                logger.error(f"Failed to load template {template_id}: {e}")
+                return None
+    
+    def get_template_snapshot(self, template_id: str) -> Optional[Template]:
+        """Get a detached copy of a template as last saved.
         
-        if not os.path.exists(file_path):
-            logger.warning(f"Template file not found: {file_path}")
-            return None
+        Safe to call from any thread. Reads a save still queued for
+        writing, else storage, and never the live template, so edits
+        not yet saved are not included and the UI thread is not
+        blocked.
         
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            
-            template = Template.from_dict(data)
-            self._templates[template.id] = template
-            
-            logger.debug(f"Loaded template: {template.id}")
-            return template
+        Args:
+            template_id: The template's unique identifier.
             
-        except (IOError, OSError, json.JSONDecodeError, KeyError) as e:
-            logger.error(f"Failed to load template {template_id}: {e}")
+        Returns:
+            A Template the caller owns, or None if never saved.
+        """
+        payload = self._write_queue.peek(template_id) if self._write_queue is not None else None
+        try:
+            if payload is not None:
+                return Template.from_dict(json.loads(payload))
+            data = self._storage.read(template_id)
+        except READ_ERRORS as e:
+            logger.error(f"Failed to read snapshot of template {template_id}: {e}")
             return None
+        return Template.from_dict(data) if data is not None else None
     
     def delete_template(self, template_id: str) -> bool:
         """Delete a template.
@@ -159,51 +420,192 @@ class TemplateService:
         Returns:
             True if deletion succeeded, False otherwise.
         """
-        try:
-            file_path = self._get_template_path(template_id)
-            
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            
-            if template_id in self._templates:
-                del self._templates[template_id]
-            
-            if self._current_template and self._current_template.id == template_id:
-                self._current_template = None
+        with self._lock:
+            try:
+                if self._write_queue is not None:
+                    self._write_queue.cancel(template_id)
+                
+                with self._io_lock:
+                    self._storage.delete(template_id)
+                
+                self._templates.remove(template_id)
+                self._templates.mark_missing(template_id)
+                with self._pin_lock:
+                    self._unsaved.discard(template_id)
+                    self._write_errors.pop(template_id, None)
+                self._search_index.remove(DOC_TEMPLATE, template_id)
+                
+                if self._current_template and self._current_template.id == template_id:
+                    self._current_template = None
+                
+                logger.debug(f"Deleted template: {template_id}")
+                return True
+                
+            except WRITE_ERRORS as e:
+                logger.error(f"Failed to delete template {template_id}: {e}")
+                return False
+    
+    def list_templates(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        sort: str = "modifiedAt",
+        reverse: Optional[bool] = None
+    ) -> List[Dict]:
+        """List available templates from stored metadata.
+        
+        The metadata is first refreshed against storage; the file
+        backend only reads files whose mtime or size changed. Templates
+        are not loaded into memory.
+        
+        Args:
+            offset: Number of templates to skip.
+            limit: Maximum number of templates, or None for all.
+            sort: Sort key: "modifiedAt", "createdAt" or "name".
+            reverse: Sort descending. Defaults to newest first for
+                timestamps and A-Z for names.
+        
+        Returns:
+            List of template metadata dictionaries.
+        """
+        self.refresh_index()
+        return self._storage.query(offset=offset, limit=limit, sort=sort, reverse=reverse)
+    
+    def count_templates(self) -> int:
+        """Get the number of stored templates.
+        
+        Returns:
+            Number of stored templates.
+        """
+        self.refresh_index()
+        return self._storage.count()
+    
+    def refresh_index(self) -> bool:
+        """Update template metadata from storage.
+        
+        Pending background writes are flushed first so they are listed.
+        If anything changed, remembered missing ids are forgotten.
+        
+        Returns:
+            True if the metadata changed.
+        """
+        if self._write_queue is not None and self._write_queue.depth:
+            self._write_queue.flush()
+        
+        with self._io_lock:
+            try:
+                changed = self._storage.refresh()
+            except (IOError, OSError) as e:
+                logger.error(f"Failed to list templates: {e}")
+                return False
+        
+        if changed:
+            # Templates may have been added outside the service
+            self._templates.forget_missing()
+            if self._search_built:
+                self._sync_search_index()
+        return changed
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all pending background writes are on disk.
+        
+        Args:
+            timeout: Maximum seconds to wait, or None to wait indefinitely.
             
-            logger.debug(f"Deleted template: {template_id}")
+        Returns:
+            True if all writes completed within the timeout.
+        """
+        if self._write_queue is None:
             return True
+        return self._write_queue.flush(timeout)
+    
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """Flush pending writes and stop the background writer.
+        
+        Later saves are written synchronously.
+        
+        Args:
+            timeout: Maximum seconds to wait for pending writes.
             
-        except (IOError, OSError) as e:
-            logger.error(f"Failed to delete template {template_id}: {e}")
-            return False
+        Returns:
+            True if all writes completed.
+        """
+        self.stop_watcher()
+        completed = True
+        if self._write_queue is not None:
+            completed = self._write_queue.shutdown(timeout=timeout)
+        if isinstance(self._storage, DedupTemplateStorage):
+            self._storage.blobs.save()
+        return completed
     
-    def list_templates(self) -> List[Dict]:
-        """List all available templates.
+    def refresh(self) -> List[str]:
+        """Rescan storage and reload cached templates changed elsewhere.
+        
+        Metadata is refreshed incrementally and each cached template is
+        checked with one version lookup; only templates whose version
+        changed are read. Templates deleted from storage are dropped
+        from the cache.
         
         Returns:
-            List of template metadata dictionaries.
+            Ids of cached templates that were reloaded or dropped.
         """
-        templates = []
+        self.refresh_index()
+        changed = []
+        for template_id in self._templates.ids():
+            if self._is_stale(template_id):
+                self.load_template(template_id)
+                changed.append(template_id)
         
-        try:
-            for filename in os.listdir(self._storage_path):
-                if filename.endswith(self.TEMPLATE_EXTENSION):
-                    template_id = filename[:-len(self.TEMPLATE_EXTENSION)]
-                    template = self.get_template(template_id)
-                    
-                    if template:
-                        templates.append({
-                            "id": template.id,
-                            "name": template.name,
-                            "modifiedAt": template.modified_at.isoformat(),
-                        })
-        except (IOError, OSError) as e:
-            logger.error(f"Failed to list templates: {e}")
+        if changed:
+            logger.debug(f"Refreshed {len(changed)} changed templates")
+        return changed
+    
+    def start_watcher(
+        self,
+        interval: float = 2.0,
+        on_change: Optional[Callable[[List[str]], None]] = None
+    ) -> bool:
+        """Poll storage for external changes on a background thread.
+        
+        Args:
+            interval: Seconds between scans.
+            on_change: Called from the watcher thread with the ids
+                returned by ``refresh()`` whenever any changed.
+            
+        Returns:
+            True if the watcher was started, False if already running.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return False
         
-        # Sort by modified date, newest first
-        templates.sort(key=lambda t: t["modifiedAt"], reverse=True)
-        return templates
+        self._watcher_stop.clear()
+        
+        def watch() -> None:
+            while not self._watcher_stop.wait(interval):
+                try:
+                    changed = self.refresh()
+                    if changed and on_change is not None:
+                        on_change(changed)
+                except Exception as e:
+                    logger.error(f"Template watcher failed: {e}")
+        
+        self._watcher = threading.Thread(target=watch, name="template_service.watch", daemon=True)
+        self._watcher.start()
+        return True
+    
+    def stop_watcher(self, timeout: Optional[float] = None) -> None:
+        """Stop the watcher thread, if running.
+        
+        Args:
+            timeout: Maximum seconds to wait for the thread to exit.
+        """
+        watcher = self._watcher
+        if watcher is None:
+            return
+        self._watcher_stop.set()
+        if watcher is not threading.current_thread():
+            watcher.join(timeout)
+        self._watcher = None
     
     def set_current_template(self, template_id: str) -> bool:
         """Set the current active template.
@@ -214,18 +616,176 @@ class TemplateService:
         Returns:
             True if template was found and set, False otherwise.
         """
-        template = self.get_template(template_id)
+        with self._lock:
+            template = self.get_template(template_id)
+            
+            if template:
+                self._set_current(template)
+                logger.debug(f"Set current template: {template_id}")
+                return True
+            
+            return False
+    
+    def get_cache_stats(self) -> Dict:
+        """Get statistics of the in-memory template cache.
+        
+        Returns:
+            Dictionary with hits, misses, entries, size and evictions.
+        """
+        stats = self._templates.get_stats().to_dict()
+        stats["maxBytes"] = self._templates.max_bytes
+        return stats
+    
+    def get_write_stats(self) -> Dict:
+        """Get statistics of background writes.
         
-        if template:
-            self._current_template = template
-            logger.debug(f"Set current template: {template_id}")
-            return True
+        Returns:
+            Dictionary with the write-behind queue's depth, counters and
+            timings (none when writes are synchronous), and ``failed``
+            mapping template ids whose last background write failed to
+            the error.
+        """
+        stats = self._write_queue.get_stats() if self._write_queue is not None else {}
+        with self._pin_lock:
+            stats["failed"] = dict(self._write_errors)
+        return stats
+    
+    def add_write_error_listener(self, listener: Callable[[str, str], None]) -> None:
+        """Add a listener for background writes that failed.
         
-        return False
+        Args:
+            listener: Called as ``listener(template_id, error)`` from the
+                writer thread once a write failed after all retries. The
+                template is then unsaved and can be saved again.
+        """
+        with self._pin_lock:
+            if listener not in self._write_error_listeners:
+                self._write_error_listeners = self._write_error_listeners + [listener]
+    
+    def remove_write_error_listener(self, listener: Callable[[str, str], None]) -> None:
+        """Remove a write error listener.
+        
+        Args:
+            listener: The listener to remove.
+        """
+        with self._pin_lock:
+            self._write_error_listeners = [l for l in self._write_error_listeners if l is not listener]
+    
+    def list_template_versions(self, template_id: str) -> List[Dict]:
+        """List the recorded versions of a template, newest first.
+        
+        With write-behind, saves coalesced into one write are recorded
+        as one version.
+        
+        Args:
+            template_id: The template's unique identifier.
+            
+        Returns:
+            List of {"version", "savedAt", "snapshot", "size"} dictionaries.
+            Empty if history is off.
+        """
+        if self._history is None:
+            return []
+        self.flush()
+        return [entry.to_dict() for entry in self._history.list_versions(template_id)]
+    
+    def get_template_version(self, template_id: str, version: int) -> Optional[Template]:
+        """Get a template as it was at a recorded version.
+        
+        Args:
+            template_id: The template's unique identifier.
+            version: Version number from ``list_template_versions``.
+            
+        Returns:
+            A detached Template, or None if the version is not recorded.
+        """
+        if self._history is None:
+            return None
+        self.flush()
+        return self._history.get_version(template_id, version)
+    
+    def restore_template_version(self, template_id: str, version: int) -> Optional[Template]:
+        """Save an older version as the newest version of a template.
+        
+        Works for deleted templates too, as long as history remains.
+        
+        Args:
+            template_id: The template's unique identifier.
+            version: Version number to restore.
+            
+        Returns:
+            The restored Template, or None if the version is unknown or
+            saving failed.
+        """
+        with self._lock:
+            restored = self.get_template_version(template_id, version)
+            if restored is None:
+                logger.warning(f"Cannot restore {template_id}: version {version} not recorded")
+                return None
+            
+            # Continue numbering after the newest known version
+            current = self.get_template(template_id)
+            newest = [entry.version for entry in self._history.list_versions(template_id)]
+            restored.version = max(newest + [current.version if current else 0])
+            
+            if self._current_template is not None and self._current_template.id == template_id:
+                self._set_current(restored)
+            else:
+                self._templates.put(template_id, restored)
+            if not self.save_template(restored):
+                return None
+            logger.info(f"Restored template {template_id} to version {version}")
+            return restored
+    
+    def get_blob_stats(self) -> Optional[Dict]:
+        """Get storage savings from content-hash deduplication.
+        
+        Returns:
+            Dictionary with blob count, stored and referenced bytes and
+            bytes saved, or None if deduplication is off.
+        """
+        if not isinstance(self._storage, DedupTemplateStorage):
+            return None
+        return self._storage.get_stats().to_dict()
+    
+    def collect_garbage(self) -> int:
+        """Delete stored blobs no template references any more.
+        
+        Pending background writes are flushed first so their blobs are
+        counted as live.
+        
+        Returns:
+            Number of blobs deleted (0 if deduplication is off).
+        """
+        if not isinstance(self._storage, DedupTemplateStorage):
+            return 0
+        self.flush()
+        with self._io_lock:
+            return self._storage.collect_garbage()
+    
+    def search_templates(self, query: str, limit: Optional[int] = 50) -> List[Dict]:
+        """Search stored templates by name, text, CSS selectors and field references.
+        
+        The index is built from storage on the first search and then
+        kept current as templates are saved, deleted and imported.
+        
+        Args:
+            query: Query such as ``"{{Front}} .card"`` or ``"name:basic*"``.
+            limit: Maximum number of hits, or None for all.
+            
+        Returns:
+            Hits as {"type", "id", "title", "score", "matches"}, best first.
+        """
+        if not self._search_built:
+            self._build_search_index()
+        return self._search_index.search(query, doc_type=DOC_TEMPLATE, limit=limit)
     
     def duplicate_template(self, template_id: str, new_name: Optional[str] = None) -> Optional[Template]:
         """Duplicate an existing template.
         
+        With deduplication on, the copy shares the source's stored CSS
+        and component blobs, so saving it writes only a small manifest.
+        
         Args:
             template_id: The template to duplicate.
             new_name: Name for the duplicate. Defaults to "{name} (Copy)".
@@ -249,21 +809,368 @@ class TemplateService:
         new_template.modified_at = datetime.now()
         new_template.version = 1
         
-        self._templates[new_template.id] = new_template
-        self.save_template(new_template)
+        with self._lock:
+            # Pinned until written, so a failed save cannot lose the copy
+            self._mark_unsaved(new_template)
+            self.save_template(new_template)
         
         logger.debug(f"Duplicated template {template_id} -> {new_template.id}")
         return new_template
     
-    def _get_template_path(self, template_id: str) -> str:
-        """Get the file path for a template.
+    def bulk_import(
+        self,
+        sources: Union[str, Sequence[str]],
+        overwrite: bool = True,
+        workers: Optional[int] = 0,
+        batch_size: int = 500,
+        progress: Optional[Callable[[str, float], None]] = None,
+        processes: bool = False
+    ) -> BulkResult:
+        """Import a template pack.
+        
+        Sources may be template files, directories or zip archives.
+        Payloads are read as they are needed, decoded and validated in
+        chunks, inline unless workers are asked for, and written in
+        batches, so the pack is never held in memory at once. An invalid
+        or unreadable item is reported in the result and does not stop
+        the import.
+        
+        Args:
+            sources: One path or a list of paths.
+            overwrite: Replace stored templates with the same id. If
+                False, such items are reported as errors.
+            workers: Parse workers. 0 parses on the calling thread;
+                None uses the executor's default.
+            batch_size: Templates per storage write.
+            progress: Called as ``progress(message, percent)``.
+            processes: Parse in worker processes rather than threads.
+                Only for use outside Anki, e.g. scripts and tests.
+            
+        Returns:
+            BulkResult with imported ids and per-item errors.
+        """
+        start = time.perf_counter()
+        result = BulkResult()
+        total = count_sources(sources)
+        self.flush()
+        
+        seen: Set[str] = set()
+        batch: List[Tuple[str, Dict]] = []
+        processed = 0
+        for chunk in parse_parallel(iter_sources(sources), workers=workers, processes=processes):
+            for source, data, error in chunk:
+                if error is not None:
+                    result.errors.append(BulkItemError(source, error))
+                    continue
+                
+                template_id = data["id"]
+                if not overwrite and (template_id in seen or self._storage.exists(template_id)):
+                    result.errors.append(BulkItemError(source, f"Template already exists: {template_id}"))
+                    continue
+                seen.add(template_id)
+                batch.append((template_id, data))
+            
+            if len(batch) >= batch_size:
+                self._import_batch(batch, result)
+                batch = []
+            processed += len(chunk)
+            _notify_progress(progress, f"Imported {processed}/{total}...", 100.0 * processed / max(total, processed))
+        
+        if batch:
+            self._import_batch(batch, result)
+        
+        result.duration_ms = (time.perf_counter() - start) * 1000
+        _notify_progress(progress, "Import complete", 100.0)
+        logger.info(f"Bulk import: {len(result.succeeded)} imported, {len(result.errors)} failed")
+        return result
+    
+    def bulk_export(
+        self,
+        archive_path: str,
+        template_ids: Optional[Sequence[str]] = None,
+        progress: Optional[Callable[[str, float], None]] = None
+    ) -> BulkResult:
+        """Export stored templates to a zip archive.
+        
+        The archive holds one ``<id>.json`` per template and can be
+        read back with ``bulk_import``. It is written atomically.
+        
+        Args:
+            archive_path: Destination ``.zip`` path.
+            template_ids: Templates to export. Exports all if None.
+            progress: Called as ``progress(message, percent)``.
+            
+        Returns:
+            BulkResult with exported ids and per-item errors.
+        """
+        start = time.perf_counter()
+        result = BulkResult()
+        self.flush()
+        ids = list(template_ids) if template_ids is not None else self._storage.list_ids()
+        total = len(ids)
+        
+        def entries():
+            for i, template_id in enumerate(ids):
+                try:
+                    data = self._storage.read(template_id)
+                except READ_ERRORS as e:
+                    result.errors.append(BulkItemError(template_id, str(e)))
+                    continue
+                if data is None:
+                    result.errors.append(BulkItemError(template_id, "Template not found"))
+                    continue
+                
+                result.succeeded.append(template_id)
+                yield f"{template_id}.json", json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+                if (i + 1) % 100 == 0:
+                    _notify_progress(progress, f"Exported {i + 1}/{total}...", 100.0 * (i + 1) / total)
+        
+        try:
+            write_archive(archive_path, entries())
+        except (IOError, OSError) as e:
+            logger.error(f"Failed to write template archive {archive_path}: {e}")
+            result.succeeded = []
+            result.errors.append(BulkItemError(archive_path, str(e)))
+        
+        result.duration_ms = (time.perf_counter() - start) * 1000
+        _notify_progress(progress, "Export complete", 100.0)
+        return result
+    
+    def migrate_storage(self, storage_format: str, compress: Optional[bool] = None) -> int:
+        """Rewrite all stored templates in another file format.
+        
+        Each template is written in the new format before the old file
+        is removed, so an interrupted migration leaves every template
+        readable. The service writes in the new format afterwards.
+        Only supported by the file backend.
+        
+        Args:
+            storage_format: Target format ("json" or "binary").
+            compress: Whether binary output is compressed. Keeps the
+                current setting if None.
+                
+        Returns:
+            Number of templates migrated.
+        """
+        storage = self._file_storage()
+        if storage_format not in self.STORAGE_FORMATS:
+            raise ValueError(f"Unknown storage format: {storage_format}")
+        
+        self.flush()
+        with self._io_lock:
+            return storage.migrate(storage_format, compress)
+    
+    def import_from(self, source: TemplateStorage, overwrite: bool = True) -> int:
+        """Import all templates from another storage backend.
+        
+        Use this to move an existing template directory into a new
+        SQLite database: ``service.import_from(FileTemplateStorage(...))``.
+        
+        Args:
+            source: Backend to copy templates from.
+            overwrite: Replace templates already stored in this service.
+            
+        Returns:
+            Number of templates imported.
+        """
+        self.flush()
+        with self._io_lock:
+            count = import_templates(source, self._storage, overwrite=overwrite)
+        # Rebuilt on the next search
+        self._search_built = False
+        return count
+    
+    def _import_batch(self, batch: List[Tuple[str, Dict]], result: BulkResult) -> None:
+        """Write one batch of imported templates and drop stale cache entries.
+        
+        If the batch write fails, templates are retried one by one so
+        the failure is attributed to the right items.
+        """
+        with self._io_lock:
+            try:
+                self._storage.write_many(batch)
+                written = [template_id for template_id, _ in batch]
+            except WRITE_ERRORS as e:
+                logger.warning(f"Batch write failed, retrying individually: {e}")
+                written = []
+                for template_id, data in batch:
+                    try:
+                        self._storage.write(template_id, data)
+                        written.append(template_id)
+                    except WRITE_ERRORS as item_error:
+                        result.errors.append(BulkItemError(template_id, str(item_error)))
+        
+        if self._search_built:
+            written_ids = set(written)
+            for template_id, data in batch:
+                if template_id in written_ids:
+                    self._index_template(template_id, data)
+        
+        with self._lock:
+            current_id = self._current_template.id if self._current_template else None
+            for template_id in written:
+                self._templates.forget_missing(template_id)
+                if template_id != current_id and template_id not in self._unsaved:
+                    self._templates.remove(template_id)
+        result.succeeded.extend(written)
+    
+    def _is_stale(self, template_id: str) -> bool:
+        """Check whether a cached template was changed outside the service.
+        
+        Templates never saved, or with a save still queued, are newer
+        than storage and never stale.
+        """
+        if template_id in self._unsaved:
+            return False
+        if self._write_queue is not None and template_id in self._write_queue:
+            return False
+        
+        try:
+            with self._io_lock:
+                version = self._storage.version(template_id)
+        except READ_ERRORS as e:
+            logger.warning(f"Could not validate cached template {template_id}: {e}")
+            return False
+        return version != self._templates.version_of(template_id)
+    
+    def _index_template(self, template_id: str, data: Dict) -> None:
+        """Re-index a stored template once the search index is built."""
+        if self._search_built:
+            self._search_index.update(
+                DOC_TEMPLATE, template_id, data.get("name", ""), template_terms(data)
+            )
+    
+    def _build_search_index(self) -> None:
+        """Index every stored template."""
+        self.flush()
+        self._search_index.clear(DOC_TEMPLATE)
+        self._search_built = True
+        self._sync_search_index()
+        logger.debug(f"Indexed {self._search_index.count(DOC_TEMPLATE)} templates for search")
+    
+    def _sync_search_index(self) -> None:
+        """Index templates added to storage and drop deleted ones."""
+        try:
+            with self._io_lock:
+                stored = set(self._storage.list_ids())
+        except (IOError, OSError) as e:
+            logger.error(f"Failed to list templates for search: {e}")
+            return
+        
+        indexed = set(self._search_index.ids(DOC_TEMPLATE))
+        for template_id in stored - indexed:
+            try:
+                data = self._storage.read(template_id)
+            except READ_ERRORS as e:
+                logger.warning(f"Cannot index template {template_id}: {e}")
+                continue
+            if data is not None:
+                self._index_template(template_id, data)
+        
+        for template_id in indexed - stored:
+            self._search_index.remove(DOC_TEMPLATE, template_id)
+    
+    def _mark_unsaved(self, template: Template) -> None:
+        """Pin a template whose in-memory state is newer than storage."""
+        with self._pin_lock:
+            self._unsaved.add(template.id)
+            self._templates.put(template.id, template, pinned=True)
+    
+    def _set_current(self, template: Template) -> None:
+        """Make a template current, moving the cache pin to it."""
+        with self._pin_lock:
+            previous = self._current_template
+            self._current_template = template
+            self._templates.put(template.id, template, pinned=True)
+            if previous is not None and previous is not template:
+                self._release_pin(previous.id)
+    
+    def _release_pin(self, template_id: str) -> None:
+        """Unpin a template unless it is current, unsaved or waiting to be written."""
+        with self._pin_lock:
+            if template_id in self._unsaved:
+                return
+            if self._current_template is not None and self._current_template.id == template_id:
+                return
+            if self._write_queue is not None and self._write_queue.has_pending(template_id):
+                return
+            self._templates.unpin(template_id)
+    
+    def _manifest_storage(self) -> TemplateStorage:
+        """Get the backend that stores template files or manifests."""
+        if isinstance(self._storage, DedupTemplateStorage):
+            return self._storage.inner
+        return self._storage
+    
+    def _file_storage(self) -> FileTemplateStorage:
+        """Get the file backend, failing for other backends."""
+        storage = self._manifest_storage()
+        if not isinstance(storage, FileTemplateStorage):
+            raise ValueError("Operation requires the file storage backend")
+        return storage
+    
+    def _write_serialized(self, template_id: str, payload: bytes) -> None:
+        """Write a template snapshot from the write-behind queue.
         
         Args:
             template_id: The template's unique identifier.
+            payload: Compact JSON from ``Template.to_bytes()``.
+        """
+        data = json.loads(payload)
+        with self._io_lock:
+            self._storage.write(template_id, data)
+            self._templates.set_version(template_id, self._storage.version(template_id))
+        with self._pin_lock:
+            self._write_errors.pop(template_id, None)
+            self._release_pin(template_id)
+        self._index_template(template_id, data)
+        if self._history is not None:
+            self._history.record(template_id, payload)
+    
+    def _on_write_failed(self, template_id: str, payload: bytes, error: Exception) -> None:
+        """Keep a template whose background write failed for good.
+        
+        Runs on the writer thread. The cached template, or the payload if
+        it was evicted, is marked unsaved so it stays pinned until saved
+        again or discarded, and listeners are told.
+        """
+        with self._pin_lock:
+            if self._write_queue.has_pending(template_id):
+                # A newer save is queued and will be written instead
+                return
+            template = self._templates.get(template_id)
+            if template is None:
+                template = Template.from_dict(json.loads(payload))
+            self._mark_unsaved(template)
+            self._write_errors[template_id] = str(error)
+            listeners = self._write_error_listeners
+        
+        for listener in listeners:
+            try:
+                listener(template_id, str(error))
+            except Exception as e:
+                logger.error(f"Error in write error listener: {e}")
+    
+    def _get_template_path(self, template_id: str, storage_format: Optional[str] = None) -> str:
+        """Get the file path for a template (file backend only).
+        
+        Args:
+            template_id: The template's unique identifier.
+            storage_format: Storage format. Defaults to the configured one.
             
         Returns:
             Absolute file path for the template.
         """
-        # Sanitize template_id to prevent path traversal
-        safe_id = "".join(c for c in template_id if c.isalnum() or c in "-_")
-        return os.path.join(self._storage_path, f"{safe_id}{self.TEMPLATE_EXTENSION}")
+        return self._file_storage().path_for(template_id, storage_format)
+
+
+def _notify_progress(
+    progress: Optional[Callable[[str, float], None]], message: str, percent: float
+) -> None:
+    """Call a progress callback, ignoring its errors."""
+    if progress is None:
+        return
+    try:
+        progress(message, percent)
+    except Exception as e:
+        logger.warning(f"Progress callback failed: {e}")
@@ -0,0 +1,921 @@
+"""Storage backends for templates.
+
+``TemplateService`` reads and writes templates through a
+``TemplateStorage`` backend:
+
+    FileTemplateStorage    one file per template plus a metadata index
+                           (the default, compatible with existing installs)
+    SQLiteTemplateStorage  a single SQLite database with a metadata table
+    DedupTemplateStorage   wraps either and stores CSS and component
+                           subtrees once, by content hash
+
+Backends store serialized templates (``Template.to_dict()``) and answer
+listing queries from metadata, without decoding templates.
+``import_templates`` copies templates between backends, e.g. from an
+existing template directory into a new database.
+"""
+
+import json
+import os
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..core import binary_format
+from ..core.exceptions import InvalidFormatError, StorageError, StorageReadError, StorageWriteError
+from .blob_store import BlobStats, BlobStore
+from .template_index import TemplateIndex
+
+logger = logging.getLogger("anki_template_designer.services.template_storage")
+
+# Errors raised when a stored template cannot be decoded
+READ_ERRORS = (IOError, OSError, json.JSONDecodeError, UnicodeDecodeError,
+               InvalidFormatError, StorageError, KeyError)
+
+# Errors raised when a template cannot be written or deleted
+WRITE_ERRORS = (IOError, OSError, InvalidFormatError, StorageError)
+
+SORT_KEYS = TemplateIndex.SORT_KEYS
+
+
+class TemplateStorage(ABC):
+    """Base class for template storage backends.
+
+    Backends may be called from the write-behind thread while the UI
+    thread reads, and must be safe for that. Failures surface as one of
+    ``READ_ERRORS`` or ``WRITE_ERRORS``.
+    """
+
+    @property
+    @abstractmethod
+    def location(self) -> str:
+        """Get the storage location (directory or database file)."""
+
+    @abstractmethod
+    def read(self, template_id: str) -> Optional[Dict[str, Any]]:
+        """Read a serialized template.
+
+        Args:
+            template_id: The template's unique identifier.
+
+        Returns:
+            Template dictionary, or None if not stored.
+
+        Raises:
+            One of ``READ_ERRORS`` if the stored template is unreadable.
+        """
+
+    @abstractmethod
+    def write(self, template_id: str, data: Dict[str, Any]) -> None:
+        """Write a serialized template, replacing any stored version.
+
+        Args:
+            template_id: The template's unique identifier.
+            data: Serialized template.
+        """
+
+    def write_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Write several templates.
+
+        Args:
+            items: (template_id, data) pairs.
+
+        Returns:
+            Number of templates written.
+        """
+        count = 0
+        for template_id, data in items:
+            self.write(template_id, data)
+            count += 1
+        return count
+
+    @abstractmethod
+    def delete(self, template_id: str) -> bool:
+        """Delete a stored template.
+
+        Args:
+            template_id: The template's unique identifier.
+
+        Returns:
+            True if the template was stored.
+        """
+
+    @abstractmethod
+    def exists(self, template_id: str) -> bool:
+        """Check whether a template is stored."""
+
+    @abstractmethod
+    def version(self, template_id: str) -> Optional[Tuple[Any, ...]]:
+        """Get a cheap token that changes whenever a template is rewritten.
+
+        Used to validate cached templates without reading them.
+
+        Args:
+            template_id: The template's unique identifier.
+
+        Returns:
+            A comparable token, or None if the template is not stored.
+        """
+
+    @abstractmethod
+    def list_ids(self) -> List[str]:
+        """List the ids of all stored templates."""
+
+    @abstractmethod
+    def query(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        sort: str = "modifiedAt",
+        reverse: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        """Get a page of template metadata.
+
+        Args:
+            offset: Number of templates to skip.
+            limit: Maximum number of templates, or None for all.
+            sort: Sort key: "modifiedAt", "createdAt" or "name".
+            reverse: Sort descending. Defaults to newest first for
+                timestamps and A-Z for names.
+
+        Returns:
+            List of {"id", "name", "modifiedAt"} dictionaries.
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """Get the number of stored templates."""
+
+    def refresh(self) -> bool:
+        """Pick up changes made outside this backend.
+
+        Returns:
+            True if the stored metadata changed.
+        """
+        return False
+
+    def close(self) -> None:
+        """Release resources held by the backend."""
+
+
+class FileTemplateStorage(TemplateStorage):
+    """One file per template, as indented JSON or compact binary.
+
+    Both formats are always readable; ``storage_format`` only decides
+    how templates are written. Metadata lives in a ``TemplateIndex``
+    that is refreshed against the directory before each query.
+    """
+
+    TEMPLATE_EXTENSION = ".json"
+    BINARY_EXTENSION = ".atdb"
+    FORMAT_JSON = "json"
+    FORMAT_BINARY = "binary"
+    STORAGE_FORMATS = (FORMAT_JSON, FORMAT_BINARY)
+
+    def __init__(
+        self,
+        storage_path: str,
+        index_path: str,
+        storage_format: str = FORMAT_JSON,
+        compress: bool = False
+    ) -> None:
+        """Initialize the backend.
+
+        Args:
+            storage_path: Template directory. Created if missing.
+            index_path: Path of the metadata index file. Must be outside
+                the template directory.
+            storage_format: Format for written templates ("json" or "binary").
+            compress: Whether binary templates are zlib-compressed.
+        """
+        if storage_format not in self.STORAGE_FORMATS:
+            raise ValueError(f"Unknown storage format: {storage_format}")
+
+        self._storage_path = storage_path
+        self._storage_format = storage_format
+        self._compress = compress
+        self._index = TemplateIndex(index_path)
+        self._lock = threading.RLock()
+        os.makedirs(storage_path, exist_ok=True)
+
+    @property
+    def location(self) -> str:
+        """Get the template directory."""
+        return self._storage_path
+
+    @property
+    def storage_format(self) -> str:
+        """Get the format used when writing templates."""
+        return self._storage_format
+
+    @property
+    def index(self) -> TemplateIndex:
+        """Get the metadata index."""
+        return self._index
+
+    def path_for(self, template_id: str, storage_format: Optional[str] = None) -> str:
+        """Get the file path for a template.
+
+        Args:
+            template_id: The template's unique identifier.
+            storage_format: Storage format. Defaults to the configured one.
+
+        Returns:
+            Absolute file path for the template.
+        """
+        # Sanitize template_id to prevent path traversal
+        safe_id = "".join(c for c in template_id if c.isalnum() or c in "-_")
+        extension = self._extension(storage_format or self._storage_format)
+        return os.path.join(self._storage_path, f"{safe_id}{extension}")
+
+    def find_file(self, template_id: str, storage_format: Optional[str] = None) -> Optional[str]:
+        """Find the file holding a template, preferring one format.
+
+        Args:
+            template_id: The template's unique identifier.
+            storage_format: Format to look for first. Defaults to the
+                configured storage format.
+
+        Returns:
+            Path of the existing file, or None if not stored.
+        """
+        preferred = storage_format or self._storage_format
+        for candidate in (preferred, self._other_format(preferred)):
+            path = self.path_for(template_id, candidate)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def read_file(self, file_path: str) -> Dict[str, Any]:
+        """Read and decode a template file in either format."""
+        with open(file_path, "rb") as f:
+            raw = f.read()
+
+        if binary_format.is_binary(raw):
+            return binary_format.decode(raw)
+        return json.loads(raw.decode("utf-8"))
+
+    def read(self, template_id: str) -> Optional[Dict[str, Any]]:
+        file_path = self.find_file(template_id)
+        if file_path is None:
+            return None
+        return self.read_file(file_path)
+
+    def write(self, template_id: str, data: Dict[str, Any]) -> None:
+        """Encode and write template data in the configured format.
+
+        The file is written atomically (temp file plus ``os.replace``).
+        Any copy stored in the other format is removed so a template
+        only ever has one file on disk.
+        """
+        if self._storage_format == self.FORMAT_BINARY:
+            payload = binary_format.encode(data, compress=self._compress)
+        else:
+            payload = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+
+        with self._lock:
+            file_path = self.path_for(template_id)
+            temp_path = f"{file_path}.tmp"
+            try:
+                with open(temp_path, "wb") as f:
+                    f.write(payload)
+                os.replace(temp_path, file_path)
+            except (IOError, OSError):
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+            stale = self.path_for(template_id, self._other_format(self._storage_format))
+            if os.path.exists(stale):
+                os.remove(stale)
+
+            self._index.update(template_id, file_path, data)
+
+    def delete(self, template_id: str) -> bool:
+        with self._lock:
+            removed = False
+            for storage_format in self.STORAGE_FORMATS:
+                file_path = self.path_for(template_id, storage_format)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                    removed = True
+            self._index.remove(template_id)
+            return removed
+
+    def exists(self, template_id: str) -> bool:
+        return self.find_file(template_id) is not None
+
+    def version(self, template_id: str) -> Optional[Tuple[Any, ...]]:
+        """Get (mtime_ns, size, inode) of the template file.
+
+        The inode catches atomic replacements that keep mtime and size.
+        """
+        for storage_format in (self._storage_format, self._other_format(self._storage_format)):
+            try:
+                stat = os.stat(self.path_for(template_id, storage_format))
+            except FileNotFoundError:
+                continue
+            return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        return None
+
+    def list_ids(self) -> List[str]:
+        ids = []
+        seen = set()
+        extensions = (self.TEMPLATE_EXTENSION, self.BINARY_EXTENSION)
+        for filename in os.listdir(self._storage_path):
+            for extension in extensions:
+                if filename.endswith(extension):
+                    template_id = filename[:-len(extension)]
+                    if template_id not in seen:
+                        seen.add(template_id)
+                        ids.append(template_id)
+                    break
+        return ids
+
+    def query(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        sort: str = "modifiedAt",
+        reverse: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._index.query(offset=offset, limit=limit, sort=sort, reverse=reverse)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._index)
+
+    def refresh(self) -> bool:
+        """Update the metadata index from the directory and save it."""
+        with self._lock:
+            changed = self._index.refresh(
+                self._storage_path,
+                (self._extension(self._storage_format),
+                 self._extension(self._other_format(self._storage_format))),
+                self.read_file,
+            )
+            if self._index.is_dirty:
+                self._index.save()
+            return changed
+
+    def migrate(self, storage_format: str, compress: Optional[bool] = None) -> int:
+        """Rewrite all stored templates in another storage format.
+
+        Each template is written in the new format before the old file
+        is removed, so an interrupted migration leaves every template
+        readable. Templates are written in the new format afterwards.
+
+        Args:
+            storage_format: Target format ("json" or "binary").
+            compress: Whether binary output is compressed. Keeps the
+                current setting if None.
+
+        Returns:
+            Number of templates migrated.
+        """
+        if storage_format not in self.STORAGE_FORMATS:
+            raise ValueError(f"Unknown storage format: {storage_format}")
+
+        with self._lock:
+            self._storage_format = storage_format
+            if compress is not None:
+                self._compress = compress
+
+            migrated = 0
+            for template_id in self.list_ids():
+                source = self.path_for(template_id, self._other_format(storage_format))
+                if not os.path.exists(source):
+                    continue
+
+                try:
+                    self.write(template_id, self.read_file(source))
+                    migrated += 1
+                except READ_ERRORS as e:
+                    logger.error(f"Failed to migrate template {template_id}: {e}")
+
+        logger.info(f"Migrated {migrated} templates to {storage_format} storage")
+        return migrated
+
+    def _extension(self, storage_format: str) -> str:
+        """Get the file extension for a storage format."""
+        if storage_format == self.FORMAT_BINARY:
+            return self.BINARY_EXTENSION
+        return self.TEMPLATE_EXTENSION
+
+    def _other_format(self, storage_format: str) -> str:
+        """Get the storage format that is not ``storage_format``."""
+        if storage_format == self.FORMAT_BINARY:
+            return self.FORMAT_JSON
+        return self.FORMAT_BINARY
+
+
+# Statements are module constants so sqlite3's per-connection statement
+# cache can reuse their prepared form.
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS templates (
+        id TEXT PRIMARY KEY,
+        data BLOB NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS template_metadata (
+        id TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        name_key TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        modified_at TEXT NOT NULL,
+        note_type TEXT,
+        size INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS template_metadata_modified ON template_metadata (modified_at, id)",
+    "CREATE INDEX IF NOT EXISTS template_metadata_created ON template_metadata (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS template_metadata_name ON template_metadata (name_key, id)",
+)
+
+_SELECT_DATA = "SELECT data FROM templates WHERE id = ?"
+_SELECT_EXISTS = "SELECT 1 FROM templates WHERE id = ?"
+_SELECT_IDS = "SELECT id FROM templates"
+_SELECT_COUNT = "SELECT COUNT(*) FROM template_metadata"
+_SELECT_VERSION = "SELECT modified_at, size FROM template_metadata WHERE id = ?"
+_UPSERT_DATA = "INSERT OR REPLACE INTO templates (id, data) VALUES (?, ?)"
+_UPSERT_METADATA = (
+    "INSERT OR REPLACE INTO template_metadata "
+    "(id, name, name_key, created_at, modified_at, note_type, size) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+_DELETE_DATA = "DELETE FROM templates WHERE id = ?"
+_DELETE_METADATA = "DELETE FROM template_metadata WHERE id = ?"
+
+_SORT_COLUMNS = {"modifiedAt": "modified_at", "createdAt": "created_at", "name": "name_key"}
+_QUERIES = {
+    (sort, descending): (
+        "SELECT id, name, modified_at FROM template_metadata "
+        f"ORDER BY {column} {'DESC' if descending else 'ASC'}, "
+        f"id {'DESC' if descending else 'ASC'} LIMIT ? OFFSET ?"
+    )
+    for sort, column in _SORT_COLUMNS.items()
+    for descending in (False, True)
+}
+
+
+class SQLiteTemplateStorage(TemplateStorage):
+    """All templates in one SQLite database.
+
+    Templates are stored as compact JSON in ``templates``; their name,
+    timestamps and note type are kept in ``template_metadata`` with an
+    index per sort key, so listing a page is a single indexed query.
+    The database runs in WAL mode, so readers never block the
+    background writer. Each write is one transaction.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path: str, cached_statements: int = 64) -> None:
+        """Open or create the database.
+
+        Args:
+            db_path: Database file path.
+            cached_statements: Size of the prepared-statement cache.
+        """
+        self._path = db_path
+        self._lock = threading.RLock()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(
+            db_path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=cached_statements,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    @property
+    def location(self) -> str:
+        """Get the database file path."""
+        return self._path
+
+    def read(self, template_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with self._lock:
+                row = self._conn.execute(_SELECT_DATA, (template_id,)).fetchone()
+        except sqlite3.Error as e:
+            raise StorageReadError(str(e), path=self._path) from e
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def write(self, template_id: str, data: Dict[str, Any]) -> None:
+        self.write_many(((template_id, data),))
+
+    def write_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Write several templates in a single transaction."""
+        rows = []
+        metadata = []
+        for template_id, data in items:
+            payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            rows.append((template_id, payload))
+            metadata.append(_metadata_row(template_id, data, len(payload)))
+
+        try:
+            with self._lock, self._transaction():
+                self._conn.executemany(_UPSERT_DATA, rows)
+                self._conn.executemany(_UPSERT_METADATA, metadata)
+        except sqlite3.Error as e:
+            raise StorageWriteError(str(e), path=self._path) from e
+        return len(rows)
+
+    def delete(self, template_id: str) -> bool:
+        try:
+            with self._lock, self._transaction():
+                removed = self._conn.execute(_DELETE_DATA, (template_id,)).rowcount > 0
+                self._conn.execute(_DELETE_METADATA, (template_id,))
+        except sqlite3.Error as e:
+            raise StorageWriteError(str(e), path=self._path) from e
+        return removed
+
+    def exists(self, template_id: str) -> bool:
+        try:
+            with self._lock:
+                return self._conn.execute(_SELECT_EXISTS, (template_id,)).fetchone() is not None
+        except sqlite3.Error as e:
+            raise StorageReadError(str(e), path=self._path) from e
+
+    def version(self, template_id: str) -> Optional[Tuple[Any, ...]]:
+        """Get (modified_at, size) from the metadata table."""
+        try:
+            with self._lock:
+                row = self._conn.execute(_SELECT_VERSION, (template_id,)).fetchone()
+        except sqlite3.Error as e:
+            raise StorageReadError(str(e), path=self._path) from e
+        return tuple(row) if row is not None else None
+
+    def list_ids(self) -> List[str]:
+        try:
+            with self._lock:
+                return [row[0] for row in self._conn.execute(_SELECT_IDS)]
+        except sqlite3.Error as e:
+            raise StorageReadError(str(e), path=self._path) from e
+
+    def query(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        sort: str = "modifiedAt",
+        reverse: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        if reverse is None:
+            reverse = sort != "name"
+
+        sql = _QUERIES[(sort, reverse)]
+        try:
+            with self._lock:
+                rows = self._conn.execute(sql, (-1 if limit is None else limit, offset)).fetchall()
+        except sqlite3.Error as e:
+            raise StorageReadError(str(e), path=self._path) from e
+        return [{"id": row[0], "name": row[1], "modifiedAt": row[2]} for row in rows]
+
+    def count(self) -> int:
+        try:
+            with self._lock:
+                return self._conn.execute(_SELECT_COUNT).fetchone()[0]
+        except sqlite3.Error as e:
+            raise StorageReadError(str(e), path=self._path) from e
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _create_schema(self) -> None:
+        """Create tables and indexes, or check an existing schema."""
+        with self._lock, self._transaction():
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > self.SCHEMA_VERSION:
+                raise StorageReadError(
+                    f"Template database schema {version} is newer than supported",
+                    path=self._path,
+                )
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+            self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Run statements in one transaction. Caller holds the lock."""
+        self._conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+
+class DedupTemplateStorage(TemplateStorage):
+    """Stores template CSS and component subtrees once, by content hash.
+
+    Wraps another backend, which stores a small manifest per template:
+    the template data with its CSS and each root component subtree
+    replaced by the digest of a blob in a ``BlobStore``. Templates that
+    share CSS or components (duplicates, near-identical copies from a
+    pack) share blobs until one of them is modified; a modified copy
+    only adds blobs for the parts that changed.
+
+    Templates written before deduplication was enabled are read as-is
+    and converted when next written. Listing, metadata and version
+    tokens come from the wrapped backend.
+    """
+
+    MANIFEST_KEY = "blobManifest"
+    MANIFEST_VERSION = 1
+
+    def __init__(self, inner: TemplateStorage, blobs: BlobStore) -> None:
+        """Initialize the backend.
+
+        Args:
+            inner: Backend that stores the manifests.
+            blobs: Store holding the shared CSS and component blobs.
+        """
+        self._inner = inner
+        self._blobs = blobs
+        self._lock = threading.RLock()
+        # template id -> digests its stored manifest references
+        self._refs: Dict[str, List[str]] = {}
+        if not blobs.counts_loaded:
+            self._mark()
+
+    @property
+    def location(self) -> str:
+        """Get the wrapped backend's location."""
+        return self._inner.location
+
+    @property
+    def inner(self) -> TemplateStorage:
+        """Get the backend that stores the manifests."""
+        return self._inner
+
+    @property
+    def blobs(self) -> BlobStore:
+        """Get the blob store."""
+        return self._blobs
+
+    def read(self, template_id: str) -> Optional[Dict[str, Any]]:
+        # Under the lock, so a concurrent write cannot leave stale refs
+        with self._lock:
+            manifest = self._inner.read(template_id)
+            if manifest is None or self.MANIFEST_KEY not in manifest:
+                return manifest
+            self._refs[template_id] = _manifest_refs(manifest)
+        return self._resolve(manifest)
+
+    def write(self, template_id: str, data: Dict[str, Any]) -> None:
+        """Store new blobs, then the manifest, then update counts.
+
+        Unchanged CSS and components hash to blobs already stored, so
+        only the manifest and the changed parts are written.
+        """
+        with self._lock:
+            manifest, refs = self._split(data)
+            old_refs = self._refs_of(template_id)
+            self._inner.write(template_id, manifest)
+            self._refs[template_id] = refs
+            self._blobs.incref(refs)
+            self._blobs.decref(old_refs)
+
+    def write_many(self, items: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        with self._lock:
+            batch = []
+            refs_by_id: Dict[str, List[str]] = {}
+            old_refs: List[str] = []
+            for template_id, data in items:
+                manifest, refs = self._split(data)
+                batch.append((template_id, manifest))
+                old_refs.extend(self._refs_of(template_id))
+                refs_by_id[template_id] = refs
+            count = self._inner.write_many(batch)
+            self._refs.update(refs_by_id)
+            self._blobs.incref(ref for refs in refs_by_id.values() for ref in refs)
+            self._blobs.decref(old_refs)
+        return count
+
+    def delete(self, template_id: str) -> bool:
+        with self._lock:
+            old_refs = self._refs_of(template_id)
+            removed = self._inner.delete(template_id)
+            self._refs.pop(template_id, None)
+            if removed:
+                self._blobs.decref(old_refs)
+            return removed
+
+    def exists(self, template_id: str) -> bool:
+        return self._inner.exists(template_id)
+
+    def version(self, template_id: str) -> Optional[Tuple[Any, ...]]:
+        return self._inner.version(template_id)
+
+    def list_ids(self) -> List[str]:
+        return self._inner.list_ids()
+
+    def query(
+        self,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        sort: str = "modifiedAt",
+        reverse: Optional[bool] = None
+    ) -> List[Dict[str, Any]]:
+        return self._inner.query(offset=offset, limit=limit, sort=sort, reverse=reverse)
+
+    def count(self) -> int:
+        return self._inner.count()
+
+    def refresh(self) -> bool:
+        return self._inner.refresh()
+
+    def close(self) -> None:
+        self._blobs.save()
+        self._inner.close()
+
+    def collect_garbage(self) -> int:
+        """Delete blobs no stored template references.
+
+        Reference counts are rebuilt from the manifests first (mark and
+        sweep), so stale counts never cause a live blob to be deleted.
+
+        Returns:
+            Number of blobs deleted.
+        """
+        with self._lock:
+            live = self._mark()
+            if live is None:
+                return 0
+            return self._blobs.sweep(set(live))
+
+    def get_stats(self) -> BlobStats:
+        """Get blob sharing statistics."""
+        return self._blobs.get_stats()
+
+    def _split(self, data: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+        """Store a template's blobs and build its manifest.
+
+        Returns:
+            (manifest, digests referenced by the manifest)
+        """
+        manifest = dict(data)
+        refs: List[str] = []
+
+        css = manifest.pop("css", "") or ""
+        if css:
+            digest = self._blobs.put(css.encode("utf-8"))
+            manifest["cssBlob"] = digest
+            refs.append(digest)
+
+        for side in ("front", "back"):
+            side_data = manifest.get(side)
+            if not isinstance(side_data, dict):
+                continue
+            side_manifest = dict(side_data)
+            digests = []
+            for component in side_manifest.pop("components", None) or []:
+                payload = json.dumps(
+                    component, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+                ).encode("utf-8")
+                digests.append(self._blobs.put(payload))
+            side_manifest["componentBlobs"] = digests
+            manifest[side] = side_manifest
+            refs.extend(digests)
+
+        manifest[self.MANIFEST_KEY] = self.MANIFEST_VERSION
+        return manifest, refs
+
+    def _resolve(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """Rebuild template data from a manifest."""
+        data = dict(manifest)
+        version = data.pop(self.MANIFEST_KEY)
+        if version > self.MANIFEST_VERSION:
+            raise StorageReadError(f"Unsupported blob manifest version {version}")
+
+        digest = data.pop("cssBlob", None)
+        data["css"] = self._blobs.get(digest).decode("utf-8") if digest else data.get("css", "")
+
+        for side in ("front", "back"):
+            side_data = data.get(side)
+            if not isinstance(side_data, dict):
+                continue
+            side_data = dict(side_data)
+            side_data["components"] = [
+                json.loads(self._blobs.get(d)) for d in side_data.pop("componentBlobs", [])
+            ]
+            data[side] = side_data
+        return data
+
+    def _refs_of(self, template_id: str) -> List[str]:
+        """Get the digests referenced by a stored manifest."""
+        refs = self._refs.get(template_id)
+        if refs is not None:
+            return refs
+        try:
+            manifest = self._inner.read(template_id)
+        except READ_ERRORS as e:
+            logger.warning(f"Cannot read old manifest of {template_id}: {e}")
+            return []
+        return _manifest_refs(manifest) if manifest else []
+
+    def _mark(self) -> Optional[Dict[str, int]]:
+        """Rebuild reference counts from every stored manifest.
+
+        Returns:
+            Count per live digest, or None if a manifest could not be
+            read (nothing may be deleted then).
+        """
+        counts: Dict[str, int] = {}
+        refs_by_id: Dict[str, List[str]] = {}
+        for template_id in self._inner.list_ids():
+            try:
+                manifest = self._inner.read(template_id)
+            except READ_ERRORS as e:
+                logger.error(f"Cannot read manifest of {template_id}, skipping collection: {e}")
+                return None
+            refs = refs_by_id[template_id] = _manifest_refs(manifest or {})
+            for digest in refs:
+                counts[digest] = counts.get(digest, 0) + 1
+        self._refs = refs_by_id
+        self._blobs.set_refcounts(counts)
+        return counts
+
+
+def _manifest_refs(manifest: Dict[str, Any]) -> List[str]:
+    """List the blob digests a manifest references."""
+    if DedupTemplateStorage.MANIFEST_KEY not in manifest:
+        return []
+    refs = [manifest["cssBlob"]] if manifest.get("cssBlob") else []
+    for side in ("front", "back"):
+        side_data = manifest.get(side)
+        if isinstance(side_data, dict):
+            refs.extend(side_data.get("componentBlobs", []))
+    return refs
+
+
+def _metadata_row(template_id: str, data: Dict[str, Any], size: int) -> Tuple[Any, ...]:
+    """Build a ``template_metadata`` row from template data."""
+    name = data.get("name") or "Untitled Template"
+    return (
+        template_id,
+        name,
+        name.casefold(),
+        data.get("createdAt") or "",
+        data.get("modifiedAt") or "",
+        data.get("noteType"),
+        size,
+    )
+
+
+def import_templates(
+    source: TemplateStorage,
+    target: TemplateStorage,
+    overwrite: bool = True,
+    batch_size: int = 500
+) -> int:
+    """Copy all templates from one backend to another.
+
+    Unreadable templates are logged and skipped. The source is not
+    modified.
+
+    Args:
+        source: Backend to read from, e.g. the existing template directory.
+        target: Backend to write to.
+        overwrite: Replace templates already present in the target.
+        batch_size: Templates written per ``write_many`` call.
+
+    Returns:
+        Number of templates imported.
+    """
+    imported = 0
+    batch: List[Tuple[str, Dict[str, Any]]] = []
+    for template_id in source.list_ids():
+        if not overwrite and target.exists(template_id):
+            continue
+        try:
+            data = source.read(template_id)
+        except READ_ERRORS as e:
+            logger.warning(f"Skipping unreadable template {template_id}: {e}")
+            continue
+        if data is None:
+            continue
+
+        batch.append((template_id, data))
+        if len(batch) >= batch_size:
+            imported += target.write_many(batch)
+            batch = []
+
+    if batch:
+        imported += target.write_many(batch)
+
+    logger.info(f"Imported {imported} templates into {target.location}")
+    return imported
@@ -3,12 +3,19 @@ Undo/Redo Manager for Template Designer.
 
 Plan 07: Implements a state-based undo/redo system with observer pattern
 for UI updates.
+
+Thread safety: changes to the history (push, undo, redo, clear) are
+serialised by a lock. After each change an immutable ``HistorySnapshot``
+is published, and every read goes through the latest one, so readers on
+other threads never block and never see a half-applied change.
+Recorded states are deep copied in and out and never mutated.
 """
 
 from dataclasses import dataclass, field
-from typing import TypeVar, Generic, Optional, Callable, List
+from typing import TypeVar, Generic, Optional, Callable, List, Tuple, Dict, Any
 from copy import deepcopy
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +30,47 @@ class HistoryEntry(Generic[T]):
     description: str
 
 
+@dataclass(frozen=True)
+class HistorySnapshot:
+    """Immutable view of the history at one point in time.
+    
+    Attributes:
+        descriptions: Action descriptions from oldest to newest.
+        current_index: Index of the last applied action, -1 if none.
+    """
+    descriptions: Tuple[str, ...] = ()
+    current_index: int = -1
+    
+    @property
+    def can_undo(self) -> bool:
+        """Check if undo is available."""
+        return self.current_index >= 0
+    
+    @property
+    def can_redo(self) -> bool:
+        """Check if redo is available."""
+        return self.current_index < len(self.descriptions) - 1
+    
+    @property
+    def undo_description(self) -> Optional[str]:
+        """Get description of the action that would be undone."""
+        return self.descriptions[self.current_index] if self.can_undo else None
+    
+    @property
+    def redo_description(self) -> Optional[str]:
+        """Get description of the action that would be redone."""
+        return self.descriptions[self.current_index + 1] if self.can_redo else None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary."""
+        return {
+            "entries": list(self.descriptions),
+            "currentIndex": self.current_index,
+            "canUndo": self.can_undo,
+            "canRedo": self.can_redo,
+        }
+
+
 HistoryListener = Callable[[str, bool, bool], None]  # (description, can_undo, can_redo)
 
 
@@ -66,37 +114,46 @@ class UndoRedoManager(Generic[T]):
         self._current_index: int = -1  # Points to current position in history
         self._max_history: int = max_history
         self._listeners: List[HistoryListener] = []
+        self._lock = threading.RLock()
+        self._snapshot = HistorySnapshot()
         
         logger.debug(f"UndoRedoManager initialized with max_history={max_history}")
     
     @property
     def can_undo(self) -> bool:
         """Check if undo is available."""
-        return self._current_index >= 0
+        return self._snapshot.can_undo
     
     @property
     def can_redo(self) -> bool:
         """Check if redo is available."""
-        return self._current_index < len(self._history) - 1
+        return self._snapshot.can_redo
     
     @property
     def undo_description(self) -> Optional[str]:
         """Get description of the action that would be undone."""
-        if self.can_undo:
-            return self._history[self._current_index].description
-        return None
+        return self._snapshot.undo_description
     
     @property
     def redo_description(self) -> Optional[str]:
         """Get description of the action that would be redone."""
-        if self.can_redo:
-            return self._history[self._current_index + 1].description
-        return None
+        return self._snapshot.redo_description
     
     @property
     def history_size(self) -> int:
         """Get current number of history entries."""
-        return len(self._history)
+        return len(self._snapshot.descriptions)
+    
+    def snapshot(self) -> HistorySnapshot:
+        """
+        Get an immutable view of the history.
+        
+        Safe to call from any thread; never blocks on writers.
+        
+        Returns:
+            The history as of the last completed change.
+        """
+        return self._snapshot
     
     def push_state(self, state_before: T, state_after: T, description: str) -> None:
         """
@@ -111,32 +168,35 @@ class UndoRedoManager(Generic[T]):
             state_after: State after the change (deep copied)
             description: Human-readable description of the change
         """
-        # Clear redo history (any entries after current position)
-        if self._current_index < len(self._history) - 1:
-            self._history = self._history[:self._current_index + 1]
-            logger.debug("Cleared redo history")
-        
-        # Create new entry with deep copies to avoid reference issues
+        # Create new entry with deep copies to avoid reference issues.
+        # Copying happens before taking the lock; entries are never mutated.
         entry = HistoryEntry(
             state_before=deepcopy(state_before),
             state_after=deepcopy(state_after),
             description=description
         )
         
-        # Add to history
-        self._history.append(entry)
-        self._current_index = len(self._history) - 1
-        
-        # Trim if exceeding max history
-        if len(self._history) > self._max_history:
-            excess = len(self._history) - self._max_history
-            self._history = self._history[excess:]
-            self._current_index -= excess
-            logger.debug(f"Trimmed {excess} oldest history entries")
-        
-        logger.debug(f"Pushed state: '{description}' (index={self._current_index}, total={len(self._history)})")
+        with self._lock:
+            # Clear redo history (any entries after current position)
+            if self._current_index < len(self._history) - 1:
+                self._history = self._history[:self._current_index + 1]
+                logger.debug("Cleared redo history")
+            
+            # Add to history
+            self._history.append(entry)
+            self._current_index = len(self._history) - 1
+            
+            # Trim if exceeding max history
+            if len(self._history) > self._max_history:
+                excess = len(self._history) - self._max_history
+                self._history = self._history[excess:]
+                self._current_index -= excess
+                logger.debug(f"Trimmed {excess} oldest history entries")
+            
+            logger.debug(f"Pushed state: '{description}' (index={self._current_index}, total={len(self._history)})")
+            snapshot = self._publish()
         
-        self._notify_listeners(description)
+        self._notify_listeners(description, snapshot)
     
     def undo(self) -> Optional[T]:
         """
@@ -145,16 +205,18 @@ class UndoRedoManager(Generic[T]):
         Returns:
             The state before the undone action, or None if nothing to undo.
         """
-        if not self.can_undo:
-            logger.debug("Nothing to undo")
-            return None
+        with self._lock:
+            if self._current_index < 0:
+                logger.debug("Nothing to undo")
+                return None
+            
+            entry = self._history[self._current_index]
+            self._current_index -= 1
+            
+            logger.debug(f"Undo: '{entry.description}' (index now {self._current_index})")
+            snapshot = self._publish()
         
-        entry = self._history[self._current_index]
-        self._current_index -= 1
-        
-        logger.debug(f"Undo: '{entry.description}' (index now {self._current_index})")
-        
-        self._notify_listeners(f"Undo: {entry.description}")
+        self._notify_listeners(f"Undo: {entry.description}", snapshot)
         
         return deepcopy(entry.state_before)
     
@@ -165,27 +227,31 @@ class UndoRedoManager(Generic[T]):
         Returns:
             The state after the redone action, or None if nothing to redo.
         """
-        if not self.can_redo:
-            logger.debug("Nothing to redo")
-            return None
-        
-        self._current_index += 1
-        entry = self._history[self._current_index]
+        with self._lock:
+            if self._current_index >= len(self._history) - 1:
+                logger.debug("Nothing to redo")
+                return None
+            
+            self._current_index += 1
+            entry = self._history[self._current_index]
+            
+            logger.debug(f"Redo: '{entry.description}' (index now {self._current_index})")
+            snapshot = self._publish()
         
-        logger.debug(f"Redo: '{entry.description}' (index now {self._current_index})")
-        
-        self._notify_listeners(f"Redo: {entry.description}")
+        self._notify_listeners(f"Redo: {entry.description}", snapshot)
         
         return deepcopy(entry.state_after)
     
     def clear(self) -> None:
         """Clear all history."""
-        self._history.clear()
-        self._current_index = -1
-        
-        logger.debug("History cleared")
+        with self._lock:
+            self._history = []
+            self._current_index = -1
+            
+            logger.debug("History cleared")
+            snapshot = self._publish()
         
-        self._notify_listeners("History cleared")
+        self._notify_listeners("History cleared", snapshot)
     
     def get_history_list(self) -> List[str]:
         """
@@ -194,7 +260,7 @@ class UndoRedoManager(Generic[T]):
         Returns:
             List of descriptions from oldest to newest.
         """
-        return [entry.description for entry in self._history]
+        return list(self._snapshot.descriptions)
     
     def add_listener(self, listener: HistoryListener) -> None:
         """
@@ -205,8 +271,11 @@ class UndoRedoManager(Generic[T]):
         Args:
             listener: Callback function to be notified
         """
-        if listener not in self._listeners:
-            self._listeners.append(listener)
+        with self._lock:
+            if listener in self._listeners:
+                return
+            # Replaced rather than mutated so notification can iterate unlocked
+            self._listeners = self._listeners + [listener]
             logger.debug(f"Added history listener (total={len(self._listeners)})")
     
     def remove_listener(self, listener: HistoryListener) -> None:
@@ -216,14 +285,29 @@ class UndoRedoManager(Generic[T]):
         Args:
             listener: The listener to remove
         """
-        if listener in self._listeners:
-            self._listeners.remove(listener)
+        with self._lock:
+            if listener not in self._listeners:
+                return
+            self._listeners = [l for l in self._listeners if l is not listener]
             logger.debug(f"Removed history listener (total={len(self._listeners)})")
     
-    def _notify_listeners(self, description: str) -> None:
-        """Notify all listeners of a history change."""
+    def _publish(self) -> HistorySnapshot:
+        """Publish a snapshot of the current history. Caller holds the lock."""
+        self._snapshot = HistorySnapshot(
+            descriptions=tuple(entry.description for entry in self._history),
+            current_index=self._current_index,
+        )
+        return self._snapshot
+    
+    def _notify_listeners(self, description: str, snapshot: HistorySnapshot) -> None:
+        """
+        Notify all listeners of a history change.
+        
+        Called without the lock held, so listeners may call back into
+        the manager; they receive the state right after their change.
+        """
         for listener in self._listeners:
             try:
-                listener(description, self.can_undo, self.can_redo)
+                listener(description, snapshot.can_undo, snapshot.can_redo)
             except Exception as e:
                 logger.error(f"Error notifying history listener: {e}")
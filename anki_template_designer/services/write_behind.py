@@ -0,0 +1,380 @@
+"""Debounced write-behind queue.
+
+Moves slow writes off the calling (UI) thread. Writes are keyed; a new
+submission for a key that is still pending replaces the pending payload,
+so rapid saves of the same template within the debounce window result
+in a single write of the latest version.
+
+A key is written once it has been quiet for ``debounce_seconds``, or at
+most ``max_delay_seconds`` after its first pending submission, so a
+template saved continuously is still written regularly.
+
+A failed write is queued again, up to ``retries`` times, unless a newer
+payload for the key is already pending. When it still fails,
+``on_error`` is called so the owner can keep the unwritten state.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from .performance.metrics import MetricsTracker
+
+logger = logging.getLogger("anki_template_designer.services.write_behind")
+
+
+@dataclass
+class _PendingWrite:
+    """Internal: latest payload for a key and when it was submitted."""
+    payload: Any
+    first_submitted: float
+    last_submitted: float
+    attempts: int = 0
+
+
+class WriteBehindQueue:
+    """Background writer with per-key coalescing.
+
+    Example:
+        queue = WriteBehindQueue(write_file, debounce_seconds=0.5)
+        queue.submit("template-id", data)
+        queue.flush()     # barrier: everything submitted so far is written
+        queue.shutdown()
+
+    Metrics (in ``metrics``):
+        ``<name>.queue_depth`` gauge: pending keys.
+        ``<name>.write`` timing: duration of each write.
+        ``<name>.latency`` timing: first submission to write completion.
+        ``<name>.written``, ``<name>.coalesced``, ``<name>.retried`` counters.
+        ``<name>.errors`` counter: writes that failed after all retries.
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[str, Any], None],
+        debounce_seconds: float = 0.5,
+        max_delay_seconds: Optional[float] = None,
+        metrics: Optional[MetricsTracker] = None,
+        name: str = "write_behind",
+        retries: int = 2,
+        on_error: Optional[Callable[[str, Any, Exception], None]] = None
+    ) -> None:
+        """Initialize the queue.
+
+        Args:
+            writer: Called on the background thread as ``writer(key, payload)``.
+            debounce_seconds: Quiet period before a key is written.
+            max_delay_seconds: Longest a pending key may wait. Defaults to
+                ten times the debounce window.
+            metrics: Tracker for queue metrics. A private one is created if None.
+            name: Prefix for metric names and the thread name.
+            retries: Times a failed write is queued again before giving up.
+            on_error: Called as ``on_error(key, payload, error)`` when a
+                write failed for good. Runs on the writing thread, before
+                ``flush()`` returns, without the queue lock held.
+        """
+        self._writer = writer
+        self._debounce = debounce_seconds
+        self._max_delay = max_delay_seconds if max_delay_seconds is not None else debounce_seconds * 10
+        self._metrics = metrics or MetricsTracker()
+        self._name = name
+        self._retries = retries
+        self._on_error = on_error
+
+        self._pending: "OrderedDict[str, _PendingWrite]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._writing: Optional[str] = None
+        self._writing_payload: Any = None
+        self._flush_requested = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def metrics(self) -> MetricsTracker:
+        """Get the metrics tracker."""
+        return self._metrics
+
+    @property
+    def depth(self) -> int:
+        """Get the number of keys waiting to be written."""
+        with self._cond:
+            return len(self._pending)
+
+    def __contains__(self, key: str) -> bool:
+        """Check whether a key is pending or being written."""
+        with self._cond:
+            return key in self._pending or self._writing == key
+
+    def has_pending(self, key: str) -> bool:
+        """Check whether a key has a submission not yet being written.
+
+        Args:
+            key: Write key.
+
+        Returns:
+            True if a write for the key is still waiting in the queue.
+        """
+        with self._cond:
+            return key in self._pending
+
+    def peek(self, key: str) -> Any:
+        """Get the newest payload of a key that is not yet fully written.
+
+        Args:
+            key: Write key.
+
+        Returns:
+            The pending payload, else the one being written, else None.
+        """
+        with self._cond:
+            pending = self._pending.get(key)
+            if pending is not None:
+                return pending.payload
+            if self._writing == key:
+                return self._writing_payload
+            return None
+
+    def submit(self, key: str, payload: Any) -> None:
+        """Queue a write, replacing any pending write for the same key.
+
+        After shutdown, writes happen synchronously on the caller's thread.
+
+        Args:
+            key: Write key, e.g. a template id.
+            payload: Value passed to the writer. Must not be mutated afterwards.
+        """
+        now = time.monotonic()
+        with self._cond:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                pending = self._pending.get(key)
+                if pending is None:
+                    self._pending[key] = _PendingWrite(payload, now, now)
+                else:
+                    pending.payload = payload
+                    pending.last_submitted = now
+                    self._metrics.increment(f"{self._name}.coalesced")
+                self._metrics.set_gauge(f"{self._name}.queue_depth", len(self._pending))
+                self._ensure_thread()
+                self._cond.notify_all()
+
+        if closed:
+            self._write_now(key, _PendingWrite(payload, now, now))
+
+    def cancel(self, key: str) -> bool:
+        """Drop a pending write, e.g. because the template was deleted.
+
+        Waits for the key if it is being written right now, so the caller
+        can safely remove the target afterwards.
+
+        Args:
+            key: Write key.
+
+        Returns:
+            True if a pending write was dropped.
+        """
+        with self._cond:
+            dropped = self._pending.pop(key, None) is not None
+            while self._writing == key:
+                self._cond.wait()
+            self._metrics.set_gauge(f"{self._name}.queue_depth", len(self._pending))
+            return dropped
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything pending now and wait for it to finish.
+
+        Args:
+            timeout: Maximum seconds to wait, or None to wait indefinitely.
+
+        Returns:
+            True if the queue drained within the timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                drained = list(self._pending.items())
+                self._pending.clear()
+                self._metrics.set_gauge(f"{self._name}.queue_depth", 0)
+            else:
+                drained = None
+
+        if drained is not None:
+            # No worker: write on this thread, outside the lock for on_error
+            for key, pending in drained:
+                self._write_now(key, pending)
+            return True
+
+        with self._cond:
+            self._flush_requested += 1
+            self._cond.notify_all()
+            try:
+                while self._pending or self._writing is not None:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flush_requested -= 1
+
+    def shutdown(self, flush: bool = True, timeout: Optional[float] = None) -> bool:
+        """Stop the background thread.
+
+        Args:
+            flush: Write pending keys first. If False they are dropped.
+            timeout: Maximum seconds to wait for the flush.
+
+        Returns:
+            True if nothing was left unwritten.
+        """
+        drained = self.flush(timeout) if flush else False
+        with self._cond:
+            if not flush:
+                self._pending.clear()
+                drained = self._writing is None
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        return drained
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue statistics.
+
+        Returns:
+            Dictionary with depth, counters and timing stats.
+        """
+        write = self._metrics.get_timing_stats(f"{self._name}.write")
+        latency = self._metrics.get_timing_stats(f"{self._name}.latency")
+        return {
+            "depth": self.depth,
+            "written": self._metrics.get_counter(f"{self._name}.written"),
+            "coalesced": self._metrics.get_counter(f"{self._name}.coalesced"),
+            "retried": self._metrics.get_counter(f"{self._name}.retried"),
+            "errors": self._metrics.get_counter(f"{self._name}.errors"),
+            "write": write.to_dict() if write else None,
+            "latency": latency.to_dict() if latency else None,
+        }
+
+    def _ensure_thread(self) -> None:
+        """Start the worker thread. Caller holds the lock."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+
+    def _next_due(self, now: float) -> Optional[str]:
+        """Find a key that is due, or None. Caller holds the lock."""
+        if self._flush_requested and self._pending:
+            return next(iter(self._pending))
+        for key, pending in self._pending.items():
+            due = min(pending.last_submitted + self._debounce,
+                      pending.first_submitted + self._max_delay)
+            if due <= now:
+                return key
+        return None
+
+    def _wait_time(self, now: float) -> Optional[float]:
+        """Seconds until the next key is due. Caller holds the lock."""
+        if not self._pending:
+            return None
+        due = min(
+            min(p.last_submitted + self._debounce, p.first_submitted + self._max_delay)
+            for p in self._pending.values()
+        )
+        return max(due - now, 0.0)
+
+    def _run(self) -> None:
+        """Worker loop."""
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed and not self._pending:
+                        return
+                    now = time.monotonic()
+                    key = self._next_due(now)
+                    if key is not None or (self._closed and self._pending):
+                        key = key or next(iter(self._pending))
+                        pending = self._pending.pop(key)
+                        self._writing = key
+                        self._writing_payload = pending.payload
+                        self._metrics.set_gauge(f"{self._name}.queue_depth", len(self._pending))
+                        break
+                    self._cond.wait(self._wait_time(now))
+
+            try:
+                error = self._write(key, pending)
+                if error is not None and not self._requeue(key, pending):
+                    self._fail(key, pending, error)
+            finally:
+                with self._cond:
+                    self._writing = None
+                    self._writing_payload = None
+                    self._cond.notify_all()
+
+    def _requeue(self, key: str, pending: _PendingWrite) -> bool:
+        """Queue a failed write again if retries are left.
+
+        Returns:
+            True if the key is pending again, with this payload or a newer one.
+        """
+        with self._cond:
+            if key in self._pending:
+                # Superseded; the newer payload is written instead
+                return True
+            if pending.attempts >= self._retries or self._closed:
+                return False
+            now = time.monotonic()
+            self._pending[key] = _PendingWrite(
+                pending.payload, pending.first_submitted, now, pending.attempts + 1
+            )
+            self._metrics.increment(f"{self._name}.retried")
+            self._metrics.set_gauge(f"{self._name}.queue_depth", len(self._pending))
+            self._cond.notify_all()
+            return True
+
+    def _write_now(self, key: str, pending: _PendingWrite) -> None:
+        """Write one key on the calling thread, retrying immediately."""
+        error = self._write(key, pending)
+        while error is not None and pending.attempts < self._retries:
+            pending.attempts += 1
+            self._metrics.increment(f"{self._name}.retried")
+            error = self._write(key, pending)
+        if error is not None:
+            self._fail(key, pending, error)
+
+    def _fail(self, key: str, pending: _PendingWrite, error: Exception) -> None:
+        """Record a write that failed for good and report it."""
+        logger.error(f"Write-behind write failed for {key} after {pending.attempts + 1} attempts: {error}")
+        self._metrics.increment(f"{self._name}.errors")
+        if self._on_error is None:
+            return
+        try:
+            self._on_error(key, pending.payload, error)
+        except Exception as e:
+            logger.error(f"Write-behind error callback failed for {key}: {e}")
+
+    def _write(self, key: str, pending: _PendingWrite) -> Optional[Exception]:
+        """Run the writer for one key and record metrics.
+
+        Returns:
+            The writer's exception, or None if the write succeeded.
+        """
+        start = time.monotonic()
+        try:
+            self._writer(key, pending.payload)
+            self._metrics.increment(f"{self._name}.written")
+            return None
+        except Exception as e:
+            logger.warning(f"Write-behind write failed for {key}: {e}")
+            return e
+        finally:
+            end = time.monotonic()
+            self._metrics.record_timing(f"{self._name}.write", (end - start) * 1000)
+            self._metrics.record_timing(f"{self._name}.latency", (end - pending.first_submitted) * 1000)
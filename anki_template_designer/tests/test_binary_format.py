@@ -0,0 +1,134 @@
+"""Tests for the compact binary template format."""
+
+import json
+import time
+
+import pytest
+
+from anki_template_designer.core import binary_format
+from anki_template_designer.core.exceptions import InvalidFormatError
+from anki_template_designer.core.models import (
+    Component, ComponentStyle, ComponentType, Template, TemplateSide
+)
+
+
+def _large_template(count):
+    """Build a template with ``count`` components."""
+    components = [
+        Component(
+            id=f"c{i:07d}",
+            type=ComponentType.FIELD if i % 2 else ComponentType.TEXT,
+            content="" if i % 2 else f"Label {i}",
+            field_name="Front" if i % 2 else None,
+            style=ComponentStyle(color="#333", padding="4px", font_size="14px"),
+            attributes={"class": "row"},
+        )
+        for i in range(count)
+    ]
+    return Template(
+        name="Large",
+        front=TemplateSide(html="<div>{{Front}}</div>", components=components),
+        back=TemplateSide(html="{{FrontSide}}<hr id=answer>{{Back}}"),
+        css=".card { font-family: arial; }",
+    )
+
+
+class TestRoundTrip:
+    """Tests for encode/decode round trips."""
+
+    @pytest.mark.parametrize("value", [
+        None, True, False, 0, 1, -1, 2 ** 40, -(2 ** 40), 1.5, "", "ünïcødé",
+        [], {}, [1, [2, [3]]], {"nested": {"list": [None, "x"]}},
+    ])
+    def test_scalar_and_container_values(self, value):
+        """Test JSON-compatible values round-trip exactly."""
+        assert binary_format.decode(binary_format.encode(value)) == value
+
+    def test_template_round_trip(self):
+        """Test a template dictionary round-trips exactly."""
+        data = _large_template(50).to_dict()
+        assert binary_format.decode(binary_format.encode(data)) == data
+
+    def test_compressed_round_trip(self):
+        """Test compressed data round-trips and is smaller."""
+        data = _large_template(200).to_dict()
+        plain = binary_format.encode(data)
+        packed = binary_format.encode(data, compress=True)
+        assert binary_format.decode(packed) == data
+        assert len(packed) < len(plain)
+
+    def test_non_canonical_timestamp_kept_as_string(self):
+        """Test timestamps that would not round-trip stay strings."""
+        data = {"createdAt": "2024-01-01T00:00:00+00:00", "modifiedAt": "not a date"}
+        assert binary_format.decode(binary_format.encode(data)) == data
+
+    def test_unknown_keys_preserved(self):
+        """Test keys outside the dictionary are stored in the string table."""
+        data = {"data-custom": 1, "id": "x"}
+        assert binary_format.decode(binary_format.encode(data)) == data
+
+    def test_smaller_than_json(self):
+        """Test the binary form is smaller than indented JSON."""
+        data = _large_template(100).to_dict()
+        as_json = json.dumps(data, indent=2).encode("utf-8")
+        assert len(binary_format.encode(data)) * 3 < len(as_json)
+
+
+class TestErrors:
+    """Tests for invalid input."""
+
+    def test_is_binary(self):
+        """Test magic detection."""
+        assert binary_format.is_binary(binary_format.encode({}))
+        assert not binary_format.is_binary(b'{"id": "x"}')
+
+    def test_rejects_json(self):
+        """Test decoding JSON text raises."""
+        with pytest.raises(InvalidFormatError):
+            binary_format.decode(b'{"id": "x"}')
+
+    def test_rejects_unknown_version(self):
+        """Test future format versions are rejected."""
+        data = bytearray(binary_format.encode({}))
+        data[len(binary_format.MAGIC)] = 99
+        with pytest.raises(InvalidFormatError):
+            binary_format.decode(bytes(data))
+
+    @pytest.mark.parametrize("cut", [1, 5, 20])
+    def test_rejects_truncated(self, cut):
+        """Test truncated data raises instead of returning partial data."""
+        data = binary_format.encode(_large_template(5).to_dict())
+        with pytest.raises(InvalidFormatError):
+            binary_format.decode(data[:-cut])
+
+    def test_rejects_unsupported_type(self):
+        """Test encoding unsupported values raises."""
+        with pytest.raises(InvalidFormatError):
+            binary_format.encode({"id": object()})
+
+
+@pytest.mark.slow
+class TestBinaryFormatBenchmarks:
+    """Size and speed comparison against JSON on a large template."""
+
+    def test_large_template_size_and_speed(self):
+        """Test a 5k-component template is much smaller and saves faster."""
+        data = _large_template(5000).to_dict()
+
+        start = time.perf_counter()
+        as_json = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
+        json_encode = time.perf_counter() - start
+
+        start = time.perf_counter()
+        as_binary = binary_format.encode(data)
+        binary_encode = time.perf_counter() - start
+
+        start = time.perf_counter()
+        decoded = binary_format.decode(as_binary)
+        binary_decode = time.perf_counter() - start
+
+        assert decoded == data
+        assert len(as_binary) * 5 < len(as_json)
+        assert len(binary_format.encode(data, compress=True)) * 20 < len(as_json)
+        assert binary_encode < json_encode * 3
+        assert binary_decode < 2.0
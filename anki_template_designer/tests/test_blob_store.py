@@ -0,0 +1,203 @@
+"""Tests for the content-addressed blob store and deduplicating storage."""
+
+import os
+import tempfile
+
+import pytest
+
+from anki_template_designer.core.exceptions import StorageReadError
+from anki_template_designer.core.models import Component, ComponentType, Template
+from anki_template_designer.services.blob_store import BlobStore
+from anki_template_designer.services.template_service import TemplateService
+from anki_template_designer.services.template_storage import (
+    DedupTemplateStorage, FileTemplateStorage, SQLiteTemplateStorage,
+)
+
+
+@pytest.fixture
+def tmpdir():
+    with tempfile.TemporaryDirectory() as path:
+        yield path
+
+
+def make_template(name="T", components=3):
+    template = Template(name=name)
+    for i in range(components):
+        template.front.components.append(
+            Component(type=ComponentType.TEXT, content=f"Block {i} " + "x" * 200)
+        )
+    template.back.components.append(Component(type=ComponentType.FIELD, field_name="Back"))
+    template.css = ".card { font-family: serif; }" * 20
+    return template
+
+
+def make_storage(tmpdir, sqlite=False):
+    if sqlite:
+        inner = SQLiteTemplateStorage(os.path.join(tmpdir, "templates.db"))
+    else:
+        inner = FileTemplateStorage(
+            os.path.join(tmpdir, "templates"), os.path.join(tmpdir, "index.json")
+        )
+    return DedupTemplateStorage(inner, BlobStore(os.path.join(tmpdir, "blobs")))
+
+
+class TestBlobStore:
+    """Tests for BlobStore."""
+
+    def test_put_is_idempotent(self, tmpdir):
+        """Test equal content is stored once under one digest."""
+        store = BlobStore(tmpdir)
+        digest = store.put(b"payload")
+        assert store.put(b"payload") == digest
+        assert store.get(digest) == b"payload"
+        assert store.has(digest)
+
+    def test_corrupt_and_missing_blobs_raise(self, tmpdir):
+        """Test damaged blobs are detected on read."""
+        store = BlobStore(tmpdir)
+        digest = store.put(b"payload")
+        with open(store.path_for(digest), "wb") as f:
+            f.write(b"tampered")
+        with pytest.raises(StorageReadError):
+            store.get(digest)
+        with pytest.raises(StorageReadError):
+            store.get("0" * 64)
+        with pytest.raises(StorageReadError):
+            store.path_for("../../etc/passwd")
+
+    def test_counts_survive_reopen(self, tmpdir):
+        """Test journaled counts are replayed and compacted."""
+        store = BlobStore(tmpdir, compact_after=3)
+        a, b = store.put(b"a"), store.put(b"bb")
+        store.incref([a, a, b])
+        store.decref([b])
+        store.incref([b])
+
+        reopened = BlobStore(tmpdir)
+        assert reopened.counts_loaded
+        assert reopened.refcount(a) == 2 and reopened.refcount(b) == 1
+        stats = reopened.get_stats()
+        assert stats.stored_bytes == 3
+        assert stats.referenced_bytes == 4
+        assert stats.to_dict()["savedBytes"] == 1
+
+    def test_missing_counts_flagged(self, tmpdir):
+        """Test blobs without count files ask for a rebuild."""
+        BlobStore(tmpdir).put(b"orphan")
+        assert not BlobStore(tmpdir).counts_loaded
+
+
+class TestDedupTemplateStorage:
+    """Tests for DedupTemplateStorage."""
+
+    @pytest.mark.parametrize("sqlite", [False, True])
+    def test_round_trip(self, tmpdir, sqlite):
+        """Test templates read back exactly as written on either backend."""
+        storage = make_storage(tmpdir, sqlite)
+        template = make_template()
+        storage.write(template.id, template.to_dict())
+        assert storage.read(template.id) == template.to_dict()
+        assert storage.query()[0]["name"] == "T"
+        storage.close()
+
+    def test_copies_share_blobs_until_modified(self, tmpdir):
+        """Test a copy adds no blobs and an edit adds only the changed part."""
+        storage = make_storage(tmpdir)
+        source = make_template()
+        storage.write(source.id, source.to_dict())
+        blobs_before = storage.get_stats().blobs
+
+        copy = Template.from_dict(source.to_dict())
+        copy.id = "copy"
+        copy.name = "Copy"
+        storage.write(copy.id, copy.to_dict())
+        stats = storage.get_stats()
+        assert stats.blobs == blobs_before
+        assert stats.saved_bytes > 0
+
+        copy.front.components[0].content = "Edited"
+        storage.write(copy.id, copy.to_dict())
+        assert storage.get_stats().blobs == blobs_before + 1
+        assert storage.read(source.id) == source.to_dict()
+        assert storage.read(copy.id)["front"]["components"][0]["content"] == "Edited"
+
+    def test_garbage_collection(self, tmpdir):
+        """Test only unreferenced blobs are collected."""
+        storage = make_storage(tmpdir)
+        keep = make_template("Keep")
+        drop = Template.from_dict(keep.to_dict())
+        drop.id = "drop"
+        drop.css = ".only-here {}"
+        for template in (keep, drop):
+            storage.write(template.id, template.to_dict())
+
+        storage.delete(drop.id)
+        # Deleted template only had its CSS to itself
+        assert storage.collect_garbage() == 1
+        assert storage.read(keep.id) == keep.to_dict()
+        assert storage.collect_garbage() == 0
+
+    def test_plain_templates_still_readable(self, tmpdir):
+        """Test templates written before deduplication load and convert on write."""
+        inner = FileTemplateStorage(os.path.join(tmpdir, "templates"), os.path.join(tmpdir, "index.json"))
+        template = make_template()
+        inner.write(template.id, template.to_dict())
+
+        storage = DedupTemplateStorage(inner, BlobStore(os.path.join(tmpdir, "blobs")))
+        assert storage.read(template.id) == template.to_dict()
+        storage.write(template.id, template.to_dict())
+        assert DedupTemplateStorage.MANIFEST_KEY in inner.read(template.id)
+        assert storage.read(template.id) == template.to_dict()
+
+    def test_lost_counts_rebuilt(self, tmpdir):
+        """Test counts are rebuilt from manifests when the count files are gone."""
+        storage = make_storage(tmpdir)
+        template = make_template()
+        storage.write(template.id, template.to_dict())
+        storage.close()
+        for name in (BlobStore.REFS_FILE, BlobStore.JOURNAL_FILE):
+            path = os.path.join(tmpdir, "blobs", name)
+            if os.path.exists(path):
+                os.remove(path)
+
+        reopened = make_storage(tmpdir)
+        assert reopened.get_stats().references == 5
+        assert reopened.collect_garbage() == 0
+        assert reopened.read(template.id) == template.to_dict()
+
+
+class TestServiceDedup:
+    """Tests for TemplateService with deduplication on."""
+
+    def test_duplicates_share_storage(self, tmpdir):
+        """Test duplicated templates are nearly free to store."""
+        service = TemplateService(tmpdir, dedup=True)
+        source = make_template()
+        service.save_template(source)
+        stored = service.get_blob_stats()["storedBytes"]
+
+        for _ in range(5):
+            service.duplicate_template(source.id)
+        stats = service.get_blob_stats()
+        assert stats["storedBytes"] == stored
+        assert stats["referencedBytes"] == stored * 6
+        assert sorted(os.listdir(service.storage_path))[0].endswith(".json")
+        assert service.storage_format == "json"
+
+    def test_delete_then_collect(self, tmpdir):
+        """Test blobs of deleted templates are collected."""
+        service = TemplateService(tmpdir, dedup=True, write_behind=True, debounce_seconds=10)
+        template = make_template()
+        service.save_template(template)
+        service.flush()
+        service.delete_template(template.id)
+        assert service.collect_garbage() == 5
+        assert service.get_blob_stats()["blobs"] == 0
+        service.shutdown()
+
+    def test_dedup_off(self, tmpdir):
+        """Test stats and collection are inert without deduplication."""
+        service = TemplateService(tmpdir)
+        assert service.get_blob_stats() is None
+        assert service.collect_garbage() == 0
+        assert not os.path.exists(os.path.join(tmpdir, TemplateService.BLOBS_DIR))
@@ -0,0 +1,214 @@
+"""Tests for bulk template import and export."""
+
+import json
+import logging
+import os
+import tempfile
+import time
+import zipfile
+
+import pytest
+
+from anki_template_designer.core import binary_format
+from anki_template_designer.core.models import Component, ComponentType, Template
+from anki_template_designer.services.bulk_transfer import parse_parallel, parse_template
+from anki_template_designer.services.template_service import TemplateService
+
+logger = logging.getLogger("anki_template_designer.tests.test_bulk_transfer")
+
+
+@pytest.fixture
+def tmpdir():
+    with tempfile.TemporaryDirectory() as path:
+        yield path
+
+
+def make_template(name):
+    template = Template(name=name)
+    template.front.components.append(
+        Component(type=ComponentType.FIELD, field_name="Front")
+    )
+    return template
+
+
+def write_pack(directory, templates):
+    os.makedirs(directory, exist_ok=True)
+    for template in templates:
+        with open(os.path.join(directory, f"{template.id}.json"), "w", encoding="utf-8") as f:
+            json.dump(template.to_dict(), f)
+
+
+class TestParsing:
+    """Tests for payload decoding and validation."""
+
+    def test_parse_json_and_binary(self):
+        """Test both storage formats are accepted."""
+        template = make_template("P")
+        data = template.to_dict()
+        assert parse_template(json.dumps(data).encode("utf-8")) == data
+        assert parse_template(binary_format.encode(data)) == data
+
+    @pytest.mark.parametrize("raw", [
+        b"",
+        b"{not json",
+        b"[1, 2]",
+        b'{"name": "no id"}',
+        b'{"id": "../escape"}',
+        b'{"id": "x", "front": {"components": [{"type": "bogus"}]}}',
+    ])
+    def test_invalid_payloads_rejected(self, raw):
+        """Test malformed payloads raise."""
+        with pytest.raises(Exception):
+            parse_template(raw)
+
+    def test_parallel_matches_inline(self):
+        """Test thread and process pools give the same results as inline parsing."""
+        items = [(f"t{i}", make_template(f"T{i}").to_bytes()) for i in range(250)]
+        items.append(("bad", b"{"))
+
+        inline = [r for chunk in parse_parallel(items) for r in chunk]
+        for processes in (False, True):
+            pooled = [
+                r for chunk in parse_parallel(items, workers=2, chunk_size=50, processes=processes)
+                for r in chunk
+            ]
+            assert sorted(inline, key=lambda r: r[0]) == sorted(pooled, key=lambda r: r[0])
+            assert sum(1 for r in pooled if r[2] is not None) == 1
+
+
+    def test_parse_parallel_streams_items(self):
+        """Test a pool pulls only a bounded number of items ahead of the results."""
+        pulled = []
+
+        def items():
+            for i in range(2000):
+                pulled.append(i)
+                yield f"t{i}", make_template(f"T{i}").to_bytes()
+
+        chunks = parse_parallel(items(), workers=2, chunk_size=50)
+        assert len(next(chunks)) == 50
+        assert len(pulled) <= 400
+        assert sum(len(chunk) for chunk in chunks) == 1950
+
+
+class TestBulkImportExport:
+    """Tests for TemplateService.bulk_import and bulk_export."""
+
+    def test_import_directory_with_errors(self, tmpdir):
+        """Test bad items are reported without aborting the import."""
+        pack = os.path.join(tmpdir, "pack")
+        templates = [make_template(f"T{i}") for i in range(5)]
+        write_pack(pack, templates)
+        with open(os.path.join(pack, "broken.json"), "w") as f:
+            f.write("{not json")
+
+        service = TemplateService(os.path.join(tmpdir, "addon"))
+        messages = []
+        result = service.bulk_import(pack, workers=0, progress=lambda m, p: messages.append(p))
+
+        assert sorted(result.succeeded) == sorted(t.id for t in templates)
+        assert len(result.errors) == 1 and result.errors[0].source.endswith("broken.json")
+        assert service.count_templates() == 5
+        assert service.get_template(templates[0].id).front.components[0].field_name == "Front"
+        assert messages[-1] == 100.0
+        assert result.to_dict()["total"] == 6
+
+    def test_corrupt_archive_member_reported(self, tmpdir):
+        """Test a member that fails its CRC check is one error, not an aborted import."""
+        templates = [make_template(f"T{i}") for i in range(3)]
+        archive = os.path.join(tmpdir, "pack.zip")
+        with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_STORED) as z:
+            for template in templates:
+                z.writestr(f"{template.id}.json", template.to_bytes())
+
+        with open(archive, "r+b") as f:
+            content = f.read()
+            offset = content.index(b'"name":"T1"')
+            f.seek(offset + len('"name":"T'))
+            f.write(b"9")
+
+        service = TemplateService(os.path.join(tmpdir, "addon"))
+        result = service.bulk_import(archive)
+        assert sorted(result.succeeded) == sorted([templates[0].id, templates[2].id])
+        assert [e.source for e in result.errors] == [f"{archive}:{templates[1].id}.json"]
+
+    def test_export_then_import_archive(self, tmpdir):
+        """Test an exported archive imports into another service."""
+        source = TemplateService(os.path.join(tmpdir, "a"))
+        ids = []
+        for i in range(3):
+            template = make_template(f"T{i}")
+            source.save_template(template)
+            ids.append(template.id)
+
+        archive = os.path.join(tmpdir, "pack.zip")
+        result = source.bulk_export(archive, ids + ["missing"])
+        assert sorted(result.succeeded) == sorted(ids)
+        assert [e.source for e in result.errors] == ["missing"]
+        with zipfile.ZipFile(archive) as z:
+            assert sorted(z.namelist()) == sorted(f"{i}.json" for i in ids)
+
+        target = TemplateService(os.path.join(tmpdir, "b"), backend="sqlite")
+        imported = target.bulk_import(archive)
+        assert sorted(imported.succeeded) == sorted(ids)
+        assert target.load_template(ids[0]).to_dict() == source.load_template(ids[0]).to_dict()
+
+    def test_no_overwrite_reports_conflicts(self, tmpdir):
+        """Test existing templates are kept when overwrite is off."""
+        pack = os.path.join(tmpdir, "pack")
+        template = make_template("Incoming")
+        write_pack(pack, [template])
+
+        service = TemplateService(os.path.join(tmpdir, "addon"))
+        existing = Template.from_dict(template.to_dict())
+        existing.name = "Existing"
+        service.save_template(existing)
+
+        result = service.bulk_import(pack, overwrite=False)
+        assert result.succeeded == []
+        assert "already exists" in result.errors[0].error
+        assert service.load_template(template.id).name == "Existing"
+
+    def test_import_replaces_cached_copy(self, tmpdir):
+        """Test imported templates are not shadowed by stale cache entries."""
+        pack = os.path.join(tmpdir, "pack")
+        template = make_template("New")
+        service = TemplateService(os.path.join(tmpdir, "addon"))
+        old = Template.from_dict(template.to_dict())
+        old.name = "Old"
+        service.save_template(old)
+        service.get_template(old.id)
+
+        write_pack(pack, [template])
+        service.bulk_import(pack)
+        assert service.get_template(template.id).name == "New"
+
+
+@pytest.mark.slow
+class TestBulkImportBenchmarks:
+    """Importing a 5k template pack."""
+
+    def test_import_5000_templates(self, tmpdir):
+        """Test bulk import beats a save_template loop on 5k templates."""
+        templates = [make_template(f"T{i}") for i in range(5000)]
+        pack = os.path.join(tmpdir, "pack.zip")
+        with zipfile.ZipFile(pack, "w") as z:
+            for template in templates:
+                z.writestr(f"{template.id}.json", template.to_bytes())
+
+        looped = TemplateService(os.path.join(tmpdir, "loop"))
+        start = time.perf_counter()
+        with zipfile.ZipFile(pack) as z:
+            for name in z.namelist():
+                looped.save_template(Template.from_dict(json.loads(z.read(name))))
+        loop_time = time.perf_counter() - start
+
+        service = TemplateService(os.path.join(tmpdir, "bulk"))
+        start = time.perf_counter()
+        result = service.bulk_import(pack, workers=None, processes=True)
+        bulk_time = time.perf_counter() - start
+
+        logger.info(f"5000 templates: save loop {loop_time:.2f}s, bulk import {bulk_time:.2f}s")
+        assert len(result.succeeded) == 5000 and not result.errors
+        assert service.count_templates() == 5000
+        assert bulk_time < loop_time
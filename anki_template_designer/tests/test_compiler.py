@@ -0,0 +1,196 @@
+"""Tests for the component tree compiler."""
+
+import time
+
+import pytest
+
+from anki_template_designer.core.compiler import (
+    TemplateCompiler, compile_template, style_to_css
+)
+from anki_template_designer.core.exceptions import ComponentError
+from anki_template_designer.core.models import (
+    Component, ComponentStyle, ComponentType, Template, TemplateSide,
+    get_recompute_counts, reset_recompute_counts
+)
+
+
+@pytest.fixture
+def compiler():
+    """Create a fresh compiler."""
+    return TemplateCompiler()
+
+
+class TestAnkiComponents:
+    """Tests for Anki token output."""
+
+    @pytest.mark.parametrize("ctype,expected", [
+        (ComponentType.FIELD, "{{Front}}"),
+        (ComponentType.HINT, "{{hint:Front}}"),
+        (ComponentType.TYPE_ANSWER, "{{type:Front}}"),
+        (ComponentType.CLOZE, "{{cloze:Front}}"),
+    ])
+    def test_field_tokens(self, compiler, ctype, expected):
+        """Test field-based components emit their tokens."""
+        assert compiler.compile_component(Component(type=ctype, field_name="Front")) == expected
+
+    def test_inline_cloze(self, compiler):
+        """Test a cloze without a field emits an inline deletion."""
+        component = Component(type=ComponentType.CLOZE, content="Paris", attributes={"ordinal": 2})
+        assert compiler.compile_component(component) == "{{c2::Paris}}"
+
+    def test_conditional(self, compiler):
+        """Test conditionals wrap their children without an element."""
+        component = Component(
+            type=ComponentType.CONDITIONAL,
+            field_name="Extra",
+            children=[Component(type=ComponentType.FIELD, field_name="Extra")],
+        )
+        assert compiler.compile_component(component) == "{{#Extra}}{{Extra}}{{/Extra}}"
+
+    def test_negated_conditional(self, compiler):
+        """Test negated conditionals use the caret marker."""
+        for attributes in ({"negate": True}, {"condition": "hide"}):
+            component = Component(type=ComponentType.CONDITIONAL, field_name="Extra",
+                                  content="none", attributes=attributes)
+            assert compiler.compile_component(component) == "{{^Extra}}none{{/Extra}}"
+
+    def test_tags_and_frontside(self, compiler):
+        """Test special fields."""
+        assert compiler.compile_component(Component(type=ComponentType.TAGS)) == "{{Tags}}"
+        assert compiler.compile_component(Component(type=ComponentType.FRONTSIDE)) == "{{FrontSide}}"
+
+    def test_styled_field_wrapped_in_span(self, compiler):
+        """Test styled tokens keep their styling in a span."""
+        component = Component(type=ComponentType.FIELD, field_name="Front",
+                              style=ComponentStyle(color="red"))
+        assert compiler.compile_component(component) == '<span style="color: red">{{Front}}</span>'
+
+    def test_missing_field_name_raises(self, compiler):
+        """Test field components require a field name."""
+        with pytest.raises(ComponentError):
+            compiler.compile_component(Component(type=ComponentType.FIELD))
+
+
+class TestElements:
+    """Tests for HTML element output."""
+
+    def test_nested_layout(self, compiler):
+        """Test layout components nest and carry their classes."""
+        row = Component(type=ComponentType.ROW, children=[
+            Component(type=ComponentType.COLUMN, children=[
+                Component(type=ComponentType.HEADING, content="Title"),
+            ]),
+        ])
+        assert compiler.compile_component(row) == (
+            '<div class="atd-row"><div class="atd-column"><h2>Title</h2></div></div>'
+        )
+
+    def test_attributes_escaped(self, compiler):
+        """Test attribute values are escaped."""
+        image = Component(type=ComponentType.IMAGE, attributes={"src": 'a".png', "alt": "<x>"})
+        assert compiler.compile_component(image) == '<img src="a&quot;.png" alt="&lt;x&gt;">'
+
+    def test_audio(self, compiler):
+        """Test audio emits a sound tag or field."""
+        assert compiler.compile_component(
+            Component(type=ComponentType.AUDIO, attributes={"src": "a.mp3"})) == "[sound:a.mp3]"
+        assert compiler.compile_component(
+            Component(type=ComponentType.AUDIO, field_name="Audio")) == "{{Audio}}"
+
+    def test_style_to_css(self):
+        """Test style conversion."""
+        style = ComponentStyle(font_size="12px", border_radius="4px", custom_css="opacity: .5;")
+        assert style_to_css(style) == "font-size: 12px; border-radius: 4px; opacity: .5"
+
+
+class TestCompileTemplate:
+    """Tests for whole-template compilation."""
+
+    def test_update_html(self):
+        """Test sides with components are regenerated, others kept."""
+        template = Template(
+            front=TemplateSide(html="stale", components=[
+                Component(type=ComponentType.FIELD, field_name="Front"),
+            ]),
+            back=TemplateSide(html="{{FrontSide}}<hr id=answer>{{Back}}"),
+        )
+        result = compile_template(template, update_html=True)
+        assert result == {"front": "{{Front}}", "back": "{{FrontSide}}<hr id=answer>{{Back}}"}
+        assert template.front.html == "{{Front}}"
+
+
+class TestMemoization:
+    """Tests for per-subtree memoization."""
+
+    def _tree(self, width):
+        return [
+            Component(type=ComponentType.CONTAINER, children=[
+                Component(type=ComponentType.TEXT, content=f"item {i}"),
+                Component(type=ComponentType.FIELD, field_name="Front"),
+            ])
+            for i in range(width)
+        ]
+
+    def test_small_edit_reemits_only_changed_path(self, compiler):
+        """Test a one-node edit only misses on the edited path."""
+        components = self._tree(50)
+        first = compiler.compile_components(components)
+
+        components[10].children[0].content = "edited"
+        before = compiler.get_stats()["misses"]
+        second = compiler.compile_components(components)
+
+        # Edited text node and its container
+        assert compiler.get_stats()["misses"] - before == 2
+        assert second == first.replace("item 10<", "edited<")
+
+    def test_clean_subtrees_not_rehashed(self, compiler):
+        """Test an edit only rehashes and re-emits the dirty path."""
+        components = self._tree(50)
+        compiler.compile_components(components)
+
+        reset_recompute_counts()
+        components[10].children[1].field_name = "Back"
+        compiler.compile_components(components)
+        assert get_recompute_counts() == {"hash": 2, "html": 2}
+
+    def test_identical_subtrees_share_output(self, compiler):
+        """Test ids do not affect the content hash."""
+        a = Component(id="a", type=ComponentType.TEXT, content="same")
+        b = Component(id="b", type=ComponentType.TEXT, content="same")
+        assert compiler.content_hash(a) == compiler.content_hash(b)
+
+    def test_cache_bounded(self):
+        """Test the cache evicts beyond its capacity."""
+        compiler = TemplateCompiler(max_entries=10)
+        compiler.compile_components(self._tree(50))
+        assert compiler.get_stats()["entries"] == 10
+
+
+@pytest.mark.slow
+class TestCompilerBenchmarks:
+    """Recompilation benchmark on a large tree."""
+
+    def test_recompile_after_small_edit(self):
+        """Test recompiling a 30k-node tree after one edit beats a cold compile."""
+        components = [
+            Component(type=ComponentType.CONTAINER, style=ComponentStyle(padding="4px"), children=[
+                Component(type=ComponentType.TEXT, content=f"item {i}", children=[
+                    Component(type=ComponentType.FIELD, field_name="Front"),
+                ]),
+            ])
+            for i in range(10_000)
+        ]
+        compiler = TemplateCompiler(max_entries=100_000)
+
+        start = time.perf_counter()
+        cold = compiler.compile_components(components)
+        cold_time = time.perf_counter() - start
+
+        components[5000].children[0].content = "edited"
+        start = time.perf_counter()
+        warm = compiler.compile_components(components)
+        warm_time = time.perf_counter() - start
+
+        assert "edited" in warm and len(warm) == len(cold) - len("item 5000") + len("edited")
+        assert warm_time < cold_time
@@ -0,0 +1,209 @@
+"""Stress tests for background readers running against foreground edits."""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import zipfile
+
+import pytest
+
+from anki_template_designer.core.models import Template
+from anki_template_designer.services.backup_manager import BackupManager, BackupStorage
+from anki_template_designer.services.selection_service import SelectionService
+from anki_template_designer.services.template_service import TemplateService
+from anki_template_designer.services.undo_redo_manager import UndoRedoManager
+
+
+@pytest.fixture
+def tmpdir():
+    with tempfile.TemporaryDirectory() as path:
+        yield path
+
+
+@pytest.fixture(autouse=True)
+def fast_switching():
+    """Switch threads often so interleavings actually happen."""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def edit(template, n):
+    """Change two fields together; a torn read would see them disagree."""
+    template.name = f"edit {n}"
+    template.css = f".v{n} {{ order: {n}; }}"
+
+
+def check_consistent(data, errors):
+    name = data.get("name", "")
+    n = name.split(" ")[-1]
+    if data.get("css") != f".v{n} {{ order: {n}; }}":
+        errors.append(f"torn template {data.get('id')}: {name!r} / {data.get('css')!r}")
+
+
+def run_background(workers, foreground):
+    """Run workers in a loop on threads until foreground returns."""
+    stop = threading.Event()
+    errors = []
+
+    def loop(worker):
+        while not stop.is_set():
+            try:
+                worker(errors)
+            except Exception as e:
+                errors.append(f"{worker.__name__}: {e!r}")
+
+    threads = [threading.Thread(target=loop, args=(w,), daemon=True) for w in workers]
+    for thread in threads:
+        thread.start()
+    try:
+        foreground()
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(10)
+    return errors
+
+
+class TestTemplateServiceStress:
+    """Background listing, snapshots and backups against foreground saves."""
+
+    @pytest.mark.parametrize("write_behind", [False, True])
+    def test_background_reads_see_saved_states(self, tmpdir, write_behind):
+        """Test readers on other threads only ever see whole saved versions."""
+        service = TemplateService(tmpdir, write_behind=write_behind, debounce_seconds=0.001)
+        templates = []
+        for i in range(5):
+            template = service.create_template()
+            edit(template, 0)
+            service.save_template(template)
+            templates.append(template)
+        service.flush()
+
+        backup_dir = os.path.join(tmpdir, "backups")
+        backups = BackupManager(backup_dir, service.storage_path)
+        archive = os.path.join(tmpdir, "export.zip")
+        counts = {"snapshots": 0, "backups": 0}
+
+        def list_and_snapshot(errors):
+            listed = service.list_templates()
+            if len(listed) != len(templates):
+                errors.append(f"listed {len(listed)} templates")
+            for meta in listed:
+                snapshot = service.get_template_snapshot(meta["id"])
+                check_consistent(snapshot.to_dict(), errors)
+                counts["snapshots"] += 1
+
+        def backup(errors):
+            backup_id = backups.create_backup()
+            data = json.loads(BackupStorage(backup_dir).load_backup_data(backup_id))
+            for data in data["templates"]:
+                check_consistent(data, errors)
+            counts["backups"] += 1
+
+        def export(errors):
+            service.bulk_export(archive)
+            with zipfile.ZipFile(archive) as zf:
+                for name in zf.namelist():
+                    check_consistent(json.loads(zf.read(name)), errors)
+
+        def foreground():
+            rng = random.Random(7)
+            for n in range(1, 301):
+                template = rng.choice(templates)
+                service.set_current_template(template.id)
+                edit(template, n)
+                service.save_template()
+
+        errors = run_background([list_and_snapshot, backup, export], foreground)
+        service.flush()
+        assert errors == []
+        assert counts["snapshots"] > 0 and counts["backups"] > 0
+        for template in templates:
+            assert service.get_template_snapshot(template.id).to_dict() == template.to_dict()
+        service.shutdown()
+
+    def test_snapshot_is_detached(self, tmpdir):
+        """Test snapshots ignore unsaved edits and can be changed freely."""
+        service = TemplateService(tmpdir, write_behind=True, debounce_seconds=10)
+        template = service.create_template("Saved")
+        service.save_template(template)
+        template.name = "Unsaved edit"
+
+        snapshot = service.get_template_snapshot(template.id)
+        assert snapshot.name == "Saved" and snapshot is not template
+        snapshot.name = "Changed"
+        assert template.name == "Unsaved edit"
+        assert service.get_template_snapshot("missing") is None
+        service.shutdown()
+
+
+class TestUndoRedoStress:
+    """History snapshots against foreground pushes and undos."""
+
+    def test_snapshots_are_consistent(self):
+        """Test readers never see an index outside the published history."""
+        manager = UndoRedoManager(max_history=20)
+
+        def read(errors):
+            snapshot = manager.snapshot()
+            if not -1 <= snapshot.current_index < max(len(snapshot.descriptions), 1):
+                errors.append(f"index {snapshot.current_index} of {len(snapshot.descriptions)}")
+            if snapshot.can_undo and snapshot.undo_description is None:
+                errors.append("undo without description")
+            manager.get_history_list()
+
+        def foreground():
+            rng = random.Random(3)
+            for n in range(3000):
+                action = rng.random()
+                if action < 0.6:
+                    manager.push_state({"n": n - 1}, {"n": n}, f"Set {n}")
+                elif action < 0.8:
+                    manager.undo()
+                else:
+                    manager.redo()
+
+        assert run_background([read, read], foreground) == []
+        assert manager.history_size <= 20
+
+
+class TestSelectionStress:
+    """Selection reads against foreground selection changes."""
+
+    def test_readers_see_whole_states(self):
+        """Test selected ids, order and primary always agree."""
+        service = SelectionService()
+        ids = [f"c{i}" for i in range(30)]
+        service.set_component_order(ids)
+        notified = []
+        service.add_listener(lambda old, new: notified.append(new.count()))
+
+        def read(errors):
+            state = service.state
+            if set(state.selection_order) != state.selected_ids:
+                errors.append(f"order {state.selection_order} vs {state.selected_ids}")
+            if state.primary_id is not None and state.primary_id not in state.selected_ids:
+                errors.append(f"primary {state.primary_id} not selected")
+            service.get_state_dict()
+
+        def foreground():
+            rng = random.Random(5)
+            operations = [
+                lambda: service.select(rng.choice(ids)),
+                lambda: service.add_to_selection(rng.choice(ids)),
+                lambda: service.remove_from_selection(rng.choice(ids)),
+                lambda: service.toggle_selection(rng.choice(ids)),
+                lambda: service.select_range(rng.choice(ids)),
+                lambda: service.move_selection("next"),
+                service.clear,
+            ]
+            for _ in range(3000):
+                rng.choice(operations)()
+
+        assert run_background([read, read], foreground) == []
+        assert notified
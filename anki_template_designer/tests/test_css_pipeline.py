@@ -0,0 +1,217 @@
+"""Tests for the note type CSS merge pipeline."""
+
+import logging
+import time
+
+import pytest
+
+from anki_template_designer.core.css_pipeline import (
+    CssPipeline, Declaration, dedupe_declarations, merge_css, parse_stylesheet,
+)
+from anki_template_designer.core.exceptions import CssSyntaxError, ErrorCode
+
+logger = logging.getLogger("anki_template_designer.tests.test_css_pipeline")
+
+ANKI_DEFAULT = """\
+.card {
+    font-family: arial;
+    font-size: 20px;
+    text-align: center;
+    color: black;
+    background-color: white;
+}
+"""
+
+
+class TestParsing:
+    """Tests for tokenising stylesheets."""
+
+    def test_strings_urls_and_comments(self):
+        """Test braces and semicolons inside strings and urls are not structure."""
+        nodes = parse_stylesheet(
+            '/* top */ .a::before { content: "};{" ; background: url(data:image/png;base64,AA==) }'
+            "@import url('x.css');"
+        )
+        assert nodes[0].text == " top "
+        assert nodes[1].declarations == [
+            Declaration("content", '"};{"'),
+            Declaration("background", "url(data:image/png;base64,AA==)"),
+        ]
+        assert (nodes[2].name, nodes[2].prelude) == ("import", "url('x.css')")
+
+    def test_selectors_are_canonical(self):
+        """Test selector lists differing only in whitespace get the same key."""
+        first, second = parse_stylesheet('.a>.b,\n.c  .d[title~="x > y"]{x:y} .a > .b , .c .d[title~="x > y"] {x:y}')
+        assert first.selector == second.selector == '.a > .b, .c .d[title~="x > y"]'
+
+    @pytest.mark.parametrize("css", [
+        ".a { color: red", ".a { color: red } }", '.a { content: "x }', ".a { &:hover { color: red } }",
+        ".a { color red }", "/* open",
+    ])
+    def test_malformed(self, css):
+        """Test malformed or nested CSS is rejected rather than guessed at."""
+        with pytest.raises(CssSyntaxError) as info:
+            parse_stylesheet(css)
+        assert info.value.code == ErrorCode.CSS_SYNTAX_INVALID
+
+
+class TestMerging:
+    """Tests for merging rules and dropping overridden declarations."""
+
+    def test_repeated_editor_saves(self):
+        """Test CSS saved again on top of itself collapses to one copy."""
+        edited = ANKI_DEFAULT + ".card { color: navy; }\n"
+        assert merge_css(ANKI_DEFAULT, edited, edited) == (
+            ".card {\n    font-family: arial;\n    font-size: 20px;\n    text-align: center;\n"
+            "    background-color: white;\n    color: navy;\n}\n"
+        )
+
+    def test_declarations(self):
+        """Test later declarations win except against !important and fallbacks."""
+        assert dedupe_declarations([
+            Declaration("color", "red", True), Declaration("color", "blue"),
+            Declaration("display", "-webkit-box"), Declaration("display", "flex"),
+            Declaration("width", "10px"), Declaration("width", "calc(100% - 2px)"),
+            Declaration("margin", "0"), Declaration("margin", "1px"),
+        ]) == [
+            Declaration("color", "red", True),
+            Declaration("display", "-webkit-box"), Declaration("display", "flex"),
+            Declaration("width", "10px"), Declaration("width", "calc(100% - 2px)"),
+            Declaration("margin", "1px"),
+        ]
+
+    def test_cascade_is_preserved(self):
+        """Test rules are not moved above a rule setting a related property."""
+        css = ".a { margin-top: 1px } .b { margin: 0 } .a { margin-top: 2px } .c { color: red } .a { color: blue }"
+        assert merge_css(css, minify=True) == ".b{margin:0}.a{margin-top:2px}.c{color:red}.a{color:blue}"
+        css = ".a { margin-top: 1px } .b { color: red } .a { padding: 2px }"
+        assert merge_css(css, minify=True) == ".a{margin-top:1px;padding:2px}.b{color:red}"
+
+    @pytest.mark.parametrize("shorthand, longhand", [
+        ("gap: 4px", "row-gap: 10px"),
+        ("inset: 0", "top: 2px"),
+        ("place-items: center", "align-items: start"),
+        ("columns: 2", "column-count: 3"),
+        ("font: 12px serif", "line-height: 2"),
+    ])
+    def test_shorthands_block_merging(self, shorthand, longhand):
+        """Test rules are not moved above a shorthand of their longhands, or the reverse."""
+        for first, second in ((shorthand, longhand), (longhand, shorthand)):
+            css = f".a {{ color: red }} .b {{ {first} }} .a {{ {second} }}"
+            assert merge_css(css, minify=True).count(".a{") == 2
+
+    def test_commented_blocks_are_kept(self):
+        """Test blocks with comments are written as they are and not merged."""
+        css = ".card { /* main font */ font-family: arial; }\n.card{color:red}\n.card{color:blue}"
+        merged = merge_css(css)
+        assert merged.startswith(".card { /* main font */ font-family: arial; }\n")
+        assert merged.count("color") == 1
+        assert CssPipeline().tidy(css).count("/* main font */") == 1
+
+    def test_at_rules(self):
+        """Test overridden media blocks go, keyframes are replaced and repeats dropped."""
+        css = """
+            @charset "utf-8";
+            @media (max-width:600px) { .card { font-size: 16px } }
+            .x { color: red }
+            @media ( max-width: 600px ) { .card { font-size: 14px } .y { color: blue } }
+            @media print { .x { color: black } }
+            @keyframes spin { from { opacity: 0 } }
+            @keyframes spin { to { opacity: 1 } }
+            @font-face { font-family: F; src: url(f.woff) }
+            @font-face { font-family: F; src: url(f.woff) }
+            @charset "utf-8";
+        """
+        assert merge_css(css, minify=True) == (
+            '@charset "utf-8";'
+            ".x{color:red}@media (max-width:600px){.card{font-size:14px}.y{color:blue}}"
+            "@media print{.x{color:black}}"
+            "@keyframes spin{to{opacity:1}}@font-face{font-family:F;src:url(f.woff)}"
+        )
+
+    def test_repeated_stylesheet(self):
+        """Test a stylesheet appended to itself keeps only the last copy's rules."""
+        css = ".a { color: red } .b { color: blue } @media print { .a { color: black } }\n"
+        assert merge_css(css + css + ".b { color: green }", minify=True) == (
+            ".a{color:red}@media print{.a{color:black}}.b{color:green}"
+        )
+
+    def test_idempotent(self):
+        """Test merging merged CSS changes nothing."""
+        css = ANKI_DEFAULT + "/* night */\n.nightMode .card { color: white }\n@media print { .card { color: black } }"
+        merged = merge_css(css, css)
+        assert "/* night */" in merged
+        assert merge_css(merged) == merged
+        assert merge_css(merge_css(merged, minify=True), minify=True) == merge_css(merged, minify=True)
+
+
+class TestCssPipeline:
+    """Tests for the caching pipeline."""
+
+    def test_cache_and_errors(self):
+        """Test results are cached by content and malformed CSS is kept."""
+        pipeline = CssPipeline(max_entries=2)
+        merged = pipeline.process(ANKI_DEFAULT, ANKI_DEFAULT)
+        assert pipeline.process(ANKI_DEFAULT, ANKI_DEFAULT) is merged
+        assert pipeline.process(ANKI_DEFAULT, ANKI_DEFAULT, minify=True) != merged
+        assert pipeline.process(".a { color: red", ".b {}") == ".a { color: red\n.b {}"
+
+        stats = pipeline.get_stats()
+        assert (stats["entries"], stats["hits"], stats["misses"], stats["errors"]) == (2, 1, 3, 1)
+
+    def test_tidy_keeps_formatting_without_duplicates(self):
+        """Test CSS is only rewritten when something was merged away."""
+        pipeline = CssPipeline()
+        css = ".card{color:black}\n\n.b {}\n"
+        assert pipeline.tidy(css) is css
+        assert pipeline.tidy(css + ".card{color:red}") == ".b {\n}\n\n.card {\n    color: red;\n}\n"
+
+
+def _note_type_css(components: int) -> str:
+    """Build a large note type stylesheet like the designer produces."""
+    parts = [ANKI_DEFAULT, ".nightMode .card, .night_mode .card { color: white; background-color: #2f2f31; }\n"]
+    for n in range(components):
+        parts.append(
+            f"#c{n} {{ display: -webkit-box; display: flex; padding: {n % 9}px; "
+            f"font-size: {12 + n % 6}px; border-radius: 4px; color: #{n % 4096:03x}; }}\n"
+            f".field-{n % 40} .item-{n}:hover > span {{ text-decoration: underline; }}\n"
+        )
+        if n % 25 == 0:
+            parts.append(f"@media (max-width: {400 + n % 5 * 100}px) {{ #c{n} {{ padding: 0; }} }}\n")
+    parts.append('@font-face { font-family: "Noto"; src: url("_noto.woff2") format("woff2"); }\n')
+    return "".join(parts)
+
+
+@pytest.mark.slow
+class TestCssPipelineBenchmarks:
+    """Merging large note type stylesheets after repeated editor saves."""
+
+    def test_merge_after_20_saves(self):
+        """Test 20 saves of a 2000-component stylesheet collapse to one copy."""
+        base = _note_type_css(2000)
+        saved = base
+        for n in range(20):
+            # The editor re-sends the whole stylesheet with one more edit
+            saved = saved + base + f"#c{n} {{ color: red; }}\n"
+
+        start = time.perf_counter()
+        merged = merge_css(saved)
+        elapsed = time.perf_counter() - start
+
+        pipeline = CssPipeline()
+        pipeline.process(saved)
+        start = time.perf_counter()
+        for _ in range(20):
+            pipeline.process(saved)
+        cached = time.perf_counter() - start
+
+        minified = merge_css(saved, minify=True)
+        logger.info(
+            f"{len(saved) / 1024:.0f}KB after 20 saves -> {len(merged) / 1024:.0f}KB merged, "
+            f"{len(minified) / 1024:.0f}KB minified in {elapsed * 1000:.0f}ms; "
+            f"20 cached calls {cached * 1000:.1f}ms"
+        )
+        assert len(merged) < len(saved) / 10
+        assert len(minified) < len(merge_css(base, minify=False))
+        assert merge_css(merged) == merged
+        assert cached < elapsed
@@ -0,0 +1,55 @@
+"""Tests for the card template field-reference index."""
+
+from anki_template_designer.core.card_renderer import REF_FIELD, REF_INVERTED, REF_SECTION
+from anki_template_designer.services.field_index import SIDE_BACK, SIDE_FRONT, FieldIndex
+
+
+class TestFieldIndex:
+    """Tests for indexing and querying field references."""
+
+    def test_references_and_usages(self):
+        """Test references are recorded per side and looked up by field."""
+        index = FieldIndex()
+        assert index.update(1, [
+            (0, "{{Front}}{{#Extra}}{{hint:Extra}}{{/Extra}}", "{{FrontSide}}<hr>{{Back}}"),
+            (1, "{{^Back}}none{{/Back}}{{text:cloze:Back}}", "{{Front}}"),
+        ]) == 4
+
+        assert [tuple(r) for r in index.references(1, 0, SIDE_FRONT)] == [
+            ("Front", REF_FIELD, ()),
+            ("Extra", REF_SECTION, ()),
+            ("Extra", REF_FIELD, ("hint",)),
+        ]
+        assert index.references(1, 1, SIDE_FRONT)[0].kind == REF_INVERTED
+        assert index.references(1, 1, SIDE_FRONT)[1].filters == ("text", "cloze")
+        assert index.references(1, 5, SIDE_FRONT) is None
+
+        assert index.usages(1, "Back") == [(0, SIDE_BACK), (1, SIDE_FRONT)]
+        assert index.usages(1, "Front") == [(0, SIDE_FRONT), (1, SIDE_BACK)]
+        assert index.usages(2, "Front") == []
+        assert index.unused_fields(1, ["Front", "Back", "Extra", "Notes"]) == ["Notes"]
+
+    def test_incremental_update(self):
+        """Test only changed sides are tokenised and stale usages are dropped."""
+        index = FieldIndex()
+        index.update(1, [(0, "{{Front}}", "{{Back}}"), (1, "{{Back}}", "{{Front}}")])
+        assert index.update(1, [(0, "{{Front}}", "{{Back}}"), (1, "{{Back}}", "{{Front}}")]) == 0
+
+        # Edit one side and drop the second card template
+        assert index.update(1, [(0, "{{Front}}", "{{Notes}}")]) == 1
+        assert index.usages(1, "Back") == []
+        assert index.usages(1, "Notes") == [(0, SIDE_BACK)]
+        assert index.sides(1) == [(0, SIDE_FRONT), (0, SIDE_BACK)]
+
+        index.update(2, [(0, "{{Front}}", "")])
+        index.remove(1)
+        assert index.note_type_ids() == [2]
+        assert index.usages(1, "Front") == []
+        assert index.get_stats() == {"noteTypes": 1, "sides": 2, "fields": 1, "tokenised": 7}
+
+    def test_malformed_templates_are_indexed(self):
+        """Test templates with unbalanced sections can still be inspected."""
+        index = FieldIndex()
+        index.update(1, [(0, "{{#Front}}{{Front}}", "{{/Back}}{{tts en_US:Back}}")])
+        assert index.referenced_fields(1) == {"Front", "Back"}
+        assert index.references(1, 0, SIDE_BACK)[0].filters == ("tts en_US",)
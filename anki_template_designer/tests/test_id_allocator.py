@@ -0,0 +1,138 @@
+"""Tests for component id allocation."""
+
+import copy
+import time
+import uuid
+
+import pytest
+
+from anki_template_designer.core.id_allocator import (
+    ID_LENGTH, IdAllocator, new_component_id
+)
+from anki_template_designer.core.models import Component, Template, TemplateSide
+
+
+class TestIdAllocator:
+    """Tests for IdAllocator."""
+
+    def test_ids_are_compact_and_monotonic(self):
+        """Test ids have a fixed length and increase."""
+        allocator = IdAllocator()
+        ids = [allocator.allocate() for _ in range(2000)]
+        assert all(len(i) == ID_LENGTH for i in ids)
+        assert ids == sorted(ids)
+        assert len(set(ids)) == len(ids)
+
+    def test_ids_start_with_letter(self):
+        """Test ids are usable as HTML ids."""
+        assert IdAllocator().allocate()[0].isalpha()
+
+    def test_skips_ids_in_use(self):
+        """Test ids already in use are never allocated."""
+        probe = IdAllocator()
+        taken = [f"{probe.prefix}0000{i}" for i in range(3)]
+        probe._used.update(taken)
+
+        assert probe.allocate() == f"{probe.prefix}00003"
+        probe._counter = 0
+        assert not set(probe.allocate_many(10)) & set(taken)
+
+    def test_allocate_many_unique(self):
+        """Test bulk allocation returns the requested number of unique ids."""
+        allocator = IdAllocator()
+        first = allocator.allocate_many(500)
+        second = allocator.allocate_many(500)
+        assert len(set(first + second)) == 1000
+        assert all(i in allocator for i in first + second)
+
+    def test_distinct_prefixes(self):
+        """Test allocators never share a prefix."""
+        prefixes = {IdAllocator().prefix for _ in range(200)}
+        assert len(prefixes) == 200
+
+    def test_reserve_reports_duplicates(self):
+        """Test reserving an id twice is reported."""
+        allocator = IdAllocator()
+        assert allocator.reserve("abc")
+        assert not allocator.reserve("abc")
+        allocator.release("abc")
+        assert "abc" not in allocator
+
+    def test_rollover(self):
+        """Test the prefix changes when the counter space is exhausted."""
+        allocator = IdAllocator()
+        old_prefix = allocator.prefix
+        allocator._counter = 36 ** 5 - 1
+        last, nxt = allocator.allocate_many(2)
+        assert last.startswith(old_prefix) and not nxt.startswith(old_prefix)
+
+    def test_copyable(self):
+        """Test allocators survive deepcopy."""
+        allocator = IdAllocator(["x"])
+        copied = copy.deepcopy(allocator)
+        assert "x" in copied
+        copied.allocate()
+
+    def test_default_allocator(self):
+        """Test default component ids are unique and have the fixed length."""
+        ids = {new_component_id() for _ in range(1000)}
+        assert len(ids) == 1000
+        assert len(Component().id) == ID_LENGTH
+
+    def test_prefixes_are_random(self):
+        """Test prefixes are long random strings, not a small space."""
+        prefix = IdAllocator().prefix
+        assert len(prefix) == 8 and prefix[0].isalpha()
+        assert len({IdAllocator().prefix[1:] for _ in range(50)}) == 50
+
+
+class TestTemplateIds:
+    """Tests for per-template id allocation."""
+
+    def test_from_dict_fills_missing_ids(self):
+        """Test id-less components get ids that avoid existing ones."""
+        data = {"front": {"components": [
+            {"id": "keep", "children": [{}, {}]},
+            {},
+        ]}}
+        template = Template.from_dict(data)
+        ids = [template.front.components[0].id, template.front.components[1].id]
+        ids += [c.id for c in template.front.components[0].children]
+        assert ids[0] == "keep"
+        assert len(set(ids)) == 4
+        assert all(i in template.id_allocator for i in ids)
+
+    def test_id_allocator_built_from_tree(self):
+        """Test a template's allocator knows the ids in its tree."""
+        template = Template(front=TemplateSide(components=[
+            Component(id="a", children=[Component(id="b")]),
+        ]))
+        allocator = template.id_allocator
+        assert "a" in allocator and "b" in allocator
+        assert template.id_allocator is allocator
+
+
+@pytest.mark.slow
+class TestIdAllocatorBenchmarks:
+    """Bulk creation benchmark."""
+
+    def test_bulk_create_100k(self):
+        """Test bulk-allocating 100k ids beats uuid4 and stays unique."""
+        allocator = IdAllocator()
+
+        start = time.perf_counter()
+        ids = allocator.allocate_many(100_000)
+        allocated = time.perf_counter() - start
+
+        start = time.perf_counter()
+        uuids = [str(uuid.uuid4())[:8] for _ in range(100_000)]
+        generated = time.perf_counter() - start
+
+        assert len(set(ids)) == 100_000
+        assert allocated < generated
+
+        start = time.perf_counter()
+        components = [Component(id=i) for i in ids]
+        assert len(components) == 100_000
+        assert time.perf_counter() - start < 10.0
+        assert len(uuids) == 100_000
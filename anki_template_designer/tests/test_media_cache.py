@@ -0,0 +1,103 @@
+"""Tests for preview media extraction and metadata caching."""
+
+import os
+import struct
+import tempfile
+
+import pytest
+
+from anki_template_designer.services.media_cache import (
+    MediaCache, extract_media_references, image_size,
+)
+
+PNG = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 640, 480) + b"\x08\x02\x00\x00\x00"
+GIF = b"GIF89a" + struct.pack("<HH", 32, 16) + b"\x00" * 8
+JPEG = (
+    b"\xff\xd8"
+    + b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    + b"\xff\xc0" + struct.pack(">HBHH", 17, 8, 300, 400) + b"\x00" * 10
+)
+WEBP = b"RIFF\x00\x00\x00\x00WEBPVP8X" + b"\x00" * 8 + (99).to_bytes(3, "little") + (49).to_bytes(3, "little")
+
+
+@pytest.fixture
+def media_dir():
+    with tempfile.TemporaryDirectory() as path:
+        for name, data in (("a.png", PNG), ("b.gif", GIF), ("c.jpg", JPEG), ("d.webp", WEBP)):
+            with open(os.path.join(path, name), "wb") as f:
+                f.write(data)
+        with open(os.path.join(path, "e.svg"), "w") as f:
+            f.write('<?xml version="1.0"?><svg width="12px" height="7.6">')
+        yield path
+
+
+class TestExtraction:
+    """Tests for finding media references."""
+
+    def test_references(self):
+        """Test local media is found once each, remote and inline URLs are not."""
+        refs = extract_media_references(
+            '<img class="x" src="a%20b.png"><IMG SRC=c.jpg>'
+            "<img src='https://example.com/r.png'><img src=\"data:image/png;base64,xx\">"
+            '[sound:say.mp3]<video src="clip.webm"></video><img src="a%20b.png">'
+            '<img src="../escape.png"><img src="x&amp;y.png">'
+        )
+        assert [(r.filename, r.tag) for r in refs] == [
+            ("a b.png", "img"), ("c.jpg", "img"), ("clip.webm", "video"),
+            ("x&y.png", "img"), ("say.mp3", "sound"),
+        ]
+        assert [r.kind for r in refs] == ["image", "image", "video", "image", "audio"]
+
+
+class TestImageSize:
+    """Tests for reading image dimensions from headers."""
+
+    def test_formats(self, media_dir):
+        """Test dimensions of each supported format."""
+        sizes = {name: image_size(os.path.join(media_dir, name)) for name in sorted(os.listdir(media_dir))}
+        assert sizes == {
+            "a.png": (640, 480), "b.gif": (32, 16), "c.jpg": (400, 300),
+            "d.webp": (100, 50), "e.svg": (12, 8),
+        }
+        assert image_size(os.path.join(media_dir, "missing.png")) is None
+
+
+class TestMediaCache:
+    """Tests for the metadata cache."""
+
+    def test_info_is_cached_until_file_changes(self, media_dir):
+        """Test files are re-read only when size or mtime changed."""
+        cache = MediaCache(media_dir)
+        info = cache.get_info("a.png")
+        assert (info.kind, info.size, info.width, info.height) == ("image", len(PNG), 640, 480)
+        assert cache.get_info("a.png") is info
+        assert cache.get_stats()["hits"] == 1
+
+        path = os.path.join(media_dir, "a.png")
+        with open(path, "wb") as f:
+            f.write(GIF)
+        os.utime(path, (1, 1))
+        assert cache.get_info("a.png").width == 32
+
+        os.remove(path)
+        assert cache.get_info("a.png") is None
+        assert cache.get_info("nope.mp3") is None
+
+    def test_bounded(self, media_dir):
+        """Test the least recently used entries are evicted."""
+        cache = MediaCache(media_dir, max_entries=2)
+        for name in ("a.png", "b.gif", "c.jpg"):
+            cache.get_info(name)
+        assert cache.get_stats()["entries"] == 2
+
+    def test_infos_and_placeholders(self, media_dir):
+        """Test large images are swapped for placeholders of the same size."""
+        cache = MediaCache(media_dir)
+        card = '<img src="a.png" alt=x><img src=\'b.gif\'><img src="gone.png">[sound:b.gif]'
+        assert [i.filename for i in cache.infos_for(card)] == ["a.png", "b.gif"]
+
+        replaced = cache.replace_large_images(card, max_bytes=len(GIF))
+        assert 'data-src="a.png" alt=x>' in replaced
+        assert "width%3D%22640%22" in replaced
+        assert "<img src='b.gif'>" in replaced
+        assert cache.replace_large_images(card, max_bytes=10 ** 6) == card
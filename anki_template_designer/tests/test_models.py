@@ -1,10 +1,14 @@
 """Tests for data models."""
 
+import copy
+import json
+import pickle
 import pytest
 from datetime import datetime
+from anki_template_designer.core.id_allocator import ID_LENGTH
 from anki_template_designer.core.models import (
     Component, ComponentType, ComponentStyle, 
-    Template, TemplateSide
+    Template, TemplateSide, get_recompute_counts, reset_recompute_counts
 )
 
 
@@ -48,7 +52,7 @@ class TestComponent:
         component = Component()
         assert component.type == ComponentType.CONTAINER
         assert component.content == ""
-        assert len(component.id) == 8
+        assert len(component.id) == ID_LENGTH
     
     def test_component_serialization(self):
         """Test component round-trip serialization."""
@@ -165,3 +169,116 @@ class TestTemplate:
         
         assert restored.front.html == "<div>Front</div>"
         assert restored.back.html == "<div>Back</div>"
+
+
+class TestChangeTracking:
+    """Tests for dirty tracking and cached derived artefacts."""
+    
+    def _tree(self):
+        leaf = Component(id="leaf", type=ComponentType.TEXT, content="x")
+        middle = Component(id="middle", children=[leaf])
+        side = TemplateSide(components=[middle, Component(id="other")])
+        return side, middle, leaf
+    
+    def _clean(self, side):
+        side.to_bytes()
+        assert not side.is_dirty
+    
+    def test_new_nodes_are_dirty(self):
+        """Test fresh components have nothing cached."""
+        assert Component().is_dirty
+    
+    def test_setter_propagates_to_ancestors(self):
+        """Test assigning a field dirties the node and its ancestors only."""
+        side, middle, leaf = self._tree()
+        self._clean(side)
+        
+        leaf.content = "y"
+        assert leaf.is_dirty and middle.is_dirty and side.is_dirty
+        assert not side.components[1].is_dirty
+    
+    @pytest.mark.parametrize("edit", [
+        lambda c: c.children.append(Component()),
+        lambda c: c.children.pop(),
+        lambda c: c.children.reverse(),
+        lambda c: c.attributes.__setitem__("class", "a"),
+        lambda c: c.attributes.update(title="t"),
+        lambda c: setattr(c.style, "color", "red"),
+    ])
+    def test_in_place_mutations_tracked(self, edit):
+        """Test in-place edits of children, attributes and style."""
+        side, middle, _ = self._tree()
+        self._clean(side)
+        
+        edit(middle)
+        assert middle.is_dirty and side.is_dirty
+    
+    def test_reparenting(self):
+        """Test moved components report to their new parent."""
+        side, middle, leaf = self._tree()
+        other = side.components[1]
+        middle.children.remove(leaf)
+        other.children.append(leaf)
+        self._clean(side)
+        
+        leaf.content = "moved"
+        assert other.is_dirty
+        assert not middle.is_dirty
+    
+    def test_to_bytes_matches_json(self):
+        """Test cached serialization equals compact JSON."""
+        template = Template(name="Ünï", css=".a {}")
+        template.front.components.append(Component(
+            type=ComponentType.TEXT, content='"quoted"',
+            style=ComponentStyle(color="red"), attributes={"data-x": [1, 2]},
+            children=[Component(type=ComponentType.FIELD, field_name="Front")],
+        ))
+        expected = json.dumps(template.to_dict(), ensure_ascii=False, separators=(",", ":"))
+        assert template.to_bytes().decode("utf-8") == expected
+        
+        template.front.components[0].children[0].field_name = "Back"
+        expected = json.dumps(template.to_dict(), ensure_ascii=False, separators=(",", ":"))
+        assert template.to_bytes().decode("utf-8") == expected
+    
+    def test_recompute_counts_per_edit(self):
+        """Test only the dirty path is re-serialized after an edit."""
+        side = TemplateSide(components=[
+            Component(children=[Component(children=[Component()]) for _ in range(10)])
+            for _ in range(10)
+        ])
+        side.to_bytes()
+        
+        reset_recompute_counts()
+        side.components[3].children[4].children[0].content = "edit"
+        side.to_bytes()
+        # Edited leaf, its two ancestors and the side itself
+        assert get_recompute_counts() == {"bytes": 4}
+    
+    def test_deepcopy_keeps_tracking(self):
+        """Test copies track changes independently of the original."""
+        side, middle, leaf = self._tree()
+        self._clean(side)
+        
+        copied = copy.deepcopy(side)
+        copied.components[0].children[0].content = "copy"
+        assert copied.is_dirty
+        assert not side.is_dirty
+        assert type(copy.deepcopy(middle.attributes)) is dict
+    
+    def test_deepcopy_of_child_detaches_it(self):
+        """Test copying one node does not copy its ancestors."""
+        _, middle, leaf = self._tree()
+        copied = copy.deepcopy(leaf)
+        assert copied.to_dict() == leaf.to_dict()
+        copied.content = "z"
+        assert leaf.content == "x"
+    
+    def test_pickle_round_trip(self):
+        """Test pickled trees restore parent links."""
+        side, _, _ = self._tree()
+        restored = pickle.loads(pickle.dumps(side))
+        self._clean(restored)
+        
+        restored.components[0].children[0].content = "y"
+        assert restored.is_dirty
+        assert restored.to_dict() != side.to_dict()
@@ -0,0 +1,131 @@
+"""Tests for representative sample-note selection."""
+
+import logging
+import time
+
+import pytest
+
+from anki_template_designer.services.note_sampler import (
+    LocalCollection, NoteSampler, score_fields,
+)
+
+logger = logging.getLogger("anki_template_designer.tests.test_note_sampler")
+
+MID = 1000
+
+
+@pytest.fixture
+def col():
+    collection = LocalCollection()
+    yield collection
+    collection.close()
+
+
+def reasons(samples):
+    return {reason: sample.note_id for sample in samples for reason in sample.reasons}
+
+
+class TestScoring:
+    """Tests for scoring notes."""
+
+    def test_score_fields(self):
+        """Test each reason counts what it is named after."""
+        scores = score_fields(["{{c1::a}} {{c2::b}}", '<img src="x.png">[sound:y.mp3]', " "])
+        assert scores == {"longest": 50, "cloze": 2, "media": 2, "empty": 1}
+
+
+class TestNoteSampler:
+    """Tests for picking and refreshing samples."""
+
+    def test_picks_per_reason(self, col):
+        """Test the best note is picked for each reason and listed once."""
+        plain = col.add_note(MID, ["short", "x"])
+        longest = col.add_note(MID, ["a" * 200, "b" * 100])
+        cloze = col.add_note(MID, ["{{c1::a}} {{c2::b}} {{c3::c}}", ""])
+        media = col.add_note(MID, ['<img src="a.png"><img src="b.png">', "[sound:c.mp3]"])
+        col.add_note(MID + 1, ["x" * 1000, ""])
+
+        samples = NoteSampler().sample(col, MID)
+        assert reasons(samples) == {"longest": longest, "cloze": cloze, "media": media, "empty": cloze}
+        assert [s.note_id for s in samples] == [longest, cloze, media]
+        assert samples[1].reasons == ["cloze", "empty"]
+        assert plain not in [s.note_id for s in samples]
+        assert samples[0].to_dict()["fields"] == ["a" * 200, "b" * 100]
+
+    def test_no_notes(self, col):
+        """Test a note type without notes has no samples."""
+        assert NoteSampler().sample(col, MID) == []
+
+    def test_incremental_refresh(self, col):
+        """Test later calls merge edited notes and rescan when a pick changes."""
+        first = col.add_note(MID, ["aaaa", "b"])
+        other = col.add_note(MID, ["aa", "b"])
+        sampler = NoteSampler()
+        assert reasons(sampler.sample(col, MID))["longest"] == first
+
+        # A new longer note is merged without a rescan
+        newer = col.add_note(MID, ["a" * 10, "b"])
+        assert reasons(sampler.sample(col, MID))["longest"] == newer
+        assert sampler.get_stats()["scans"] == 1
+
+        # Shortening the pick rescans, so the runner-up can win
+        col.update_note(newer, ["a", "b"])
+        assert reasons(sampler.sample(col, MID))["longest"] == first
+        assert sampler.get_stats()["scans"] == 2
+
+        # Deleting the pick rescans too
+        col.remove_notes([first])
+        assert reasons(sampler.sample(col, MID))["longest"] == other
+        assert sampler.get_stats()["scans"] == 3
+
+    def test_bounded_scan(self, col):
+        """Test scans only read the most recently edited notes."""
+        old = col.add_note(MID, ["x" * 100])
+        col.add_notes(MID, [[f"n{i}"] for i in range(10)])
+        samples = NoteSampler(scan_limit=5).sample(col, MID)
+        assert old not in [s.note_id for s in samples]
+
+
+class TestLocalCollection:
+    """Tests for the collection stand-in."""
+
+    def test_find_and_get_notes(self, col):
+        """Test notes can be found by note type and read back."""
+        note_id = col.add_note(MID, ["Front", "Back"], mod=50)
+        col.add_note(MID + 1, ["Other"])
+        assert col.find_notes(f"mid:{MID}") == [note_id]
+        note = col.get_note(note_id)
+        assert (note.mid, note.mod, note.fields) == (MID, 50, ["Front", "Back"])
+        with pytest.raises(ValueError):
+            col.find_notes("deck:Default")
+        with pytest.raises(KeyError):
+            col.get_note(999)
+
+
+@pytest.mark.slow
+class TestSamplerBenchmarks:
+    """Cached sampling against searching the collection on every call."""
+
+    def test_repeat_sampling_50000_notes(self, col):
+        """Test refreshing cached picks is cheaper than searching each time."""
+        col.add_notes(MID, (
+            [f"word {n} " * (n % 7), "{{c1::x}}" * (n % 3), '<img src="a.png">' * (n % 5 == 0)]
+            for n in range(50000)
+        ))
+
+        start = time.perf_counter()
+        for _ in range(20):
+            note = col.get_note(col.find_notes(f"mid:{MID}")[0])
+        search = time.perf_counter() - start
+
+        sampler = NoteSampler()
+        first = sampler.sample(col, MID)
+        start = time.perf_counter()
+        for _ in range(20):
+            assert sampler.sample(col, MID) == first
+        cached = time.perf_counter() - start
+
+        logger.info(f"20 samples of 50000 notes: search {search * 1000:.1f}ms, cached {cached * 1000:.1f}ms")
+        assert note.fields is not None
+        assert sampler.get_stats()["scans"] == 1
+        assert cached < search
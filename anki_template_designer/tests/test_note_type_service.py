@@ -15,6 +15,7 @@ from anki_template_designer.services.note_type_service import (
     get_note_type_service,
     init_note_type_service
 )
+from anki_template_designer.services.note_sampler import LocalCollection
 
 
 class TestAnkiField:
@@ -234,6 +235,108 @@ class TestNoteTypeService:
         assert result[0].name == "Basic"
         assert result[1].name == "Cloze"
     
+    def test_get_all_note_types_refreshes_modified_only(self):
+        """Test listings reuse note types whose model mod is unchanged."""
+        mock_mw = Mock()
+        mock_col = Mock()
+        mock_mw.col = mock_col
+        models = [
+            {"id": 1, "name": "Basic", "mod": 100, "usn": -1, "css": ""},
+            {"id": 2, "name": "Other", "mod": 200, "usn": -1, "css": ""},
+            {"id": 3, "name": "Gone", "mod": 300, "usn": -1, "css": ""},
+        ]
+        mock_col.models.all.return_value = models
+        
+        service = NoteTypeService(mock_mw)
+        first = service.get_all_note_types()
+        
+        models[0] = dict(models[0], name="Renamed", mod=101)
+        del models[2]
+        second = service.get_all_note_types()
+        
+        assert second[0].name == "Renamed" and second[0] is not first[0]
+        assert second[1] is first[1]
+        assert set(service._cache) == {1, 2}
+        
+        mock_col.models.get.return_value = models[1]
+        service.update_css(2, "new")
+        assert set(service._cache) == {1}
+    
+    def test_get_all_note_types_reads_versions_in_one_query(self):
+        """Test listings load only models whose notetypes row changed."""
+        mock_mw = Mock()
+        mock_col = Mock()
+        mock_mw.col = mock_col
+        models = {
+            1: {"id": 1, "name": "Basic", "mod": 100, "usn": -1, "css": ""},
+            2: {"id": 2, "name": "Other", "mod": 200, "usn": -1, "css": ""},
+        }
+        mock_col.db.all.return_value = [(1, 100, -1), (2, 200, -1)]
+        mock_col.models.get.side_effect = lambda note_type_id: models.get(note_type_id)
+        
+        service = NoteTypeService(mock_mw)
+        first = service.get_all_note_types()
+        assert [nt.name for nt in first] == ["Basic", "Other"]
+        assert mock_col.models.get.call_count == 2
+        
+        models[1] = dict(models[1], name="Renamed", mod=101)
+        mock_col.db.all.return_value = [(1, 101, -1), (2, 200, -1)]
+        second = service.get_all_note_types()
+        
+        assert second[0].name == "Renamed" and second[1] is first[1]
+        assert mock_col.models.get.call_count == 3
+        assert mock_col.db.all.call_count == 2
+        mock_col.models.all.assert_not_called()
+    
+    def test_get_note_type_summaries(self):
+        """Test summaries use the name/ID listing and skip building note types."""
+        mock_mw = Mock()
+        mock_col = Mock()
+        mock_mw.col = mock_col
+        entries = []
+        for note_type_id, name in [(1, "Basic"), (2, "Reversed")]:
+            entry = Mock(id=note_type_id)
+            entry.name = name  # "name" is a Mock constructor argument
+            entries.append(entry)
+        mock_col.models.all_names_and_ids.return_value = entries
+        mock_col.db.all.return_value = [(1, 0, "Forward"), (2, 0, "Card 1"), (2, 1, "Card 2")]
+        
+        service = NoteTypeService(mock_mw)
+        
+        summaries = service.get_note_type_summaries()
+        assert [s.to_dict() for s in summaries] == [
+            {"id": 1, "name": "Basic", "templateNames": ["Forward"]},
+            {"id": 2, "name": "Reversed", "templateNames": ["Card 1", "Card 2"]}
+        ]
+        mock_col.db.all.assert_called_once()
+        mock_col.models.get.assert_not_called()
+        mock_col.models.all.assert_not_called()
+        assert service._cache == {}
+        
+        names_only = service.get_note_type_summaries(include_templates=False)
+        assert [s.template_names for s in names_only] == [None, None]
+        mock_col.db.all.assert_called_once()
+        
+        # No templates table: fall back to one read of all models
+        mock_col.db.all.side_effect = Exception("no such table: templates")
+        mock_col.models.all.return_value = [{"id": 1, "name": "Basic", "tmpls": [{"name": "Card 1"}]}]
+        assert service.get_note_type_summaries()[0].template_names == ["Card 1"]
+        mock_col.models.get.assert_not_called()
+    
+    def test_get_note_type_summaries_without_light_listing(self):
+        """Test older collections fall back to reading the models."""
+        mock_mw = Mock()
+        mock_mw.col.models = Mock(spec=["all", "get"])
+        mock_mw.col.models.all.return_value = [
+            {"id": 1, "name": "Basic", "tmpls": [{"name": "Card 1"}], "flds": [{"name": "F"}]}
+        ]
+        
+        service = NoteTypeService(mock_mw)
+        summaries = service.get_note_type_summaries()
+        assert summaries[0].template_names == ["Card 1"]
+        assert service._cache == {}
+        
+    
     def test_get_note_type_from_cache(self):
         """Test getting note type from cache."""
         service = NoteTypeService()
@@ -245,6 +348,35 @@ class TestNoteTypeService:
         result = service.get_note_type(100)
         assert result is nt
     
+    def test_get_note_type_reloads_modified_model(self):
+        """Test a cached note type is replaced once its model's mod changes."""
+        mock_mw = Mock()
+        mock_col = Mock()
+        mock_mw.col = mock_col
+        model = {
+            "id": 1, "name": "Test", "mod": 100, "usn": -1, "css": ".card {}",
+            "tmpls": [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Back}}"}]
+        }
+        mock_col.models.get.return_value = model
+        service = NoteTypeService(mock_mw)
+        
+        first = service.get_note_type(1)
+        assert service.get_note_type(1) is first
+        
+        # Edited in Anki's own card editor
+        mock_col.models.get.return_value = dict(
+            model, mod=200, css=".card { color: red; }",
+            tmpls=[{"name": "Card 1", "qfmt": "<b>{{Front}}</b>", "afmt": "{{Back}}"}]
+        )
+        fresh = service.get_note_type(1)
+        assert fresh is not first
+        assert fresh.templates[0].front == "<b>{{Front}}</b>"
+        assert fresh.css == ".card { color: red; }"
+        
+        mock_col.models.get.return_value = None
+        assert service.get_note_type(1) is None
+        assert 1 not in service._cache
+    
     def test_get_note_type_not_found(self):
         """Test getting non-existent note type."""
         mock_mw = Mock()
@@ -320,6 +452,27 @@ class TestNoteTypeService:
         assert sample["Question"] == "[Question]"
         assert sample["Answer"] == "[Answer]"
     
+    def test_get_sample_note_data(self):
+        """Test sample note data comes from the note with the most content."""
+        col = LocalCollection()
+        col.add_note(1, ["short", "x"])
+        col.add_note(1, ["a much longer question", "and answer"])
+        col.models = Mock()
+        col.models.get.side_effect = lambda mid: {
+            "id": 1, "name": "Test", "mod": 10, "usn": -1,
+            "flds": [{"name": "Question"}, {"name": "Answer"}, {"name": "Extra"}]
+        } if mid == 1 else None
+        mock_mw = Mock()
+        mock_mw.col = col
+        
+        service = NoteTypeService(mock_mw)
+        
+        data = service.get_sample_note_data(1)
+        assert data == {"Question": "a much longer question", "Answer": "and answer", "Extra": ""}
+        assert [s.reasons for s in service.get_sample_notes(1)] == [["longest"]]
+        assert service.get_sample_note_data(2) is None
+        col.close()
+    
     def test_render_preview(self):
         """Test rendering a preview."""
         service = NoteTypeService()
@@ -350,6 +503,85 @@ class TestNoteTypeService:
         assert "Hello" in preview["back"]  # FrontSide replacement
         assert "css" in preview
     
+    def test_render_preview_media(self, tmp_path):
+        """Test previews list their media and can swap large images."""
+        (tmp_path / "big.png").write_bytes(b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x01\x00\x00\x00\x00\x80" + b"\x00" * 100)
+        mock_mw = Mock()
+        mock_mw.col.media.dir.return_value = str(tmp_path)
+        mock_mw.col.models.get.return_value = {
+            "id": 1, "name": "Test", "mod": 10, "usn": -1,
+            "tmpls": [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{FrontSide}}[sound:missing.mp3]"}]
+        }
+        service = NoteTypeService(mock_mw)
+        
+        preview = service.render_preview(1, 0, {"Front": '<img src="big.png">'})
+        assert preview["media"] == [{
+            "filename": "big.png", "kind": "image", "size": 124,
+            "mtime": (tmp_path / "big.png").stat().st_mtime, "width": 256, "height": 128
+        }]
+        assert preview["front"] == '<img src="big.png">'
+        
+        preview = service.render_preview(1, 0, {"Front": '<img src="big.png">'}, placeholder_over=100)
+        assert preview["front"].startswith('<img src="data:image/svg+xml,')
+        assert 'data-src="big.png"' in preview["back"]
+    
+    def test_render_preview_sections_and_errors(self):
+        """Test sections are honoured and malformed templates report an error."""
+        service = NoteTypeService()
+        nt = NoteType(
+            id=1,
+            name="Test",
+            templates=[
+                CardTemplate(name="Card 1", ordinal=0, front="{{#Extra}}<i>{{Extra}}</i>{{/Extra}}{{Front}}", back="{{Back}}"),
+                CardTemplate(name="Card 2", ordinal=1, front="{{#Front}}", back="")
+            ],
+        )
+        service._cache[1] = nt
+        
+        assert service.render_preview(1, 0, {"Front": "F", "Back": "B", "Extra": ""})["front"] == "F"
+        assert service.render_preview(1, 0, {"Front": "F", "Back": "B", "Extra": "e"})["front"] == "<i>e</i>F"
+        assert service.get_render_stats()["hits"] == 1
+        assert "error" in service.render_preview(1, 1, {"Front": "F"})
+    
+    def test_render_previews(self):
+        """Test a batch renders every card of every note with the CSS once."""
+        service = NoteTypeService()
+        service._cache[1] = NoteType(
+            id=1,
+            name="Two Way",
+            templates=[
+                CardTemplate(name="Forward", ordinal=0, front="{{Front}}", back="{{Back}}"),
+                CardTemplate(name="Reverse", ordinal=1, front="{{Back}}", back="{{Front}}")
+            ],
+            css=".card {}"
+        )
+        notes = [{"Front": "f1", "Back": "b1"}, {"Front": "f2", "Back": "b2"}]
+        
+        result = service.render_previews(1, notes=notes)
+        assert result["css"] == ".card {}"
+        assert [(c["note"], c["ordinal"], c["front"]) for c in result["cards"]] == [
+            (0, 0, "f1"), (0, 1, "b1"), (1, 0, "f2"), (1, 1, "b2")
+        ]
+        assert "css" not in result["cards"][0]
+        
+        result = service.render_previews(1, ordinals=[1, 5], notes=notes)
+        assert len(result["cards"]) == 2
+        assert result["errors"][0]["ordinal"] == 5
+        assert service.render_previews(99) is None
+    
+    def test_render_previews_cloze(self):
+        """Test cloze notes render one card per deletion they contain."""
+        service = NoteTypeService()
+        service._cache[2] = NoteType(
+            id=2,
+            name="Cloze",
+            templates=[CardTemplate(name="Cloze", ordinal=0, front="{{cloze:Text}}", back="{{cloze:Text}}")],
+            is_cloze=True
+        )
+        result = service.render_previews(2, notes=[{"Text": "{{c1::a}} {{c3::b}}"}])
+        assert [c["ordinal"] for c in result["cards"]] == [0, 2]
+        assert 'data-cloze="b"' in result["cards"][1]["front"]
+    
     def test_update_template(self):
         """Test updating a template."""
         mock_mw = Mock()
@@ -388,6 +620,158 @@ class TestNoteTypeService:
         assert result is True
         assert model["css"] == "new css"
         mock_col.models.save.assert_called_once()
+    
+    def test_apply_changes(self):
+        """Test templates and CSS are saved together, once."""
+        mock_mw = Mock()
+        mock_col = Mock()
+        mock_mw.col = mock_col
+        
+        model = {
+            "id": 1,
+            "name": "Test",
+            "css": "old css",
+            "tmpls": [
+                {"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{Back}}"},
+                {"name": "Card 2", "qfmt": "{{Back}}", "afmt": "{{Front}}"}
+            ]
+        }
+        mock_col.models.get.return_value = model
+        
+        service = NoteTypeService(mock_mw)
+        service._cache[1] = NoteType(id=1, name="Test")
+        service._cache[2] = NoteType(id=2, name="Other")
+        
+        result = service.apply_changes(1, {0: ("<b>{{Front}}</b>", None), 1: ("{{Back}}", "{{Front}}")}, "new css")
+        
+        assert result.success and result.saved
+        assert result.templates_changed == [0]
+        assert result.css_changed is True
+        assert set(result.to_dict()["timings"]) == {"validateMs", "saveMs", "totalMs"}
+        mock_col.models.save.assert_called_once()
+        saved = mock_col.models.save.call_args[0][0]
+        assert saved["tmpls"][0]["qfmt"] == "<b>{{Front}}</b>"
+        assert saved["css"] == "new css"
+        assert set(service._cache) == {2}
+        
+        # Nothing differs: nothing is saved
+        mock_col.models.get.return_value = saved
+        result = service.apply_changes(1, {0: ("<b>{{Front}}</b>", "{{Back}}")}, "new css")
+        assert result.success and not result.saved
+        mock_col.models.save.assert_called_once()
+    
+    def test_apply_changes_skips_unchanged_content(self):
+        """Test whitespace-only differences are not saved or backed up."""
+        mock_mw = Mock()
+        mock_col = Mock()
+        mock_mw.col = mock_col
+        model = {
+            "id": 1, "css": ".card {}\n",
+            "tmpls": [{"qfmt": "<div>{{Front}}</div>", "afmt": "{{Back}}"}]
+        }
+        mock_col.models.get.return_value = model
+        backups = []
+        service = NoteTypeService(mock_mw)
+        
+        result = service.apply_changes(
+            1, {0: ("<div>{{Front}}</div>  \r\n", "{{Back}}")}, ".card {}", before_save=backups.append
+        )
+        assert result.success and not result.saved
+        assert backups == []
+        mock_col.models.save.assert_not_called()
+        
+        result = service.apply_changes(1, {0: (None, "{{Back}}<hr>")}, ".card {}", before_save=backups.append)
+        assert result.saved and result.templates_changed == [0] and not result.css_changed
+        assert backups == [model]
+        saved = mock_col.models.save.call_args[0][0]
+        assert saved["css"] == ".card {}\n"
+        
+        stats = service.get_save_stats()
+        assert (stats["saved"], stats["skipped"]) == (1, 1)
+        assert stats["save"]["count"] == 1
+    
+    def test_apply_changes_merges_duplicate_css(self):
+        """Test CSS is saved as written unless merging is asked for."""
+        mock_mw = Mock()
+        mock_col = Mock()
+        mock_mw.col = mock_col
+        model = {"id": 1, "css": ".card { color: black; }", "tmpls": [{"qfmt": "{{Front}}", "afmt": "{{Back}}"}]}
+        mock_col.models.get.return_value = model
+        service = NoteTypeService(mock_mw)
+        
+        css = ".card { color: black; }\n.card { color: navy; }"
+        result = service.apply_changes(1, css=css)
+        assert result.css_changed
+        assert mock_col.models.save.call_args[0][0]["css"] == css
+        
+        service.apply_changes(1, css=css, optimize_css=True)
+        assert mock_col.models.save.call_args[0][0]["css"] == ".card {\n    color: navy;\n}\n"
+        
+        # Kept as written when nothing merges
+        service.apply_changes(1, css=".card{color:red}", optimize_css=True)
+        assert mock_col.models.save.call_args[0][0]["css"] == ".card{color:red}"
+        assert service.optimize_css(css, minify=True) == ".card{color:navy}"
+        assert service.get_save_stats()["css"]["misses"] == 3
+    
+    def test_field_references(self):
+        """Test field usages, unused fields and the reference map."""
+        mock_mw = Mock()
+        mock_col = Mock()
+        mock_mw.col = mock_col
+        model = {
+            "id": 1, "name": "Test", "css": "",
+            "flds": [{"name": "Front"}, {"name": "Back"}, {"name": "Notes"}],
+            "tmpls": [{"name": "Card 1", "qfmt": "{{Front}}", "afmt": "{{FrontSide}}{{#Back}}{{Back}}{{/Back}}"}]
+        }
+        mock_col.models.get.return_value = model
+        service = NoteTypeService(mock_mw)
+        
+        assert service.find_field_usages(1, "Back") == [{
+            "ordinal": 0, "side": "back",
+            "references": [
+                {"field": "Back", "kind": "section", "filters": []},
+                {"field": "Back", "kind": "field", "filters": []}
+            ]
+        }]
+        assert service.get_unused_fields(1) == ["Notes"]
+        
+        # Saving a template re-indexes only that note type
+        service.apply_changes(1, {0: ("{{Front}} {{Notes}}", None)})
+        mock_col.models.get.return_value = mock_col.models.save.call_args[0][0]
+        assert service.get_unused_fields(1) == []
+        
+        references = service.get_field_reference_map(1)
+        assert references["usages"]["Notes"] == [[0, "front"]]
+        assert [s["side"] for s in references["sides"]] == ["front", "back"]
+        assert references["unusedFields"] == []
+        
+        mock_col.models.get.return_value = None
+        assert service.get_field_reference_map(2) is None
+    
+    def test_apply_changes_validates_first(self):
+        """Test nothing is saved if any change is invalid."""
+        mock_mw = Mock()
+        mock_col = Mock()
+        mock_mw.col = mock_col
+        model = {"id": 1, "css": "", "tmpls": [{"qfmt": "{{Front}}", "afmt": "{{Back}}"}]}
+        mock_col.models.get.return_value = model
+        service = NoteTypeService(mock_mw)
+        
+        result = service.apply_changes(1, {0: ("{{#Front}}open", None)}, "new css")
+        assert not result.success and "invalid" in result.error
+        assert "front" in result.error and result.details["side"] == "front"
+        result = service.apply_changes(1, {0: ("{{Front}}", "{{/Back}}")})
+        assert result.error.startswith("Template 0 back is invalid")
+        assert (result.details["ordinal"], result.details["side"]) == (0, "back")
+        assert result.to_dict()["details"]["side"] == "back"
+        result = service.apply_changes(1, {3: ("x", "y")})
+        assert not result.success and "out of range" in result.error
+        
+        mock_col.models.save.side_effect = RuntimeError("locked")
+        result = service.apply_changes(1, {0: ("{{Back}}", None)})
+        assert not result.success and result.error == "locked"
+        assert model["tmpls"][0]["qfmt"] == "{{Front}}"
+        assert mock_col.models.save.call_count == 1
 
 
 class TestGlobalFunctions:
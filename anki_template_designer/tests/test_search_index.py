@@ -0,0 +1,225 @@
+"""Tests for the full-text search index."""
+
+import logging
+import tempfile
+import time
+from unittest.mock import Mock
+
+import pytest
+
+from anki_template_designer.core.models import Component, ComponentType, Template
+from anki_template_designer.services.note_type_service import NoteTypeService
+from anki_template_designer.services.search_index import (
+    DOC_NOTE_TYPE, DOC_TEMPLATE, SearchIndex, empty_terms, add_css, add_html,
+    parse_query, template_terms,
+)
+from anki_template_designer.services.template_service import TemplateService
+
+logger = logging.getLogger("anki_template_designer.tests.test_search_index")
+
+
+def make_template(name, field="Front", css=".card { color: red; }"):
+    template = Template(name=name)
+    template.front.components.append(
+        Component(type=ComponentType.FIELD, field_name=field)
+    )
+    template.css = css
+    return template
+
+
+def hit_ids(hits):
+    return [hit["id"] for hit in hits]
+
+
+class TestExtraction:
+    """Tests for term extraction."""
+
+    def test_html_terms(self):
+        """Test fields, classes, ids and text are separated."""
+        terms = empty_terms()
+        add_html(terms, '<div class="front big" id="q">Question &amp; {{hint:Back Extra}}</div>')
+        assert terms["field"] == {"back extra"}
+        assert terms["class"] == {"front", "big"}
+        assert terms["id"] == {"q"}
+        assert terms["text"] == {"question"}
+
+    def test_css_selectors_only(self):
+        """Test selectors are indexed but declarations and at-rules are not."""
+        terms = empty_terms()
+        add_css(terms, """
+            /* .commented {} */
+            .card, div#main > span.hl:hover { color: #ffaa00; }
+            @media (max-width: 600px) { .nightMode .card { margin: 0; } }
+        """)
+        assert terms["class"] == {"card", "hl", "nightmode"}
+        assert terms["id"] == {"main"}
+        assert terms["element"] == {"div", "span"}
+
+    def test_template_terms(self):
+        """Test component field names and names are indexed."""
+        terms = template_terms(make_template("Basic Vocab", field="Word").to_dict())
+        assert terms["name"] == {"basic", "vocab"}
+        assert "word" in terms["field"]
+        assert "card" in terms["class"]
+
+    def test_parse_query_shorthands(self):
+        """Test query shorthands map to kinds."""
+        assert parse_query("{{cloze:Text}} .card #main name:bas*") == [
+            ("field", "text", False),
+            ("class", "card", False),
+            ("id", "main", False),
+            ("name", "bas", True),
+        ]
+        assert parse_query('field:"Back Extra"') == [("field", "back extra", False)]
+
+
+class TestSearchIndex:
+    """Tests for SearchIndex."""
+
+    def test_and_semantics_and_ranking(self):
+        """Test all terms must match and name matches rank first."""
+        index = SearchIndex()
+        a, b = empty_terms(), empty_terms()
+        a["name"] = {"front"}
+        a["field"] = {"front"}
+        b["text"] = {"front", "back"}
+        index.update(DOC_TEMPLATE, "a", "A", a)
+        index.update(DOC_TEMPLATE, "b", "B", b)
+
+        assert hit_ids(index.search("front")) == ["a", "b"]
+        assert hit_ids(index.search("front back")) == ["b"]
+        assert index.search("front missing") == []
+        assert index.search("") == []
+
+    def test_incremental_update(self):
+        """Test re-indexing replaces old terms and skips unchanged documents."""
+        index = SearchIndex()
+        terms = empty_terms()
+        terms["class"] = {"old"}
+        assert index.update(DOC_TEMPLATE, "t", "T", terms)
+        assert not index.update(DOC_TEMPLATE, "t", "T", {k: set(v) for k, v in terms.items()})
+
+        terms = empty_terms()
+        terms["class"] = {"new"}
+        assert index.update(DOC_TEMPLATE, "t", "T", terms)
+        assert index.search(".old") == []
+        assert hit_ids(index.search(".new")) == ["t"]
+
+        assert index.remove(DOC_TEMPLATE, "t")
+        assert index.search(".new") == []
+        assert len(index) == 0
+
+    def test_prefix_and_type_filter(self):
+        """Test prefix queries and filtering by document type."""
+        index = SearchIndex()
+        terms = empty_terms()
+        terms["name"] = {"vocabulary"}
+        index.update(DOC_TEMPLATE, "t", "Vocabulary", terms)
+        index.update(DOC_NOTE_TYPE, 1, "Vocabulary", terms)
+
+        assert len(index.search("voc*")) == 2
+        assert hit_ids(index.search("voc*", doc_type=DOC_NOTE_TYPE)) == ["1"]
+        assert index.search("voc") == []
+
+        index.clear(DOC_TEMPLATE)
+        assert index.count() == 1
+        assert index.ids(DOC_NOTE_TYPE) == ["1"]
+
+
+class TestServiceSearch:
+    """Tests for search through the services."""
+
+    def test_template_service_tracks_changes(self):
+        """Test saves, deletes and external writes update the index."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            existing = make_template("Existing", field="Word")
+            TemplateService(tmpdir).save_template(existing)
+
+            service = TemplateService(tmpdir)
+            assert hit_ids(service.search_templates("{{Word}}")) == [existing.id]
+
+            template = make_template("Kanji", field="Reading")
+            service.save_template(template)
+            assert hit_ids(service.search_templates("field:reading")) == [template.id]
+
+            template.front.components[0].field_name = "Meaning"
+            service.save_template(template)
+            assert service.search_templates("field:reading") == []
+            assert hit_ids(service.search_templates("{{Meaning}}")) == [template.id]
+
+            service.delete_template(existing.id)
+            assert service.search_templates("{{Word}}") == []
+
+            added = make_template("Added Elsewhere")
+            TemplateService(tmpdir).save_template(added)
+            service.refresh_index()
+            assert hit_ids(service.search_templates("elsewhere")) == [added.id]
+
+    def test_write_behind_saves_indexed(self):
+        """Test background writes update the index."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = TemplateService(tmpdir, write_behind=True, debounce_seconds=10)
+            service.search_templates("anything")
+            template = make_template("Queued", field="Later")
+            service.save_template(template)
+            service.flush()
+            assert hit_ids(service.search_templates("{{Later}}")) == [template.id]
+            service.shutdown()
+
+    def test_note_types_share_index(self):
+        """Test note types are indexed and updates re-index them."""
+        model = {
+            "id": 7,
+            "name": "Cloze",
+            "flds": [{"name": "Text"}],
+            "tmpls": [{"name": "Cloze", "qfmt": "{{cloze:Text}}", "afmt": "{{cloze:Text}}"}],
+            "css": ".cloze { font-weight: bold; }",
+            "sortf": 0,
+        }
+        mw = Mock()
+        mw.col.models.all.return_value = [model]
+        mw.col.models.get.return_value = model
+
+        index = SearchIndex()
+        service = NoteTypeService(mw, search_index=index)
+        assert hit_ids(service.search_note_types("{{Text}} .cloze")) == ["7"]
+
+        assert service.update_css(7, ".highlight {}")
+        assert service.search_note_types(".cloze") == []
+        assert hit_ids(service.search_note_types(".highlight")) == ["7"]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            templates = TemplateService(tmpdir, search_index=index)
+            templates.save_template(make_template("Cloze Deck", field="Text"))
+            templates.search_templates("text")
+            assert len(index.search("{{Text}}")) == 2
+
+
+@pytest.mark.slow
+class TestSearchBenchmarks:
+    """Query latency over tens of thousands of documents."""
+
+    def test_query_20000_documents(self):
+        """Test queries stay in the millisecond range at 20k documents."""
+        index = SearchIndex()
+        fields = [f"Field{i}" for i in range(200)]
+        start = time.perf_counter()
+        for i in range(20000):
+            data = make_template(
+                f"Template {i} deck{i % 50}",
+                field=fields[i % len(fields)],
+                css=f".card .c{i % 500} {{ color: red; }}",
+            ).to_dict()
+            index.update(DOC_TEMPLATE, str(i), data["name"], template_terms(data))
+        build = time.perf_counter() - start
+
+        queries = ["{{Field7}}", "deck3 .card", "name:templ*", ".c42 field:field42", "deck1*"]
+        start = time.perf_counter()
+        for _ in range(20):
+            for query in queries:
+                index.search(query)
+        per_query = (time.perf_counter() - start) / (20 * len(queries))
+
+        logger.info(f"20000 docs: build {build:.2f}s, query {per_query * 1000:.3f}ms")
+        assert len(index.search("{{Field7}}", limit=None)) == 100
+        assert per_query < 0.025
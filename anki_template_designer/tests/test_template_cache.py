@@ -0,0 +1,248 @@
+"""Tests for the bounded template cache."""
+
+import tempfile
+import time
+
+import pytest
+
+from anki_template_designer.core.models import Template
+from anki_template_designer.services.template_cache import TemplateCache
+from anki_template_designer.services.template_service import TemplateService
+
+
+def template_size():
+    return len(Template(name="T").to_bytes())
+
+
+class TestTemplateCache:
+    """Tests for TemplateCache."""
+
+    def test_lru_eviction_within_budget(self):
+        """Test the least recently used template is evicted first."""
+        cache = TemplateCache(max_bytes=int(template_size() * 2.5))
+        first, second, third = Template(name="T"), Template(name="T"), Template(name="T")
+        cache.put(first.id, first)
+        cache.put(second.id, second)
+        assert cache.get(first.id) is first
+
+        cache.put(third.id, third)
+        assert first.id in cache and third.id in cache
+        assert second.id not in cache
+        assert cache.size_bytes <= cache.max_bytes
+        assert cache.get_stats().evictions == 1
+
+    def test_pinned_not_evicted(self):
+        """Test pinned templates survive eviction."""
+        cache = TemplateCache(max_bytes=template_size())
+        pinned, other = Template(name="T"), Template(name="T")
+        cache.put(pinned.id, pinned, pinned=True)
+        cache.put(other.id, other)
+
+        assert pinned.id in cache
+        assert other.id not in cache
+
+        cache.unpin(pinned.id)
+        assert not cache.is_pinned(pinned.id)
+
+    def test_put_refreshes_size(self):
+        """Test re-putting an edited template updates its size."""
+        cache = TemplateCache()
+        template = Template(name="T")
+        cache.put(template.id, template)
+        before = cache.size_bytes
+
+        template.css = "x" * 1000
+        cache.put(template.id, template)
+        assert cache.size_bytes == before + 1000
+        assert len(cache) == 1
+
+    def test_negative_entries_expire(self):
+        """Test missing ids are remembered until their TTL passes."""
+        cache = TemplateCache(negative_ttl=0.05)
+        cache.mark_missing("gone")
+        assert cache.is_missing("gone")
+        time.sleep(0.06)
+        assert not cache.is_missing("gone")
+
+    def test_negative_entries_bounded_and_cleared_by_put(self):
+        """Test the negative cache is bounded and put forgets the id."""
+        cache = TemplateCache(max_negative=2)
+        for name in ("a", "b", "c"):
+            cache.mark_missing(name)
+        assert not cache.is_missing("a")
+        assert cache.is_missing("c")
+
+        template = Template(name="T")
+        cache.mark_missing(template.id)
+        cache.put(template.id, template)
+        assert not cache.is_missing(template.id)
+
+
+class CountingStorageService:
+    """Creates a service whose storage reads are counted."""
+
+    def __init__(self, tmpdir, **kwargs):
+        self.service = TemplateService(tmpdir, **kwargs)
+        self.reads = 0
+        read = self.service.storage.read
+
+        def counting_read(template_id):
+            self.reads += 1
+            return read(template_id)
+        self.service.storage.read = counting_read
+
+
+class TestServiceCache:
+    """Tests for the cache inside TemplateService."""
+
+    def test_negative_caching_avoids_storage(self):
+        """Test repeated lookups of a missing id read storage once."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            counted = CountingStorageService(tmpdir)
+            for _ in range(5):
+                assert counted.service.get_template("missing") is None
+            assert counted.reads == 1
+
+    def test_save_clears_negative_entry(self):
+        """Test a template saved after a miss is found."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = TemplateService(tmpdir)
+            template = Template(name="Late")
+            assert service.get_template(template.id) is None
+            service.save_template(template)
+            assert service.get_template(template.id) is template
+
+    def test_external_add_visible_after_refresh(self):
+        """Test templates added elsewhere are found once listed."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = TemplateService(tmpdir)
+            template = Template(name="Elsewhere")
+            assert service.get_template(template.id) is None
+
+            TemplateService(tmpdir).save_template(template)
+            service.list_templates()
+            assert service.get_template(template.id).name == "Elsewhere"
+
+    def test_budget_evicts_but_keeps_current_and_unsaved(self):
+        """Test loaded templates are evicted while pinned ones stay."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            writer = TemplateService(tmpdir)
+            ids = []
+            for i in range(10):
+                template = Template(name="T")
+                writer.save_template(template)
+                ids.append(template.id)
+
+            service = TemplateService(tmpdir, cache_max_bytes=template_size() * 3)
+            unsaved = service.create_template("T")
+            assert service.set_current_template(ids[0])
+            for template_id in ids[1:]:
+                assert service.get_template(template_id) is not None
+
+            assert len(service._templates) <= 4
+            assert ids[0] in service._templates
+            assert unsaved.id in service._templates
+            assert service.get_cache_stats()["evictions"] > 0
+
+    def test_budget_keeps_edited_templates_until_saved(self):
+        """Test edited, duplicated and failed-to-save templates survive eviction."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            writer = TemplateService(tmpdir)
+            ids = []
+            for i in range(10):
+                template = Template(name="T")
+                writer.save_template(template)
+                ids.append(template.id)
+
+            service = TemplateService(tmpdir, cache_max_bytes=template_size() * 3)
+            edited = service.get_template(ids[0])
+            edited.name = "Edited"
+            assert service.mark_modified(ids[0])
+            assert service.set_current_template(ids[1])
+            copy = service.duplicate_template(ids[1])
+            failing = service.get_template(ids[2])
+            failing.name = "Not written"
+            service._storage.write = lambda *args: (_ for _ in ()).throw(OSError("disk full"))
+            assert not service.save_template(failing)
+            del service._storage.write
+
+            for template_id in ids[3:]:
+                assert service.get_template(template_id) is not None
+            assert service.get_cache_stats()["evictions"] > 0
+            assert service.get_template(ids[0]) is edited
+            assert service.get_template(ids[2]).name == "Not written"
+            assert service._templates.is_pinned(ids[0]) and service._templates.is_pinned(ids[2])
+            assert not service._templates.is_pinned(copy.id)
+
+            # Saving or discarding releases the pin
+            assert service.save_template(edited)
+            assert not service._templates.is_pinned(ids[0])
+            assert service.discard_changes(ids[2]).name == "T"
+            assert not service._templates.is_pinned(ids[2])
+
+    def test_write_behind_keeps_templates_until_written(self):
+        """Test a saved template stays pinned while its write is queued."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            writer = TemplateService(tmpdir)
+            ids = []
+            for i in range(10):
+                template = Template(name="T")
+                writer.save_template(template)
+                ids.append(template.id)
+
+            service = TemplateService(
+                tmpdir, cache_max_bytes=template_size() * 3, write_behind=True, debounce_seconds=10
+            )
+            edited = service.get_template(ids[0])
+            edited.name = "Edited"
+            assert service.set_current_template(ids[1])
+            assert service.save_template(edited)
+            assert service.set_current_template(ids[2])
+
+            for template_id in ids[3:]:
+                assert service.get_template(template_id) is not None
+            assert service.get_cache_stats()["evictions"] > 0
+            assert service._templates.is_pinned(ids[0])
+            assert ids[0] in service._templates
+            assert not service._templates.is_pinned(ids[1])
+
+            # The writer releases the pin once the save is on disk
+            assert service.flush(timeout=5)
+            assert not service._templates.is_pinned(ids[0])
+            assert service._templates.is_pinned(ids[2])
+            service.shutdown()
+
+    def test_current_pin_moves(self):
+        """Test switching templates unpins the previous saved one."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = TemplateService(tmpdir)
+            first = service.create_template("A")
+            service.save_template(first)
+            second = service.create_template("B")
+            service.save_template(second)
+
+            assert service._templates.is_pinned(second.id)
+            assert not service._templates.is_pinned(first.id)
+
+
+@pytest.mark.slow
+class TestServiceCacheBenchmarks:
+    """Memory stays bounded while browsing many templates."""
+
+    def test_browse_1000_templates_bounded(self):
+        """Test loading 1000 templates stays within the byte budget."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            writer = TemplateService(tmpdir)
+            ids = []
+            for i in range(1000):
+                template = Template(name=f"T{i}")
+                template.css = ".card {}" * 50
+                writer.save_template(template)
+                ids.append(template.id)
+
+            budget = 64 * 1024
+            service = TemplateService(tmpdir, cache_max_bytes=budget)
+            for template_id in ids:
+                service.get_template(template_id)
+            assert service._templates.size_bytes <= budget
+            assert len(service._templates) < 1000
@@ -0,0 +1,315 @@
+"""Tests for the template diff/patch engine."""
+
+import copy
+import json
+import random
+import time
+
+import pytest
+
+from anki_template_designer.core.exceptions import TemplatePatchError
+from anki_template_designer.core.models import (
+    Component, ComponentStyle, ComponentType, Template, TemplateSide
+)
+from anki_template_designer.core.template_diff import (
+    TemplatePatch,
+    apply_patch,
+    diff_templates,
+    diff_text,
+)
+
+
+def _copy(template):
+    """Deep copy a template."""
+    return copy.deepcopy(template)
+
+
+def _build_tree(rng, counter, depth=0, max_children=4):
+    """Build a random component subtree."""
+    counter[0] += 1
+    node = Component(
+        id=f"n{counter[0]}",
+        type=rng.choice(list(ComponentType)),
+        content=rng.choice(["", "text", "hello world"]),
+        style=ComponentStyle(color=rng.choice([None, "#333", "red"])),
+        attributes=rng.choice([{}, {"class": "a"}, {"data-x": [1, 2]}]),
+    )
+    if depth < 3:
+        for _ in range(rng.randint(0, max_children)):
+            node.children.append(_build_tree(rng, counter, depth + 1, max_children))
+    return node
+
+
+def _random_template(rng, counter):
+    template = Template(name="Random")
+    template.front = TemplateSide(
+        html="<div>{{Front}}</div>\n" * rng.randint(0, 5),
+        components=[_build_tree(rng, counter) for _ in range(rng.randint(1, 3))],
+    )
+    template.back = TemplateSide(
+        html="<div>{{Back}}</div>",
+        components=[_build_tree(rng, counter) for _ in range(rng.randint(0, 2))],
+    )
+    template.css = ".card { color: black; }\n" * rng.randint(0, 3)
+    return template
+
+
+def _all_nodes(roots):
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(node.children)
+
+
+def _children_list(side, parent):
+    return side.components if parent is None else parent.children
+
+
+def _mutate(rng, template, counter):
+    """Apply a random edit to a template."""
+    side = rng.choice([template.front, template.back])
+    nodes = list(_all_nodes(side.components))
+    action = rng.choice(["insert", "delete", "move", "props", "reorder", "text"])
+
+    if action == "text":
+        side.html = side.html[: len(side.html) // 2] + "<b>x</b>" + side.html[len(side.html) // 2:]
+        template.css += "\n.x { y: z; }"
+    elif action == "insert" or not nodes:
+        parent = rng.choice(nodes + [None])
+        siblings = _children_list(side, parent)
+        siblings.insert(rng.randint(0, len(siblings)), _build_tree(rng, counter, depth=2))
+    elif action == "delete":
+        victim = rng.choice(nodes)
+        for candidate in [None] + nodes:
+            siblings = _children_list(side, candidate)
+            if victim in siblings:
+                siblings.remove(victim)
+                # Keep one grandchild alive elsewhere to exercise moves out
+                if victim.children and nodes:
+                    survivor = victim.children[0]
+                    side.components.append(survivor)
+                break
+    elif action == "move":
+        node = rng.choice(nodes)
+        for candidate in [None] + nodes:
+            siblings = _children_list(side, candidate)
+            if node in siblings:
+                siblings.remove(node)
+                break
+        targets = [None] + [n for n in _all_nodes(side.components)]
+        parent = rng.choice(targets)
+        siblings = _children_list(side, parent)
+        siblings.insert(rng.randint(0, len(siblings)), node)
+    elif action == "props":
+        node = rng.choice(nodes)
+        node.content = "changed"
+        node.field_name = rng.choice([None, "Front", "Back"])
+        node.style = ComponentStyle(font_size="12px", color=node.style.color)
+        node.attributes = dict(node.attributes, title="t")
+        node.attributes.pop("class", None)
+    else:
+        parent = rng.choice(nodes + [None])
+        rng.shuffle(_children_list(side, parent))
+
+
+class TestDiffText:
+    """Tests for text diffs."""
+
+    def test_equal_text(self):
+        """Test equal strings produce no edits."""
+        assert diff_text("abc", "abc") == []
+
+    def test_single_edit(self):
+        """Test a small change produces one trimmed edit."""
+        edits = diff_text("hello world", "hello there world")
+        assert edits == [[6, "", "there "]]
+
+    def test_large_text_line_edits(self):
+        """Test large edits are split into line-level edits."""
+        old = "".join(f"line {i}\n" for i in range(500))
+        new = old.replace("line 10\n", "LINE 10\n").replace("line 400\n", "LINE 400\n")
+        edits = diff_text(old, new)
+        total = sum(len(o) + len(n) for _, o, n in edits)
+        assert total < 100
+
+
+class TestDiffTemplates:
+    """Tests for template diffs."""
+
+    def test_identical_templates_empty_patch(self):
+        """Test identical templates produce an empty patch."""
+        template = _random_template(random.Random(1), [0])
+        patch = diff_templates(template, _copy(template))
+        assert patch.is_empty
+
+    def test_property_change(self):
+        """Test a single property change produces a single op."""
+        old = Template(front=TemplateSide(components=[Component(id="a", content="x")]))
+        new = _copy(old)
+        new.front.components[0].content = "y"
+
+        patch = diff_templates(old, new)
+        assert patch.ops == [{
+            "op": "node", "side": "front", "id": "a",
+            "key": "content", "old": "x", "new": "y",
+        }]
+
+    def test_move_to_end_single_op(self):
+        """Test moving one child to the end is a single move."""
+        children = [Component(id=f"c{i}") for i in range(10)]
+        old = Template(front=TemplateSide(components=children))
+        new = _copy(old)
+        new.front.components.append(new.front.components.pop(0))
+
+        patch = diff_templates(old, new)
+        assert len(patch) == 1
+        assert patch.ops[0]["op"] == "move"
+
+    def test_insert_subtree_single_op(self):
+        """Test inserting a new subtree is a single insert."""
+        old = Template(front=TemplateSide(components=[Component(id="root")]))
+        new = _copy(old)
+        new.front.components[0].children.append(
+            Component(id="p", children=[Component(id="c1"), Component(id="c2")])
+        )
+
+        patch = diff_templates(old, new)
+        assert len(patch) == 1
+        assert patch.ops[0]["op"] == "insert"
+        assert len(patch.ops[0]["node"]["children"]) == 2
+
+    def test_duplicate_ids_fall_back_to_replace(self):
+        """Test ambiguous ids still produce a correct patch."""
+        old = Template(front=TemplateSide(components=[Component(id="d"), Component(id="d")]))
+        new = Template(front=TemplateSide(components=[Component(id="d", content="z")]))
+        new.id = old.id
+        new.created_at = old.created_at
+        new.modified_at = old.modified_at
+
+        patch = diff_templates(old, new)
+        result = apply_patch(_copy(old), patch)
+        assert result.to_dict() == new.to_dict()
+
+
+class TestApplyPatch:
+    """Tests for applying patches."""
+
+    def test_patch_json_round_trip(self):
+        """Test patches survive JSON serialization."""
+        rng = random.Random(7)
+        counter = [0]
+        old = _random_template(rng, counter)
+        new = _copy(old)
+        for _ in range(5):
+            _mutate(rng, new, counter)
+
+        patch = diff_templates(old, new)
+        restored = TemplatePatch.from_dict(json.loads(json.dumps(patch.to_dict())))
+        assert apply_patch(_copy(old), restored).to_dict() == new.to_dict()
+
+    def test_conflict_detected(self):
+        """Test applying a patch to the wrong base raises."""
+        old = Template(front=TemplateSide(components=[Component(id="a", content="x")]))
+        new = _copy(old)
+        new.front.components[0].content = "y"
+        patch = diff_templates(old, new)
+
+        with pytest.raises(TemplatePatchError):
+            apply_patch(_copy(new), patch)
+
+    def test_unknown_format_rejected(self):
+        """Test unsupported patch formats are rejected."""
+        with pytest.raises(TemplatePatchError):
+            TemplatePatch.from_dict({"format": 99, "ops": []})
+
+    def test_patch_does_not_alias_template(self):
+        """Test applied nodes do not share state with the patch."""
+        old = Template()
+        new = _copy(old)
+        new.front.components.append(Component(id="a", attributes={"k": [1]}))
+        patch = diff_templates(old, new)
+
+        result = apply_patch(_copy(old), patch)
+        result.front.components[0].attributes["k"].append(2)
+        assert patch.ops[0]["node"]["attributes"] == {"k": [1]}
+
+
+class TestPatchProperties:
+    """Randomised property tests: apply(old, diff) == new and back."""
+
+    @pytest.mark.parametrize("seed", range(60))
+    def test_forward_and_reverse(self, seed):
+        """Test patches apply forwards and backwards."""
+        rng = random.Random(seed)
+        counter = [0]
+        old = _random_template(rng, counter)
+        new = _copy(old)
+        for _ in range(rng.randint(1, 8)):
+            _mutate(rng, new, counter)
+        new.update_modified()
+
+        patch = diff_templates(old, new)
+
+        forward = apply_patch(_copy(old), patch)
+        assert forward.to_dict() == new.to_dict()
+
+        backward = apply_patch(_copy(new), patch, reverse=True)
+        assert backward.to_dict() == old.to_dict()
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_inverse_of_inverse(self, seed):
+        """Test inverting twice yields the original operations."""
+        rng = random.Random(seed)
+        counter = [0]
+        old = _random_template(rng, counter)
+        new = _copy(old)
+        for _ in range(4):
+            _mutate(rng, new, counter)
+
+        patch = diff_templates(old, new)
+        assert patch.inverted().inverted().ops == patch.ops
+
+
+@pytest.mark.slow
+class TestDiffBenchmarks:
+    """Benchmarks on large trees."""
+
+    def _wide_template(self, count):
+        roots = []
+        for i in range(count // 10):
+            roots.append(Component(
+                id=f"r{i}",
+                children=[Component(id=f"r{i}c{j}", content=f"t{j}") for j in range(9)],
+            ))
+        return Template(front=TemplateSide(components=roots))
+
+    def test_large_tree_small_edit(self):
+        """Test diffing a 50k-node tree with a few edits is fast and small."""
+        old = self._wide_template(50_000)
+        new = _copy(old)
+        for i in range(0, 5000, 500):
+            new.front.components[i].children[3].content = "edited"
+
+        start = time.perf_counter()
+        patch = diff_templates(old, new)
+        elapsed = time.perf_counter() - start
+
+        assert len(patch) == 10
+        assert len(json.dumps(patch.to_dict())) < 2000
+        assert elapsed < 5.0
+
+    def test_large_tree_apply(self):
+        """Test applying a structural patch to a large tree."""
+        old = self._wide_template(20_000)
+        new = _copy(old)
+        new.front.components.reverse()
+        new.front.components[0].children.append(Component(id="extra"))
+
+        patch = diff_templates(old, new)
+        start = time.perf_counter()
+        result = apply_patch(_copy(old), patch)
+        elapsed = time.perf_counter() - start
+
+        assert result.to_dict() == new.to_dict()
+        assert elapsed < 5.0
@@ -0,0 +1,177 @@
+"""Tests for per-template version history."""
+
+import logging
+import os
+import tempfile
+import time
+
+import pytest
+
+from anki_template_designer.core.models import Component, ComponentType, Template
+from anki_template_designer.services.template_history import TemplateHistory
+from anki_template_designer.services.template_service import TemplateService
+
+logger = logging.getLogger("anki_template_designer.tests.test_template_history")
+
+
+@pytest.fixture
+def tmpdir():
+    with tempfile.TemporaryDirectory() as path:
+        yield path
+
+
+def make_template():
+    template = Template(name="History")
+    template.front.components.append(Component(type=ComponentType.FIELD, field_name="Front"))
+    template.css = ".card { color: black; }\n" * 50
+    return template
+
+
+def record_versions(history, template, count):
+    """Record ``count`` edits and return the css of each version."""
+    states = {}
+    for i in range(count):
+        template.front.components[0].content = f"edit {i}"
+        template.update_modified()
+        history.record(template.id, template.to_bytes())
+        states[template.version] = template.to_dict()
+    return states
+
+
+class TestTemplateHistory:
+    """Tests for TemplateHistory."""
+
+    def test_snapshots_and_deltas(self, tmpdir):
+        """Test snapshots are written periodically with patches between."""
+        history = TemplateHistory(tmpdir, snapshot_interval=5)
+        template = make_template()
+        states = record_versions(history, template, 12)
+
+        entries = list(reversed(history.list_versions(template.id)))
+        assert [e.snapshot for e in entries] == [True, False, False, False, False] * 2 + [True, False]
+        # Patches are much smaller than snapshots
+        assert entries[1].size * 4 < entries[0].size
+
+        for version, data in states.items():
+            assert history.get_version(template.id, version).to_dict() == data
+        assert history.get_version(template.id, 999) is None
+
+    def test_unchanged_not_recorded(self, tmpdir):
+        """Test recording the same state twice appends nothing."""
+        history = TemplateHistory(tmpdir)
+        template = make_template()
+        assert history.record(template.id, template.to_bytes())
+        assert not history.record(template.id, template.to_bytes())
+
+    def test_reopen_and_torn_tail(self, tmpdir):
+        """Test logs are re-indexed after restart and a torn record is dropped."""
+        history = TemplateHistory(tmpdir, snapshot_interval=3)
+        template = make_template()
+        states = record_versions(history, template, 4)
+        with open(history.path_for(template.id), "ab") as f:
+            f.write(b'{"version": 99, "patch"')
+
+        reopened = TemplateHistory(tmpdir, snapshot_interval=3)
+        assert len(reopened.list_versions(template.id)) == 4
+        last = max(states)
+        assert reopened.get_version(template.id, last).to_dict() == states[last]
+
+        states.update(record_versions(reopened, template, 1))
+        assert reopened.get_version(template.id, template.version).to_dict() == states[template.version]
+
+    def test_compaction_keeps_recent_and_snapshots(self, tmpdir):
+        """Test compaction thins old versions while recent ones stay replayable."""
+        history = TemplateHistory(tmpdir, snapshot_interval=4, keep_recent=1000)
+        template = make_template()
+        states = record_versions(history, template, 20)
+        versions = sorted(states)
+
+        removed = history.compact(template.id, keep_recent=6)
+        assert removed > 0
+        kept = {e.version for e in history.list_versions(template.id)}
+        assert set(versions[-6:]) <= kept
+        for version in kept:
+            assert history.get_version(template.id, version).to_dict() == states[version]
+        # Old snapshots survive as sparse checkpoints
+        assert versions[0] in kept
+
+    def test_automatic_compaction_bounds_log(self, tmpdir):
+        """Test logs are compacted as they grow."""
+        history = TemplateHistory(tmpdir, snapshot_interval=5, keep_recent=10)
+        template = make_template()
+        record_versions(history, template, 60)
+        assert len(history.list_versions(template.id)) < 30
+
+
+class TestServiceHistory:
+    """Tests for the TemplateService history APIs."""
+
+    def test_list_get_restore(self, tmpdir):
+        """Test versions can be listed, fetched and restored."""
+        service = TemplateService(tmpdir, history=True)
+        template = service.create_template("Versioned")
+        service.save_template(template)
+        first = template.version
+        template.css = ".changed {}"
+        service.save_template(template)
+
+        versions = service.list_template_versions(template.id)
+        assert [v["version"] for v in versions] == [template.version, first]
+        assert service.get_template_version(template.id, first).css == ""
+
+        restored = service.restore_template_version(template.id, first)
+        assert restored.css == "" and restored.version > template.version
+        assert service.load_template(template.id).css == ""
+        assert service.current_template is restored
+
+    def test_restore_deleted(self, tmpdir):
+        """Test a deleted template can be brought back from history."""
+        service = TemplateService(tmpdir, history=True, write_behind=True, debounce_seconds=10)
+        template = make_template()
+        service.save_template(template)
+        service.flush()
+        service.delete_template(template.id)
+
+        restored = service.restore_template_version(template.id, template.version)
+        assert restored is not None
+        service.flush()
+        assert service.load_template(template.id).css == template.css
+        service.shutdown()
+
+    def test_history_off(self, tmpdir):
+        """Test the APIs are inert when history is off."""
+        service = TemplateService(tmpdir)
+        template = service.create_template("Plain")
+        service.save_template(template)
+        assert service.list_template_versions(template.id) == []
+        assert service.get_template_version(template.id, template.version) is None
+        assert not os.path.exists(os.path.join(tmpdir, TemplateService.HISTORY_DIR))
+
+
+@pytest.mark.slow
+class TestHistoryBenchmarks:
+    """Retrieval stays bounded as history grows."""
+
+    def test_retrieval_bounded_by_snapshot_interval(self, tmpdir):
+        """Test fetching old and new versions of a long history is equally fast."""
+        history = TemplateHistory(tmpdir, snapshot_interval=20, keep_recent=5000)
+        template = make_template()
+        for i in range(40):
+            template.front.components.append(
+                Component(type=ComponentType.TEXT, content=f"block {i}")
+            )
+        states = record_versions(history, template, 1000)
+        versions = sorted(states)
+
+        def fetch(version):
+            start = time.perf_counter()
+            for _ in range(5):
+                assert history.get_version(template.id, version).to_dict() == states[version]
+            return (time.perf_counter() - start) / 5
+
+        early, late = fetch(versions[18]), fetch(versions[-2])
+        size = os.path.getsize(history.path_for(template.id))
+        logger.info(f"1000 versions: log {size / 1024:.0f} KiB, "
+              f"early {early * 1000:.2f}ms, late {late * 1000:.2f}ms")
+        assert late < early * 3
+        assert late < 0.1
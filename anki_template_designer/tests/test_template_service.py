@@ -225,3 +225,361 @@ class TestTemplateServiceSecurity:
         # Should not contain path separators
         assert ".." not in safe_path
         assert safe_path.endswith(".json")
+
+
+class TestTemplateServiceBinaryStorage:
+    """Tests for the binary storage format."""
+    
+    def test_invalid_storage_format_rejected(self):
+        """Test unknown storage formats are rejected."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with pytest.raises(ValueError):
+                TemplateService(tmpdir, storage_format="xml")
+    
+    def test_binary_save_and_load(self):
+        """Test templates saved in binary format load back."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = TemplateService(tmpdir, storage_format="binary", compress=True)
+            template = service.create_template("Binary")
+            template.css = ".card { color: red; }"
+            service.save_template(template)
+            
+            path = service._get_template_path(template.id)
+            assert path.endswith(".atdb")
+            assert os.path.exists(path)
+            
+            service._templates.clear()
+            loaded = service.load_template(template.id)
+            assert loaded.to_dict() == template.to_dict()
+    
+    def test_reads_other_format(self):
+        """Test a JSON-writing service reads binary files and vice versa."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            binary_service = TemplateService(tmpdir, storage_format="binary")
+            template = binary_service.create_template("Mixed")
+            binary_service.save_template(template)
+            
+            json_service = TemplateService(tmpdir)
+            assert json_service.load_template(template.id).name == "Mixed"
+            assert [t["id"] for t in json_service.list_templates()] == [template.id]
+    
+    def test_save_replaces_other_format(self):
+        """Test saving removes the copy in the other format."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            json_service = TemplateService(tmpdir)
+            template = json_service.create_template("Switch")
+            json_service.save_template(template)
+            
+            binary_service = TemplateService(tmpdir, storage_format="binary")
+            binary_service.save_template(template)
+            
+            assert not os.path.exists(json_service._get_template_path(template.id))
+            assert os.path.exists(binary_service._get_template_path(template.id))
+    
+    def test_migrate_storage(self):
+        """Test migrating all templates to binary and back."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = TemplateService(tmpdir)
+            ids = []
+            for i in range(3):
+                template = service.create_template(f"T{i}")
+                service.save_template(template)
+                ids.append(template.id)
+            
+            assert service.migrate_storage("binary") == 3
+            assert service.storage_format == "binary"
+            assert all(name.endswith(".atdb") for name in os.listdir(service.storage_path))
+            
+            service._templates.clear()
+            assert sorted(t["id"] for t in service.list_templates()) == sorted(ids)
+            
+            assert service.migrate_storage("json") == 3
+            assert all(name.endswith(".json") for name in os.listdir(service.storage_path))
+    
+    def test_delete_removes_binary_file(self):
+        """Test deleting removes binary files."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = TemplateService(tmpdir, storage_format="binary")
+            template = service.create_template("Gone")
+            service.save_template(template)
+            
+            service.delete_template(template.id)
+            assert os.listdir(service.storage_path) == []
+
+
+class TestTemplateServiceIndex:
+    """Tests for the template metadata index."""
+    
+    def _populate(self, service, names):
+        ids = []
+        for name in names:
+            template = service.create_template(name)
+            service.save_template(template)
+            ids.append(template.id)
+        service._templates.clear()
+        return ids
+    
+    def test_list_does_not_load_templates(self, temp_service):
+        """Test listing is served without loading templates."""
+        self._populate(temp_service, ["A", "B"])
+        assert len(temp_service.list_templates()) == 2
+        assert len(temp_service._templates) == 0
+    
+    def test_pagination_and_sorting(self, temp_service):
+        """Test offset, limit and sort parameters."""
+        self._populate(temp_service, ["delta", "Alpha", "charlie", "bravo"])
+        
+        names = [t["name"] for t in temp_service.list_templates(sort="name")]
+        assert names == ["Alpha", "bravo", "charlie", "delta"]
+        
+        page = temp_service.list_templates(offset=1, limit=2, sort="name")
+        assert [t["name"] for t in page] == ["bravo", "charlie"]
+        
+        newest = temp_service.list_templates(limit=1)
+        assert newest[0]["name"] == "bravo"
+        oldest = temp_service.list_templates(limit=1, reverse=False)
+        assert oldest[0]["name"] == "delta"
+        
+        assert temp_service.count_templates() == 4
+    
+    def test_invalid_sort_rejected(self, temp_service):
+        """Test unknown sort keys are rejected."""
+        with pytest.raises(ValueError):
+            temp_service.list_templates(sort="size")
+    
+    def test_persisted_index_avoids_reads(self):
+        """Test a new service lists from the saved index without reading templates."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            first = TemplateService(tmpdir)
+            self._populate(first, ["A", "B", "C"])
+            first.list_templates()
+            
+            service = TemplateService(tmpdir)
+            def fail(path):
+                raise AssertionError(f"unexpected read of {path}")
+            service.storage.read_file = fail
+            assert len(service.list_templates()) == 3
+    
+    def test_external_changes_detected(self, temp_service):
+        """Test files added, changed or removed outside the service are picked up."""
+        ids = self._populate(temp_service, ["A", "B"])
+        temp_service.list_templates()
+        
+        other = TemplateService(temp_service._addon_dir)
+        template = other.load_template(ids[0])
+        template.name = "Renamed elsewhere"
+        other.storage.write(template.id, template.to_dict())
+        os.remove(temp_service._get_template_path(ids[1]))
+        
+        listed = temp_service.list_templates()
+        assert [t["name"] for t in listed] == ["Renamed elsewhere"]
+    
+    def test_delete_updates_index(self, temp_service):
+        """Test deleting a template removes it from the index."""
+        ids = self._populate(temp_service, ["A", "B"])
+        temp_service.delete_template(ids[0])
+        assert [t["id"] for t in temp_service.storage.index.query()] == [ids[1]]
+    
+    def test_corrupt_index_rebuilt(self):
+        """Test an unreadable index file is rebuilt from the templates."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = TemplateService(tmpdir)
+            self._populate(service, ["A"])
+            with open(service.storage.index.path, "w") as f:
+                f.write("{not json")
+            
+            assert len(TemplateService(tmpdir).list_templates()) == 1
+
+
+@pytest.mark.slow
+class TestTemplateServiceIndexBenchmarks:
+    """Listing benchmark on a large store."""
+    
+    def test_list_2000_templates(self):
+        """Test a warm listing of 2000 templates is fast."""
+        import time
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = TemplateService(tmpdir)
+            for i in range(2000):
+                service.save_template(Template(name=f"T{i}"))
+            
+            fresh = TemplateService(tmpdir)
+            start = time.perf_counter()
+            page = fresh.list_templates(limit=50)
+            elapsed = time.perf_counter() - start
+            
+            assert len(page) == 50
+            assert len(fresh._templates) == 0
+            assert elapsed < 1.0
+
+
+class TestTemplateServiceWriteBehind:
+    """Tests for background saves."""
+    
+    def test_saves_coalesced_and_flushed(self):
+        """Test repeated saves produce one write of the latest version."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = TemplateService(tmpdir, write_behind=True, debounce_seconds=10)
+            template = service.create_template("Draft")
+            for i in range(5):
+                template.css = f".v{i} {{}}"
+                assert service.save_template(template)
+            
+            assert service.flush(timeout=5)
+            stats = service.write_queue.get_stats()
+            assert stats["written"] == 1
+            assert stats["coalesced"] == 4
+            
+            service._templates.clear()
+            assert service.load_template(template.id).css == ".v4 {}"
+            service.shutdown()
+    
+    def test_list_and_load_see_pending_saves(self):
+        """Test listing and loading flush pending writes first."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = TemplateService(tmpdir, write_behind=True, debounce_seconds=10)
+            template = service.create_template("Pending")
+            service.save_template(template)
+            
+            assert [t["name"] for t in service.list_templates()] == ["Pending"]
+            service.shutdown()
+    
+    def test_delete_cancels_pending_save(self):
+        """Test a deleted template is not resurrected by a queued save."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = TemplateService(tmpdir, write_behind=True, debounce_seconds=10)
+            template = service.create_template("Doomed")
+            service.save_template(template)
+            service.delete_template(template.id)
+            service.shutdown()
+            
+            assert os.listdir(service.storage_path) == []
+    
+    def test_failed_background_write_keeps_template_unsaved(self):
+        """Test a template whose background write fails stays pinned and unsaved."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            size = len(Template(name="T").to_bytes())
+            service = TemplateService(
+                tmpdir, write_behind=True, debounce_seconds=10, cache_max_bytes=size * 3
+            )
+            failures = []
+            service.add_write_error_listener(lambda template_id, error: failures.append(template_id))
+            template = service.create_template("T")
+            service.set_current_template(service.create_template("T").id)
+            
+            def fail(template_id, data):
+                raise OSError("disk full")
+            service.storage.write = fail
+            assert service.save_template(template)
+            assert service.flush(timeout=5)
+            
+            for i in range(5):
+                service._templates.put(f"other{i}", Template(name="T"))
+            assert failures == [template.id]
+            assert template.id in service._unsaved
+            assert service._templates.is_pinned(template.id)
+            assert service.get_template(template.id) is template
+            assert list(service.get_write_stats()["failed"]) == [template.id]
+            
+            # Saving again once storage works clears the failure
+            del service.storage.write
+            assert service.save_template(template)
+            assert service.flush(timeout=5)
+            assert template.id not in service._unsaved
+            assert service.get_write_stats()["failed"] == {}
+            service.shutdown()
+    
+    def test_atomic_write_leaves_no_temp_files(self, temp_service):
+        """Test writes go through a temp file that is renamed into place."""
+        template = temp_service.create_template("Atomic")
+        temp_service.save_template(template)
+        assert os.listdir(temp_service.storage_path) == [f"{template.id}.json"]
+
+
+class TestTemplateServiceValidation:
+    """Tests for detecting templates changed outside the service."""
+    
+    def _stored(self, tmpdir, name="Original"):
+        service = TemplateService(tmpdir)
+        template = Template(name=name)
+        service.save_template(template)
+        return template.id
+    
+    def test_unchanged_template_not_reread(self):
+        """Test a valid cached template is served without reading storage."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            template_id = self._stored(tmpdir)
+            service = TemplateService(tmpdir)
+            first = service.get_template(template_id)
+            
+            def fail(template_id):
+                raise AssertionError("unexpected read")
+            service.storage.read = fail
+            assert service.get_template(template_id) is first
+    
+    def test_external_edit_reloaded(self):
+        """Test get_template reloads a template rewritten elsewhere."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            template_id = self._stored(tmpdir)
+            service = TemplateService(tmpdir)
+            assert service.get_template(template_id).name == "Original"
+            
+            other = TemplateService(tmpdir)
+            template = other.load_template(template_id)
+            template.name = "Edited elsewhere"
+            other.save_template(template)
+            
+            assert service.get_template(template_id).name == "Edited elsewhere"
+    
+    def test_own_saves_not_reloaded(self):
+        """Test saving through the service keeps the cached object."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            service = TemplateService(tmpdir, write_behind=True, debounce_seconds=0)
+            template = service.create_template("Mine")
+            service.save_template(template)
+            service.flush()
+            service.set_current_template(service.create_template("Other").id)
+            assert service.get_template(template.id) is template
+            service.shutdown()
+    
+    def test_refresh_reports_changes(self):
+        """Test refresh reloads changed and drops deleted templates."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            kept = self._stored(tmpdir, "Kept")
+            edited = self._stored(tmpdir, "Edited")
+            deleted = self._stored(tmpdir, "Deleted")
+            service = TemplateService(tmpdir, validate_cache=False)
+            for template_id in (kept, edited, deleted):
+                service.get_template(template_id)
+            
+            other = TemplateService(tmpdir)
+            template = other.load_template(edited)
+            template.name = "Edited twice"
+            other.save_template(template)
+            other.delete_template(deleted)
+            
+            assert sorted(service.refresh()) == sorted([edited, deleted])
+            assert service.get_template(edited).name == "Edited twice"
+            assert deleted not in service._templates
+            assert service.refresh() == []
+    
+    def test_watcher_notifies(self):
+        """Test the watcher thread picks up external changes."""
+        import threading
+        with tempfile.TemporaryDirectory() as tmpdir:
+            template_id = self._stored(tmpdir)
+            service = TemplateService(tmpdir)
+            service.get_template(template_id)
+            
+            seen = threading.Event()
+            assert service.start_watcher(interval=0.01, on_change=lambda ids: seen.set())
+            assert not service.start_watcher(interval=0.01)
+            
+            other = TemplateService(tmpdir)
+            template = other.load_template(template_id)
+            template.name = "Watched"
+            other.save_template(template)
+            
+            assert seen.wait(5)
+            service.shutdown()
+            assert service.get_template(template_id).name == "Watched"
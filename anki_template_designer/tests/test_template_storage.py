@@ -0,0 +1,281 @@
+"""Tests for template storage backends."""
+
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+import pytest
+
+from anki_template_designer.core.exceptions import StorageReadError
+from anki_template_designer.core.models import Template
+from anki_template_designer.services.template_service import TemplateService
+from anki_template_designer.services.template_storage import (
+    FileTemplateStorage, SQLiteTemplateStorage, TemplateStorage, import_templates,
+)
+
+logger = logging.getLogger("anki_template_designer.tests.test_template_storage")
+
+
+@pytest.fixture
+def tmpdir():
+    with tempfile.TemporaryDirectory() as path:
+        yield path
+
+
+@pytest.fixture
+def sqlite_storage(tmpdir):
+    storage = SQLiteTemplateStorage(os.path.join(tmpdir, "templates.db"))
+    yield storage
+    storage.close()
+
+
+def make_file_storage(tmpdir):
+    return FileTemplateStorage(
+        os.path.join(tmpdir, "templates"), os.path.join(tmpdir, "template_index.json")
+    )
+
+
+class TestSQLiteTemplateStorage:
+    """Tests for the SQLite backend."""
+
+    def test_write_read_delete(self, sqlite_storage):
+        """Test the basic round trip."""
+        template = Template(name="Stored")
+        template.css = ".card { color: red; }"
+        sqlite_storage.write(template.id, template.to_dict())
+
+        assert sqlite_storage.exists(template.id)
+        assert sqlite_storage.read(template.id) == template.to_dict()
+        assert sqlite_storage.list_ids() == [template.id]
+
+        assert sqlite_storage.delete(template.id)
+        assert sqlite_storage.read(template.id) is None
+        assert not sqlite_storage.delete(template.id)
+        assert sqlite_storage.count() == 0
+
+    def test_wal_mode(self, sqlite_storage):
+        """Test the database is opened in WAL mode."""
+        conn = sqlite3.connect(sqlite_storage.location)
+        try:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        finally:
+            conn.close()
+
+    def test_query_sorting_and_pagination(self, sqlite_storage):
+        """Test queries sort like the file index."""
+        names = ["delta", "Alpha", "charlie", "bravo"]
+        for i, name in enumerate(names):
+            template = Template(name=name)
+            data = template.to_dict()
+            data["modifiedAt"] = f"2024-01-0{i + 1}T00:00:00"
+            sqlite_storage.write(template.id, data)
+
+        by_name = [t["name"] for t in sqlite_storage.query(sort="name")]
+        assert by_name == ["Alpha", "bravo", "charlie", "delta"]
+        page = sqlite_storage.query(offset=1, limit=2, sort="name")
+        assert [t["name"] for t in page] == ["bravo", "charlie"]
+        assert sqlite_storage.query(limit=1)[0]["name"] == "bravo"
+        assert sqlite_storage.query(limit=1, reverse=False)[0]["name"] == "delta"
+
+        with pytest.raises(ValueError):
+            sqlite_storage.query(sort="size")
+
+    def test_rewrite_updates_metadata(self, sqlite_storage):
+        """Test rewriting a template replaces its metadata row."""
+        template = Template(name="Before")
+        sqlite_storage.write(template.id, template.to_dict())
+        template.name = "After"
+        sqlite_storage.write(template.id, template.to_dict())
+
+        assert sqlite_storage.count() == 1
+        assert sqlite_storage.query()[0]["name"] == "After"
+
+    def test_reopen_keeps_data(self, tmpdir):
+        """Test data survives closing and reopening the database."""
+        path = os.path.join(tmpdir, "templates.db")
+        storage = SQLiteTemplateStorage(path)
+        template = Template(name="Durable")
+        storage.write(template.id, template.to_dict())
+        storage.close()
+
+        reopened = SQLiteTemplateStorage(path)
+        assert reopened.read(template.id)["name"] == "Durable"
+        reopened.close()
+
+    def test_version_changes_on_write(self, sqlite_storage):
+        """Test the version token tracks rewrites."""
+        template = Template(name="V")
+        assert sqlite_storage.version(template.id) is None
+        sqlite_storage.write(template.id, template.to_dict())
+        before = sqlite_storage.version(template.id)
+
+        template.css = ".changed {}"
+        sqlite_storage.write(template.id, template.to_dict())
+        assert sqlite_storage.version(template.id) != before
+
+    def test_newer_schema_rejected(self, tmpdir):
+        """Test a database from a newer version is not modified."""
+        path = os.path.join(tmpdir, "templates.db")
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA user_version = 99")
+        conn.close()
+
+        with pytest.raises(StorageReadError):
+            SQLiteTemplateStorage(path)
+
+    def test_database_errors_wrapped(self, tmpdir):
+        """Test every read surfaces database errors as StorageReadError."""
+        storage = SQLiteTemplateStorage(os.path.join(tmpdir, "templates.db"))
+        storage.close()
+        for call in (lambda: storage.exists("a"), storage.list_ids, storage.query, storage.count):
+            with pytest.raises(StorageReadError):
+                call()
+
+    def test_base_class_is_abstract(self):
+        """Test backends must implement the storage interface."""
+        with pytest.raises(TypeError):
+            TemplateStorage()
+
+
+class TestFileTemplateStorage:
+    """Tests for the file backend."""
+
+    def test_version_is_stat_based(self, tmpdir):
+        """Test the version token is (mtime_ns, size, inode) and follows rewrites."""
+        storage = make_file_storage(tmpdir)
+        template = Template(name="V")
+        assert storage.version(template.id) is None
+        storage.write(template.id, template.to_dict())
+
+        stat = os.stat(storage.path_for(template.id))
+        version = storage.version(template.id)
+        assert version == (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+        storage.write(template.id, template.to_dict())
+        assert storage.version(template.id) != version
+
+
+class TestImportTemplates:
+    """Tests for copying templates between backends."""
+
+    def test_import_directory(self, tmpdir, sqlite_storage):
+        """Test importing an existing template directory."""
+        files = make_file_storage(tmpdir)
+        ids = []
+        for i in range(5):
+            template = Template(name=f"T{i}")
+            files.write(template.id, template.to_dict())
+            ids.append(template.id)
+        with open(os.path.join(files.location, "broken.json"), "w") as f:
+            f.write("{not json")
+
+        assert import_templates(files, sqlite_storage, batch_size=2) == 5
+        assert sorted(sqlite_storage.list_ids()) == sorted(ids)
+        assert os.path.exists(files.path_for(ids[0]))
+
+    def test_import_without_overwrite(self, tmpdir, sqlite_storage):
+        """Test existing templates are kept when overwrite is off."""
+        files = make_file_storage(tmpdir)
+        template = Template(name="Source")
+        files.write(template.id, template.to_dict())
+        template.name = "Target"
+        sqlite_storage.write(template.id, template.to_dict())
+
+        assert import_templates(files, sqlite_storage, overwrite=False) == 0
+        assert sqlite_storage.read(template.id)["name"] == "Target"
+
+
+class TestServiceWithSQLite:
+    """Tests for TemplateService on the SQLite backend."""
+
+    def test_crud(self, tmpdir):
+        """Test the service works unchanged on SQLite."""
+        service = TemplateService(tmpdir, backend="sqlite")
+        template = service.create_template("Cards")
+        assert service.save_template(template)
+
+        service._templates.clear()
+        assert service.load_template(template.id).name == "Cards"
+        assert [t["id"] for t in service.list_templates()] == [template.id]
+        assert service.storage_format is None
+        assert not os.path.exists(os.path.join(tmpdir, TemplateService.TEMPLATES_DIR))
+
+        assert service.delete_template(template.id)
+        assert service.count_templates() == 0
+
+    def test_write_behind(self, tmpdir):
+        """Test background writes reach the database."""
+        service = TemplateService(tmpdir, backend="sqlite", write_behind=True, debounce_seconds=10)
+        template = service.create_template("Queued")
+        service.save_template(template)
+        assert service.count_templates() == 1
+        service.shutdown()
+
+    def test_import_from_directory(self, tmpdir):
+        """Test moving an existing install to SQLite."""
+        files_service = TemplateService(tmpdir)
+        for i in range(3):
+            files_service.save_template(Template(name=f"T{i}"))
+
+        service = TemplateService(tmpdir, backend="sqlite")
+        assert service.import_from(files_service.storage) == 3
+        assert service.count_templates() == 3
+
+    def test_file_only_operations_rejected(self, tmpdir):
+        """Test file-format operations fail clearly on SQLite."""
+        service = TemplateService(tmpdir, backend="sqlite")
+        with pytest.raises(ValueError):
+            service.migrate_storage("binary")
+
+    def test_unknown_backend_rejected(self, tmpdir):
+        """Test unknown backends are rejected."""
+        with pytest.raises(ValueError):
+            TemplateService(tmpdir, backend="redis")
+
+
+@pytest.mark.slow
+class TestStorageBenchmarks:
+    """Load, save and list latency of both backends at 10k templates."""
+
+    COUNT = 10000
+
+    def _measure(self, service, templates):
+        start = time.perf_counter()
+        for template in templates:
+            service.save_template(template)
+        save = time.perf_counter() - start
+
+        service._templates.clear()
+        start = time.perf_counter()
+        for template in templates[::20]:
+            service.load_template(template.id)
+        load = (time.perf_counter() - start) / len(templates[::20])
+
+        service.list_templates(limit=50)
+        start = time.perf_counter()
+        for _ in range(10):
+            page = service.list_templates(limit=50)
+        listing = (time.perf_counter() - start) / 10
+        assert len(page) == 50
+        return save / len(templates), load, listing
+
+    def test_backends_at_10k(self, tmpdir):
+        """Test SQLite lists faster than the file backend and both stay usable."""
+        templates = [Template(name=f"Template {i}") for i in range(self.COUNT)]
+
+        file_service = TemplateService(os.path.join(tmpdir, "files"))
+        file_save, file_load, file_list = self._measure(file_service, templates)
+
+        sqlite_service = TemplateService(os.path.join(tmpdir, "db"), backend="sqlite")
+        sql_save, sql_load, sql_list = self._measure(sqlite_service, templates)
+
+        logger.info(
+            "per op (ms)   save    load    list(50)\n"
+            f"file        {file_save * 1000:6.3f}  {file_load * 1000:6.3f}  {file_list * 1000:7.3f}\n"
+            f"sqlite      {sql_save * 1000:6.3f}  {sql_load * 1000:6.3f}  {sql_list * 1000:7.3f}"
+        )
+
+        assert sql_list < file_list
+        assert sql_load < 0.01 and file_load < 0.01
@@ -0,0 +1,161 @@
+"""Tests for the write-behind queue."""
+
+import threading
+import time
+
+import pytest
+
+from anki_template_designer.services.write_behind import WriteBehindQueue
+
+
+class Recorder:
+    """Writer that records calls."""
+
+    def __init__(self, delay=0.0, fail_keys=()):
+        self.calls = []
+        self.delay = delay
+        self.fail_keys = set(fail_keys)
+        self.lock = threading.Lock()
+
+    def __call__(self, key, payload):
+        if self.delay:
+            time.sleep(self.delay)
+        if key in self.fail_keys:
+            raise IOError("disk full")
+        with self.lock:
+            self.calls.append((key, payload))
+
+
+@pytest.fixture
+def recorder():
+    return Recorder()
+
+
+class TestWriteBehindQueue:
+    """Tests for WriteBehindQueue."""
+
+    def test_coalesces_within_debounce(self, recorder):
+        """Test rapid submissions of one key produce one write of the latest payload."""
+        queue = WriteBehindQueue(recorder, debounce_seconds=0.2)
+        for i in range(10):
+            queue.submit("a", i)
+        assert queue.flush(timeout=5)
+
+        assert recorder.calls == [("a", 9)]
+        assert queue.get_stats()["coalesced"] == 9
+        queue.shutdown()
+
+    def test_writes_after_debounce(self, recorder):
+        """Test pending writes happen on their own after the quiet period."""
+        queue = WriteBehindQueue(recorder, debounce_seconds=0.05)
+        queue.submit("a", 1)
+        deadline = time.monotonic() + 5
+        while not recorder.calls and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert recorder.calls == [("a", 1)]
+        queue.shutdown()
+
+    def test_max_delay_bounds_starvation(self, recorder):
+        """Test a continuously saved key is still written."""
+        queue = WriteBehindQueue(recorder, debounce_seconds=0.1, max_delay_seconds=0.2)
+        end = time.monotonic() + 0.6
+        i = 0
+        while time.monotonic() < end:
+            queue.submit("a", i)
+            i += 1
+            time.sleep(0.01)
+        assert recorder.calls
+        queue.shutdown()
+
+    def test_flush_is_a_barrier(self):
+        """Test flush waits for writes in progress."""
+        recorder = Recorder(delay=0.1)
+        queue = WriteBehindQueue(recorder, debounce_seconds=10)
+        for key in "abc":
+            queue.submit(key, key)
+        assert queue.flush(timeout=5)
+        assert sorted(k for k, _ in recorder.calls) == ["a", "b", "c"]
+        assert queue.depth == 0
+        queue.shutdown()
+
+    def test_cancel_drops_pending(self, recorder):
+        """Test cancelled keys are not written."""
+        queue = WriteBehindQueue(recorder, debounce_seconds=10)
+        queue.submit("a", 1)
+        assert "a" in queue
+        assert queue.cancel("a")
+        queue.flush()
+        assert recorder.calls == []
+        queue.shutdown()
+
+    def test_errors_counted_and_isolated(self):
+        """Test a failing write does not stop other writes."""
+        recorder = Recorder(fail_keys={"bad"})
+        queue = WriteBehindQueue(recorder, debounce_seconds=10)
+        queue.submit("bad", 1)
+        queue.submit("good", 2)
+        queue.flush()
+        assert recorder.calls == [("good", 2)]
+        assert queue.get_stats()["errors"] == 1
+        queue.shutdown()
+
+    def test_failed_write_retried(self):
+        """Test a failed write is retried and succeeds without reporting an error."""
+        attempts = []
+        errors = []
+
+        def flaky(key, payload):
+            attempts.append(payload)
+            if len(attempts) < 2:
+                raise IOError("busy")
+
+        queue = WriteBehindQueue(flaky, debounce_seconds=10, on_error=lambda *args: errors.append(args))
+        queue.submit("a", 1)
+        assert queue.flush(timeout=5)
+        assert attempts == [1, 1]
+        assert errors == []
+        assert queue.get_stats()["retried"] == 1 and queue.get_stats()["errors"] == 0
+        queue.shutdown()
+
+    def test_on_error_after_retries(self):
+        """Test on_error gets the payload once retries are used up."""
+        recorder = Recorder(fail_keys={"bad"})
+        errors = []
+        queue = WriteBehindQueue(
+            recorder, debounce_seconds=10, retries=1, on_error=lambda *args: errors.append(args)
+        )
+        queue.submit("bad", 1)
+        assert queue.flush(timeout=5)
+        assert [(key, payload) for key, payload, _ in errors] == [("bad", 1)]
+        assert isinstance(errors[0][2], IOError)
+        assert queue.get_stats()["retried"] == 1
+        queue.shutdown()
+
+        queue.submit("bad", 2)
+        assert [payload for _, payload, _ in errors] == [1, 2]
+
+    def test_metrics(self, recorder):
+        """Test queue depth and latency metrics are recorded."""
+        queue = WriteBehindQueue(recorder, debounce_seconds=10, name="q")
+        queue.submit("a", 1)
+        queue.submit("b", 1)
+        assert queue.metrics.get_gauge("q.queue_depth") == 2
+        queue.flush()
+        assert queue.metrics.get_gauge("q.queue_depth") == 0
+        assert queue.metrics.get_timing_stats("q.latency").count == 2
+        assert queue.get_stats()["written"] == 2
+        queue.shutdown()
+
+    def test_submit_after_shutdown_is_synchronous(self, recorder):
+        """Test writes after shutdown happen immediately."""
+        queue = WriteBehindQueue(recorder, debounce_seconds=10)
+        queue.shutdown()
+        queue.submit("a", 1)
+        assert recorder.calls == [("a", 1)]
+
+    def test_shutdown_without_flush_drops(self, recorder):
+        """Test shutdown can discard pending writes."""
+        queue = WriteBehindQueue(recorder, debounce_seconds=10)
+        queue.submit("a", 1)
+        queue.shutdown(flush=False)
+        assert recorder.calls == []